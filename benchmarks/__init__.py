@@ -0,0 +1,7 @@
+"""Benchmarks for the hot endpoints, run against the local Seedr simulator
+
+``python -m benchmarks`` measures throughput, p50/p95/p99 latency, peak
+RSS and upstream Seedr calls per scenario and concurrency level. It writes
+the results as a JSON baseline (``-o``), and with ``--compare`` it flags
+regressions against a stored baseline.
+"""
@@ -0,0 +1,83 @@
+"""Command line entry point: ``python -m benchmarks --help``"""
+import argparse
+import os
+import sys
+import tempfile
+
+from benchmarks import baseline
+from benchmarks.scenarios import SCENARIOS, by_name
+
+
+def _isolate_state(directory: str):
+    """Keep tokens, queues and caches of the benchmark out of the working directory"""
+    for name, value in {
+        "SHARED_STATE_PATH": os.path.join(directory, "shared_state.db"),
+        "TOKEN_STORAGE_PATH": os.path.join(directory, "tokens.json"),
+        "TREE_MIRROR_PATH": os.path.join(directory, "tree_mirror.db"),
+        "USAGE_SERIES_PATH": "",
+        "USAGE_SAMPLE_INTERVAL": "0",
+        "DEFAULT_AUTH": "False",
+        "TRACING_OTLP_ENDPOINT": "",
+        "LOG_LEVEL": "WARNING"
+    }.items():
+        os.environ[name] = value
+
+
+def _print_result(result):
+    latency = result["latency_ms"]
+    print(
+        f"{result['scenario'] + '@' + str(result['concurrency']):<32} {result['throughput']:>9.1f} req/s"
+        f"  p50 {latency['p50']:>8.1f}  p95 {latency['p95']:>8.1f}  p99 {latency['p99']:>8.1f} ms"
+        f"  rss {result['peak_rss_mb']:>7.1f} MB  upstream/req {result['upstream_calls_per_request']:>7.2f}"
+        + (f"  errors {result['errors']}" if result["errors"] else ""),
+        flush=True
+    )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Benchmark the hot API endpoints")
+    parser.add_argument("-s", "--scenario", action="append", help="Scenario to run (repeatable; default all)")
+    parser.add_argument("-c", "--concurrency", default="1,8,32", help="Comma-separated concurrency levels")
+    parser.add_argument("-n", "--requests", type=int, help="Measured requests per level (default per scenario)")
+    parser.add_argument("--warmup", type=int, default=5, help="Unmeasured requests before each level")
+    parser.add_argument("--latency", default="0", help="Simulated Seedr latency, e.g. lognormal:0.08,0.5")
+    parser.add_argument("-o", "--output", help="Write the results to this baseline file")
+    parser.add_argument("--compare", metavar="BASELINE", help="Flag regressions against this baseline file")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative slowdown (default 0.2)")
+    parser.add_argument("--list", action="store_true", help="List the scenarios and exit")
+    args = parser.parse_args()
+
+    if args.list:
+        for scenario in SCENARIOS:
+            print(f"{scenario.name:<24} {scenario.description}")
+        return 0
+
+    try:
+        scenarios = by_name(args.scenario)
+        concurrency = [int(level) for level in args.concurrency.split(',') if level.strip()]
+    except ValueError as e:
+        parser.error(str(e))
+    reference = baseline.load(args.compare) if args.compare else None
+
+    with tempfile.TemporaryDirectory(prefix="seedr-bench-") as directory:
+        _isolate_state(directory)
+        from benchmarks.runner import run
+
+        document = run(scenarios, concurrency, args.requests, args.warmup, args.latency, progress=_print_result)
+
+    if args.output:
+        baseline.save(args.output, document)
+        print(f"Results written to {args.output}")
+    if reference is None:
+        return 0
+
+    findings = baseline.compare(reference, document, args.tolerance)
+    regressions = [finding for finding in findings if finding.regression]
+    for finding in findings:
+        print(finding)
+    print(f"{len(regressions)} regression(s) against {args.compare}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,81 @@
+"""Baseline files and regression checks
+
+A baseline is the JSON document ``runner.run`` returns. Results are keyed
+``<scenario>@<concurrency>``. ``compare`` checks a new run against a
+stored baseline, one result at a time:
+
+* throughput may drop, and p50/p95/p99 latency and peak RSS may grow, by up
+  to ``tolerance`` (relative) before the change counts as a regression.
+  Latency and RSS changes below an absolute floor never count, because
+  sub-millisecond timings are mostly noise.
+* Upstream calls per request depend only on the code, not on the machine,
+  so at concurrency 1 any increase counts. At higher concurrency, request
+  coalescing makes the count depend on timing, so ``tolerance`` applies.
+* Errors where the baseline had none count.
+"""
+import json
+from dataclasses import dataclass
+from typing import Any, Dict, List
+
+# Absolute changes below these never count as regressions
+LATENCY_FLOOR_MS = 1.0
+RSS_FLOOR_MB = 16.0
+
+
+@dataclass
+class Finding:
+    key: str
+    metric: str
+    baseline: float
+    current: float
+    regression: bool
+
+    @property
+    def change(self) -> float:
+        """Relative change (0.25 is +25%)"""
+        if self.baseline == 0:
+            return 0.0 if self.current == 0 else float("inf")
+        return self.current / self.baseline - 1
+
+    def __str__(self) -> str:
+        flag = "REGRESSION" if self.regression else "ok"
+        return f"{flag:<10} {self.key:<32} {self.metric:<26} {self.baseline:>10g} -> {self.current:<10g} ({self.change:+.1%})"
+
+
+def save(path: str, document: Dict[str, Any]):
+    with open(path, 'w') as f:
+        json.dump(document, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+def load(path: str) -> Dict[str, Any]:
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], tolerance: float = 0.2) -> List[Finding]:
+    """Findings for every result present in both documents"""
+    findings = []
+    old_results, new_results = baseline.get("results", {}), current.get("results", {})
+    for key in sorted(set(old_results) & set(new_results)):
+        old, new = old_results[key], new_results[key]
+
+        findings.append(Finding(
+            key, "throughput", old["throughput"], new["throughput"],
+            new["throughput"] < old["throughput"] * (1 - tolerance)
+        ))
+        for name in ("p50", "p95", "p99"):
+            before, after = old["latency_ms"][name], new["latency_ms"][name]
+            findings.append(Finding(
+                key, f"latency_ms.{name}", before, after,
+                after > before * (1 + tolerance) and after - before > LATENCY_FLOOR_MS
+            ))
+        before, after = old["peak_rss_mb"], new["peak_rss_mb"]
+        findings.append(Finding(
+            key, "peak_rss_mb", before, after, after > before * (1 + tolerance) and after - before > RSS_FLOOR_MB
+        ))
+        before, after = old["upstream_calls_per_request"], new["upstream_calls_per_request"]
+        allowed = before + 1e-3 if new["concurrency"] == 1 else before * (1 + tolerance) + 1e-3
+        findings.append(Finding(key, "upstream_calls_per_request", before, after, after > allowed))
+        findings.append(Finding(key, "errors", old["errors"], new["errors"], new["errors"] > 0 and not old["errors"]))
+    return findings
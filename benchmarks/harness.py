@@ -0,0 +1,132 @@
+"""Load generation and measurement
+
+``run_load`` sends a fixed number of requests with N concurrent workers
+and records per-request latency. ``RssSampler`` tracks peak resident
+memory during a run. The API, the simulator and the load generator share
+one process, so the figures are for all three together.
+"""
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+import httpx
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# A request function sends request number ``index`` and returns the response
+RequestFn = Callable[[httpx.Client, int], httpx.Response]
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of ``values`` (0 when empty)"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+
+def _current_rss() -> Optional[int]:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _peak_rss() -> int:
+    if resource is None:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class RssSampler:
+    """Highest resident set size seen while running
+
+    Samples /proc/self/statm. Where that is missing, falls back to the
+    process-lifetime peak from getrusage.
+    """
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            rss = _current_rss()
+            if rss is None:
+                return
+            self.peak = max(self.peak, rss)
+            self._stop.wait(self.interval)
+
+    def __enter__(self) -> "RssSampler":
+        self.peak = _current_rss() or 0
+        self._thread = threading.Thread(target=self._run, name="rss-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+        if _current_rss() is None:
+            self.peak = _peak_rss()
+
+
+@dataclass
+class LoadResult:
+    requests: int
+    concurrency: int
+    elapsed: float
+    latencies: List[float] = field(default_factory=list)
+    errors: int = 0
+    statuses: Dict[int, int] = field(default_factory=dict)
+
+    @property
+    def throughput(self) -> float:
+        return self.requests / self.elapsed if self.elapsed > 0 else 0.0
+
+
+def run_load(base_url: str, request: RequestFn, requests: int, concurrency: int,
+             timeout: float = 120.0) -> LoadResult:
+    """Send ``requests`` requests (indexes 0 to requests - 1) from ``concurrency`` workers"""
+    counter = iter(range(requests))
+    lock = threading.Lock()
+    latencies: List[float] = []
+    statuses: Dict[int, int] = {}
+
+    def worker():
+        with httpx.Client(base_url=base_url, timeout=timeout) as client:
+            while True:
+                with lock:
+                    index = next(counter, None)
+                if index is None:
+                    return
+                start = time.perf_counter()
+                try:
+                    status = request(client, index).status_code
+                except httpx.HTTPError:
+                    status = 0
+                elapsed = time.perf_counter() - start
+                with lock:
+                    latencies.append(elapsed)
+                    statuses[status] = statuses.get(status, 0) + 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for future in [pool.submit(worker) for _ in range(concurrency)]:
+            future.result()
+    elapsed = time.perf_counter() - start
+
+    errors = sum(count for status, count in statuses.items() if not 200 <= status < 300)
+    return LoadResult(requests, concurrency, elapsed, latencies, errors, statuses)
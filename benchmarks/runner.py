@@ -0,0 +1,114 @@
+"""Run scenarios against the API and a simulated Seedr
+
+The API is served by uvicorn on a local port, so requests pass through the
+real middleware stack and thread pool. Application modules are imported
+lazily: ``python -m benchmarks`` first points the state files at a
+temporary directory.
+"""
+import os
+import platform
+import sys
+import uuid
+from datetime import datetime, timezone
+from functools import partial
+from typing import Any, Callable, Dict, List, Optional
+
+import httpx
+
+from benchmarks.harness import RssSampler, percentile, run_load
+from benchmarks.scenarios import Context, Scenario
+from simulator import BackgroundServer, SimulatorConfig, SimulatorServer
+
+BASELINE_VERSION = 1
+
+
+def _ms(seconds: float) -> float:
+    return round(seconds * 1000, 3)
+
+
+def run_scenario(api_url: str, scenario: Scenario, concurrency: int, requests: Optional[int] = None,
+                 warmup: int = 5, latency: str = "0") -> Dict[str, Any]:
+    """Measure one scenario at one concurrency level"""
+    from config import settings
+    from utils.seedr_client import client_manager, configure_endpoints
+
+    requests = requests or scenario.requests
+    config = SimulatorConfig(latency=latency, **scenario.simulator)
+    torrentmeta_url = settings.TORRENTMETA_URL
+    user = f"bench-{scenario.name}-c{concurrency}-{uuid.uuid4().hex[:6]}"
+    with SimulatorServer(config) as sim:
+        configure_endpoints(sim.url)
+        settings.TORRENTMETA_URL = f"{sim.url}/torrentmeta"
+        try:
+            client_manager.create_client_from_password(user, config.password)
+            ctx = Context(user, sim, {"requests": requests + warmup})
+            if scenario.setup is not None:
+                scenario.setup(ctx)
+
+            request = partial(scenario.request, ctx)
+            with httpx.Client(base_url=api_url, timeout=120.0) as client:
+                for index in range(warmup):
+                    request(client, -1 - index)
+
+            calls_before = dict(sim.state.calls)
+            with RssSampler() as rss:
+                result = run_load(api_url, request, requests, concurrency)
+            upstream = {
+                func: count - calls_before.get(func, 0)
+                for func, count in sorted(sim.state.calls.items())
+                if count - calls_before.get(func, 0)
+            }
+        finally:
+            configure_endpoints(settings.SEEDR_BASE_URL or None)
+            settings.TORRENTMETA_URL = torrentmeta_url
+            for user_id in [u for u in list(client_manager.clients) if u.startswith(user)]:
+                client_manager.remove_client(user_id)
+
+    measured = {
+        "scenario": scenario.name,
+        "description": scenario.description,
+        "concurrency": concurrency,
+        "requests": requests,
+        "errors": result.errors,
+        "throughput": round(result.throughput, 2),
+        "latency_ms": {
+            "p50": _ms(percentile(result.latencies, 50)),
+            "p95": _ms(percentile(result.latencies, 95)),
+            "p99": _ms(percentile(result.latencies, 99)),
+            "max": _ms(max(result.latencies, default=0.0))
+        },
+        "peak_rss_mb": round(rss.peak / 2 ** 20, 1),
+        "upstream_calls": upstream,
+        "upstream_calls_per_request": round(sum(upstream.values()) / requests, 3)
+    }
+    if result.errors:
+        measured["statuses"] = {str(status): count for status, count in sorted(result.statuses.items())}
+    return measured
+
+
+def run(scenarios: List[Scenario], concurrency: List[int], requests: Optional[int] = None, warmup: int = 5,
+        latency: str = "0", progress: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+    """Run every scenario at every concurrency level; returns a baseline document"""
+    from main import create_app
+
+    results = {}
+    with BackgroundServer(create_app()) as api:
+        for scenario in scenarios:
+            for level in concurrency:
+                measured = run_scenario(api.url, scenario, level, requests, warmup, latency)
+                results[f"{scenario.name}@{level}"] = measured
+                if progress is not None:
+                    progress(measured)
+
+    return {
+        "version": BASELINE_VERSION,
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "argv": sys.argv[1:]
+        },
+        "options": {"upstream_latency": latency, "warmup": warmup},
+        "results": results
+    }
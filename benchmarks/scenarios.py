@@ -0,0 +1,137 @@
+"""The benchmarked endpoints
+
+At every concurrency level, a scenario gets a fresh simulator (configured
+by ``simulator``) and a fresh simulated user. ``setup`` prepares the
+account before the run, and ``request`` sends request number ``index``.
+Warmup requests get negative indexes. ``data["requests"]`` holds the number
+of requests, warmup included.
+"""
+import hashlib
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+import httpx
+
+from simulator import SimulatorServer
+
+
+@dataclass
+class Context:
+    """What a scenario's setup and requests share"""
+
+    user: str
+    simulator: SimulatorServer
+    data: Dict[str, Any] = field(default_factory=dict)
+
+    def params(self, **extra: Any) -> Dict[str, Any]:
+        return {"user_id": self.user, **extra}
+
+
+@dataclass
+class Scenario:
+    name: str
+    description: str
+    request: Callable[[Context, httpx.Client, int], httpx.Response]
+    simulator: Dict[str, Any] = field(default_factory=dict)  # SimulatorConfig overrides
+    setup: Optional[Callable[[Context], None]] = None
+    requests: int = 200  # Measured requests per concurrency level
+
+
+def tree(nodes: int) -> Dict[str, Any]:
+    """Simulator tree settings for about ``nodes`` folders and files in total"""
+    if nodes <= 10:
+        return {"tree_folders": 1, "tree_depth": 0, "tree_fanout": 0, "tree_files": max(nodes - 1, 0)}
+    if nodes <= 1000:
+        # 10 folders with 9 subfolders each, 9 files per folder: 100 folders + 900 files
+        return {"tree_folders": 10, "tree_depth": 1, "tree_fanout": 9, "tree_files": 9}
+    # Three levels (10 + 90 + 810 folders), 10 files per folder: 910 folders + 9100 files
+    return {"tree_folders": 10, "tree_depth": 2, "tree_fanout": 9, "tree_files": 10}
+
+
+def magnet(ctx: Context, index: int) -> str:
+    infohash = hashlib.sha1(f"{ctx.user}:{index}".encode()).hexdigest()
+    return f"magnet:?xt=urn:btih:{infohash}&dn=Benchmark+{index}"
+
+
+def _first_folder(ctx: Context):
+    from utils.seedr_client import client_manager
+
+    ctx.data["folder_id"] = client_manager.get_client(ctx.user).list_contents().folders[0].id
+
+
+def _add_torrents(ctx: Context):
+    from utils.seedr_client import client_manager
+
+    client = client_manager.get_client(ctx.user)
+    for index in range(20):
+        client.add_torrent(magnet_link=magnet(ctx, 10_000_000 + index))
+
+
+def _log_in_many(ctx: Context):
+    """Users the API has stored tokens for but no client in memory"""
+    from utils.seedr_client import client_manager
+
+    # One user per request, warmup included
+    ctx.data["users"] = users = [f"{ctx.user}-{i}" for i in range(ctx.data["requests"])]
+    for user in users:
+        client_manager.create_client_from_password(user, ctx.simulator.state.config.password)
+        with client_manager.lock:
+            client_manager.clients.pop(user, None)
+
+
+def _cold_auth(ctx: Context, client: httpx.Client, index: int) -> httpx.Response:
+    users = ctx.data["users"]
+    return client.get("/api/v1/account/quota", params={"user_id": users[index % len(users)]})
+
+
+SCENARIOS: List[Scenario] = [
+    Scenario(
+        "files_list", "GET /files/list of the root folder",
+        lambda ctx, client, i: client.get("/api/v1/files/list", params=ctx.params()),
+        simulator=tree(1000)
+    ),
+    *[
+        Scenario(
+            f"files_list_all_{nodes}", f"GET /files/list-all of a {nodes}-node tree",
+            lambda ctx, client, i: client.get("/api/v1/files/list-all", params=ctx.params()),
+            simulator=tree(nodes), requests=requests
+        )
+        for nodes, requests in ((10, 200), (1000, 20), (10000, 4))
+    ],
+    Scenario(
+        "files_archive", "POST /files/archive/{folder_id} with a download link per file",
+        lambda ctx, client, i: client.post(f"/api/v1/files/archive/{ctx.data['folder_id']}", params=ctx.params()),
+        simulator={**tree(1000), "tree_files": 20}, setup=_first_folder, requests=100
+    ),
+    Scenario(
+        "torrents_list", "GET /torrents/list with 20 active torrents",
+        lambda ctx, client, i: client.get("/api/v1/torrents/list", params=ctx.params()),
+        simulator={**tree(10), "torrent_duration": "fixed:86400"}, setup=_add_torrents
+    ),
+    Scenario(
+        "torrents_smart_add", "POST /torrents/smartAdd of a new magnet (space check included)",
+        lambda ctx, client, i: client.post(
+            "/api/v1/torrents/smartAdd", params=ctx.params(), json={"magnet_link": magnet(ctx, i)}
+        ),
+        simulator={**tree(10), "torrent_duration": "fixed:86400", "space_max": 10 ** 15}, requests=100
+    ),
+    Scenario(
+        "auth_warm", "GET /account/quota: dependency path for a user whose client is in memory",
+        lambda ctx, client, i: client.get("/api/v1/account/quota", params=ctx.params()),
+        simulator=tree(10)
+    ),
+    Scenario(
+        "auth_cold", "GET /account/quota: dependency path rebuilding the client from the token store",
+        _cold_auth, simulator=tree(10), setup=_log_in_many
+    ),
+]
+
+
+def by_name(names: Optional[List[str]] = None) -> List[Scenario]:
+    if not names:
+        return list(SCENARIOS)
+    known = {scenario.name: scenario for scenario in SCENARIOS}
+    unknown = [name for name in names if name not in known]
+    if unknown:
+        raise ValueError(f"Unknown scenario(s): {', '.join(unknown)} (known: {', '.join(known)})")
+    return [known[name] for name in names]
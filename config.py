@@ -15,15 +15,115 @@ class Settings(BaseSettings):
     # Seedr client settings
     SEEDR_TIMEOUT: float = 30.0
     SEEDR_PROXY: Optional[str] = None
+    SEEDR_BASE_URL: str = ""  # Alternative Seedr origin, e.g. a local simulator (python -m simulator); empty for www.seedr.cc
+    SEEDR_MAX_RETRIES: int = 2  # Retries of transient failures (reads, and writes with an Idempotency-Key)
+    SEEDR_BACKOFF: float = 0.25  # Base of the jittered exponential backoff
+    SEEDR_BACKOFF_MAX: float = 4.0
+    SEEDR_CALL_DEADLINE: float = 45.0  # Budget for all attempts of one call; a retry needs SEEDR_TIMEOUT of it left
+    SEEDR_BREAKER_THRESHOLD: int = 5  # Consecutive transient failures that open a circuit breaker
+    SEEDR_BREAKER_COOLDOWN: float = 30.0  # Seconds an open breaker fails fast before a trial call
+    SEEDR_COALESCE_READS: bool = True  # Identical concurrent reads for a user share one upstream call
+    SEEDR_SHARED_LISTING_TTL: float = 0.0  # Seconds folder listings are shared between workers; 0 disables
     
     # Token storage
-    TOKEN_STORAGE_PATH: str = "tokens.json"
+    TOKEN_STORAGE_PATH: str = "tokens.json"  # Legacy token file, imported into the shared state database
+    
+    # State shared by worker processes (tokens, cache, leader leases)
+    SHARED_STATE_PATH: str = "shared_state.db"
+    LEADER_LEASE_TTL: float = 30.0  # A background job moves to another worker this long after its leader dies
     
     # Auth settings
     DEFAULT_USERNAME: Optional[str] = None
     DEFAULT_PASSWORD: Optional[str] = None
     DEFAULT_AUTH: bool = False
     
+    # TorrentMeta metadata service
+    TORRENTMETA_URL: str = "https://torrentmeta.fly.dev"
+    TORRENTMETA_CONNECT_TIMEOUT: float = 5.0
+    TORRENTMETA_READ_TIMEOUT: float = 30.0
+    TORRENTMETA_MAX_RETRIES: int = 2
+    TORRENTMETA_BACKOFF: float = 0.5
+    TORRENTMETA_MAX_CONNECTIONS: int = 20
+    TORRENTMETA_CACHE_TTL: float = 3600.0  # Seconds lookups are shared between workers; 0 disables
+    
+    # Space check pipeline (smartAdd / addAndDownload)
+    SPACE_CHECK_METADATA_TIMEOUT: float = 5.0
+    SPACE_CHECK_SPACE_TIMEOUT: float = 10.0
+    SPACE_CHECK_FALLBACK: str = "add"  # "add" or "reject" when metadata times out
+    
+    # Quota ledger
+    QUOTA_LEDGER_REFRESH_INTERVAL: float = 60.0
+    QUOTA_RESERVATION_TTL: float = 21600.0
+    
+    # Seconds a non-completed torrent status is served from the index before re-listing
+    TORRENT_STATUS_MAX_AGE: float = 10.0
+    
+    # Torrent file uploads
+    MAX_TORRENT_UPLOAD_SIZE: int = 10 * 1024 * 1024
+    MAX_TORRENT_UPLOAD_FILES: int = 20
+    TORRENT_UPLOAD_CONCURRENCY: int = 4
+    
+    # Bulk ingestion queue
+    INGEST_DISPATCH_INTERVAL: float = 30.0
+    INGEST_MAX_ATTEMPTS: int = 3
+    INGEST_MAX_BATCH: int = 200
+    
+    # Storage reclamation
+    RECLAIM_POLICY: str = "lru"  # "lru", "age" or "size"
+    RECLAIM_PROTECTED_FOLDERS: str = ""  # Comma-separated folder ids or names
+    
+    # Account data cache (seconds)
+    ACCOUNT_CACHE_SETTINGS_TTL: float = 300.0
+    ACCOUNT_CACHE_MEMORY_TTL: float = 30.0
+    ACCOUNT_CACHE_DEVICES_TTL: float = 600.0
+    ACCOUNT_CACHE_STALE_TTL: float = 3600.0  # Serve expired data this long while refreshing in the background
+    
+    # Usage time series
+    USAGE_SAMPLE_INTERVAL: float = 60.0  # 0 disables the sampler
+    USAGE_SERIES_CAPACITY: int = 10080  # Samples kept per user (7 days at 60s)
+    USAGE_SERIES_PATH: str = ""  # Append-only sample log; empty keeps samples in memory only
+    
+    # Local mirror of the folder tree
+    TREE_MIRROR_PATH: str = "tree_mirror.db"
+    TREE_MIRROR_SYNC_INTERVAL: float = 0.0  # Seconds between syncs; 0 disables the mirror
+    TREE_MIRROR_FULL_SYNC_INTERVAL: float = 21600.0  # Re-list every folder this often, not only changed ones
+    TREE_MIRROR_MAX_AGE: float = 900.0  # Oldest mirrored data /files/list, list-all and search serve by default
+    
+    # Dashboard
+    DASHBOARD_TIMEOUT: float = 10.0  # Shared deadline (seconds) for the dashboard fan-out
+    
+    # Response compression
+    COMPRESSION_ENABLED: bool = True
+    COMPRESSION_MIN_SIZE: int = 1024  # Complete bodies below this many bytes are sent uncompressed
+    COMPRESSION_EXCLUDE_PATHS: str = ""  # Comma-separated path prefixes never compressed
+    COMPRESSION_GZIP_LEVEL: int = 6
+    COMPRESSION_BROTLI_QUALITY: int = 4  # Used when the brotli package is installed
+    COMPRESSION_ZSTD_LEVEL: int = 3  # Used when the zstandard package is installed
+    
+    # Metrics
+    METRICS_ENABLED: bool = True  # Prometheus text format at /metrics
+    
+    # Tracing and profiling
+    TRACING_OTLP_ENDPOINT: str = ""  # OTLP/HTTP JSON traces URL (e.g. http://collector:4318/v1/traces); off when empty
+    TRACING_SERVICE_NAME: str = "seedr-api"
+    TRACING_EXPORT_INTERVAL: float = 5.0
+    TRACING_MAX_QUEUE: int = 10000  # Spans beyond this many unexported ones are dropped
+    PROFILE_TOKEN: str = ""  # X-Profile-Token value that enables ?profile=1; off when empty
+    PROFILE_INTERVAL: float = 0.005  # Seconds between stack samples
+    
+    # Completion webhooks
+    WEBHOOK_SECRET: str = ""  # HMAC-SHA256 signing key; unsigned when empty
+    WEBHOOK_ALLOW_PRIVATE_HOSTS: bool = False  # Accept callback URLs on loopback/private networks
+    WEBHOOK_POLL_INTERVAL: float = 15.0
+    WEBHOOK_WATCH_TTL: float = 86400.0
+    WEBHOOK_TIMEOUT: float = 10.0
+    WEBHOOK_MAX_ATTEMPTS: int = 6
+    WEBHOOK_BACKOFF_BASE: float = 2.0
+    WEBHOOK_BACKOFF_MAX: float = 600.0
+    
+    # Startup
+    DISABLED_ROUTERS: str = ""  # Comma-separated routers not to load: auth, account, dashboard, files, torrents, metadata, vlc
+    
     # VLC Media Player
     VLC_PATH: str = r"C:\Program Files\VideoLAN\VLC\vlc.exe"
 
@@ -1,9 +1,19 @@
+from utils import startup  # First, so the startup clock covers every other import
+import importlib
 import logging
-import uvicorn
-from fastapi import FastAPI
+from typing import List
+from fastapi import FastAPI, Response
+from fastapi.datastructures import Default
 from fastapi.middleware.cors import CORSMiddleware
 from config import settings
-from routers import auth, account, files, torrents, vlc
+from models import IndexResponse
+from utils.compression import CompressionMiddleware
+from utils.metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, MetricsMiddleware, registry
+from utils.profiling import ProfilingMiddleware
+from utils.resilience import IdempotencyKeyMiddleware
+from utils.serialization import FastJSONResponse
+from utils.tracing import TracingMiddleware, exporter
+from utils.upload_limit import UploadLimitMiddleware
 
 # Setup logging
 
@@ -16,6 +26,25 @@ logger = logging.getLogger(__name__)
 
 from contextlib import asynccontextmanager
 
+# Routers by name, in registration order. Only enabled ones are imported, so a
+# router listed in DISABLED_ROUTERS costs nothing at startup.
+ROUTERS = {
+    "auth": "routers.auth",
+    "account": "routers.account",
+    "dashboard": "routers.dashboard",
+    "files": "routers.files",
+    "torrents": "routers.torrents",
+    "metadata": "routers.metadata",
+    "vlc": "routers.vlc",
+}
+
+def enabled_routers() -> List[str]:
+    disabled = {name.strip() for name in settings.DISABLED_ROUTERS.split(',') if name.strip()}
+    unknown = disabled - set(ROUTERS)
+    if unknown:
+        logger.warning(f"Ignoring unknown DISABLED_ROUTERS entries: {', '.join(sorted(unknown))}")
+    return [name for name in ROUTERS if name not in disabled]
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Initialize application services on startup"""
@@ -34,8 +63,36 @@ async def lifespan(app: FastAPI):
             logger.error(f"❌ Error initializing default authentication: {str(e)}")
     else:
         logger.info("🔓 Default Authentication: DISABLED")
+
+    # Resume bulk ingestion left over from a previous run
+    from utils.ingest_queue import ingest_queue
+    ingest_queue.resume()
+
+    from utils.quota_ledger import quota_ledger
+    quota_ledger.start()
+
+    from utils.usage_series import usage_recorder
+    usage_recorder.start()
+
+    from utils.tree_mirror import tree_mirror
+    tree_mirror.start()
+    logger.info(f"🚀 Ready {startup.mark('ready') * 1000:.0f} ms after startup began")
     yield
-    # Cleanup code can go here if needed
+    usage_recorder.stop()
+    quota_ledger.stop()
+    tree_mirror.stop()
+    ingest_queue.stop()
+
+    from utils.reclaimer import storage_reclaimer
+    storage_reclaimer.flush()
+
+    from utils.webhooks import completion_poller, webhook_delivery
+    completion_poller.stop()
+    webhook_delivery.stop()
+    exporter.stop()
+
+    from utils.torrentmeta import torrentmeta
+    await torrentmeta.aclose()
 
 def create_app() -> FastAPI:
 
@@ -45,9 +102,14 @@ def create_app() -> FastAPI:
         version="1.0.0",
         docs_url="/docs",
         redoc_url="/redoc",
+        # Kept as a default so routes with a response_model use Pydantic's direct JSON encoding
+        default_response_class=Default(FastJSONResponse),
         lifespan=lifespan
     )
 
+    # Each middleware added wraps the ones added before it: CORS is the innermost
+    # and Metrics, added last, the outermost
+
     # CORS
     app.add_middleware(
         CORSMiddleware,
@@ -57,33 +119,79 @@ def create_app() -> FastAPI:
         allow_headers=["*"],
     )
 
+    # Reject oversize torrent uploads before the body is read
+    # (multipart framing gets a small allowance on top of the file limit)
+    multipart_overhead = 64 * 1024
+    app.add_middleware(
+        UploadLimitMiddleware,
+        limits={
+            "/api/v1/torrents/add/file": settings.MAX_TORRENT_UPLOAD_SIZE + multipart_overhead,
+            "/api/v1/torrents/add/files": (
+                settings.MAX_TORRENT_UPLOAD_SIZE * settings.MAX_TORRENT_UPLOAD_FILES + multipart_overhead
+            )
+        }
+    )
+
+    # Negotiated gzip/br/zstd compression. It wraps the routes, CORS and the upload
+    # limit, so it compresses their final bodies. The middleware added below wraps it.
+    if settings.COMPRESSION_ENABLED:
+        app.add_middleware(
+            CompressionMiddleware,
+            minimum_size=settings.COMPRESSION_MIN_SIZE,
+            exclude_paths=[p.strip() for p in settings.COMPRESSION_EXCLUDE_PATHS.split(',')],
+            gzip_level=settings.COMPRESSION_GZIP_LEVEL,
+            brotli_quality=settings.COMPRESSION_BROTLI_QUALITY,
+            zstd_level=settings.COMPRESSION_ZSTD_LEVEL
+        )
+
+    # Idempotency-Key header, which lets upstream writes be retried
+    app.add_middleware(IdempotencyKeyMiddleware)
+
+    # Request spans, and per-request profiles for ?profile=1. Both wrap compression,
+    # so the profile covers it and the profile body itself is sent uncompressed
+    app.add_middleware(TracingMiddleware)
+    app.add_middleware(ProfilingMiddleware)
+
+    # Request metrics. Added last, so it is the outermost middleware and its latency
+    # includes every other middleware
+    if settings.METRICS_ENABLED:
+        app.add_middleware(MetricsMiddleware)
+
+        @app.get("/metrics", include_in_schema=False)
+        async def metrics():
+            # Async so thread pool gauges can read the event loop's limiter
+            return Response(registry.render(), media_type=METRICS_CONTENT_TYPE)
+
     # Include Routers
-    app.include_router(auth.router, prefix="/api/v1")
-    app.include_router(account.router, prefix="/api/v1")
-    app.include_router(files.router, prefix="/api/v1")
-    app.include_router(torrents.router, prefix="/api/v1")
-    app.include_router(vlc.router, prefix="/api/v1")
+    routers = enabled_routers()
+    for name in routers:
+        app.include_router(importlib.import_module(ROUTERS[name]).router, prefix="/api/v1")
 
-    @app.get("/", tags=["General"])
+    @app.get("/", response_model=IndexResponse, tags=["General"])
     def index():
         return {
             "message": "Welcome to Seedr API",
             "documentation": "/docs",
             "version": "1.0.0",
             "endpoints": {
-                "authentication": "/api/v1/auth",
-                "account": "/api/v1/account",
-                "files": "/api/v1/files",
-                "torrents": "/api/v1/torrents",
-                "vlc": "/api/v1/vlc"
+                key: path for key, name, path in (
+                    ("authentication", "auth", "/api/v1/auth"),
+                    ("account", "account", "/api/v1/account"),
+                    ("files", "files", "/api/v1/files"),
+                    ("torrents", "torrents", "/api/v1/torrents"),
+                    ("vlc", "vlc", "/api/v1/vlc")
+                ) if name in routers
             }
         }
     
     return app
 
 app = create_app()
+startup.mark("app")
 
 if __name__ == "__main__":
+    import uvicorn
+
     uvicorn.run(
         "main:app",
         host=settings.HOST,
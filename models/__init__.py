@@ -1,4 +1,32 @@
 """Models package"""
-from .schemas import create_models
+from .schemas import (
+    SeedrModel, ApiModel,
+    SeedrFile, SeedrTorrent, SeedrFolder, FolderContents,
+    AccountSettings, AccountInfo, UserSettings, MemoryBandwidth, Device, DeviceCode, Token,
+    FetchFileResult, APIResult, AddTorrentResult, RawSeedrResponse,
+    IndexResponse, LoginResponse, MessageResponse,
+    Reservation, QuotaStatus, UsageStats, UsageBucket, UsageSample, UsageResponse,
+    DevicesResponse, WishlistResponse, ActionResponse, DashboardResponse,
+    AllContentsResponse, SearchResponse, FileLink, ArchiveResponse, ArchiveStatusResponse,
+    ReclaimCandidate, ReclaimPlan, ReclaimError, ReclaimResponse, PinsResponse, MirrorSync, MirrorStatusResponse,
+    SpaceCheck, Reclamation, CallbackInfo, TorrentIndexEntry, AddTorrentResponse,
+    UploadResult, UploadResponse, QueueItem, QueueState, BulkAddResponse, CountResponse,
+    WebhookWatch, WebhooksResponse, TorrentListResponse, TorrentStatusResponse, MetadataResponse,
+    PlayResponse, VlcConfigResponse
+)
 
-__all__ = ['create_models']
+__all__ = [
+    'SeedrModel', 'ApiModel',
+    'SeedrFile', 'SeedrTorrent', 'SeedrFolder', 'FolderContents',
+    'AccountSettings', 'AccountInfo', 'UserSettings', 'MemoryBandwidth', 'Device', 'DeviceCode', 'Token',
+    'FetchFileResult', 'APIResult', 'AddTorrentResult', 'RawSeedrResponse',
+    'IndexResponse', 'LoginResponse', 'MessageResponse',
+    'Reservation', 'QuotaStatus', 'UsageStats', 'UsageBucket', 'UsageSample', 'UsageResponse',
+    'DevicesResponse', 'WishlistResponse', 'ActionResponse', 'DashboardResponse',
+    'AllContentsResponse', 'SearchResponse', 'FileLink', 'ArchiveResponse', 'ArchiveStatusResponse',
+    'ReclaimCandidate', 'ReclaimPlan', 'ReclaimError', 'ReclaimResponse', 'PinsResponse', 'MirrorSync', 'MirrorStatusResponse',
+    'SpaceCheck', 'Reclamation', 'CallbackInfo', 'TorrentIndexEntry', 'AddTorrentResponse',
+    'UploadResult', 'UploadResponse', 'QueueItem', 'QueueState', 'BulkAddResponse', 'CountResponse',
+    'WebhookWatch', 'WebhooksResponse', 'TorrentListResponse', 'TorrentStatusResponse', 'MetadataResponse',
+    'PlayResponse', 'VlcConfigResponse'
+]
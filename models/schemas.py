@@ -1,145 +1,541 @@
-from flask_restx import fields
-
-
-def create_models(api):
-    """Create all Swagger models for the API"""
-    
-    # Authentication Models
-    device_code_response = api.model('DeviceCodeResponse', {
-        'device_code': fields.String(description='Device code for authentication'),
-        'user_code': fields.String(description='User code to display'),
-        'verification_uri': fields.String(description='URL for user to visit'),
-        'expires_in': fields.Integer(description='Expiration time in seconds'),
-        'interval': fields.Integer(description='Polling interval in seconds')
-    })
-    
-    password_login_request = api.model('PasswordLoginRequest', {
-        'username': fields.String(required=True, description='Seedr username/email'),
-        'password': fields.String(required=True, description='Seedr password')
-    })
-    
-    device_code_login_request = api.model('DeviceCodeLoginRequest', {
-        'device_code': fields.String(required=True, description='Device code from get_device_code')
-    })
-    
-    refresh_token_request = api.model('RefreshTokenRequest', {
-        'refresh_token': fields.String(required=True, description='Refresh token')
-    })
-    
-    token_response = api.model('TokenResponse', {
-        'access_token': fields.String(description='Access token'),
-        'refresh_token': fields.String(description='Refresh token'),
-        'token_type': fields.String(description='Token type (usually Bearer)'),
-        'expires_in': fields.Integer(description='Token expiration in seconds')
-    })
-    
-    # Account Models
-    settings_response = api.model('SettingsResponse', {
-        'account': fields.Raw(description='Account information'),
-        'user': fields.Raw(description='User information')
-    })
-    
-    memory_bandwidth_response = api.model('MemoryBandwidthResponse', {
-        'space_used': fields.String(description='Space used'),
-        'space_max': fields.String(description='Maximum space'),
-        'bandwidth_used': fields.String(description='Bandwidth used'),
-        'bandwidth_max': fields.String(description='Maximum bandwidth')
-    })
-    
-    change_name_request = api.model('ChangeNameRequest', {
-        'name': fields.String(required=True, description='New account name'),
-        'password': fields.String(required=True, description='Current password for verification')
-    })
-    
-    change_password_request = api.model('ChangePasswordRequest', {
-        'old_password': fields.String(required=True, description='Current password'),
-        'new_password': fields.String(required=True, description='New password')
-    })
-    
-    # File/Folder Models
-    file_model = api.model('File', {
-        'id': fields.String(description='File ID'),
-        'name': fields.String(description='File name'),
-        'size': fields.Integer(description='File size in bytes'),
-        'folder_file_id': fields.String(description='Parent folder ID')
-    })
-    
-    folder_model = api.model('Folder', {
-        'id': fields.String(description='Folder ID'),
-        'name': fields.String(description='Folder name'),
-        'size': fields.Integer(description='Total size in bytes')
-    })
-    
-    folder_contents_response = api.model('FolderContentsResponse', {
-        'folders': fields.List(fields.Nested(folder_model), description='List of folders'),
-        'files': fields.List(fields.Nested(file_model), description='List of files')
-    })
-    
-    create_folder_request = api.model('CreateFolderRequest', {
-        'name': fields.String(required=True, description='Folder name')
-    })
-    
-    rename_request = api.model('RenameRequest', {
-        'new_name': fields.String(required=True, description='New name')
-    })
-    
-    fetch_file_response = api.model('FetchFileResponse', {
-        'url': fields.String(description='Download URL'),
-        'name': fields.String(description='File name'),
-        'size': fields.Integer(description='File size')
-    })
-    
-    archive_response = api.model('ArchiveResponse', {
-        'archive_id': fields.String(description='Archive ID'),
-        'url': fields.String(description='Archive download URL')
-    })
-    
-    # Torrent Models
-    add_torrent_request = api.model('AddTorrentRequest', {
-        'magnet_link': fields.String(description='Magnet link (if not uploading file)'),
-        'wishlist_id': fields.String(description='Wishlist ID (optional)'),
-        'folder_id': fields.String(description='Destination folder ID (default: -1)')
-    })
-    
-    scan_page_request = api.model('ScanPageRequest', {
-        'url': fields.String(required=True, description='URL to scan for torrents')
-    })
-    
-    torrent_response = api.model('TorrentResponse', {
-        'result': fields.Boolean(description='Operation success'),
-        'user_torrent_id': fields.String(description='Torrent ID'),
-        'message': fields.String(description='Response message')
-    })
-    
-    # Generic Models
-    success_response = api.model('SuccessResponse', {
-        'success': fields.Boolean(description='Operation success'),
-        'message': fields.String(description='Response message')
-    })
-    
-    error_response = api.model('ErrorResponse', {
-        'error': fields.String(description='Error message'),
-        'code': fields.Integer(description='Error code')
-    })
-    
-    return {
-        'device_code_response': device_code_response,
-        'password_login_request': password_login_request,
-        'device_code_login_request': device_code_login_request,
-        'refresh_token_request': refresh_token_request,
-        'token_response': token_response,
-        'settings_response': settings_response,
-        'memory_bandwidth_response': memory_bandwidth_response,
-        'change_name_request': change_name_request,
-        'change_password_request': change_password_request,
-        'folder_contents_response': folder_contents_response,
-        'create_folder_request': create_folder_request,
-        'rename_request': rename_request,
-        'fetch_file_response': fetch_file_response,
-        'archive_response': archive_response,
-        'add_torrent_request': add_torrent_request,
-        'scan_page_request': scan_page_request,
-        'torrent_response': torrent_response,
-        'success_response': success_response,
-        'error_response': error_response
-    }
+"""Typed response models
+
+Every route declares one of these as its ``response_model``. The models
+mirror the seedrcc objects field for field and are validated straight from
+them (``from_attributes``), so routes return the upstream objects as they
+are and Pydantic's compiled core validates and encodes the response in one
+pass, with no intermediate dicts. The private ``_raw`` payload seedrcc
+keeps on every object is never read.
+
+Upstream fields are optional: Seedr omits or nulls fields freely and a
+missing value must not turn a good response into a 500. Numbers Seedr
+sends where a string is documented are accepted and written as strings.
+
+Envelope fields that only appear in some outcomes are optional as well;
+those routes are registered with ``response_model_exclude_unset`` so keys a
+route did not set are left out instead of being written as null.
+"""
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Union
+
+from pydantic import BaseModel, ConfigDict
+
+
+class SeedrModel(BaseModel):
+    """Base for models validated from seedrcc objects"""
+    model_config = ConfigDict(from_attributes=True, coerce_numbers_to_str=True)
+
+
+class ApiModel(BaseModel):
+    """Base for response envelopes built by the routes"""
+    model_config = ConfigDict(from_attributes=True, coerce_numbers_to_str=True)
+
+
+# Seedr objects
+
+class SeedrFile(SeedrModel):
+    file_id: Optional[int] = None
+    name: Optional[str] = None
+    size: Optional[int] = None
+    folder_id: Optional[int] = None
+    folder_file_id: Optional[int] = None
+    hash: Optional[str] = None
+    last_update: Optional[datetime] = None
+    play_audio: Optional[bool] = None
+    play_video: Optional[bool] = None
+    video_progress: Optional[str] = None
+    is_lost: Optional[int] = None
+    thumb: Optional[str] = None
+
+
+class SeedrTorrent(SeedrModel):
+    id: Optional[int] = None
+    name: Optional[str] = None
+    size: Optional[int] = None
+    hash: Optional[str] = None
+    progress: Optional[str] = None
+    last_update: Optional[datetime] = None
+    folder: Optional[str] = None
+    download_rate: Optional[int] = None
+    upload_rate: Optional[int] = None
+    torrent_quality: Optional[int] = None
+    connected_to: Optional[int] = None
+    downloading_from: Optional[int] = None
+    uploading_to: Optional[int] = None
+    seeders: Optional[int] = None
+    leechers: Optional[int] = None
+    warnings: Optional[str] = None
+    stopped: Optional[int] = None
+    progress_url: Optional[str] = None
+
+
+class SeedrFolder(SeedrModel):
+    id: Optional[int] = None
+    name: Optional[str] = None
+    fullname: Optional[str] = None
+    size: Optional[int] = None
+    last_update: Optional[datetime] = None
+    is_shared: Optional[bool] = None
+    play_audio: Optional[bool] = None
+    play_video: Optional[bool] = None
+    folders: List['SeedrFolder'] = []
+    files: List[SeedrFile] = []
+    torrents: List[SeedrTorrent] = []
+    parent: Optional[int] = None
+    timestamp: Optional[datetime] = None
+    indexes: List[Any] = []
+
+
+class FolderContents(SeedrFolder):
+    """A folder listing, with the account usage Seedr sends along with it"""
+    space_used: Optional[int] = None
+    space_max: Optional[int] = None
+    saw_walkthrough: Optional[int] = None
+    type: Optional[str] = None
+    t: List[Optional[datetime]] = []
+
+
+class AccountSettings(SeedrModel):
+    allow_remote_access: Optional[bool] = None
+    site_language: Optional[str] = None
+    subtitles_language: Optional[str] = None
+    email_announcements: Optional[bool] = None
+    email_newsletter: Optional[bool] = None
+
+
+class AccountInfo(SeedrModel):
+    username: Optional[str] = None
+    user_id: Optional[int] = None
+    premium: Optional[int] = None
+    package_id: Optional[int] = None
+    package_name: Optional[str] = None
+    space_used: Optional[int] = None
+    space_max: Optional[int] = None
+    bandwidth_used: Optional[int] = None
+    email: Optional[str] = None
+    wishlist: List[Any] = []
+    invites: Optional[int] = None
+    invites_accepted: Optional[int] = None
+    max_invites: Optional[int] = None
+
+
+class UserSettings(SeedrModel):
+    result: Optional[bool] = None
+    code: Optional[int] = None
+    settings: Optional[AccountSettings] = None
+    account: Optional[AccountInfo] = None
+    country: Optional[str] = None
+
+
+class MemoryBandwidth(SeedrModel):
+    bandwidth_used: Optional[int] = None
+    bandwidth_max: Optional[int] = None
+    space_used: Optional[int] = None
+    space_max: Optional[int] = None
+    is_premium: Optional[int] = None
+
+
+class Device(SeedrModel):
+    client_id: Optional[str] = None
+    client_name: Optional[str] = None
+    device_code: Optional[str] = None
+    tk: Optional[str] = None
+
+
+class DeviceCode(SeedrModel):
+    expires_in: Optional[int] = None
+    interval: Optional[int] = None
+    device_code: Optional[str] = None
+    user_code: Optional[str] = None
+    verification_url: Optional[str] = None
+
+
+class Token(SeedrModel):
+    access_token: Optional[str] = None
+    refresh_token: Optional[str] = None
+    device_code: Optional[str] = None
+
+
+class FetchFileResult(SeedrModel):
+    result: Optional[bool] = None
+    url: Optional[str] = None
+    name: Optional[str] = None
+
+
+class APIResult(SeedrModel):
+    result: Optional[bool] = None
+    code: Optional[int] = None
+
+
+class AddTorrentResult(SeedrModel):
+    result: Optional[bool] = None
+    user_torrent_id: Optional[int] = None
+    title: Optional[str] = None
+    torrent_hash: Optional[str] = None
+    code: Optional[int] = None
+
+
+class RawSeedrResponse(ApiModel):
+    """An add that came back as a bare HTTP response instead of a parsed result"""
+    status_code: Optional[int] = None
+    raw_response: Optional[str] = None
+
+
+# General
+
+class IndexResponse(ApiModel):
+    message: str
+    documentation: str
+    version: str
+    endpoints: Dict[str, str]
+
+
+# Authentication
+
+class LoginResponse(ApiModel):
+    message: str
+    user_id: str
+    token: Optional[Token] = None
+
+
+class MessageResponse(ApiModel):
+    message: str
+
+
+# Account
+
+class Reservation(ApiModel):
+    id: str
+    size: int
+    torrent_id: Optional[str] = None
+    torrent_hash: Optional[str] = None
+    age_seconds: float
+
+
+class QuotaStatus(ApiModel):
+    space_used: int
+    space_max: int
+    reserved: int
+    available: int
+    reading_age_seconds: Optional[float] = None
+    reservations: List[Reservation] = []
+
+
+class UsageStats(ApiModel):
+    min: int
+    max: int
+    avg: float
+
+
+class UsageBucket(ApiModel):
+    start: float
+    count: int
+    space_used: UsageStats
+    space_max: UsageStats
+    bandwidth_used: UsageStats
+    torrents: UsageStats
+
+
+class UsageSample(ApiModel):
+    timestamp: float
+    space_used: int
+    space_max: int
+    bandwidth_used: int
+    torrents: int
+
+
+class UsageResponse(ApiModel):
+    success: bool
+    start: Optional[float] = None
+    end: Optional[float] = None
+    samples: int
+    latest: Optional[UsageSample] = None
+    buckets: List[UsageBucket]
+    seconds_until_full: Optional[float] = None
+
+
+class DevicesResponse(ApiModel):
+    devices: List[Device]
+
+
+class WishlistResponse(ApiModel):
+    result: bool
+    code: int
+    wishlist: List[Any]
+
+
+class ActionResponse(ApiModel):
+    """Outcome of a create/rename/delete call on Seedr"""
+    success: bool
+    message: str
+    result: Optional[APIResult] = None
+
+
+# Dashboard
+
+class DashboardResponse(ApiModel):
+    success: bool
+    settings: Optional[UserSettings] = None
+    memory_bandwidth: Optional[MemoryBandwidth] = None
+    devices: Optional[List[Device]] = None
+    torrents: Optional[List[SeedrTorrent]] = None
+    contents: Optional[FolderContents] = None
+    errors: Dict[str, str]
+    elapsed_seconds: float
+
+
+# Files
+
+class AllContentsResponse(ApiModel):
+    folders: List[SeedrFolder]
+    files: List[SeedrFile]
+    total_folders: int
+    total_files: int
+
+
+class SearchResponse(ApiModel):
+    results: Optional[SeedrFolder] = None
+
+
+class FileLink(ApiModel):
+    file_id: Optional[int] = None
+    name: Optional[str] = None
+    size: Optional[int] = None
+    download_url: Optional[str] = None
+    error: Optional[str] = None
+
+
+class ArchiveResponse(ApiModel):
+    success: bool
+    message: str
+    folder_id: str
+    files: List[FileLink]
+    total_files: int
+
+
+class ArchiveStatusResponse(ApiModel):
+    status: str
+    message: str
+    download_url: Optional[str] = None
+    name: Optional[str] = None
+    file_id: Optional[str] = None
+    archive_id: Optional[str] = None
+
+
+class ReclaimCandidate(ApiModel):
+    folder_id: str
+    name: str
+    size: int
+    last_update: float
+    last_access: Optional[float] = None
+
+
+class ReclaimPlan(ApiModel):
+    policy: str
+    bytes_needed: int
+    bytes_freed: int
+    sufficient: bool
+    folders: List[ReclaimCandidate]
+    protected: List[str]
+
+
+class ReclaimError(ApiModel):
+    folder_id: str
+    error: str
+
+
+class ReclaimResponse(ApiModel):
+    success: bool
+    dry_run: bool
+    plan: ReclaimPlan
+    deleted: Optional[List[ReclaimCandidate]] = None
+    bytes_freed: Optional[int] = None
+    errors: Optional[List[ReclaimError]] = None
+
+
+class PinsResponse(ApiModel):
+    success: Optional[bool] = None
+    message: Optional[str] = None
+    pins: List[str]
+
+
+class MirrorSync(ApiModel):
+    full: bool
+    listed: int
+    confirmed: int
+    elapsed_seconds: float
+
+
+class MirrorStatusResponse(ApiModel):
+    enabled: bool
+    folders: int
+    files: int
+    torrents: int
+    dirty_folders: int
+    synced_at: Optional[float] = None
+    full_synced_at: Optional[float] = None
+    verified_at: Optional[float] = None
+    age_seconds: Optional[float] = None
+    sync: Optional[MirrorSync] = None
+
+
+# Torrents
+
+class SpaceCheck(ApiModel):
+    torrent_size: int
+    torrent_size_formatted: Optional[str] = None
+    available_space: int
+    available_space_formatted: Optional[str] = None
+    space_used: Optional[int] = None
+    space_used_formatted: Optional[str] = None
+    space_max: Optional[int] = None
+    space_max_formatted: Optional[str] = None
+    space_needed: Optional[int] = None
+    space_needed_formatted: Optional[str] = None
+    reserved_by_pending_adds: Optional[int] = None
+    metadata_timed_out: Optional[bool] = None
+    space_timed_out: Optional[bool] = None
+    elapsed_seconds: Optional[float] = None
+    sufficient: bool
+
+
+class Reclamation(ApiModel):
+    performed: bool
+    reason: Optional[str] = None
+    policy: Optional[str] = None
+    plan: Optional[ReclaimPlan] = None
+    deleted: Optional[List[ReclaimCandidate]] = None
+    bytes_freed: Optional[int] = None
+    errors: Optional[List[ReclaimError]] = None
+
+
+class CallbackInfo(ApiModel):
+    registered: bool
+    url: str
+    reason: Optional[str] = None
+
+
+class TorrentIndexEntry(ApiModel):
+    hash: str
+    torrent_id: Optional[str] = None
+    title: Optional[str] = None
+    status: str
+    progress: Optional[float] = None
+    folder_id: Optional[str] = None
+    folder_name: Optional[str] = None
+    updated_at: Optional[float] = None
+
+
+class AddTorrentResponse(ApiModel):
+    """Outcome of /add, /smartAdd and /addAndDownload; keys depend on the outcome"""
+    success: bool
+    message: Optional[str] = None
+    error: Optional[str] = None
+    duplicate: Optional[bool] = None
+    existing: Optional[TorrentIndexEntry] = None
+    result: Optional[Union[AddTorrentResult, RawSeedrResponse]] = None
+    seedr_response: Optional[RawSeedrResponse] = None
+    torrent_info: Optional[Union[AddTorrentResult, RawSeedrResponse]] = None
+    space_check: Optional[SpaceCheck] = None
+    reclamation: Optional[Reclamation] = None
+    callback: Optional[CallbackInfo] = None
+    status: Optional[str] = None
+    folder_id: Optional[str] = None
+    files: Optional[List[FileLink]] = None
+    vlc_playback: Optional[Dict[str, Any]] = None
+
+
+class UploadResult(ApiModel):
+    filename: Optional[str] = None
+    success: bool
+    result: Optional[Union[AddTorrentResult, RawSeedrResponse]] = None
+    error: Optional[Any] = None
+
+
+class UploadResponse(ApiModel):
+    success: bool
+    message: str
+    result: Optional[Union[AddTorrentResult, RawSeedrResponse]] = None
+    results: Optional[List[UploadResult]] = None
+    total: Optional[int] = None
+    added: Optional[int] = None
+
+
+class QueueItem(ApiModel):
+    id: str
+    magnet_link: str
+    folder_id: str
+    size: int
+    status: str
+    attempts: int
+    created_at: float
+    dispatched_at: Optional[float] = None
+    torrent_id: Optional[str] = None
+    error: Optional[str] = None
+
+
+class QueueState(ApiModel):
+    success: bool
+    dispatched: Optional[int] = None
+    items: List[QueueItem]
+    metrics: Dict[str, Any]
+    ledger: QuotaStatus
+
+
+class BulkAddResponse(ApiModel):
+    success: bool
+    message: str
+    items: List[QueueItem]
+    total: int
+
+
+class CountResponse(ApiModel):
+    success: bool
+    message: str
+    removed: Optional[int] = None
+
+
+class WebhookWatch(ApiModel):
+    torrent_hash: Optional[str] = None
+    title: Optional[str] = None
+    torrent_id: Optional[str] = None
+    folder_id: str
+    callback_url: str
+    created_at: float
+
+
+class WebhooksResponse(ApiModel):
+    success: bool
+    watching: List[WebhookWatch]
+    metrics: Dict[str, Any]
+    dead_letters: List[Dict[str, Any]]
+
+
+class TorrentListResponse(ApiModel):
+    success: bool
+    torrents: List[SeedrTorrent]
+    total: int
+
+
+class TorrentStatusResponse(TorrentIndexEntry):
+    success: bool
+
+
+class MetadataResponse(ApiModel):
+    success: bool
+    metadata: Any
+
+
+# VLC
+
+class PlayResponse(ApiModel):
+    success: bool
+    message: str
+    url: str
+    mode: str
+
+
+class VlcConfigResponse(ApiModel):
+    vlc_path: str
+    vlc_exists: bool
+    platform: str
@@ -1,13 +1,23 @@
 from fastapi import APIRouter, HTTPException, Depends, Query
 from pydantic import BaseModel
-from typing import Optional, Dict, Any
+from typing import Optional
+import time
 from seedrcc import Seedr
 from seedrcc.exceptions import SeedrError
-from utils.dependencies import get_seedr_client
+from models import (
+    ActionResponse, DevicesResponse, MemoryBandwidth, QuotaStatus, UsageResponse, UserSettings, WishlistResponse
+)
+from utils.account_cache import account_cache, SETTINGS
+from utils.dependencies import get_seedr_client, get_user_id
+from utils.quota_ledger import quota_ledger
+from utils.resilience import upstream_error
+from utils.serialization import SerializedRoute
+from utils.usage_series import usage_recorder
 
 router = APIRouter(
     prefix="/account",
-    tags=["Account"]
+    tags=["Account"],
+    route_class=SerializedRoute
 )
 
 # Pydantic Models
@@ -19,58 +29,79 @@ class ChangePasswordRequest(BaseModel):
     old_password: str
     new_password: str
 
-def to_dict(obj: Any) -> Dict[str, Any]:
-    """Helper to convert objects to dict"""
-    if isinstance(obj, dict):
-        return obj
-    if hasattr(obj, 'to_dict'):
-        return obj.to_dict()
-    if hasattr(obj, '__dict__'):
-        return obj.__dict__
-    return str(obj)
-
-@router.get("/settings", summary="Get account settings")
-def get_settings(client: Seedr = Depends(get_seedr_client)):
+@router.get("/settings", response_model=UserSettings, summary="Get account settings")
+def get_settings(
+    client: Seedr = Depends(get_seedr_client),
+    user_id: str = Depends(get_user_id)
+):
     try:
-        settings = client.get_settings()
-        return to_dict(settings)
+        return account_cache.settings(user_id, client)
     except SeedrError as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise upstream_error(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
 
-@router.get("/memory-bandwidth", summary="Get memory and bandwidth usage")
-def get_memory_bandwidth(client: Seedr = Depends(get_seedr_client)):
+@router.get("/memory-bandwidth", response_model=MemoryBandwidth, summary="Get memory and bandwidth usage")
+def get_memory_bandwidth(
+    client: Seedr = Depends(get_seedr_client),
+    user_id: str = Depends(get_user_id)
+):
     try:
-        memory_bandwidth = client.get_memory_bandwidth()
-        return to_dict(memory_bandwidth)
+        return account_cache.memory_bandwidth(user_id, client)
     except SeedrError as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise upstream_error(e)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
+
+@router.get("/quota", response_model=QuotaStatus, summary="Get cached quota and pending space reservations")
+def get_quota(
+    refresh: bool = Query(False, description="Re-read the quota from Seedr first"),
+    client: Seedr = Depends(get_seedr_client),
+    user_id: str = Depends(get_user_id)
+):
+    try:
+        if refresh:
+            quota_ledger.refresh(user_id, client)
+        return quota_ledger.status(user_id)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
 
-@router.get("/devices", summary="Get list of authorized devices")
-def get_devices(client: Seedr = Depends(get_seedr_client)):
+@router.get("/usage", response_model=UsageResponse, response_model_exclude_unset=True, summary="Get space and bandwidth usage history")
+def get_usage(
+    start: Optional[float] = Query(None, description="Range start (unix seconds; default: oldest sample)"),
+    end: Optional[float] = Query(None, description="Range end (unix seconds; default: newest sample)"),
+    window: Optional[float] = Query(None, gt=0, description="Range length in seconds ending at 'end' (overrides 'start')"),
+    buckets: int = Query(60, ge=1, le=1000, description="Number of min/max/avg buckets"),
+    client: Seedr = Depends(get_seedr_client),
+    user_id: str = Depends(get_user_id)
+):
+    if window is not None:
+        start = (end if end is not None else time.time()) - window
+    return {"success": True, **usage_recorder.query(user_id, start, end, buckets)}
+
+@router.get("/devices", response_model=DevicesResponse, summary="Get list of authorized devices")
+def get_devices(
+    client: Seedr = Depends(get_seedr_client),
+    user_id: str = Depends(get_user_id)
+):
     try:
-        devices = client.get_devices()
-        return {"devices": to_dict(devices)}
+        devices = account_cache.devices(user_id, client)
+        return {"devices": devices}
     except SeedrError as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise upstream_error(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
 
-@router.get("/list_wishlist", summary="Get user's wishlist")
-def list_wishlist(client: Seedr = Depends(get_seedr_client)):
+@router.get("/list_wishlist", response_model=WishlistResponse, summary="Get user's wishlist")
+def list_wishlist(
+    client: Seedr = Depends(get_seedr_client),
+    user_id: str = Depends(get_user_id)
+):
     try:
-        settings = client.get_settings()
-        settings_dict = to_dict(settings)
-        
-        # Extract wishlist from account data
-        wishlist = []
-        if isinstance(settings_dict, dict):
-            account = settings_dict.get('account', {})
-            if isinstance(account, dict):
-                wishlist = account.get('wishlist', [])
+        # The wishlist is part of the (cached) settings payload
+        settings = account_cache.settings(user_id, client)
+        account = getattr(settings, 'account', None)
+        wishlist = getattr(account, 'wishlist', None) or []
         
         return {
             "result": True,
@@ -78,34 +109,44 @@ def list_wishlist(client: Seedr = Depends(get_seedr_client)):
             "wishlist": wishlist
         }
     except SeedrError as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise upstream_error(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
 
-@router.put("/name", summary="Change account name")
-def change_name(request: ChangeNameRequest, client: Seedr = Depends(get_seedr_client)):
+@router.put("/name", response_model=ActionResponse, summary="Change account name")
+def change_name(
+    request: ChangeNameRequest,
+    client: Seedr = Depends(get_seedr_client),
+    user_id: str = Depends(get_user_id)
+):
     try:
         result = client.change_name(request.name, request.password)
+        account_cache.invalidate(user_id, SETTINGS)
         return {
             "success": True,
             "message": "Name changed successfully",
-            "result": to_dict(result)
+            "result": result
         }
     except SeedrError as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise upstream_error(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
 
-@router.put("/password", summary="Change account password")
-def change_password(request: ChangePasswordRequest, client: Seedr = Depends(get_seedr_client)):
+@router.put("/password", response_model=ActionResponse, summary="Change account password")
+def change_password(
+    request: ChangePasswordRequest,
+    client: Seedr = Depends(get_seedr_client),
+    user_id: str = Depends(get_user_id)
+):
     try:
         result = client.change_password(request.old_password, request.new_password)
+        account_cache.invalidate(user_id)
         return {
             "success": True,
             "message": "Password changed successfully",
-            "result": to_dict(result)
+            "result": result
         }
     except SeedrError as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise upstream_error(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
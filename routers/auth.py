@@ -1,14 +1,18 @@
 from fastapi import APIRouter, HTTPException, Depends, Query
 from pydantic import BaseModel
-from typing import Optional, Dict, Any
+from typing import Optional
 from seedrcc import Seedr
 from seedrcc.exceptions import SeedrError
 from utils.seedr_client import client_manager
 from utils.dependencies import get_seedr_client
+from utils.resilience import upstream_error
+from models import DeviceCode, LoginResponse, MessageResponse
+from utils.serialization import SerializedRoute
 
 router = APIRouter(
     prefix="/auth",
-    tags=["Authentication"]
+    tags=["Authentication"],
+    route_class=SerializedRoute
 )
 
 # Pydantic Models
@@ -24,27 +28,17 @@ class RefreshTokenLoginRequest(BaseModel):
     refresh_token: str
     user_id: str = "default"
 
-def to_dict(obj: Any) -> Dict[str, Any]:
-    """Helper to convert objects to dict"""
-    if isinstance(obj, dict):
-        return obj
-    if hasattr(obj, 'to_dict'):
-        return obj.to_dict()
-    if hasattr(obj, '__dict__'):
-        return obj.__dict__
-    return str(obj) # Fallback
-
-@router.post("/device-code", summary="Get device code for authentication")
+@router.post("/device-code", response_model=DeviceCode, summary="Get device code for authentication")
 def get_device_code():
     try:
         device_code_data = Seedr.get_device_code()
-        return to_dict(device_code_data)
+        return device_code_data
     except SeedrError as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise upstream_error(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
 
-@router.post("/login/password", summary="Login with username and password")
+@router.post("/login/password", response_model=LoginResponse, response_model_exclude_none=True, summary="Login with username and password")
 def login_password(request: PasswordLoginRequest):
     try:
         client = client_manager.create_client_from_password(request.username, request.password)
@@ -55,7 +49,7 @@ def login_password(request: PasswordLoginRequest):
         }
         
         if hasattr(client, "token") and client.token:
-            token_info["token"] = to_dict(client.token)
+            token_info["token"] = client.token
         
         return token_info
         
@@ -64,7 +58,7 @@ def login_password(request: PasswordLoginRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
 
-@router.post("/login/device-code", summary="Login with device code")
+@router.post("/login/device-code", response_model=LoginResponse, response_model_exclude_none=True, summary="Login with device code")
 def login_device_code(request: DeviceCodeLoginRequest):
     try:
         client = client_manager.create_client_from_device_code(request.device_code, request.user_id)
@@ -75,7 +69,7 @@ def login_device_code(request: DeviceCodeLoginRequest):
         }
         
         if hasattr(client, "token") and client.token:
-            token_info["token"] = to_dict(client.token)
+            token_info["token"] = client.token
         
         return token_info
         
@@ -84,7 +78,7 @@ def login_device_code(request: DeviceCodeLoginRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
 
-@router.post("/login/refresh-token", summary="Login with refresh token")
+@router.post("/login/refresh-token", response_model=LoginResponse, response_model_exclude_none=True, summary="Login with refresh token")
 def login_refresh_token(request: RefreshTokenLoginRequest):
     try:
         client = client_manager.create_client_from_refresh_token(request.refresh_token, request.user_id)
@@ -95,7 +89,7 @@ def login_refresh_token(request: RefreshTokenLoginRequest):
         }
         
         if hasattr(client, "token") and client.token:
-            token_info["token"] = to_dict(client.token)
+            token_info["token"] = client.token
         
         return token_info
         
@@ -104,7 +98,7 @@ def login_refresh_token(request: RefreshTokenLoginRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
 
-@router.post("/refresh", summary="Refresh access token")
+@router.post("/refresh", response_model=LoginResponse, response_model_exclude_none=True, summary="Refresh access token")
 def refresh_token(
     user_id: str = Query("default", description="User identifier"),
     client: Seedr = Depends(get_seedr_client)
@@ -118,7 +112,7 @@ def refresh_token(
         }
         
         if hasattr(client, "token") and client.token:
-            token_info["token"] = to_dict(client.token)
+            token_info["token"] = client.token
         
         return token_info
         
@@ -127,7 +121,7 @@ def refresh_token(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
 
-@router.post("/logout", summary="Logout and remove stored session")
+@router.post("/logout", response_model=MessageResponse, summary="Logout and remove stored session")
 def logout(user_id: str = Query("default", description="User identifier")):
     try:
         client_manager.remove_client(user_id)
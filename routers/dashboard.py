@@ -0,0 +1,91 @@
+from fastapi import APIRouter, Depends, Query
+from typing import Dict, Any
+from seedrcc import Seedr
+from concurrent.futures import ThreadPoolExecutor, wait
+import contextvars
+import time
+import logging
+from config import settings
+from models import DashboardResponse
+from utils.account_cache import account_cache
+from utils.dependencies import get_seedr_client, get_user_id
+from utils.metrics import registry
+from utils.quota_ledger import quota_ledger
+from utils.serialization import SerializedRoute
+from utils.torrent_index import torrent_index
+
+router = APIRouter(
+    prefix="/dashboard",
+    tags=["Dashboard"],
+    route_class=SerializedRoute
+)
+logger = logging.getLogger(__name__)
+
+# Shared pool for dashboard fan-out (one slot per upstream call per request)
+_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="dashboard")
+registry.watch_executor("dashboard", _executor)
+
+def _list_root(client: Seedr, user_id: str):
+    contents = client.list_contents('0')
+    quota_ledger.observe_listing(user_id, contents)
+    torrent_index.observe_listing(user_id, '0', contents)
+    return contents
+
+@router.get("", response_model=DashboardResponse, summary="Get settings, usage, devices, torrents and root folder in one call")
+def get_dashboard(
+    timeout: float = Query(None, gt=0, description="Deadline in seconds for all sections (default: DASHBOARD_TIMEOUT)"),
+    client: Seedr = Depends(get_seedr_client),
+    user_id: str = Depends(get_user_id)
+):
+    """
+    Fans the upstream calls out concurrently under one shared deadline.
+
+    The torrents list and the root folder come from the same root listing.
+    A section that fails or misses the deadline is reported in ``errors``
+    and left as null; the other sections are still returned.
+    """
+    start = time.monotonic()
+    deadline = timeout or settings.DASHBOARD_TIMEOUT
+    def submit(fn, *args):
+        # Each section runs in the request's context so its upstream spans join the request trace
+        return _executor.submit(contextvars.copy_context().run, fn, *args)
+
+    futures = {
+        "settings": submit(account_cache.settings, user_id, client),
+        "memory_bandwidth": submit(account_cache.memory_bandwidth, user_id, client),
+        "devices": submit(account_cache.devices, user_id, client),
+        "root": submit(_list_root, client, user_id)
+    }
+    wait(futures.values(), timeout=deadline)
+
+    results: Dict[str, Any] = {}
+    errors: Dict[str, str] = {}
+    for name, future in futures.items():
+        if not future.done():
+            future.cancel()
+            errors[name] = f"Timed out after {deadline} seconds"
+            continue
+        try:
+            results[name] = future.result()
+        except Exception as e:
+            logger.error(f"Dashboard section '{name}' failed: {e}")
+            errors[name] = str(e)
+
+    root = results.get("root")
+    torrents = None
+    if root is not None:
+        torrents = getattr(root, 'torrents', None) or []
+    if "root" in errors:
+        errors["torrents"] = errors["root"]
+        errors["contents"] = errors.pop("root")
+
+    return {
+        "success": not errors,
+        "settings": results.get("settings"),
+        "memory_bandwidth": results.get("memory_bandwidth"),
+        "devices": results.get("devices"),
+        "torrents": torrents,
+        "contents": root,
+        "errors": errors,
+        "elapsed_seconds": round(time.monotonic() - start, 3)
+    }
@@ -1,14 +1,27 @@
 from fastapi import APIRouter, HTTPException, Depends, Query, Response
 from pydantic import BaseModel
-from typing import Optional, Dict, Any, List
+from typing import Optional
 from seedrcc import Seedr
 from seedrcc.exceptions import SeedrError
-from utils.dependencies import get_seedr_client
+from models import (
+    ActionResponse, AllContentsResponse, ArchiveResponse, ArchiveStatusResponse, FetchFileResult, FolderContents,
+    MirrorStatusResponse, PinsResponse, ReclaimResponse, SearchResponse
+)
+from utils.account_cache import account_cache
+from utils.dependencies import get_seedr_client, get_user_id, get_fields, get_max_age
+from utils.quota_ledger import quota_ledger
+from utils.reclaimer import storage_reclaimer
+from utils.resilience import upstream_error
+from utils.serialization import SerializedRoute, FastJSONResponse, FieldTree, project
+from utils.torrent_index import torrent_index
+from utils.tree_mirror import freshness_headers, mirror_user, tree_mirror
 import logging
+import sqlite3
 
 router = APIRouter(
     prefix="/files",
-    tags=["Files"]
+    tags=["Files"],
+    route_class=SerializedRoute
 )
 logger = logging.getLogger(__name__)
 
@@ -19,64 +32,105 @@ class CreateFolderRequest(BaseModel):
 class RenameRequest(BaseModel):
     new_name: str
 
-def to_dict(obj: Any) -> Dict[str, Any]:
-    """Helper to convert objects to dict"""
-    if isinstance(obj, dict):
-        return obj
-    if isinstance(obj, list):
-        return [to_dict(i) for i in obj]
-    if hasattr(obj, 'to_dict'):
-        return obj.to_dict()
-    if hasattr(obj, '__dict__'):
-        return obj.__dict__
-    return str(obj)
+class ReclaimRequest(BaseModel):
+    bytes_needed: int
+    policy: Optional[str] = None
+    dry_run: bool = True
+
+def _from_mirror(query, *args):
+    """Run a tree mirror query; None (ask Seedr) when the mirror cannot be read"""
+    try:
+        return query(*args)
+    except sqlite3.Error as e:
+        logger.error(f"Tree mirror read failed: {e}")
+        return None
 
-@router.get("/list", summary="List folder contents")
+@router.get("/list", response_model=FolderContents, summary="List folder contents")
 def list_contents(
+    response: Response,
     folder_id: str = Query("0", description="Folder ID to list (default: '0' for root)"),
-    client: Seedr = Depends(get_seedr_client)
+    fields: Optional[FieldTree] = Depends(get_fields),
+    max_age: Optional[float] = Depends(get_max_age),
+    client: Seedr = Depends(get_seedr_client),
+    user_id: str = Depends(get_user_id)
 ):
     try:
-        contents = client.list_contents(folder_id)
-        return to_dict(contents)
+        owner = mirror_user(client, user_id)
+        mirrored = _from_mirror(tree_mirror.listing, owner, folder_id, max_age) if max_age else None
+        if mirrored is not None:
+            contents, verified_at = mirrored
+            response.headers.update(freshness_headers(verified_at))
+        else:
+            contents = client.list_contents(folder_id)
+            quota_ledger.observe_listing(user_id, contents, root=folder_id == '0')
+            if folder_id != '0':
+                # The root is recorded when a reclamation plan lists it
+                storage_reclaimer.record_listing(user_id, folder_id, contents)
+            torrent_index.observe_listing(user_id, folder_id, contents)
+            if max_age is not None:
+                tree_mirror.observe_later(owner, folder_id, contents)
+        if fields is not None:
+            return FastJSONResponse(project(contents, fields), headers=dict(response.headers))
+        return contents
     except SeedrError as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise upstream_error(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
 
-@router.get("/list-all", summary="Recursively list all files and folders")
-def list_all_contents(client: Seedr = Depends(get_seedr_client)):
+@router.get("/list-all", response_model=AllContentsResponse, summary="Recursively list all files and folders")
+def list_all_contents(
+    response: Response,
+    fields: Optional[FieldTree] = Depends(get_fields),
+    max_age: Optional[float] = Depends(get_max_age),
+    client: Seedr = Depends(get_seedr_client),
+    user_id: str = Depends(get_user_id)
+):
     try:
-        all_folders = []
-        all_files = []
-        folders_to_process = ['0']  # Start with root
-        
-        while folders_to_process:
-            current_folder_id = folders_to_process.pop(0)
-            contents = client.list_contents(current_folder_id)
-            
-            # Add current folder items
-            if hasattr(contents, 'folders') and contents.folders:
-                for folder in contents.folders:
-                    all_folders.append(folder)
-                    folders_to_process.append(str(folder.id))
+        owner = mirror_user(client, user_id)
+        mirrored = _from_mirror(tree_mirror.tree, owner, max_age) if max_age else None
+        if mirrored is not None:
+            all_folders, all_files, verified_at = mirrored
+            response.headers.update(freshness_headers(verified_at))
+        else:
+            all_folders = []
+            all_files = []
+            folders_to_process = ['0']  # Start with root
             
-            if hasattr(contents, 'files') and contents.files:
-                for file in contents.files:
-                    all_files.append(file)
+            while folders_to_process:
+                current_folder_id = folders_to_process.pop(0)
+                contents = client.list_contents(current_folder_id)
+                torrent_index.observe_listing(user_id, current_folder_id, contents)
+                if max_age is not None:
+                    tree_mirror.observe_later(owner, current_folder_id, contents)
+                
+                # Add current folder items
+                if hasattr(contents, 'folders') and contents.folders:
+                    for folder in contents.folders:
+                        all_folders.append(folder)
+                        folders_to_process.append(str(folder.id))
+                
+                if hasattr(contents, 'files') and contents.files:
+                    for file in contents.files:
+                        all_files.append(file)
         
-        return {
-            "folders": to_dict(all_folders),
-            "files": to_dict(all_files),
+        response_data = {
+            "folders": all_folders,
+            "files": all_files,
             "total_folders": len(all_folders),
             "total_files": len(all_files)
         }
+        if fields is not None:
+            # A projection applies to each folder and file
+            response_data["folders"] = project(all_folders, fields)
+            response_data["files"] = project(all_files, fields)
+            return FastJSONResponse(response_data, headers=dict(response.headers))
+        return response_data
     except SeedrError as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise upstream_error(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
 
-@router.post("/folder", summary="Create a new folder")
+@router.post("/folder", response_model=ActionResponse, summary="Create a new folder")
 def create_folder(
     request: CreateFolderRequest,
     client: Seedr = Depends(get_seedr_client)
@@ -86,14 +140,14 @@ def create_folder(
         return {
             "success": True,
             "message": "Folder created successfully",
-            "result": to_dict(result)
+            "result": result
         }
     except SeedrError as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise upstream_error(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
 
-@router.put("/file/{file_id}/rename", summary="Rename a file")
+@router.put("/file/{file_id}/rename", response_model=ActionResponse, summary="Rename a file")
 def rename_file(
     file_id: str,
     request: RenameRequest,
@@ -104,14 +158,14 @@ def rename_file(
         return {
             "success": True,
             "message": "File renamed successfully",
-            "result": to_dict(result)
+            "result": result
         }
     except SeedrError as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise upstream_error(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
 
-@router.put("/folder/{folder_id}/rename", summary="Rename a folder")
+@router.put("/folder/{folder_id}/rename", response_model=ActionResponse, summary="Rename a folder")
 def rename_folder(
     folder_id: str,
     request: RenameRequest,
@@ -122,68 +176,85 @@ def rename_folder(
         return {
             "success": True,
             "message": "Folder renamed successfully",
-            "result": to_dict(result)
+            "result": result
         }
     except SeedrError as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise upstream_error(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
 
-@router.delete("/file/{file_id}", summary="Delete a file")
+@router.delete("/file/{file_id}", response_model=ActionResponse, summary="Delete a file")
 def delete_file(
     file_id: str,
-    client: Seedr = Depends(get_seedr_client)
+    client: Seedr = Depends(get_seedr_client),
+    user_id: str = Depends(get_user_id)
 ):
     try:
         result = client.delete_file(file_id)
+        quota_ledger.invalidate(user_id)
+        account_cache.invalidate_usage(user_id)
         return {
             "success": True,
             "message": "File deleted successfully",
-            "result": to_dict(result)
+            "result": result
         }
     except SeedrError as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise upstream_error(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
 
-@router.delete("/folder/{folder_id}", summary="Delete a folder")
+@router.delete("/folder/{folder_id}", response_model=ActionResponse, summary="Delete a folder")
 def delete_folder(
     folder_id: str,
-    client: Seedr = Depends(get_seedr_client)
+    client: Seedr = Depends(get_seedr_client),
+    user_id: str = Depends(get_user_id)
 ):
     try:
         result = client.delete_folder(folder_id)
+        quota_ledger.invalidate(user_id)
+        account_cache.invalidate_usage(user_id)
+        torrent_index.forget_folder(user_id, folder_id)
         return {
             "success": True,
             "message": "Folder deleted successfully",
-            "result": to_dict(result)
+            "result": result
         }
     except SeedrError as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise upstream_error(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
 
-@router.get("/search", summary="Search files by query")
+@router.get("/search", response_model=SearchResponse, summary="Search files by query")
 def search_files(
+    response: Response,
     query: str = Query(..., description="Search query"),
-    client: Seedr = Depends(get_seedr_client)
+    max_age: Optional[float] = Depends(get_max_age),
+    client: Seedr = Depends(get_seedr_client),
+    user_id: str = Depends(get_user_id)
 ):
     try:
+        mirrored = _from_mirror(tree_mirror.search, mirror_user(client, user_id), query, max_age) if max_age else None
+        if mirrored is not None:
+            results, verified_at = mirrored
+            response.headers.update(freshness_headers(verified_at))
+            return {"results": results}
         results = client.search_files(query)
-        return {"results": to_dict(results)}
+        return {"results": results}
     except SeedrError as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise upstream_error(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
 
-@router.get("/fetch/{file_id}", summary="Get file download URL")
+@router.get("/fetch/{file_id}", response_model=FetchFileResult, summary="Get file download URL")
 def fetch_file(
     file_id: str,
-    client: Seedr = Depends(get_seedr_client)
+    client: Seedr = Depends(get_seedr_client),
+    user_id: str = Depends(get_user_id)
 ):
     try:
         file_info = client.fetch_file(file_id)
-        return to_dict(file_info)
+        storage_reclaimer.record_file_access(user_id, file_id)
+        return file_info
     except SeedrError as e:
         error_msg = str(e)
         if "Invalid JSON" in error_msg:
@@ -194,24 +265,36 @@ def fetch_file(
                     "suggestion": "If you are trying to download a folder, please use the Archive/Download Folder feature."
                 }
             )
-        raise HTTPException(status_code=500, detail=error_msg)
+        raise upstream_error(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
 
-@router.post("/archive/{folder_id}", summary="Create archive from folder")
+@router.post("/archive/{folder_id}", response_model=ArchiveResponse, summary="Create archive from folder")
 def create_archive(
     folder_id: str,
-    client: Seedr = Depends(get_seedr_client)
+    fields: Optional[FieldTree] = Depends(get_fields),
+    client: Seedr = Depends(get_seedr_client),
+    user_id: str = Depends(get_user_id)
 ):
     try:
         # Get folder contents and return download links for all files
         folder_contents = client.list_contents(folder_id)
+        storage_reclaimer.record_folder_access(user_id, folder_id)
         
         files_with_links = []
+        # Download links cost one upstream call per file; skip them when not requested
+        want_links = fields is None or 'download_url' in fields or 'error' in fields
         
         # Iterate through all files in the folder
         if hasattr(folder_contents, 'files') and folder_contents.files:
             for file in folder_contents.files:
+                if not want_links:
+                    files_with_links.append({
+                        'file_id': file.folder_file_id,
+                        'name': file.name,
+                        'size': file.size
+                    })
+                    continue
                 try:
                     # Get download URL for each file
                     file_info = client.fetch_file(str(file.folder_file_id))
@@ -229,20 +312,24 @@ def create_archive(
                         'error': f'Could not get download link: {str(e)}'
                     })
         
-        return {
+        response_data = {
             "success": True,
             "message": f"Found {len(files_with_links)} files in folder",
             "folder_id": folder_id,
             "files": files_with_links,
             "total_files": len(files_with_links)
         }
+        if fields is not None:
+            response_data["files"] = project(files_with_links, fields)
+            return FastJSONResponse(response_data)
+        return response_data
     except SeedrError as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise upstream_error(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
 
-@router.get("/archive/{archive_id}/status", summary="Check status of a folder archive")
-async def archive_status(
+@router.get("/archive/{archive_id}/status", response_model=ArchiveStatusResponse, response_model_exclude_unset=True, summary="Check status of a folder archive")
+def archive_status(
     archive_id: str,
     response: Response,
     client: Seedr = Depends(get_seedr_client)
@@ -267,6 +354,94 @@ async def archive_status(
                 "message": "Archive is still being created or registered by Seedr. Please wait a moment and check again.",
                 "archive_id": archive_id
             }
-        raise HTTPException(status_code=500, detail=str(e))
+        raise upstream_error(e)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
+
+@router.get("/reclaim/preview", response_model=ReclaimResponse, response_model_exclude_unset=True, summary="Preview which folders would be evicted to free space")
+def preview_reclaim(
+    bytes_needed: int = Query(..., description="Bytes to free"),
+    policy: Optional[str] = Query(None, description="Eviction policy: lru, age or size"),
+    client: Seedr = Depends(get_seedr_client),
+    user_id: str = Depends(get_user_id)
+):
+    try:
+        return {"success": True, "dry_run": True, "plan": storage_reclaimer.plan(user_id, client, bytes_needed, policy)}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except SeedrError as e:
+        raise upstream_error(e)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
+
+@router.post("/reclaim", response_model=ReclaimResponse, response_model_exclude_unset=True, summary="Evict folders to free space")
+def reclaim(
+    request: ReclaimRequest,
+    client: Seedr = Depends(get_seedr_client),
+    user_id: str = Depends(get_user_id)
+):
+    try:
+        plan = storage_reclaimer.plan(user_id, client, request.bytes_needed, request.policy)
+        if request.dry_run:
+            return {"success": True, "dry_run": True, "plan": plan}
+        outcome = storage_reclaimer.execute(user_id, client, plan)
+        return {"success": not outcome["errors"], "dry_run": False, "plan": plan, **outcome}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except SeedrError as e:
+        raise upstream_error(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
+
+@router.get("/pins", response_model=PinsResponse, response_model_exclude_unset=True, summary="List folders protected from reclamation")
+def list_pins(
+    client: Seedr = Depends(get_seedr_client),
+    user_id: str = Depends(get_user_id)
+):
+    return {"pins": storage_reclaimer.pins(user_id)}
+
+@router.put("/folder/{folder_id}/pin", response_model=PinsResponse, response_model_exclude_unset=True, summary="Protect a folder from reclamation")
+def pin_folder(
+    folder_id: str,
+    client: Seedr = Depends(get_seedr_client),
+    user_id: str = Depends(get_user_id)
+):
+    storage_reclaimer.pin(user_id, folder_id)
+    return {"success": True, "message": "Folder pinned", "pins": storage_reclaimer.pins(user_id)}
+
+@router.delete("/folder/{folder_id}/pin", response_model=PinsResponse, response_model_exclude_unset=True, summary="Remove reclamation protection from a folder")
+def unpin_folder(
+    folder_id: str,
+    client: Seedr = Depends(get_seedr_client),
+    user_id: str = Depends(get_user_id)
+):
+    if not storage_reclaimer.unpin(user_id, folder_id):
+        raise HTTPException(status_code=404, detail="Folder is not pinned")
+    return {"success": True, "message": "Folder unpinned", "pins": storage_reclaimer.pins(user_id)}
+
+@router.get("/mirror", response_model=MirrorStatusResponse, response_model_exclude_unset=True, summary="Status of the local tree mirror")
+def mirror_status(
+    client: Seedr = Depends(get_seedr_client),
+    user_id: str = Depends(get_user_id)
+):
+    try:
+        return tree_mirror.status(mirror_user(client, user_id))
+    except sqlite3.Error as e:
+        raise HTTPException(status_code=503, detail=f"Tree mirror unavailable: {str(e)}")
+
+@router.post("/mirror/sync", response_model=MirrorStatusResponse, response_model_exclude_unset=True, summary="Sync the local tree mirror now")
+def sync_mirror(
+    full: bool = Query(False, description="Re-list every folder instead of only the changed ones"),
+    client: Seedr = Depends(get_seedr_client),
+    user_id: str = Depends(get_user_id)
+):
+    if not tree_mirror.enabled:
+        raise HTTPException(status_code=409, detail="The tree mirror is disabled (TREE_MIRROR_SYNC_INTERVAL=0)")
+    owner = mirror_user(client, user_id)
+    try:
+        stats = tree_mirror.sync(owner, client, full=full)
+        return {**tree_mirror.status(owner), "sync": stats}
+    except SeedrError as e:
+        raise upstream_error(e)
+    except sqlite3.Error as e:
+        raise HTTPException(status_code=503, detail=f"Tree mirror unavailable: {str(e)}")
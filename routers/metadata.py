@@ -0,0 +1,25 @@
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel
+from models import MetadataResponse
+from utils.serialization import SerializedRoute
+from utils.torrentmeta import torrentmeta, TorrentMetaError
+
+# Served under /torrents like before; a separate router so it can be disabled (DISABLED_ROUTERS=metadata)
+router = APIRouter(
+    prefix="/torrents",
+    tags=["Torrents"],
+    route_class=SerializedRoute
+)
+
+class TorrentMetadataRequest(BaseModel):
+    query: str
+
+@router.post("/metadata", response_model=MetadataResponse, summary="Get torrent metadata")
+async def get_metadata(request: TorrentMetadataRequest):
+    try:
+        metadata = await torrentmeta.aquery(request.query)
+        return {"success": True, "metadata": metadata}
+    except TorrentMetaError:
+        raise HTTPException(status_code=500, detail="Failed to fetch torrent metadata")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
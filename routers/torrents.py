@@ -3,92 +3,73 @@ from pydantic import BaseModel
 from typing import Optional, Dict, Any, List
 from seedrcc import Seedr
 from seedrcc.exceptions import SeedrError
-import requests
+import contextvars
 import subprocess
 import os
+import tempfile
 import time
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from config import settings
-from utils.dependencies import get_seedr_client
+from models import (
+    ActionResponse, AddTorrentResponse, BulkAddResponse, CountResponse, QueueState,
+    TorrentListResponse, TorrentStatusResponse, UploadResponse, WebhooksResponse
+)
+from utils.account_cache import account_cache, SETTINGS
+from utils.dependencies import get_seedr_client, get_user_id, get_fields
+from utils.ingest_queue import ingest_queue
+from utils.quota_ledger import quota_ledger
+from utils.reclaimer import check_policy, storage_reclaimer
+from utils.resilience import upstream_error
+from utils.serialization import SerializedRoute, FastJSONResponse, FieldTree, project
+from utils.space_check import check_space, SpaceCheckResult
+from utils.torrent_index import torrent_index, infohash_from_magnet, STATUS_COMPLETED, STATUS_IN_FLIGHT
+from utils.webhooks import check_callback_url, completion_poller, webhook_delivery
 
 router = APIRouter(
     prefix="/torrents",
-    tags=["Torrents"]
+    tags=["Torrents"],
+    route_class=SerializedRoute
 )
 logger = logging.getLogger(__name__)
 
+_UPLOAD_CHUNK_SIZE = 64 * 1024
+
 # Pydantic Models
 class AddTorrentRequest(BaseModel):
     magnet_link: str
     wishlist_id: Optional[str] = None
     folder_id: str = "-1"
+    allow_duplicate: bool = False
+    callback_url: Optional[str] = None
 
 class SmartAddTorrentRequest(BaseModel):
     magnet_link: str
     folder_id: str = "-1"
     skip_space_check: bool = False
+    reclaim_space: bool = False
+    reclaim_policy: Optional[str] = None
+    allow_duplicate: bool = False
+    callback_url: Optional[str] = None
 
 class AddAndDownloadRequest(BaseModel):
     magnet_link: str
     folder_id: str = "-1"
     skip_space_check: bool = False
+    reclaim_space: bool = False
+    reclaim_policy: Optional[str] = None
+    allow_duplicate: bool = False
+    callback_url: Optional[str] = None
     wait_for_completion: bool = True
     max_wait_seconds: int = 300
     poll_interval: int = 5
     play_in_vlc: bool = False
 
-class TorrentMetadataRequest(BaseModel):
-    query: str
-
-def to_dict(obj: Any) -> Dict[str, Any]:
-    """Helper to convert objects to dict"""
-    if isinstance(obj, dict):
-        return obj
-    if isinstance(obj, list):
-        return [to_dict(i) for i in obj]
-    if hasattr(obj, 'to_dict'):
-        return obj.to_dict()
-    if hasattr(obj, '__dict__'):
-        return obj.__dict__
-    return str(obj)
+class BulkAddRequest(BaseModel):
+    magnet_links: List[str]
+    folder_id: str = "-1"
 
 # Helper functions
-def _get_torrent_size(magnet_link: str) -> int:
-    """Get torrent size from TorrentMeta API"""
-    try:
-        torrentmeta_url = 'https://torrentmeta.fly.dev'
-        headers = {'Content-Type': 'application/json'}
-        payload = {'query': magnet_link}
-        
-        response = requests.post(
-            torrentmeta_url,
-            json=payload,
-            headers=headers,
-            timeout=30
-        )
-        
-        if response.status_code == 200:
-            result = response.json()
-            metadata = result.get('data', {})
-            if 'files' in metadata and isinstance(metadata['files'], list):
-                return sum(file.get('size', 0) for file in metadata['files'])
-        return 0
-    except Exception as e:
-        logger.error(f"Error fetching torrent size: {str(e)}")
-        return 0
-
-def _get_available_space(client: Seedr):
-    """Get available space in bytes from Seedr account"""
-    try:
-        memory_bandwidth = client.get_memory_bandwidth()
-        space_used = getattr(memory_bandwidth, 'space_used', 0)
-        space_max = getattr(memory_bandwidth, 'space_max', 0)
-        available_space = space_max - space_used
-        return available_space, space_used, space_max
-    except Exception as e:
-        logger.error(f"Error fetching available space: {str(e)}")
-        return 0, 0, 0
-
 def _format_size(size_bytes: float) -> str:
     """Format bytes to human-readable size"""
     for unit in ['B', 'KB', 'MB', 'GB', 'TB']:
@@ -97,11 +78,123 @@ def _format_size(size_bytes: float) -> str:
         size_bytes /= 1024.0
     return f"{size_bytes:.2f} PB"
 
-@router.post("/add", summary="Add torrent via magnet link")
+def _space_check_details(check: SpaceCheckResult) -> Dict[str, Any]:
+    """Build the space_check section of an add response"""
+    return {
+        "torrent_size": check.torrent_size,
+        "torrent_size_formatted": _format_size(check.torrent_size) if check.torrent_size > 0 else "Unknown",
+        "available_space": check.available_space,
+        "available_space_formatted": _format_size(check.available_space),
+        "space_used": check.space_used,
+        "space_used_formatted": _format_size(check.space_used),
+        "space_max": check.space_max,
+        "space_max_formatted": _format_size(check.space_max),
+        "reserved_by_pending_adds": check.reserved,
+        "metadata_timed_out": check.metadata_timed_out,
+        "space_timed_out": check.space_timed_out,
+        "elapsed_seconds": round(check.elapsed, 3),
+        "sufficient": check.sufficient
+    }
+
+def _metadata_timeout_response(response: Response, check: SpaceCheckResult) -> Dict[str, Any]:
+    """Response returned when the metadata stage timed out and the fallback policy is 'reject'"""
+    response.status_code = 504
+    return {
+        "success": False,
+        "error": "Torrent metadata lookup timed out",
+        "message": "Cannot verify torrent size - set SPACE_CHECK_FALLBACK=add or skip_space_check to add anyway",
+        "space_check": _space_check_details(check)
+    }
+
+def _reclaim_space(client: Seedr, user_id: str, magnet_link: str, check: SpaceCheckResult, policy: Optional[str]):
+    """Evict folders to make room for a torrent that does not fit, then re-check"""
+    plan = storage_reclaimer.plan(user_id, client, check.space_needed, policy)
+    if not plan["sufficient"]:
+        return check, {"performed": False, "reason": "Not enough reclaimable space", "plan": plan}
+    outcome = storage_reclaimer.execute(user_id, client, plan)
+    quota_ledger.refresh(user_id, client)
+    return check_space(client, magnet_link, user_id), {"performed": True, "policy": plan["policy"], **outcome}
+
+def _register_add(user_id: str, result: Any, infohash: Optional[str] = None, folder_id: str = '0'):
+    """Record a freshly added torrent in the infohash index"""
+    account_cache.invalidate_usage(user_id)
+    torrent_index.register_add(
+        user_id,
+        getattr(result, 'torrent_hash', None) or infohash,
+        getattr(result, 'user_torrent_id', None),
+        getattr(result, 'title', None),
+        folder_id
+    )
+
+def _validate_callback_url(callback_url: Optional[str]):
+    """Reject callback URLs we cannot or must not deliver to before adding anything"""
+    if not callback_url:
+        return
+    try:
+        check_callback_url(callback_url)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def _validate_reclaim_policy(reclaim_space: bool, policy: Optional[str]):
+    """Reject an unknown eviction policy before the space check reserves anything"""
+    if not reclaim_space:
+        return
+    try:
+        check_policy(policy)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def _watch_completion(user_id: str, callback_url: Optional[str], result: Any, folder_id: str,
+                      infohash: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """
+    Register a completion webhook for a freshly added torrent.
+
+    The torrent is already added, so a torrent that cannot be watched (no
+    infohash and no title) is reported as not registered instead of failing
+    the request.
+    """
+    if not callback_url:
+        return None
+    try:
+        completion_poller.watch(
+            user_id,
+            getattr(result, 'torrent_hash', None) or infohash,
+            callback_url,
+            title=getattr(result, 'title', None),
+            torrent_id=getattr(result, 'user_torrent_id', None),
+            folder_id=folder_id
+        )
+    except ValueError as e:
+        logger.warning(f"Not watching torrent added by {user_id} for completion: {e}")
+        return {"registered": False, "url": callback_url, "reason": str(e)}
+    return {"registered": True, "url": callback_url}
+
+def _duplicate_response(existing: Dict[str, Any]) -> Dict[str, Any]:
+    """Response returned instead of adding a torrent that is already present"""
+    if existing["status"] == STATUS_IN_FLIGHT:
+        message = "Torrent is already being added by another request"
+    elif existing["status"] == STATUS_COMPLETED:
+        message = "Torrent already downloaded - returning the existing folder"
+    else:
+        message = "Torrent is already in the account - returning the existing torrent"
+    return {
+        "success": True,
+        "duplicate": True,
+        "message": message,
+        "existing": existing
+    }
+
+@router.post("/add", response_model=AddTorrentResponse, response_model_exclude_unset=True, summary="Add torrent via magnet link")
 def add_torrent(
     request: AddTorrentRequest,
-    client: Seedr = Depends(get_seedr_client)
+    client: Seedr = Depends(get_seedr_client),
+    user_id: str = Depends(get_user_id)
 ):
+    _validate_callback_url(request.callback_url)
+    infohash = infohash_from_magnet(request.magnet_link)
+    existing = None if request.allow_duplicate else torrent_index.claim(user_id, infohash)
+    if existing is not None:
+        return _duplicate_response(existing)
     try:
         # Call add_torrent and get the raw result
         result = client.add_torrent(
@@ -109,6 +202,8 @@ def add_torrent(
             wishlist_id=request.wishlist_id,
             folder_id=request.folder_id
         )
+        _register_add(user_id, result, infohash, request.folder_id)
+        callback = _watch_completion(user_id, request.callback_url, result, request.folder_id, infohash)
         
         # If result has a response attribute (httpx Response object)
         if hasattr(result, 'status_code') and hasattr(result, 'text'):
@@ -116,63 +211,86 @@ def add_torrent(
                 "status_code": result.status_code,
                 "raw_response": result.text
             }
-            return {
+            response_data = {
                 "success": True,
                 "message": "Torrent added successfully",
                 "seedr_response": seedr_response
             }
         else:
             # Fallback to dict conversion
-            return {
+            response_data = {
                 "success": True,
                 "message": "Torrent added successfully",
-                "result": to_dict(result)
+                "result": result
             }
+        if callback is not None:
+            response_data["callback"] = callback
+        return response_data
     except SeedrError as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise upstream_error(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
+    finally:
+        if not request.allow_duplicate:
+            torrent_index.release_claim(user_id, infohash)
 
-@router.post("/smartAdd", summary="Smart add torrent with space validation")
+@router.post("/smartAdd", response_model=AddTorrentResponse, response_model_exclude_unset=True, summary="Smart add torrent with space validation")
 def smart_add_torrent(
     request: SmartAddTorrentRequest,
     response: Response,
-    client: Seedr = Depends(get_seedr_client)
+    client: Seedr = Depends(get_seedr_client),
+    user_id: str = Depends(get_user_id)
 ):
+    _validate_callback_url(request.callback_url)
+    _validate_reclaim_policy(request.reclaim_space, request.reclaim_policy)
+    infohash = infohash_from_magnet(request.magnet_link)
+    existing = None if request.allow_duplicate else torrent_index.claim(user_id, infohash)
+    if existing is not None:
+        return _duplicate_response(existing)
     try:
         # Perform space check unless explicitly skipped
+        check = None
+        reclamation = None
         if not request.skip_space_check:
-            torrent_size = _get_torrent_size(request.magnet_link)
-            available_space, space_used, space_max = _get_available_space(client)
+            check = check_space(client, request.magnet_link, user_id)
+            if check.rejected_by_policy:
+                return _metadata_timeout_response(response, check)
             
-            if torrent_size > 0 and available_space > 0:
-                if torrent_size > available_space:
-                    space_needed = torrent_size - available_space
-                    response.status_code = 507
-                    return {
-                        "success": False,
-                        "error": "Insufficient storage space",
-                        "message": "Cannot add torrent - not enough space available",
-                        "space_check": {
-                            "torrent_size": torrent_size,
-                            "torrent_size_formatted": _format_size(torrent_size),
-                            "available_space": available_space,
-                            "available_space_formatted": _format_size(available_space),
-                            "space_used": space_used,
-                            "space_used_formatted": _format_size(space_used),
-                            "space_max": space_max,
-                            "space_max_formatted": _format_size(space_max),
-                            "space_needed": space_needed,
-                            "space_needed_formatted": _format_size(space_needed),
-                            "sufficient": False
-                        }
-                    }
+            if not check.sufficient and request.reclaim_space:
+                check, reclamation = _reclaim_space(client, user_id, request.magnet_link, check, request.reclaim_policy)
+            
+            if not check.sufficient:
+                response.status_code = 507
+                details = _space_check_details(check)
+                details["space_needed"] = check.space_needed
+                details["space_needed_formatted"] = _format_size(check.space_needed)
+                response_data = {
+                    "success": False,
+                    "error": "Insufficient storage space",
+                    "message": "Cannot add torrent - not enough space available",
+                    "space_check": details
+                }
+                if reclamation is not None:
+                    response_data["reclamation"] = reclamation
+                return response_data
         
         # Add torrent
-        result = client.add_torrent(
-            magnet_link=request.magnet_link,
-            folder_id=request.folder_id
-        )
+        try:
+            result = client.add_torrent(
+                magnet_link=request.magnet_link,
+                folder_id=request.folder_id
+            )
+        except Exception:
+            if check is not None:
+                quota_ledger.release(user_id, check.reservation_id)
+            raise
+        if check is not None:
+            quota_ledger.bind(
+                user_id, check.reservation_id,
+                getattr(result, 'user_torrent_id', None), getattr(result, 'torrent_hash', None)
+            )
+        _register_add(user_id, result, infohash, request.folder_id)
+        callback = _watch_completion(user_id, request.callback_url, result, request.folder_id, infohash)
         
         # Handle raw response or dict conversion
         if hasattr(result, 'status_code') and hasattr(result, 'text'):
@@ -181,7 +299,7 @@ def smart_add_torrent(
                 "raw_response": result.text
             }
         else:
-            result_data = to_dict(result)
+            result_data = result
         
         response_data = {
             "success": True,
@@ -189,55 +307,76 @@ def smart_add_torrent(
             "result": result_data
         }
         
-        if not request.skip_space_check:
-            torrent_size = _get_torrent_size(request.magnet_link) if "torrent_size" not in locals() else torrent_size
-            available_space, space_used, space_max = _get_available_space(client) if "available_space" not in locals() else (available_space, space_used, space_max)
-            
-            response_data["space_check"] = {
-                "torrent_size": torrent_size,
-                "torrent_size_formatted": _format_size(torrent_size) if torrent_size > 0 else "Unknown",
-                "available_space": available_space,
-                "available_space_formatted": _format_size(available_space),
-                "space_used": space_used,
-                "space_used_formatted": _format_size(space_used),
-                "space_max": space_max,
-                "space_max_formatted": _format_size(space_max),
-                "sufficient": True
-            }
+        if check is not None:
+            response_data["space_check"] = _space_check_details(check)
+        if reclamation is not None:
+            response_data["reclamation"] = reclamation
+        if callback is not None:
+            response_data["callback"] = callback
             
         return response_data
 
     except SeedrError as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise upstream_error(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
+    finally:
+        if not request.allow_duplicate:
+            torrent_index.release_claim(user_id, infohash)
 
-@router.post("/addAndDownload", summary="Add torrent and wait for download URLs")
+@router.post("/addAndDownload", response_model=AddTorrentResponse, response_model_exclude_unset=True, summary="Add torrent and wait for download URLs")
 def add_and_download(
     request: AddAndDownloadRequest,
     response: Response,
     background_tasks: BackgroundTasks,
-    client: Seedr = Depends(get_seedr_client)
+    client: Seedr = Depends(get_seedr_client),
+    user_id: str = Depends(get_user_id)
 ):
+    _validate_callback_url(request.callback_url)
+    _validate_reclaim_policy(request.reclaim_space, request.reclaim_policy)
+    infohash = infohash_from_magnet(request.magnet_link)
+    existing = None if request.allow_duplicate else torrent_index.claim(user_id, infohash)
+    if existing is not None:
+        return _duplicate_response(existing)
     try:
-        # Space Check Logic (Reuse helper or duplicate logic for clarity in one flow)
+        # Space Check Logic
+        check = None
+        reclamation = None
         if not request.skip_space_check:
-            torrent_size = _get_torrent_size(request.magnet_link)
-            available_space, space_used, space_max = _get_available_space(client)
-            if torrent_size > 0 and available_space > 0 and torrent_size > available_space:
+            check = check_space(client, request.magnet_link, user_id)
+            if check.rejected_by_policy:
+                return _metadata_timeout_response(response, check)
+            if not check.sufficient and request.reclaim_space:
+                check, reclamation = _reclaim_space(client, user_id, request.magnet_link, check, request.reclaim_policy)
+            if not check.sufficient:
                 response.status_code = 507
-                return {
+                response_data = {
                     "success": False,
                     "error": "Insufficient storage space",
                     "space_check": {
-                        "torrent_size": torrent_size,
-                        "available_space": available_space,
+                        "torrent_size": check.torrent_size,
+                        "available_space": check.available_space,
                         "sufficient": False
                     }
                 }
+                if reclamation is not None:
+                    response_data["reclamation"] = reclamation
+                return response_data
 
         # Add Torrent
-        add_result = client.add_torrent(magnet_link=request.magnet_link, folder_id=request.folder_id)
+        try:
+            add_result = client.add_torrent(magnet_link=request.magnet_link, folder_id=request.folder_id)
+        except Exception:
+            if check is not None:
+                quota_ledger.release(user_id, check.reservation_id)
+            raise
+        if check is not None:
+            quota_ledger.bind(
+                user_id, check.reservation_id,
+                getattr(add_result, 'user_torrent_id', None), getattr(add_result, 'torrent_hash', None)
+            )
+        _register_add(user_id, add_result, infohash, request.folder_id)
+        callback = _watch_completion(user_id, request.callback_url, add_result, request.folder_id, infohash)
         
         # Handle raw response or dict conversion
         if hasattr(add_result, 'status_code') and hasattr(add_result, 'text'):
@@ -246,7 +385,7 @@ def add_and_download(
                 "raw_response": add_result.text
             }
         else:
-            torrent_info = to_dict(add_result)
+            torrent_info = add_result
         
         response_data = {
             "success": True,
@@ -254,6 +393,17 @@ def add_and_download(
             "torrent_info": torrent_info,
             "files": []
         }
+        if reclamation is not None:
+            response_data["reclamation"] = reclamation
+
+        if callback is not None:
+            response_data["callback"] = callback
+        # With a callback the download URLs are delivered by webhook, so don't hold the connection
+        if callback is not None and callback["registered"]:
+            response.status_code = 202
+            response_data["message"] = "Torrent added. Download URLs will be POSTed to callback_url on completion."
+            response_data["status"] = "added"
+            return response_data
 
         if not request.wait_for_completion:
             response.status_code = 202
@@ -265,78 +415,63 @@ def add_and_download(
         start_time = time.time()
         max_wait = min(request.max_wait_seconds, 600)
         torrent_title = getattr(add_result, 'title', '')
-        torrent_hash = getattr(add_result, 'torrent_hash', '')
+        torrent_hash = getattr(add_result, 'torrent_hash', '') or infohash or ''
         
         while (time.time() - start_time) < max_wait:
             try:
                 folder_id_to_check = request.folder_id if request.folder_id != '-1' else '0'
                 contents = client.list_contents(folder_id_to_check)
+                quota_ledger.observe_listing(user_id, contents, root=folder_id_to_check == '0')
+                torrent_index.observe_listing(user_id, folder_id_to_check, contents)
                 
-                is_downloading = False
+                # Completion is an index lookup: by infohash, or by title when Seedr gave no hash
+                matching_folder_id = None
+                entry = torrent_index.lookup(user_id, torrent_hash) if torrent_hash else None
+                if entry is not None:
+                    if entry["status"] == STATUS_COMPLETED:
+                        matching_folder_id = entry["folder_id"]
+                else:
+                    folder = torrent_index.find_folder(user_id, torrent_title, folder_id_to_check)
+                    if folder:
+                        matching_folder_id = folder["folder_id"]
                 
-                # Check torrents list for progress
-                if hasattr(contents, 'torrents') and contents.torrents:
-                    for torrent in contents.torrents:
-                        if (hasattr(torrent, 'hash') and torrent.hash == torrent_hash) or \
-                           (hasattr(torrent, 'title') and torrent.title == torrent_title):
-                            progress = getattr(torrent, 'progress', 0)
+                if matching_folder_id:
+                    if check is not None:
+                        quota_ledger.release(user_id, check.reservation_id)
+                    storage_reclaimer.record_folder_access(user_id, matching_folder_id)
+                    # Fetch files
+                    folder_contents = client.list_contents(str(matching_folder_id))
+                    if hasattr(folder_contents, 'files') and folder_contents.files:
+                        for file in folder_contents.files:
                             try:
-                                curr_prog = int(float(progress)) if isinstance(progress, str) else int(progress)
-                            except:
-                                curr_prog = 0
-                            
-                            if curr_prog < 100:
-                                is_downloading = True
-                            break
-                
-                if not is_downloading:
-                    # Check for completed folder
-                    matching_folder = None
-                    normalized_title = torrent_title.replace('&', '_').replace(':', ' ').replace('?', '')
-                    
-                    if hasattr(contents, 'folders') and contents.folders:
-                        for folder in contents.folders:
-                            folder_name = getattr(folder, 'name', '')
-                            if folder_name == torrent_title or \
-                               folder_name == normalized_title or \
-                               folder_name.replace('&', '_') == torrent_title.replace('&', '_'):
-                                matching_folder = folder
-                                break
-                    
-                    if matching_folder:
-                        # Fetch files
-                        folder_contents = client.list_contents(str(matching_folder.id))
-                        if hasattr(folder_contents, 'files') and folder_contents.files:
-                            for file in folder_contents.files:
-                                try:
-                                    file_info = client.fetch_file(str(file.folder_file_id))
-                                    response_data['files'].append({
-                                        'file_id': file.folder_file_id,
-                                        'name': file.name,
-                                        'size': file.size,
-                                        'download_url': file_info.url
-                                    })
-                                except Exception:
-                                    pass
-                            
-                            response_data['folder_id'] = matching_folder.id
-                            response_data['status'] = 'completed'
-                            
-                            # VLC Playback
-                            if request.play_in_vlc and settings.VLC_PATH and os.path.exists(settings.VLC_PATH):
-                                valid_files = [f for f in response_data['files'] if 'download_url' in f]
-                                if valid_files:
-                                    enqueue = len(valid_files) > 1
-                                    for file in valid_files:
-                                        cmd = [settings.VLC_PATH]
-                                        if enqueue:
-                                            cmd.extend(["--one-instance", "--playlist-enqueue"])
-                                        cmd.append(file['download_url'])
-                                        subprocess.Popen(cmd)
-                                    response_data['vlc_playback'] = {'started': True}
-
-                            return response_data
-            
+                                file_info = client.fetch_file(str(file.folder_file_id))
+                                response_data['files'].append({
+                                    'file_id': file.folder_file_id,
+                                    'name': file.name,
+                                    'size': file.size,
+                                    'download_url': file_info.url
+                                })
+                            except Exception:
+                                pass
+                        
+                        response_data['folder_id'] = matching_folder_id
+                        response_data['status'] = 'completed'
+                        
+                        # VLC Playback
+                        if request.play_in_vlc and settings.VLC_PATH and os.path.exists(settings.VLC_PATH):
+                            valid_files = [f for f in response_data['files'] if 'download_url' in f]
+                            if valid_files:
+                                enqueue = len(valid_files) > 1
+                                for file in valid_files:
+                                    cmd = [settings.VLC_PATH]
+                                    if enqueue:
+                                        cmd.extend(["--one-instance", "--playlist-enqueue"])
+                                    cmd.append(file['download_url'])
+                                    subprocess.Popen(cmd)
+                                response_data['vlc_playback'] = {'started': True}
+
+                        return response_data
+        
                 time.sleep(request.poll_interval)
             except Exception as e:
                 logger.error(f"Polling error: {e}")
@@ -349,113 +484,306 @@ def add_and_download(
         return response_data
 
     except SeedrError as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise upstream_error(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
+    finally:
+        if not request.allow_duplicate:
+            torrent_index.release_claim(user_id, infohash)
 
-@router.post("/add/file", summary="Add torrent via file upload")
+def _spool_upload(upload: UploadFile) -> str:
+    """Copy an uploaded .torrent to a temporary file in chunks, enforcing MAX_TORRENT_UPLOAD_SIZE"""
+    limit = settings.MAX_TORRENT_UPLOAD_SIZE
+    written = 0
+    tmp = tempfile.NamedTemporaryFile(suffix='.torrent', delete=False)
+    try:
+        with tmp:
+            while True:
+                chunk = upload.file.read(_UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                written += len(chunk)
+                if written > limit:
+                    raise HTTPException(
+                        status_code=413,
+                        detail=f"Torrent file '{upload.filename}' exceeds the {limit} byte upload limit"
+                    )
+                tmp.write(chunk)
+    except BaseException:
+        os.unlink(tmp.name)
+        raise
+    return tmp.name
+
+def _add_uploaded_torrent(client: Seedr, upload: UploadFile, folder_id: str, wishlist_id: Optional[str] = None):
+    """Add an uploaded .torrent; at most MAX_TORRENT_UPLOAD_SIZE bytes are ever buffered"""
+    path = _spool_upload(upload)
+    try:
+        return client.add_torrent(
+            torrent_file=path,
+            wishlist_id=wishlist_id,
+            folder_id=folder_id
+        )
+    finally:
+        os.unlink(path)
+
+def _add_result_data(result: Any) -> Any:
+    """Handle raw response or dict conversion"""
+    if hasattr(result, 'status_code') and hasattr(result, 'text'):
+        return {
+            "status_code": result.status_code,
+            "raw_response": result.text
+        }
+    return result
+
+@router.post("/add/file", response_model=UploadResponse, response_model_exclude_unset=True, summary="Add torrent via file upload")
 def add_torrent_file(
     file: UploadFile = File(...),
     folder_id: str = Form("-1"),
     wishlist_id: Optional[str] = Form(None),
-    client: Seedr = Depends(get_seedr_client)
+    client: Seedr = Depends(get_seedr_client),
+    user_id: str = Depends(get_user_id)
 ):
     try:
-        file_content = file.file.read()
-        result = client.add_torrent(
-            torrent_file=file_content,
-            wishlist_id=wishlist_id,
-            folder_id=folder_id
-        )
-        
-        # Handle raw response or dict conversion
-        if hasattr(result, 'status_code') and hasattr(result, 'text'):
-            result_data = {
-                "status_code": result.status_code,
-                "raw_response": result.text
-            }
-        else:
-            result_data = to_dict(result)
+        result = _add_uploaded_torrent(client, file, folder_id, wishlist_id)
+        _register_add(user_id, result, folder_id=folder_id)
         
         return {
             "success": True,
             "message": "Torrent added successfully",
-            "result": result_data
+            "result": _add_result_data(result)
+        }
+    except HTTPException:
+        raise
+    except SeedrError as e:
+        raise upstream_error(e)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
+
+@router.post("/add/files", response_model=UploadResponse, response_model_exclude_unset=True, summary="Add several torrent files in one request")
+def add_torrent_files(
+    files: List[UploadFile] = File(...),
+    folder_id: str = Form("-1"),
+    client: Seedr = Depends(get_seedr_client),
+    user_id: str = Depends(get_user_id)
+):
+    if len(files) > settings.MAX_TORRENT_UPLOAD_FILES:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Too many files ({len(files)}); the limit is {settings.MAX_TORRENT_UPLOAD_FILES} per request"
+        )
+
+    def add_one(upload: UploadFile) -> Dict[str, Any]:
+        try:
+            result = _add_uploaded_torrent(client, upload, folder_id)
+            _register_add(user_id, result, folder_id=folder_id)
+            return {"filename": upload.filename, "success": True, "result": _add_result_data(result)}
+        except HTTPException as e:
+            return {"filename": upload.filename, "success": False, "error": e.detail}
+        except Exception as e:
+            return {"filename": upload.filename, "success": False, "error": str(e)}
+
+    try:
+        with ThreadPoolExecutor(max_workers=min(len(files), settings.TORRENT_UPLOAD_CONCURRENCY) or 1) as pool:
+            # Each add runs in the request's context so its spans and Idempotency-Key carry over
+            futures = [pool.submit(contextvars.copy_context().run, add_one, upload) for upload in files]
+            results = [future.result() for future in futures]
+        added = sum(1 for r in results if r["success"])
+        return {
+            "success": added == len(results),
+            "message": f"Added {added} of {len(results)} torrents",
+            "results": results,
+            "total": len(results),
+            "added": added
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
+
+@router.post("/bulkAdd", response_model=BulkAddResponse, summary="Queue many magnets for space-aware dispatch")
+def bulk_add(
+    request: BulkAddRequest,
+    response: Response,
+    client: Seedr = Depends(get_seedr_client),
+    user_id: str = Depends(get_user_id)
+):
+    magnet_links = [m.strip() for m in request.magnet_links if m and m.strip()]
+    if not magnet_links:
+        raise HTTPException(status_code=400, detail="No magnet links provided")
+    if len(magnet_links) > settings.INGEST_MAX_BATCH:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Too many magnet links ({len(magnet_links)}); the limit is {settings.INGEST_MAX_BATCH} per request"
+        )
+    try:
+        items = ingest_queue.submit(user_id, magnet_links, request.folder_id)
+        response.status_code = 202
+        return {
+            "success": True,
+            "message": f"Queued {len(items)} torrents. They will be added as storage space becomes available.",
+            "items": items,
+            "total": len(items)
         }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
+
+@router.get("/queue", response_model=QueueState, response_model_exclude_unset=True, summary="Get bulk ingestion queue state and metrics")
+def get_queue(
+    client: Seedr = Depends(get_seedr_client),
+    user_id: str = Depends(get_user_id)
+):
+    try:
+        return {"success": True, **ingest_queue.state(user_id)}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
+
+@router.post("/queue/dispatch", response_model=QueueState, response_model_exclude_unset=True, summary="Run a dispatch cycle for the queue now")
+def dispatch_queue(
+    client: Seedr = Depends(get_seedr_client),
+    user_id: str = Depends(get_user_id)
+):
+    try:
+        added = ingest_queue.dispatch(user_id, client)
+        return {"success": True, "dispatched": added, **ingest_queue.state(user_id)}
     except SeedrError as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise upstream_error(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
 
-@router.delete("/{torrent_id}", summary="Delete a torrent")
+@router.delete("/queue", response_model=CountResponse, response_model_exclude_unset=True, summary="Forget dispatched and failed queue items")
+def clear_queue(
+    client: Seedr = Depends(get_seedr_client),
+    user_id: str = Depends(get_user_id)
+):
+    removed = ingest_queue.clear_finished(user_id)
+    return {"success": True, "message": f"Removed {removed} finished items", "removed": removed}
+
+@router.delete("/queue/{item_id}", response_model=CountResponse, response_model_exclude_unset=True, summary="Remove an item from the queue")
+def remove_queue_item(
+    item_id: str,
+    client: Seedr = Depends(get_seedr_client),
+    user_id: str = Depends(get_user_id)
+):
+    if not ingest_queue.remove(user_id, item_id):
+        raise HTTPException(status_code=404, detail="Queue item not found or already dispatched")
+    return {"success": True, "message": "Queue item removed"}
+
+@router.get("/webhooks", response_model=WebhooksResponse, summary="Get completion webhook watches, delivery metrics and dead letters")
+def get_webhooks(
+    client: Seedr = Depends(get_seedr_client),
+    user_id: str = Depends(get_user_id)
+):
+    return {
+        "success": True,
+        "watching": completion_poller.pending(user_id),
+        **webhook_delivery.status(user_id)
+    }
+
+@router.post("/webhooks/dead-letters/{delivery_id}/retry", response_model=CountResponse, response_model_exclude_unset=True, summary="Retry a dead-lettered webhook delivery")
+def retry_webhook(
+    delivery_id: str,
+    client: Seedr = Depends(get_seedr_client),
+    user_id: str = Depends(get_user_id)
+):
+    if not webhook_delivery.retry_dead_letter(delivery_id, user_id):
+        raise HTTPException(status_code=404, detail="Dead-lettered delivery not found")
+    return {"success": True, "message": "Delivery re-queued"}
+
+@router.delete("/webhooks/dead-letters", response_model=CountResponse, response_model_exclude_unset=True, summary="Discard dead-lettered webhook deliveries")
+def clear_webhook_dead_letters(
+    client: Seedr = Depends(get_seedr_client),
+    user_id: str = Depends(get_user_id)
+):
+    removed = webhook_delivery.clear_dead_letters(user_id)
+    return {"success": True, "message": f"Removed {removed} dead letters", "removed": removed}
+
+@router.delete("/{torrent_id}", response_model=ActionResponse, summary="Delete a torrent")
 def delete_torrent(
     torrent_id: str,
-    client: Seedr = Depends(get_seedr_client)
+    client: Seedr = Depends(get_seedr_client),
+    user_id: str = Depends(get_user_id)
 ):
     try:
         result = client.delete_torrent(torrent_id)
+        quota_ledger.release_torrent(user_id, torrent_id=torrent_id)
+        torrent_index.forget_torrent(user_id, torrent_id)
+        account_cache.invalidate_usage(user_id)
         return {
             "success": True,
             "message": "Torrent deleted successfully",
-            "result": to_dict(result)
+            "result": result
         }
     except SeedrError as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise upstream_error(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
 
-@router.delete("/wishlist/{wishlist_id}", summary="Delete a wishlist item")
+@router.delete("/wishlist/{wishlist_id}", response_model=ActionResponse, summary="Delete a wishlist item")
 def delete_wishlist(
     wishlist_id: str,
-    client: Seedr = Depends(get_seedr_client)
+    client: Seedr = Depends(get_seedr_client),
+    user_id: str = Depends(get_user_id)
 ):
     try:
         result = client.delete_wishlist(wishlist_id)
+        account_cache.invalidate(user_id, SETTINGS)
         return {
             "success": True,
             "message": "Wishlist item deleted successfully",
-            "result": to_dict(result)
+            "result": result
         }
     except SeedrError as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise upstream_error(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
 
-@router.get("/list", summary="List all active torrents")
-async def list_torrents(client: Seedr = Depends(get_seedr_client)):
+@router.get("/list", response_model=TorrentListResponse, summary="List all active torrents")
+def list_torrents(
+    fields: Optional[FieldTree] = Depends(get_fields),
+    client: Seedr = Depends(get_seedr_client),
+    user_id: str = Depends(get_user_id)
+):
     try:
         contents = client.list_contents()
-        torrents_list = []
-        if hasattr(contents, 'torrents') and contents.torrents:
-            torrents_list = [to_dict(t) for t in contents.torrents]
-        
-        return {
+        quota_ledger.observe_listing(user_id, contents)
+        torrent_index.observe_listing(user_id, '0', contents)
+        torrents_list = getattr(contents, 'torrents', None) or []
+        response_data = {
             "success": True,
             "torrents": torrents_list,
             "total": len(torrents_list)
         }
+        if fields is not None:
+            response_data["torrents"] = project(torrents_list, fields)
+            return FastJSONResponse(response_data)
+        return response_data
     except SeedrError as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise upstream_error(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
 
-@router.post("/metadata", summary="Get torrent metadata")
-async def get_metadata(request: TorrentMetadataRequest):
+@router.get("/{torrent_hash}/status", response_model=TorrentStatusResponse, summary="Get torrent status by infohash")
+def torrent_status(
+    torrent_hash: str,
+    refresh: bool = Query(False, description="Re-list the root folder before answering"),
+    client: Seedr = Depends(get_seedr_client),
+    user_id: str = Depends(get_user_id)
+):
     try:
-        torrentmeta_url = 'https://torrentmeta.fly.dev'
-        headers = {'Content-Type': 'application/json'}
-        payload = {'query': request.query}
-        
-        response = requests.post(
-            torrentmeta_url,
-            json=payload,
-            headers=headers,
-            timeout=30
+        entry = torrent_index.lookup(user_id, torrent_hash)
+        stale = entry is None or (
+            entry["status"] != STATUS_COMPLETED and
+            time.time() - entry["updated_at"] > settings.TORRENT_STATUS_MAX_AGE
         )
-        
-        if response.status_code == 200:
-            return {"success": True, "metadata": response.json()}
-        else:
-            raise HTTPException(status_code=500, detail="Failed to fetch torrent metadata")
+        if refresh or stale:
+            contents = client.list_contents('0')
+            quota_ledger.observe_listing(user_id, contents)
+            torrent_index.observe_listing(user_id, '0', contents)
+            entry = torrent_index.lookup(user_id, torrent_hash)
+        if entry is None:
+            raise HTTPException(status_code=404, detail="Torrent not found")
+        return {"success": True, **entry}
+    except HTTPException:
+        raise
+    except SeedrError as e:
+        raise upstream_error(e)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
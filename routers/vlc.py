@@ -4,17 +4,20 @@ from typing import Optional
 import subprocess
 import os
 from config import settings
+from models import PlayResponse, VlcConfigResponse
+from utils.serialization import SerializedRoute
 
 router = APIRouter(
     prefix="/vlc",
-    tags=["VLC Player"]
+    tags=["VLC Player"],
+    route_class=SerializedRoute
 )
 
 class PlayRequest(BaseModel):
     url: str
     enqueue: bool = False
 
-@router.post("/play", summary="Play a download URL in VLC media player")
+@router.post("/play", response_model=PlayResponse, summary="Play a download URL in VLC media player")
 async def play_in_vlc(request: PlayRequest):
     try:
         # Check if VLC exists
@@ -49,7 +52,7 @@ async def play_in_vlc(request: PlayRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
 
-@router.get("/config", summary="Get current VLC configuration")
+@router.get("/config", response_model=VlcConfigResponse, summary="Get current VLC configuration")
 def get_vlc_config():
     return {
         "vlc_path": settings.VLC_PATH,
@@ -0,0 +1,13 @@
+"""Local Seedr simulator for offline development and load testing
+
+A fake Seedr backend, with a TorrentMeta stand-in, that speaks the HTTP API
+seedrcc uses. It has generated folder trees, torrents that complete over
+time, expiring tokens, and configurable latency and error injection. Run it
+with ``python -m simulator`` and set ``SEEDR_BASE_URL`` (and
+``TORRENTMETA_URL``) to point the API at it.
+"""
+from simulator.app import create_app
+from simulator.server import BackgroundServer, SimulatorServer
+from simulator.state import SimulatorConfig
+
+__all__ = ["BackgroundServer", "SimulatorConfig", "SimulatorServer", "create_app"]
@@ -0,0 +1,43 @@
+"""Command line entry point: ``python -m simulator --help``"""
+import argparse
+from dataclasses import fields
+
+import uvicorn
+
+from simulator.app import create_app
+from simulator.state import SimulatorConfig
+
+
+def _config_from_args(args: argparse.Namespace) -> SimulatorConfig:
+    values = {f.name: getattr(args, f.name) for f in fields(SimulatorConfig) if f.name != "func_latency"}
+    func_latency = {}
+    for item in args.func_latency:
+        func, _, spec = item.partition('=')
+        if not spec:
+            raise SystemExit(f"--func-latency expects FUNC=SPEC, got '{item}'")
+        func_latency[func] = spec
+    return SimulatorConfig(func_latency=func_latency, **values)
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m simulator", description="Run a local Seedr simulator")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    defaults = SimulatorConfig()
+    for f in fields(SimulatorConfig):
+        if f.name == "func_latency":
+            continue
+        parser.add_argument(f"--{f.name.replace('_', '-')}", type=type(getattr(defaults, f.name)),
+                            default=getattr(defaults, f.name))
+    parser.add_argument("--func-latency", action="append", default=[], metavar="FUNC=SPEC",
+                        help="Latency for one API func, e.g. list_contents=lognormal:0.2,0.8")
+    args = parser.parse_args()
+
+    config = _config_from_args(args)
+    print(f"Seedr simulator on http://{args.host}:{args.port} "
+          f"(SEEDR_BASE_URL=http://{args.host}:{args.port}, TORRENTMETA_URL=http://{args.host}:{args.port}/torrentmeta)")
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
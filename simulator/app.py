@@ -0,0 +1,321 @@
+"""HTTP surface of the simulator
+
+Serves the Seedr endpoints seedrcc talks to, under the same paths as on
+www.seedr.cc. Point seedrcc at it with ``SEEDR_BASE_URL``:
+
+* ``POST /oauth_test/token.php``: password and refresh-token grants
+* ``GET|POST /oauth_test/resource.php?func=...``: the resource API
+* ``GET /api/device/code`` and ``GET /api/device/authorize``: device flow
+* ``GET /progress/{torrent_id}``: the ``progress_url`` of active torrents
+
+There is also a TorrentMeta stand-in at ``POST /torrentmeta`` (use it as
+``TORRENTMETA_URL``) and call counters at ``GET /_simulator/stats``.
+"""
+import asyncio
+import hashlib
+import json
+import re
+import time
+from typing import Any, Dict, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+from simulator.distributions import Distribution
+from simulator.state import Account, SeedrState, SimulatorConfig, parse_magnet, torrent_metadata
+
+_TORRENT_NAME = re.compile(rb'4:name(\d+):')
+
+# Username the device flow logs in as
+DEVICE_USERNAME = "device@simulator.local"
+
+
+def _error(status: int, error: str, description: Optional[str] = None) -> JSONResponse:
+    body = {"error": error}
+    if description:
+        body["error_description"] = description
+    return JSONResponse(body, status_code=status)
+
+
+def _failed(code: int = 400, **extra: Any) -> Dict[str, Any]:
+    return {"result": False, "code": code, **extra}
+
+
+def _torrent_file_identity(content: bytes) -> tuple:
+    """(infohash, name) of an uploaded .torrent; the hash covers the whole file rather than the info dict"""
+    infohash = hashlib.sha1(content).hexdigest()
+    name = None
+    match = _TORRENT_NAME.search(content)
+    if match:
+        start = match.end()
+        name = content[start:start + int(match.group(1))].decode('utf-8', 'replace')
+    return infohash, name
+
+
+def _items(raw: Optional[str]) -> list:
+    try:
+        items = json.loads(raw or '[]')
+    except json.JSONDecodeError:
+        return []
+    return items if isinstance(items, list) else []
+
+
+def create_app(config: Optional[SimulatorConfig] = None) -> FastAPI:
+    config = config or SimulatorConfig()
+    state = SeedrState(config)
+    latency = Distribution(config.latency)
+    func_latency = {func: Distribution(spec) for func, spec in config.func_latency.items()}
+    torrentmeta_latency = Distribution(config.torrentmeta_latency)
+
+    app = FastAPI(title="Seedr simulator", docs_url=None, redoc_url=None, openapi_url=None)
+    app.state.simulator = state
+
+    async def delay(distribution: Distribution):
+        if not distribution.is_zero:
+            with state.lock:
+                seconds = distribution.sample(state.rng)
+            await asyncio.sleep(seconds)
+
+    def inject_error(rate: float) -> bool:
+        if rate <= 0:
+            return False
+        with state.lock:
+            failed = state.rng.random() < rate
+            if failed:
+                state.injected_errors += 1
+        return failed
+
+    def count(func: str):
+        with state.lock:
+            state.calls[func] = state.calls.get(func, 0) + 1
+
+    # Auth
+
+    @app.post("/oauth_test/token.php")
+    async def token(request: Request):
+        count("token")
+        await delay(latency)
+        if inject_error(config.error_rate):
+            return _error(503, "service_unavailable")
+        form = await request.form()
+        with state.lock:
+            if form.get("grant_type") == "password":
+                if not form.get("username") or form.get("password") != config.password:
+                    return _error(401, "invalid_grant", "Invalid username and password combination")
+                state.account(form["username"])
+                return state.issue_token(form["username"])
+            if form.get("grant_type") == "refresh_token":
+                username = state.refresh_tokens.get(form.get("refresh_token", ""))
+                if username is None:
+                    return _error(400, "invalid_grant", "Invalid refresh token")
+                return state.issue_token(username, refresh_token=form["refresh_token"])
+        return _error(400, "unsupported_grant_type")
+
+    @app.get("/api/device/code")
+    async def device_code():
+        count("device_code")
+        await delay(latency)
+        with state.lock:
+            return state.new_device_code()
+
+    @app.get("/api/device/authorize")
+    async def device_authorize(device_code: str = ""):
+        count("device_authorize")
+        await delay(latency)
+        with state.lock:
+            pending = state.device_codes.get(device_code)
+            if pending is None:
+                return _error(400, "invalid_device_code")
+            if time.time() - pending["created"] < config.device_approval_delay:
+                return {"error": "authorization_pending"}
+            account = state.account(DEVICE_USERNAME)
+            if not any(d["device_code"] == device_code for d in account.devices):
+                account.devices.append({
+                    "client_id": "seedr_xbmc", "client_name": "Simulated device",
+                    "device_code": device_code, "tk": pending["user_code"]
+                })
+            issued = state.issue_token(DEVICE_USERNAME)
+        # Device logins refresh by asking for the device code again
+        issued.pop("refresh_token")
+        return issued
+
+    # Resource API
+
+    def dispatch(account: Account, func: str, form: Dict[str, Any], base_url: str) -> Dict[str, Any]:
+        account.advance()
+        if func == "get_settings":
+            return account.settings_payload()
+        if func == "get_memory_bandwidth":
+            return account.memory_payload()
+        if func == "get_devices":
+            return {"result": True, "devices": list(account.devices)}
+        if func == "list_contents":
+            try:
+                folder_id = int(form.get("content_id") or 0)
+            except ValueError:
+                folder_id = -1
+            payload = account.list_payload(folder_id, base_url)
+            return payload if payload is not None else _failed(404, error="folder_not_found")
+        if func == "add_torrent":
+            return add_torrent(account, form)
+        if func == "fetch_file":
+            record = account.files.get(int(form.get("folder_file_id") or 0))
+            if record is None:
+                return _failed(404, error="file_not_found")
+            account.bandwidth_used += record["size"]
+            return {
+                "result": True,
+                "url": f"{base_url}/download/{record['folder_file_id']}/{record['name']}",
+                "name": record["name"]
+            }
+        if func == "create_empty_archive":
+            items = _items(form.get("archive_arr"))
+            if not items or int(items[0].get("id", -1)) not in account.folders:
+                return _failed(404, error="folder_not_found")
+            archive_id = account.next_id()
+            return {
+                "result": True, "archive_id": archive_id,
+                "archive_url": f"{base_url}/archive/{archive_id}.zip", "code": 200
+            }
+        if func == "search_files":
+            query = (form.get("search_query") or "").lower()
+            folders = [f for f in account.folders.values() if f["id"] and query in f["name"].lower()]
+            files = [f for f in account.files.values() if query in f["name"].lower()]
+            return {
+                "result": True, "id": 0, "name": "", "fullname": "", "size": 0, "is_shared": False,
+                "play_audio": False, "play_video": False,
+                "folders": [account.folder_payload(f) for f in folders],
+                "files": [account.file_payload(f) for f in files],
+                "torrents": []
+            }
+        if func == "add_folder":
+            name = form.get("name") or ""
+            if not name:
+                return _failed(400, error="missing_name")
+            account.add_folder(name)
+            return {"result": True, "code": 200}
+        if func == "rename":
+            new_name = form.get("rename_to") or ""
+            if form.get("file_id"):
+                target = account.files.get(int(form["file_id"]))
+            else:
+                target = account.folders.get(int(form.get("folder_id") or -1))
+            if target is None or not new_name:
+                return _failed(404, error="not_found")
+            target["name"] = new_name
+            return {"result": True, "code": 200}
+        if func == "delete":
+            for item in _items(form.get("delete_arr")):
+                item_id = int(item.get("id", -1))
+                if item.get("type") == "file":
+                    account.remove_file(item_id)
+                elif item.get("type") == "folder" and item_id:
+                    account.delete_folder(item_id)
+                elif item.get("type") == "torrent":
+                    account.torrents.pop(item_id, None)
+            return {"result": True, "code": 200}
+        if func == "remove_wishlist":
+            wishlist_id = str(form.get("id"))
+            account.wishlist = [w for w in account.wishlist if str(w["id"]) != wishlist_id]
+            return {"result": True, "code": 200}
+        if func == "user_account_modify":
+            if form.get("setting") == "fullname":
+                if form.get("password") != config.password:
+                    return _failed(403, error="incorrect_password")
+                account.fullname = form.get("fullname") or account.fullname
+                return {"result": True, "code": 200}
+            if form.get("password") != config.password or form.get("new_password") != form.get("new_password_repeat"):
+                return _failed(403, error="incorrect_password")
+            return {"result": True, "code": 200}
+        if func == "scan_page":
+            url = form.get("url") or ""
+            torrents = []
+            for index in range(2):
+                infohash = hashlib.sha1(f"{url}#{index}".encode()).hexdigest()
+                metadata = torrent_metadata(config, infohash)
+                torrents.append({
+                    "id": index + 1, "hash": infohash, "size": metadata["size"], "title": metadata["name"],
+                    "magnet": f"magnet:?xt=urn:btih:{infohash}", "last_use": None, "pct": 0.0,
+                    "filenames": [f["name"] for f in metadata["files"]],
+                    "filesizes": [f["size"] for f in metadata["files"]]
+                })
+            return {"result": True, "torrents": torrents}
+        return _failed(400, error="unknown_func")
+
+    def add_torrent(account: Account, form: Dict[str, Any]) -> Dict[str, Any]:
+        upload = form.get("torrent_file")
+        if upload is not None and hasattr(upload, "file"):
+            infohash, name = _torrent_file_identity(upload.file.read())
+        else:
+            infohash, name = parse_magnet(form.get("torrent_magnet") or "")
+        if infohash is None:
+            return _failed(400, error="invalid_magnet")
+        try:
+            folder_id = max(int(form.get("folder_id") or -1), 0)
+        except ValueError:
+            folder_id = 0
+        metadata = torrent_metadata(config, infohash, name)
+        if account.space_used + metadata["size"] > config.space_max:
+            wish = {"id": account.next_id(), "title": metadata["name"], "size": metadata["size"], "hash": infohash}
+            account.wishlist.append(wish)
+            return {"result": "not_enough_space_added_to_wishlist", "wt": wish}
+        torrent = account.add_torrent(infohash, name, folder_id)
+        return {
+            "result": True, "user_torrent_id": torrent["id"], "title": torrent["name"],
+            "torrent_hash": infohash, "code": 200
+        }
+
+    @app.api_route("/oauth_test/resource.php", methods=["GET", "POST"])
+    async def resource(request: Request, func: str = "", access_token: str = ""):
+        count(func)
+        await delay(func_latency.get(func, latency))
+        if inject_error(config.error_rate):
+            return _error(503, "service_unavailable")
+        form = await request.form()
+        with state.lock:
+            account, error = state.authenticate(access_token)
+            if account is None:
+                return _error(401, error)
+            return dispatch(account, func, dict(form), str(request.base_url).rstrip('/'))
+
+    @app.get("/progress/{torrent_id}")
+    async def progress(torrent_id: int):
+        count("progress")
+        await delay(latency)
+        with state.lock:
+            found = state.find_torrent(torrent_id)
+            if found is None:
+                return _error(404, "torrent_not_found")
+            account, torrent = found
+            return account.progress_payload(torrent, time.time())
+
+    # TorrentMeta stand-in
+
+    @app.post("/torrentmeta")
+    async def torrentmeta(request: Request):
+        count("torrentmeta")
+        await delay(torrentmeta_latency)
+        if inject_error(config.torrentmeta_error_rate):
+            return _error(503, "service_unavailable")
+        try:
+            query = (await request.json()).get("query", "")
+        except (ValueError, AttributeError):
+            return _error(400, "invalid_request")
+        infohash, name = parse_magnet(query)
+        if infohash is None and re.fullmatch(r'[0-9a-fA-F]{40}', query or ''):
+            infohash = query.lower()
+        if infohash is None:
+            return _error(404, "not_found")
+        metadata = torrent_metadata(config, infohash, name)
+        return {"data": {"name": metadata["name"], "infohash": infohash, "files": metadata["files"]}}
+
+    @app.get("/_simulator/stats")
+    async def stats():
+        with state.lock:
+            return {
+                "calls": dict(state.calls),
+                "injected_errors": state.injected_errors,
+                "accounts": len(state.accounts)
+            }
+
+    return app
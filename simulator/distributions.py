@@ -0,0 +1,82 @@
+"""Random distributions given as short strings
+
+Latencies, file sizes and torrent durations are configured as
+``<kind>:<arguments>``:
+
+=====================  ==========================================
+``0`` or ``fixed:S``   always S (``0`` means no delay)
+``uniform:A,B``        uniformly between A and B
+``normal:MU,SIGMA``    normal, clipped at 0
+``lognormal:MED,S``    log-normal with median MED and shape S
+``exp:MEAN``           exponential with mean MEAN
+``pareto:MIN,ALPHA``   Pareto with scale MIN and shape ALPHA
+=====================  ==========================================
+
+Long-tailed kinds (``lognormal``, ``pareto``) are the useful ones for
+reproducing upstream tail latency.
+"""
+import math
+import random
+from typing import Callable, Dict, Tuple
+
+
+def _fixed(rng: random.Random, value: float) -> float:
+    return value
+
+
+def _uniform(rng: random.Random, low: float, high: float) -> float:
+    return rng.uniform(low, high)
+
+
+def _normal(rng: random.Random, mu: float, sigma: float) -> float:
+    return max(0.0, rng.gauss(mu, sigma))
+
+
+def _lognormal(rng: random.Random, median: float, shape: float) -> float:
+    return rng.lognormvariate(math.log(median), shape) if median > 0 else 0.0
+
+
+def _exponential(rng: random.Random, mean: float) -> float:
+    return rng.expovariate(1.0 / mean) if mean > 0 else 0.0
+
+
+def _pareto(rng: random.Random, minimum: float, alpha: float) -> float:
+    return minimum * rng.paretovariate(alpha)
+
+
+_KINDS: Dict[str, Tuple[Callable[..., float], int]] = {
+    "fixed": (_fixed, 1),
+    "uniform": (_uniform, 2),
+    "normal": (_normal, 2),
+    "lognormal": (_lognormal, 2),
+    "exp": (_exponential, 1),
+    "pareto": (_pareto, 2)
+}
+
+
+class Distribution:
+    """A parsed distribution spec; ``sample`` draws one value"""
+
+    def __init__(self, spec: str):
+        self.spec = spec.strip() or "0"
+        kind, _, args = self.spec.partition(':')
+        if not args:
+            kind, args = "fixed", kind
+        if kind not in _KINDS:
+            raise ValueError(f"Unknown distribution '{kind}' (expected one of {', '.join(_KINDS)})")
+        sampler, arity = _KINDS[kind]
+        try:
+            params = [float(a) for a in args.split(',')]
+        except ValueError:
+            raise ValueError(f"Invalid distribution arguments in '{spec}'")
+        if len(params) != arity:
+            raise ValueError(f"'{kind}' takes {arity} argument(s), got '{spec}'")
+        self._sampler = sampler
+        self._params = params
+        self.is_zero = kind == "fixed" and params[0] == 0
+
+    def sample(self, rng: random.Random) -> float:
+        return self._sampler(rng, *self._params)
+
+    def __repr__(self) -> str:
+        return f"Distribution({self.spec!r})"
@@ -0,0 +1,68 @@
+"""Run the simulator (or any ASGI app) on a local port in a background thread"""
+import threading
+import time
+from typing import Optional
+
+import uvicorn
+
+from simulator.app import create_app
+from simulator.state import SimulatorConfig
+
+
+class BackgroundServer:
+    """Serves an ASGI app with uvicorn in a daemon thread; ``url`` is its base URL once started
+
+    Port 0 picks a free port. Usable as a context manager.
+    """
+
+    def __init__(self, app, host: str = "127.0.0.1", port: int = 0, **options):
+        self.app = app
+        options.setdefault("log_level", "warning")
+        self.server = uvicorn.Server(uvicorn.Config(app, host=host, port=port, **options))
+        self.host = host
+        self.port = port
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def start(self, timeout: float = 10.0) -> "BackgroundServer":
+        self._thread = threading.Thread(target=self.server.run, name=type(self).__name__, daemon=True)
+        self._thread.start()
+        deadline = time.monotonic() + timeout
+        while not self.server.started:
+            if not self._thread.is_alive() or time.monotonic() > deadline:
+                raise RuntimeError(f"{type(self).__name__} failed to start")
+            time.sleep(0.01)
+        self.port = self.server.servers[0].sockets[0].getsockname()[1]
+        return self
+
+    def stop(self):
+        self.server.should_exit = True
+        if self._thread is not None:
+            self._thread.join(timeout=10.0)
+            self._thread = None
+
+    def __enter__(self) -> "BackgroundServer":
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+class SimulatorServer(BackgroundServer):
+    """Serves a simulator app on 127.0.0.1
+
+    This is how tests and benchmarks use the simulator::
+
+        with SimulatorServer(SimulatorConfig(latency="lognormal:0.05,0.5")) as sim:
+            configure_endpoints(sim.url)
+    """
+
+    def __init__(self, config: Optional[SimulatorConfig] = None, host: str = "127.0.0.1", port: int = 0):
+        super().__init__(create_app(config), host, port)
+
+    @property
+    def state(self):
+        return self.app.state.simulator
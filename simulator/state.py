@@ -0,0 +1,413 @@
+"""Simulated Seedr accounts
+
+Each username gets its own account with a generated folder tree: the same
+seed and username always produce the same tree. Added torrents follow a
+progress timeline. Each one takes a ``torrent_duration`` sample to
+download, then turns into a folder of files, the way Seedr moves finished
+torrents. Access tokens expire after ``token_ttl`` seconds, so the clients'
+refresh path runs too.
+"""
+import hashlib
+import random
+import re
+import secrets
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs
+
+from simulator.distributions import Distribution
+
+GB = 1024 ** 3
+
+_BTIH = re.compile(r'btih:([0-9a-fA-F]{40}|[A-Za-z2-7]{32})')
+_WORDS = (
+    "alpha", "bravo", "cedar", "delta", "ember", "falcon", "granite", "harbor", "island", "juniper",
+    "kestrel", "lumen", "meadow", "nimbus", "orchid", "prairie", "quartz", "raven", "summit", "tundra"
+)
+_EXTENSIONS = (".mkv", ".mp4", ".avi", ".srt", ".nfo", ".mp3", ".flac", ".jpg")
+
+
+@dataclass
+class SimulatorConfig:
+    """Behaviour of the simulated Seedr and TorrentMeta services"""
+
+    seed: int = 1
+    password: str = "simulator"  # Accepted for every username
+    latency: str = "0"  # Seedr response delay in seconds
+    func_latency: Dict[str, str] = field(default_factory=dict)  # Per API func overrides, e.g. list_contents
+    error_rate: float = 0.0  # Share of Seedr requests answered with 503
+    token_ttl: float = 3600.0  # Seconds before an access token expires
+    device_approval_delay: float = 0.0  # Seconds before a device code is authorised
+    tree_folders: int = 5  # Folders in the root
+    tree_depth: int = 2  # Levels of subfolders below those
+    tree_fanout: int = 3  # Subfolders per folder
+    tree_files: int = 8  # Files per folder
+    file_size: str = "lognormal:400000000,1.2"  # Bytes
+    space_max: int = 100 * GB
+    bandwidth_max: int = 1000 * GB
+    torrent_duration: str = "uniform:30,300"  # Seconds from add to completion
+    torrent_files: int = 3  # Files in a completed torrent
+    torrentmeta_latency: str = "0"
+    torrentmeta_error_rate: float = 0.0
+
+
+def _timestamp(epoch: float) -> str:
+    return datetime.fromtimestamp(epoch).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def parse_magnet(magnet: str) -> Tuple[Optional[str], Optional[str]]:
+    """(infohash, display name) of a magnet link"""
+    match = _BTIH.search(magnet or '')
+    infohash = match.group(1).lower() if match else None
+    name = parse_qs(magnet.partition('?')[2]).get('dn', [None])[0] if magnet else None
+    return infohash, name
+
+
+def torrent_metadata(config: SimulatorConfig, infohash: str, name: Optional[str] = None) -> Dict[str, Any]:
+    """Deterministic metadata for an infohash, shared by the TorrentMeta stand-in and ``add_torrent``"""
+    rng = random.Random(f"{config.seed}:{infohash}")
+    size = Distribution(config.file_size)
+    title = name or f"{rng.choice(_WORDS).title()} {rng.choice(_WORDS).title()} {rng.randint(1990, 2025)}"
+    files = [
+        {"name": f"{title} - part {i + 1}{rng.choice(_EXTENSIONS[:3])}", "size": max(1, int(size.sample(rng)))}
+        for i in range(max(1, config.torrent_files))
+    ]
+    return {"name": title, "infohash": infohash, "files": files, "size": sum(f["size"] for f in files)}
+
+
+class Account:
+    """One simulated Seedr account: folder tree, torrents, wishlist and devices"""
+
+    def __init__(self, username: str, user_id: int, config: SimulatorConfig):
+        self.username = username
+        self.user_id = user_id
+        self.config = config
+        self.rng = random.Random(f"{config.seed}:{username}")
+        self.folders: Dict[int, Dict[str, Any]] = {}
+        self.files: Dict[int, Dict[str, Any]] = {}
+        # Child ids by parent folder id, so listings don't scan the whole account
+        self._subfolders: Dict[int, Dict[int, None]] = {}
+        self._folder_files: Dict[int, Dict[int, None]] = {}
+        self.torrents: Dict[int, Dict[str, Any]] = {}
+        self.archives: Dict[int, Dict[str, Any]] = {}
+        self.wishlist: List[Dict[str, Any]] = []
+        self.devices: List[Dict[str, Any]] = []
+        self.bandwidth_used = 0
+        self.fullname = username.split('@')[0]
+        self._next_id = 1000
+        self._size = Distribution(config.file_size)
+        self._put_folder(self._folder_record(0, "", None))
+        self._generate(0, config.tree_folders, config.tree_depth)
+
+    def next_id(self) -> int:
+        self._next_id += 1
+        return self._next_id
+
+    # Tree
+
+    def _folder_record(self, folder_id: int, name: str, parent: Optional[int]) -> Dict[str, Any]:
+        return {"id": folder_id, "name": name, "parent": parent, "created": time.time() - self.rng.uniform(0, 90 * 86400)}
+
+    def _put_folder(self, folder: Dict[str, Any]):
+        self.folders[folder["id"]] = folder
+        if folder["parent"] is not None:
+            self._subfolders.setdefault(folder["parent"], {})[folder["id"]] = None
+
+    def add_folder(self, name: str, parent: int = 0) -> Dict[str, Any]:
+        folder = self._folder_record(self.next_id(), name, parent)
+        folder["created"] = time.time()
+        self._put_folder(folder)
+        return folder
+
+    def add_file(self, folder_id: int, name: str, size: int) -> Dict[str, Any]:
+        file_id = self.next_id()
+        record = {
+            "folder_file_id": file_id,
+            "file_id": file_id + 7_000_000,
+            "folder_id": folder_id,
+            "name": name,
+            "size": size,
+            "hash": hashlib.sha1(f"{self.username}:{file_id}".encode()).hexdigest(),
+            "created": time.time()
+        }
+        self.files[file_id] = record
+        self._folder_files.setdefault(folder_id, {})[file_id] = None
+        return record
+
+    def remove_file(self, file_id: int):
+        record = self.files.pop(file_id, None)
+        if record is not None:
+            self._folder_files.get(record["folder_id"], {}).pop(file_id, None)
+
+    def _generate(self, parent: int, count: int, depth: int):
+        for _ in range(count):
+            name = f"{self.rng.choice(_WORDS).title()} {self.rng.choice(_WORDS).title()} {self.rng.randint(1, 999)}"
+            folder = self._folder_record(self.next_id(), name, parent)
+            self._put_folder(folder)
+            for index in range(self.config.tree_files):
+                size = max(1, int(self._size.sample(self.rng)))
+                record = self.add_file(folder["id"], f"{name} {index + 1:02d}{self.rng.choice(_EXTENSIONS)}", size)
+                record["created"] = folder["created"]
+            if depth > 0:
+                self._generate(folder["id"], self.config.tree_fanout, depth - 1)
+
+    def children(self, folder_id: int) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        folders = [self.folders[i] for i in self._subfolders.get(folder_id, ())]
+        files = [self.files[i] for i in self._folder_files.get(folder_id, ())]
+        return folders, files
+
+    def folder_size(self, folder_id: int) -> int:
+        folders, files = self.children(folder_id)
+        return sum(f["size"] for f in files) + sum(self.folder_size(f["id"]) for f in folders)
+
+    def delete_folder(self, folder_id: int):
+        folders, files = self.children(folder_id)
+        for sub in folders:
+            self.delete_folder(sub["id"])
+        for record in files:
+            self.remove_file(record["folder_file_id"])
+        folder = self.folders.pop(folder_id, None)
+        if folder is not None:
+            self._subfolders.get(folder["parent"], {}).pop(folder_id, None)
+
+    @property
+    def space_used(self) -> int:
+        return sum(f["size"] for f in self.files.values()) + sum(t["size"] for t in self.torrents.values())
+
+    # Torrents
+
+    def add_torrent(self, infohash: str, name: Optional[str], folder_id: int) -> Dict[str, Any]:
+        metadata = torrent_metadata(self.config, infohash, name)
+        duration = Distribution(self.config.torrent_duration).sample(self.rng)
+        torrent = {
+            "id": self.next_id(),
+            "name": metadata["name"],
+            "hash": infohash,
+            "size": metadata["size"],
+            "files": metadata["files"],
+            "folder_id": folder_id,
+            "added": time.time(),
+            "duration": max(duration, 0.0)
+        }
+        self.torrents[torrent["id"]] = torrent
+        return torrent
+
+    def progress(self, torrent: Dict[str, Any], now: float) -> float:
+        if torrent["duration"] <= 0:
+            return 100.0
+        return min(100.0, (now - torrent["added"]) / torrent["duration"] * 100)
+
+    def advance(self, now: Optional[float] = None):
+        """Turn torrents that have finished downloading into folders"""
+        now = now or time.time()
+        for torrent in [t for t in self.torrents.values() if self.progress(t, now) >= 100]:
+            del self.torrents[torrent["id"]]
+            parent = torrent["folder_id"] if torrent["folder_id"] in self.folders else 0
+            folder = self.add_folder(torrent["name"], parent)
+            for file in torrent["files"]:
+                self.add_file(folder["id"], file["name"], file["size"])
+
+    # Seedr payloads
+
+    def folder_payload(self, folder: Dict[str, Any]) -> Dict[str, Any]:
+        size = self.folder_size(folder["id"])
+        return {
+            "id": folder["id"],
+            "name": folder["name"],
+            "fullname": folder["name"],
+            "size": size,
+            "last_update": _timestamp(folder["created"]),
+            "is_shared": False,
+            "play_audio": False,
+            "play_video": True
+        }
+
+    def file_payload(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "name": record["name"],
+            "size": record["size"],
+            "hash": record["hash"],
+            "folder_id": record["folder_id"],
+            "folder_file_id": record["folder_file_id"],
+            "file_id": record["file_id"],
+            "last_update": _timestamp(record["created"]),
+            "play_audio": record["name"].endswith((".mp3", ".flac")),
+            "play_video": record["name"].endswith((".mkv", ".mp4", ".avi")),
+            "video_progress": None,
+            "is_lost": 0,
+            "thumb": None
+        }
+
+    def torrent_payload(self, torrent: Dict[str, Any], base_url: str, now: float) -> Dict[str, Any]:
+        progress = self.progress(torrent, now)
+        rate = int(torrent["size"] / torrent["duration"]) if torrent["duration"] > 0 else 0
+        return {
+            "id": torrent["id"],
+            "name": torrent["name"],
+            "size": torrent["size"],
+            "hash": torrent["hash"],
+            "progress": f"{progress:.1f}",
+            "last_update": _timestamp(torrent["added"]),
+            "folder": str(torrent["folder_id"]),
+            "download_rate": rate,
+            "upload_rate": 0,
+            "torrent_quality": 3,
+            "connected_to": 12,
+            "downloading_from": 8,
+            "uploading_to": 0,
+            "seeders": 40,
+            "leechers": 5,
+            "warnings": "[]",
+            "stopped": 0,
+            "progress_url": f"{base_url}/progress/{torrent['id']}?callback=cb"
+        }
+
+    def progress_payload(self, torrent: Dict[str, Any], now: float) -> Dict[str, Any]:
+        progress = self.progress(torrent, now)
+        rate = int(torrent["size"] / torrent["duration"]) if torrent["duration"] > 0 else 0
+        stats = {
+            "torrent_hash": torrent["hash"], "progress": progress, "title": torrent["name"],
+            "downloading_from": 8, "uploading_to": 0, "warnings": "[]", "stopped": 0,
+            "folder_created": 0, "download_rate": rate, "size": torrent["size"], "torrent_quality": 3,
+            "seeders": 40, "leechers": 5, "seed_ratio": 0
+        }
+        return {
+            "title": torrent["name"], "size": torrent["size"], "progress": progress, "hash": torrent["hash"],
+            "stopped": 0, "download_rate": rate, "stats": stats, "torrent_quality": 3, "warnings": "",
+            "files_progress": []
+        }
+
+    def list_payload(self, folder_id: int, base_url: str) -> Optional[Dict[str, Any]]:
+        folder = self.folders.get(folder_id)
+        if folder is None:
+            return None
+        now = time.time()
+        folders, files = self.children(folder_id)
+        payload = self.folder_payload(folder)
+        payload.update({
+            "folders": [self.folder_payload(f) for f in folders],
+            "files": [self.file_payload(f) for f in files],
+            "torrents": [
+                self.torrent_payload(t, base_url, now) for t in self.torrents.values()
+                if t["folder_id"] == folder_id or folder_id == 0
+            ],
+            "parent": folder["parent"] if folder["parent"] is not None else -1,
+            "timestamp": _timestamp(folder["created"]),
+            "indexes": [],
+            "result": True
+        })
+        if folder_id == 0:
+            payload.update({
+                "space_used": self.space_used,
+                "space_max": self.config.space_max,
+                "saw_walkthrough": 1,
+                "type": "folder",
+                "t": [int(now)]
+            })
+        return payload
+
+    def settings_payload(self) -> Dict[str, Any]:
+        return {
+            "result": True,
+            "code": 200,
+            "settings": {
+                "allow_remote_access": False,
+                "site_language": "en",
+                "subtitles_language": "en",
+                "email_announcements": False,
+                "email_newsletter": False
+            },
+            "account": {
+                "username": self.fullname,
+                "user_id": self.user_id,
+                "premium": 1,
+                "package_id": 2,
+                "package_name": "Simulated",
+                "space_used": self.space_used,
+                "space_max": self.config.space_max,
+                "bandwidth_used": self.bandwidth_used,
+                "email": self.username,
+                "wishlist": list(self.wishlist),
+                "invites": 0,
+                "invites_accepted": 0,
+                "max_invites": 0
+            },
+            "country": "ZZ"
+        }
+
+    def memory_payload(self) -> Dict[str, Any]:
+        return {
+            "bandwidth_used": self.bandwidth_used,
+            "bandwidth_max": self.config.bandwidth_max,
+            "space_used": self.space_used,
+            "space_max": self.config.space_max,
+            "is_premium": 1
+        }
+
+
+class SeedrState:
+    """Accounts, tokens and device codes of the simulated service"""
+
+    def __init__(self, config: SimulatorConfig):
+        self.config = config
+        self.lock = threading.RLock()
+        self.accounts: Dict[str, Account] = {}
+        self.access_tokens: Dict[str, Tuple[str, float]] = {}
+        self.refresh_tokens: Dict[str, str] = {}
+        self.device_codes: Dict[str, Dict[str, Any]] = {}
+        self.rng = random.Random(config.seed)
+        self.calls: Dict[str, int] = {}
+        self.injected_errors = 0
+
+    def account(self, username: str) -> Account:
+        account = self.accounts.get(username)
+        if account is None:
+            account = self.accounts[username] = Account(username, len(self.accounts) + 1, self.config)
+        return account
+
+    def issue_token(self, username: str, refresh_token: Optional[str] = None) -> Dict[str, Any]:
+        access_token = secrets.token_hex(20)
+        self.access_tokens[access_token] = (username, time.time() + self.config.token_ttl)
+        if refresh_token is None:
+            refresh_token = secrets.token_hex(20)
+            self.refresh_tokens[refresh_token] = username
+        return {
+            "access_token": access_token,
+            "refresh_token": refresh_token,
+            "expires_in": int(self.config.token_ttl),
+            "token_type": "Bearer",
+            "scope": None
+        }
+
+    def authenticate(self, access_token: str) -> Tuple[Optional[Account], Optional[str]]:
+        """The token's account, or an error code (``invalid_token`` / ``expired_token``)"""
+        entry = self.access_tokens.get(access_token or '')
+        if entry is None:
+            return None, "invalid_token"
+        username, expires_at = entry
+        if time.time() >= expires_at:
+            return None, "expired_token"
+        return self.account(username), None
+
+    def new_device_code(self) -> Dict[str, Any]:
+        device_code = secrets.token_hex(16)
+        user_code = secrets.token_hex(3).upper()
+        self.device_codes[device_code] = {"created": time.time(), "user_code": user_code}
+        return {
+            "device_code": device_code,
+            "user_code": user_code,
+            "verification_url": "https://www.seedr.cc/devices",
+            "expires_in": 1800,
+            "interval": 5
+        }
+
+    def find_torrent(self, torrent_id: int) -> Optional[Tuple[Account, Dict[str, Any]]]:
+        for account in self.accounts.values():
+            account.advance()
+            torrent = account.torrents.get(torrent_id)
+            if torrent is not None:
+                return account, torrent
+        return None
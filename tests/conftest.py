@@ -0,0 +1,21 @@
+import threading
+
+import pytest
+
+from config import settings
+from utils.shared_state import shared_state
+from utils.tree_mirror import tree_mirror
+
+
+@pytest.fixture(autouse=True)
+def isolated_state(tmp_path, monkeypatch):
+    """Keep the databases and files written by the global state objects out of the working directory"""
+    monkeypatch.setattr(settings, "SHARED_STATE_PATH", str(tmp_path / "shared_state.db"))
+    monkeypatch.setattr(settings, "TOKEN_STORAGE_PATH", str(tmp_path / "tokens.json"))
+    monkeypatch.setattr(settings, "TREE_MIRROR_PATH", str(tmp_path / "tree_mirror.db"))
+    monkeypatch.setattr(settings, "USAGE_SERIES_PATH", "")
+    for store, path in ((shared_state, settings.SHARED_STATE_PATH), (tree_mirror, settings.TREE_MIRROR_PATH)):
+        monkeypatch.setattr(store, "path", path)
+        monkeypatch.setattr(store, "_local", threading.local())
+        monkeypatch.setattr(store, "_initialized", False)
+    monkeypatch.setattr(shared_state, "legacy_token_path", settings.TOKEN_STORAGE_PATH)
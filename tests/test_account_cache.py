@@ -0,0 +1,57 @@
+from types import SimpleNamespace
+
+from config import settings
+from utils.account_cache import AccountCache, SETTINGS, MEMORY_BANDWIDTH
+from utils.quota_ledger import quota_ledger
+
+
+def test_hits_revalidates_stale_and_invalidates(monkeypatch):
+    monkeypatch.setattr(settings, "ACCOUNT_CACHE_SETTINGS_TTL", 60)
+    monkeypatch.setattr(settings, "ACCOUNT_CACHE_STALE_TTL", 60)
+    cache = AccountCache()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        return len(calls)
+
+    assert cache.get("u1", SETTINGS, fetch) == 1
+    assert cache.get("u1", SETTINGS, fetch) == 1
+    assert len(calls) == 1
+
+    # Expired but within the stale window: old value now, refresh in the background
+    value, fetched_at = cache.entries[("u1", SETTINGS)]
+    cache.entries[("u1", SETTINGS)] = (value, fetched_at - 90)
+    assert cache.get("u1", SETTINGS, fetch) == 1
+    cache._executor.shutdown(wait=True)
+    assert cache.get("u1", SETTINGS, fetch) == 2
+    assert cache.stats["stale_hits"] == 1
+
+    cache.invalidate_usage("u1")
+    assert ("u1", SETTINGS) not in cache.entries
+    assert cache.get("u1", SETTINGS, fetch) == 3
+
+def test_fetch_started_before_invalidation_is_not_stored():
+    cache = AccountCache()
+
+    def fetch():
+        cache.invalidate("u1", MEMORY_BANDWIDTH)
+        return "outdated"
+
+    assert cache.get("u1", MEMORY_BANDWIDTH, fetch) == "outdated"
+    assert ("u1", MEMORY_BANDWIDTH) not in cache.entries
+
+
+def test_memory_bandwidth_reading_keeps_reservations_bound_during_the_call():
+    quota_ledger.record_reading("mb-user", 0, 100)
+    _, reservation, _, _ = quota_ledger.admit("mb-user", 60)
+
+    class Client:
+        def get_memory_bandwidth(self):
+            # The add succeeds while the reading is in flight, so Seedr's figure does not include it
+            quota_ledger.bind("mb-user", reservation.id, torrent_id=7)
+            return SimpleNamespace(space_used=0, space_max=100)
+
+    AccountCache().memory_bandwidth("mb-user", Client())
+    assert quota_ledger.status("mb-user")["reserved"] == 60
+    quota_ledger.release("mb-user", reservation.id)
@@ -0,0 +1,69 @@
+import utils.seedr_client as seedr_client
+import utils.shared_state as shared_state_module
+from benchmarks import baseline
+from benchmarks.harness import percentile
+from benchmarks.runner import run_scenario
+from benchmarks.scenarios import by_name
+from main import create_app
+from simulator import BackgroundServer
+from utils.resilience import breakers
+from utils.shared_state import SharedState
+
+
+def result(throughput=100.0, p95=10.0, upstream=1.0, concurrency=1, errors=0):
+    return {
+        "concurrency": concurrency, "throughput": throughput, "errors": errors, "peak_rss_mb": 100.0,
+        "latency_ms": {"p50": 5.0, "p95": p95, "p99": p95 * 2}, "upstream_calls_per_request": upstream
+    }
+
+
+def regressions(old, new):
+    findings = baseline.compare({"results": {"s@1": old}}, {"results": {"s@1": new}}, tolerance=0.2)
+    return sorted(f.metric for f in findings if f.regression)
+
+
+def test_percentile_is_nearest_rank():
+    values = [float(v) for v in range(1, 101)]
+    assert percentile(values, 50) == 50.0
+    assert percentile(values, 99) == 99.0
+    assert percentile([], 95) == 0.0
+
+
+def test_compare_flags_only_changes_beyond_tolerance():
+    assert regressions(result(), result(throughput=85.0, p95=11.5)) == []
+    assert regressions(result(), result(throughput=70.0, p95=20.0)) == [
+        "latency_ms.p95", "latency_ms.p99", "throughput"
+    ]
+    # Sub-millisecond jitter is ignored even when it is large in relative terms
+    assert regressions(result(p95=0.2), result(p95=0.6)) == []
+
+
+def test_compare_flags_extra_upstream_calls_and_new_errors():
+    assert regressions(result(), result(upstream=1.5, errors=2)) == ["errors", "upstream_calls_per_request"]
+    # Coalescing makes counts timing dependent under concurrency
+    assert regressions(result(concurrency=8), result(upstream=1.1, concurrency=8)) == []
+
+
+def test_scenarios_run_against_the_simulator(tmp_path, monkeypatch):
+    state = SharedState(str(tmp_path / "state.db"), "", owner="test")
+    monkeypatch.setattr(seedr_client, "shared_state", state)
+    monkeypatch.setattr(shared_state_module, "shared_state", state)
+
+    with BackgroundServer(create_app()) as api:
+        measured = {
+            scenario.name: run_scenario(api.url, scenario, concurrency=1, requests=4, warmup=1)
+            for scenario in by_name(["files_list_all_10", "torrents_smart_add", "auth_cold"])
+        }
+    breakers.reset()
+
+    assert all(m["errors"] == 0 and m["throughput"] > 0 for m in measured.values())
+    assert measured["files_list_all_10"]["upstream_calls"] == {"list_contents": 8}
+    assert measured["torrents_smart_add"]["upstream_calls"]["add_torrent"] == 4
+    assert measured["auth_cold"]["upstream_calls_per_request"] == 0
+
+
+def test_baseline_round_trip(tmp_path):
+    document = {"version": 1, "results": {"s@1": result()}}
+    path = str(tmp_path / "baseline.json")
+    baseline.save(path, document)
+    assert baseline.load(path) == document
@@ -0,0 +1,81 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from seedrcc.exceptions import APIError
+
+from utils.coalescing import COALESCED_CALLS, SingleFlight, call_key
+from utils.seedr_client import InstrumentedSeedr
+
+
+class SlowSeedr:
+    def __init__(self, error=None):
+        self.release = threading.Event()
+        self.calls = []
+        self.error = error
+
+    def list_contents(self, folder_id="0"):
+        self.calls.append(folder_id)
+        self.release.wait(5)
+        if self.error:
+            raise self.error
+        return {"folder": folder_id}
+
+    def add_folder(self, name):
+        self.calls.append(name)
+        self.release.wait(5)
+        return {"result": True}
+
+
+def run_concurrently(upstream, fn, callers, expected_waiters, method):
+    """Start ``callers`` together, release the upstream once the followers wait, return the futures"""
+    before = COALESCED_CALLS.get(method)
+    pool = ThreadPoolExecutor(max_workers=len(callers))
+    futures = [pool.submit(fn, *args) for args in callers]
+    deadline = time.monotonic() + 5
+    while COALESCED_CALLS.get(method) < before + expected_waiters and time.monotonic() < deadline:
+        time.sleep(0.005)
+    upstream.release.set()
+    pool.shutdown(wait=True)
+    return futures
+
+
+def test_identical_concurrent_reads_share_one_upstream_call():
+    upstream = SlowSeedr()
+    client = InstrumentedSeedr(upstream, "tabs")
+    futures = run_concurrently(upstream, client.list_contents, [("0",)] * 6, 5, "list_contents")
+    results = [f.result() for f in futures]
+    assert upstream.calls == ["0"]
+    assert all(result is results[0] for result in results)
+
+    # The key is free again once the call has finished
+    assert client.list_contents("0") == {"folder": "0"}
+    assert upstream.calls == ["0", "0"]
+
+
+def test_followers_receive_the_leaders_exception():
+    upstream = SlowSeedr(error=APIError("bad folder"))
+    client = InstrumentedSeedr(upstream, "errors")
+    futures = run_concurrently(upstream, client.list_contents, [("7",)] * 3, 2, "list_contents")
+    for future in futures:
+        with pytest.raises(APIError):
+            future.result()
+    assert upstream.calls == ["7"]
+
+
+def test_writes_and_different_arguments_are_not_coalesced():
+    upstream = SlowSeedr()
+    upstream.release.set()
+    client = InstrumentedSeedr(upstream, "writes")
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        list(pool.map(client.add_folder, ["a", "a"]))
+        list(pool.map(client.list_contents, ["1", "2"]))
+    assert sorted(upstream.calls) == ["1", "2", "a", "a"]
+
+
+def test_unhashable_arguments_are_not_coalesced():
+    assert call_key("u", "search_files", ({"q": "x"},), {}) is None
+    group = SingleFlight()
+    assert group.do(call_key("u", "list_contents", ("0",), {}), lambda: 1) == 1
+    assert group.calls == {}
@@ -0,0 +1,76 @@
+import asyncio
+import gzip
+import zlib
+
+from fastapi import FastAPI
+from fastapi.responses import Response
+from fastapi.testclient import TestClient
+
+from utils.compression import CompressionMiddleware, choose_encoding
+
+
+def make_app():
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, minimum_size=100, exclude_paths=["/raw"])
+
+    @app.get("/big")
+    def big():
+        return {"items": ["x" * 10] * 200}
+
+    @app.get("/small")
+    def small():
+        return {"ok": True}
+
+    @app.get("/raw/blob")
+    def raw():
+        return Response(b"y" * 500, media_type="text/plain")
+
+    return TestClient(app)
+
+
+def test_negotiation_honours_q_values():
+    assert choose_encoding("gzip;q=0.5, br", ["zstd", "br", "gzip"]) == "br"
+    assert choose_encoding("br, gzip", ["gzip"]) == "gzip"
+    assert choose_encoding("*;q=0.1, zstd;q=0", ["zstd", "gzip"]) == "gzip"
+    assert choose_encoding("identity", ["gzip"]) is None
+
+
+def test_compresses_large_bodies_only():
+    client = make_app()
+    response = client.get("/big", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert len(response.json()["items"]) == 200
+
+    response = client.get("/small", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+
+    response = client.get("/raw/blob", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+    assert response.content == b"y" * 500
+
+
+def test_streaming_chunks_flush_individually():
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200,
+                    "headers": [(b"content-type", b"application/x-ndjson")]})
+        for i in range(3):
+            await send({"type": "http.response.body", "body": f'{{"n": {i}}}\n'.encode(), "more_body": True})
+        await send({"type": "http.response.body", "body": b""})
+
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "method": "GET", "path": "/stream", "headers": [(b"accept-encoding", b"gzip")]}
+    asyncio.run(CompressionMiddleware(app, minimum_size=1000)(scope, None, send))
+
+    assert (b"content-encoding", b"gzip") in sent[0]["headers"]
+    bodies = [m["body"] for m in sent[1:]]
+    assert len(bodies) == 4
+    # Each NDJSON line is decodable as soon as its chunk arrives
+    decoder = zlib.decompressobj(31)
+    assert decoder.decompress(bodies[0]) == b'{"n": 0}\n'
+    assert decoder.decompress(bodies[1]) == b'{"n": 1}\n'
+    assert gzip.decompress(b"".join(bodies)) == b'{"n": 0}\n{"n": 1}\n{"n": 2}\n'
@@ -0,0 +1,65 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+
+from main import create_app
+from utils.account_cache import account_cache
+from utils.dependencies import get_seedr_client, get_user_id
+
+
+class SlowSeedr:
+    """Every upstream call takes DELAY seconds; devices fails"""
+    DELAY = 0.3
+
+    def _wait(self):
+        time.sleep(self.DELAY)
+
+    def get_settings(self):
+        self._wait()
+        return {"account": {"username": "demo"}}
+
+    def get_memory_bandwidth(self):
+        self._wait()
+        return SimpleNamespace(space_used=10, space_max=100)
+
+    def get_devices(self):
+        self._wait()
+        raise RuntimeError("devices unavailable")
+
+    def list_contents(self, folder_id="0"):
+        self._wait()
+        return SimpleNamespace(
+            torrents=[SimpleNamespace(id=1, hash="ab" * 20, name="T", progress="50")],
+            folders=[], files=[], space_used=10, space_max=100
+        )
+
+
+@pytest.fixture
+def api():
+    app = create_app()
+    app.dependency_overrides[get_seedr_client] = lambda: SlowSeedr()
+    app.dependency_overrides[get_user_id] = lambda: "dashboard-user"
+    account_cache.invalidate("dashboard-user")
+    return TestClient(app)
+
+
+def test_sections_are_fetched_concurrently(api):
+    start = time.monotonic()
+    data = api.get("/api/v1/dashboard").json()
+    elapsed = time.monotonic() - start
+
+    assert elapsed < SlowSeedr.DELAY * 3
+    assert data["settings"]["account"]["username"] == "demo"
+    assert data["memory_bandwidth"]["space_max"] == 100
+    assert data["torrents"][0]["name"] == "T"
+    assert data["devices"] is None
+    assert data["errors"] == {"devices": "devices unavailable"}
+    assert data["success"] is False
+
+
+def test_deadline_reports_slow_sections(api):
+    data = api.get("/api/v1/dashboard", params={"timeout": 0.05}).json()
+    assert data["contents"] is None
+    assert set(data["errors"]) == {"settings", "memory_bandwidth", "devices", "torrents", "contents"}
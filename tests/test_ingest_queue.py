@@ -0,0 +1,83 @@
+from types import SimpleNamespace
+
+from utils import ingest_queue as queue_module
+from utils.ingest_queue import IngestQueue, pack_first_fit_decreasing
+from utils.shared_state import SharedState
+
+
+def test_first_fit_decreasing_packs_largest_set():
+    items = [{"id": n, "size": size} for n, size in enumerate([50, 20, 70, 10, 40])]
+    selected = pack_first_fit_decreasing(items, 100)
+    assert [i["size"] for i in selected] == [70, 20, 10]
+
+
+def test_unknown_sizes_are_dispatched_alone():
+    items = [{"id": 1, "size": 0, "created_at": 2}, {"id": 2, "size": 0, "created_at": 1}]
+    assert [i["id"] for i in pack_first_fit_decreasing(items, 100)] == [2]
+
+
+class FakeClient:
+    def __init__(self):
+        self.added = []
+
+    def list_contents(self, folder_id="0"):
+        return SimpleNamespace(space_used=0, space_max=100, torrents=[])
+
+    def get_memory_bandwidth(self):
+        return SimpleNamespace(space_used=0, space_max=100)
+
+    def add_torrent(self, magnet_link=None, folder_id="-1"):
+        self.added.append(magnet_link)
+        return SimpleNamespace(user_torrent_id=len(self.added), torrent_hash=magnet_link)
+
+
+def make_queue(monkeypatch, state):
+    queue = IngestQueue(state)
+    monkeypatch.setattr(queue, "start", lambda: None)
+    return queue
+
+
+def test_dispatch_respects_free_space(tmp_path, monkeypatch):
+    shared = SharedState(str(tmp_path / "state.db"), "", owner="a")
+    sizes = {"m1": 60, "m2": 30, "m3": 50, "m4": 500}
+    monkeypatch.setattr(queue_module, "get_torrent_size", lambda magnet, timeout=None: sizes[magnet])
+    queue = make_queue(monkeypatch, shared)
+
+    queue.submit("ingest-user", list(sizes))
+    queue._executor.shutdown(wait=True)
+
+    client = FakeClient()
+    assert queue.dispatch("ingest-user", client) == 2
+    assert client.added == ["m1", "m2"]
+
+    state = queue.state("ingest-user")
+    assert state["metrics"]["by_status"] == {
+        "sizing": 0, "queued": 1, "dispatched": 2, "failed": 0, "too_large": 1, "duplicate": 0
+    }
+
+    # A restarted worker picks up the persisted queue
+    restarted = make_queue(monkeypatch, shared)
+    restarted.resume()
+    assert restarted.state("ingest-user")["metrics"]["pending"] == 1
+
+
+def test_workers_keep_their_own_items_until_they_stop(tmp_path, monkeypatch):
+    db = str(tmp_path / "state.db")
+    monkeypatch.setattr(queue_module, "get_torrent_size", lambda magnet, timeout=None: 10)
+    leader = make_queue(monkeypatch, SharedState(db, "", owner="a"))
+    follower = make_queue(monkeypatch, SharedState(db, "", owner="b"))
+    leader.resume()
+    follower.resume()
+
+    leader.submit("u", ["m1"])
+    follower.submit("u", ["m2", "m3"])
+    for queue in (leader, follower):
+        queue._executor.shutdown(wait=True)
+
+    # Nothing is adopted while the follower is running, and no submit overwrote another's
+    assert leader._adopt() == 0
+    assert len(SharedState(db, "", owner="c").records("ingest-queue")) == 3
+
+    follower.stop()
+    assert leader._adopt() == 2
+    assert sorted(i["magnet_link"] for i in leader.state("u")["items"]) == ["m1", "m2", "m3"]
@@ -0,0 +1,55 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from main import create_app
+from utils.metrics import Histogram, REQUEST_LATENCY, UPSTREAM_LATENCY
+from utils.seedr_client import InstrumentedSeedr
+
+
+class FakeSeedr:
+    token = "t"
+
+    def list_contents(self, folder_id="0"):
+        return folder_id
+
+    def fetch_file(self, file_id):
+        raise RuntimeError("boom")
+
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = Histogram("demo_seconds", "Demo.", ("route",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(value, "/a")
+    lines = histogram.render()
+    assert 'demo_seconds_bucket{route="/a",le="0.1"} 2' in lines
+    assert 'demo_seconds_bucket{route="/a",le="1"} 3' in lines
+    assert 'demo_seconds_bucket{route="/a",le="+Inf"} 4' in lines
+    assert 'demo_seconds_count{route="/a"} 4' in lines
+    assert 'demo_seconds_sum{route="/a"} 3.65' in lines
+
+
+def test_instrumented_client_times_calls_and_passes_attributes_through():
+    client = InstrumentedSeedr(FakeSeedr())
+    before_ok = UPSTREAM_LATENCY.count("list_contents", "ok")
+    before_error = UPSTREAM_LATENCY.count("fetch_file", "error")
+
+    assert client.list_contents("5") == "5"
+    with pytest.raises(RuntimeError):
+        client.fetch_file("1")
+    assert client.token == "t"
+
+    assert UPSTREAM_LATENCY.count("list_contents", "ok") == before_ok + 1
+    assert UPSTREAM_LATENCY.count("fetch_file", "error") == before_error + 1
+
+
+def test_requests_are_recorded_by_route_template():
+    api = TestClient(create_app())
+    before = REQUEST_LATENCY.count("GET", "/files/archive/{archive_id}/status", "401")
+    api.get("/api/v1/files/archive/1/status")
+    api.get("/api/v1/files/archive/2/status")
+    assert REQUEST_LATENCY.count("GET", "/files/archive/{archive_id}/status", "401") == before + 2
+
+    body = api.get("/metrics").text
+    assert 'seedr_api_request_duration_seconds_bucket{method="GET",route="/files/archive/{archive_id}/status"' in body
+    assert 'seedr_threadpool_max_workers{pool="endpoints"}' in body
+    assert "# TYPE seedr_cache_requests_total counter" in body
@@ -1,6 +0,0 @@
-def test_ci_placeholder():
-    """
-    Placeholder test to ensure CI workflow passes when no other tests exist.
-    Delete this file once real tests are added.
-    """
-    assert True
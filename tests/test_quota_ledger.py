@@ -0,0 +1,71 @@
+from types import SimpleNamespace
+
+from utils import quota_ledger as ledger_module
+from utils.quota_ledger import QuotaLedger
+
+
+class CountingClient:
+    def __init__(self, space_used=0, space_max=100):
+        self.calls = 0
+        self.space_used = space_used
+        self.space_max = space_max
+
+    def get_memory_bandwidth(self):
+        self.calls += 1
+        return SimpleNamespace(space_used=self.space_used, space_max=self.space_max)
+
+
+def test_reservations_prevent_overcommit():
+    ledger = QuotaLedger()
+    client = CountingClient(space_used=40, space_max=100)
+
+    available, used, space_max, reserved = ledger.snapshot("u", client)
+    assert (available, used, space_max, reserved) == (60, 40, 100, 0)
+
+    admitted = [ledger.admit("u", 25)[0] for _ in range(4)]
+    assert admitted == [True, True, False, False]
+    assert ledger.snapshot("u", client)[0] == 10
+    assert client.calls == 1
+
+
+def test_reconcile_releases_finished_torrents(monkeypatch):
+    monkeypatch.setattr(ledger_module, "RECONCILE_GRACE_SECONDS", 0)
+    ledger = QuotaLedger()
+    ledger.record_reading("u", 0, 100)
+    _, reservation, _, _ = ledger.admit("u", 60)
+    ledger.bind("u", reservation.id, torrent_id=7, torrent_hash="ABC")
+
+    ledger.reconcile("u", [SimpleNamespace(id=7, hash="abc")])
+    assert ledger.status("u")["reserved"] == 60
+
+    ledger.reconcile("u", [])
+    assert ledger.status("u")["reserved"] == 0
+
+
+def test_failed_add_releases_reservation():
+    ledger = QuotaLedger()
+    ledger.record_reading("u", 0, 100)
+    _, reservation, _, _ = ledger.admit("u", 80)
+    assert not ledger.admit("u", 30)[0]
+    ledger.release("u", reservation.id)
+    ledger.record_reading("u", 0, 100)
+    assert ledger.admit("u", 30)[0]
+
+
+def test_readings_taken_after_the_add_release_its_reservation():
+    ledger = QuotaLedger()
+    client = CountingClient(space_used=0, space_max=100)
+    ledger.record_reading("u", 0, 100)
+    _, reservation, _, _ = ledger.admit("u", 60)
+
+    # A reading requested before the add succeeded does not include it yet
+    ledger.record_reading("u", 0, 100, taken_at=reservation.created_at - 1)
+    ledger.bind("u", reservation.id, torrent_id=7)
+    ledger.record_reading("u", 0, 100, taken_at=reservation.created_at)
+    assert ledger.status("u")["reserved"] == 60
+
+    # Seedr now counts the torrent, so the space must not be counted twice
+    client.space_used = 60
+    assert ledger.refresh("u", client)
+    assert ledger.status("u")["reserved"] == 0
+    assert ledger.admit("u", 40)[0]
@@ -0,0 +1,123 @@
+from datetime import datetime
+from types import SimpleNamespace
+
+from fastapi.testclient import TestClient
+
+from main import create_app
+from utils.dependencies import get_seedr_client, get_user_id
+from utils.reclaimer import StorageReclaimer
+from utils.shared_state import SharedState
+
+
+def folder(folder_id, name, size, day):
+    return SimpleNamespace(id=folder_id, name=name, size=size, last_update=datetime(2024, 1, day))
+
+
+class FakeClient:
+    def __init__(self):
+        self.deleted = []
+        self.root = SimpleNamespace(
+            folders=[folder(1, "old", 10, 1), folder(2, "big", 80, 5), folder(3, "new", 30, 9)],
+            files=[]
+        )
+
+    def list_contents(self, folder_id="0"):
+        if folder_id == "0":
+            return self.root
+        return SimpleNamespace(folders=[], files=[SimpleNamespace(folder_file_id=99)])
+
+    def delete_folder(self, folder_id):
+        self.deleted.append(folder_id)
+
+
+def make_reclaimer(tmp_path):
+    return StorageReclaimer(SharedState(str(tmp_path / "state.db"), ""))
+
+
+def test_policies_order_candidates(tmp_path):
+    reclaimer = make_reclaimer(tmp_path)
+    client = FakeClient()
+
+    assert [f["name"] for f in reclaimer.plan("u", client, 35, "age")["folders"]] == ["old", "big"]
+    assert [f["name"] for f in reclaimer.plan("u", client, 35, "size")["folders"]] == ["big"]
+
+    # Fetching a file inside "old" makes it the most recently used folder
+    reclaimer.record_listing("u", "1", client.list_contents("1"))
+    reclaimer.record_file_access("u", 99)
+    assert [f["name"] for f in reclaimer.plan("u", client, 35, "lru")["folders"]] == ["big"]
+    assert [f["name"] for f in reclaimer.plan("u", client, 115, "lru")["folders"]] == ["big", "new", "old"]
+
+
+def test_pins_and_dry_run(tmp_path):
+    reclaimer = make_reclaimer(tmp_path)
+    client = FakeClient()
+    reclaimer.pin("u", "2")
+    assert make_reclaimer(tmp_path).pins("u") == ["2"]  # Another worker sees the pin
+
+    plan = reclaimer.plan("u", client, 100, "size")
+    assert [f["name"] for f in plan["folders"]] == ["new", "old"]
+    assert not plan["sufficient"]
+    assert client.deleted == []
+
+    outcome = reclaimer.execute("u", client, reclaimer.plan("u", client, 20, "size"))
+    assert client.deleted == ["3"]
+    assert outcome["bytes_freed"] == 30
+
+
+def test_records_of_deleted_folders_and_files_are_dropped(tmp_path):
+    reclaimer = make_reclaimer(tmp_path)
+    client = FakeClient()
+    reclaimer.record_listing("u", "0", client.root)
+    reclaimer.record_listing("u", "1", client.list_contents("1"))
+    reclaimer.record_file_access("u", 99)
+    assert list(reclaimer.shared_state.records("reclaim-files")) == ["u|99"]
+
+    # The file was deleted from folder 1
+    reclaimer.record_listing("u", "1", SimpleNamespace(folders=[], files=[]))
+    assert reclaimer.shared_state.records("reclaim-files") == {}
+
+    # Folder 1 was deleted from the root
+    reclaimer.record_listing("u", "1", client.list_contents("1"))
+    reclaimer.flush()
+    client.root.folders.pop(0)
+    reclaimer.record_listing("u", "0", client.root)
+    assert "u|1" not in reclaimer.shared_state.records("reclaim-folders")
+    assert reclaimer.shared_state.records("reclaim-files") == {}
+    assert reclaimer.shared_state.records("reclaim-access") == {}
+
+
+def test_unchanged_listings_are_not_rewritten(tmp_path, monkeypatch):
+    reclaimer = make_reclaimer(tmp_path)
+    client = FakeClient()
+    writes = []
+    record_put = reclaimer.shared_state.record_put
+    monkeypatch.setattr(reclaimer.shared_state, "record_put", lambda ns, values: writes.append(ns) or record_put(ns, values))
+
+    reclaimer.record_listing("u", "1", client.list_contents("1"))
+    assert writes
+    writes.clear()
+    reclaimer.record_listing("u", "1", client.list_contents("1"))
+    assert writes == []
+
+    reclaimer.record_listing("u", "1", SimpleNamespace(folders=[], files=[]))
+    assert writes
+
+
+def test_unknown_reclaim_policy_is_rejected_before_the_add():
+    calls = []
+
+    class Untouchable:
+        def __getattr__(self, name):
+            calls.append(name)
+            raise AssertionError(f"{name} must not be called")
+
+    app = create_app()
+    app.dependency_overrides[get_seedr_client] = lambda: Untouchable()
+    app.dependency_overrides[get_user_id] = lambda: "policy-user"
+    api = TestClient(app)
+    for path in ("/api/v1/torrents/smartAdd", "/api/v1/torrents/addAndDownload"):
+        response = api.post(path, json={"magnet_link": "magnet:?xt=urn:btih:" + "ab" * 20,
+                                        "reclaim_space": True, "reclaim_policy": "biggest"})
+        assert response.status_code == 400
+        assert "biggest" in response.json()["detail"]
+    assert calls == []
@@ -0,0 +1,130 @@
+import pytest
+from fastapi.testclient import TestClient
+from seedrcc.exceptions import APIError, NetworkError
+
+from config import settings
+from main import create_app
+from utils.dependencies import get_seedr_client, get_user_id
+from utils.resilience import CircuitOpenError, _idempotency_key, breakers
+from utils.seedr_client import InstrumentedSeedr
+
+
+class FlakySeedr:
+    def __init__(self, failures=0, error=NetworkError):
+        self.failures = failures
+        self.error = error
+        self.calls = 0
+
+    def _attempt(self, result):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise self.error("connection reset")
+        return result
+
+    def list_contents(self, folder_id="0"):
+        return self._attempt({"folders": [], "files": [], "torrents": []})
+
+    def add_folder(self, name):
+        return self._attempt({"result": True})
+
+
+@pytest.fixture(autouse=True)
+def fast_retries(monkeypatch):
+    monkeypatch.setattr(settings, "SEEDR_BACKOFF", 0.0)
+    monkeypatch.setattr(settings, "SEEDR_MAX_RETRIES", 2)
+    monkeypatch.setattr(settings, "SEEDR_BREAKER_THRESHOLD", 3)
+    monkeypatch.setattr(settings, "SEEDR_BREAKER_COOLDOWN", 30.0)
+    breakers.reset()
+    yield
+    breakers.reset()
+
+
+def test_reads_are_retried_and_writes_only_with_an_idempotency_key():
+    upstream = FlakySeedr(failures=2)
+    assert InstrumentedSeedr(upstream, "reader").list_contents("0")["folders"] == []
+    assert upstream.calls == 3
+
+    upstream = FlakySeedr(failures=1)
+    with pytest.raises(NetworkError):
+        InstrumentedSeedr(upstream, "writer").add_folder("a")
+    assert upstream.calls == 1
+
+    token = _idempotency_key.set("key-1")
+    try:
+        assert InstrumentedSeedr(upstream, "writer").add_folder("a") == {"result": True}
+    finally:
+        _idempotency_key.reset(token)
+    assert upstream.calls == 2
+
+
+def test_no_retry_starts_without_time_for_a_full_attempt(monkeypatch):
+    monkeypatch.setattr(settings, "SEEDR_TIMEOUT", 30.0)
+    monkeypatch.setattr(settings, "SEEDR_CALL_DEADLINE", 45.0)
+    upstream = FlakySeedr(failures=2)
+    assert InstrumentedSeedr(upstream, "reader").list_contents("0")["folders"] == []
+    assert upstream.calls == 3
+
+    # With less than SEEDR_TIMEOUT of the budget left, the failure is final
+    monkeypatch.setattr(settings, "SEEDR_CALL_DEADLINE", 29.0)
+    upstream = FlakySeedr(failures=1)
+    with pytest.raises(NetworkError):
+        InstrumentedSeedr(upstream, "reader").list_contents("0")
+    assert upstream.calls == 1
+
+
+def test_api_errors_are_not_retried_and_do_not_trip_the_breaker():
+    upstream = FlakySeedr(failures=10, error=APIError)
+    client = InstrumentedSeedr(upstream, "api-errors")
+    for _ in range(4):
+        with pytest.raises(APIError):
+            client.list_contents("0")
+    assert upstream.calls == 4
+
+
+def test_open_breaker_fails_fast_with_503_and_retry_after(monkeypatch):
+    upstream = FlakySeedr(failures=100)
+    app = create_app()
+    app.dependency_overrides[get_seedr_client] = lambda: InstrumentedSeedr(upstream, "brownout")
+    app.dependency_overrides[get_user_id] = lambda: "brownout"
+    api = TestClient(app)
+
+    first = api.get("/api/v1/files/list")
+    assert first.status_code == 502
+    assert upstream.calls == 3
+
+    rejected = api.get("/api/v1/files/list")
+    assert rejected.status_code == 503
+    assert 1 <= int(rejected.headers["Retry-After"]) <= 30
+    assert upstream.calls == 3
+
+    # After the cooldown one trial call goes through; its success closes the breaker
+    monkeypatch.setattr(settings, "SEEDR_BREAKER_COOLDOWN", 0.0)
+    for breaker in breakers.breakers.values():
+        breaker.cooldown = 0.0
+    upstream.failures = 0
+    assert api.get("/api/v1/files/list").status_code == 200
+    assert all(b.state == "closed" for b in breakers.breakers.values())
+
+
+def test_host_breaker_covers_every_user():
+    for user in ("a", "b", "c"):
+        with pytest.raises(NetworkError):
+            InstrumentedSeedr(FlakySeedr(failures=1), user).add_folder("x")
+    with pytest.raises(CircuitOpenError) as excinfo:
+        InstrumentedSeedr(FlakySeedr(), "d").list_contents("0")
+    assert excinfo.value.scope == "host"
+
+
+def test_routes_calling_seedr_do_not_block_the_event_loop():
+    # Retries sleep, so a route that gets a Seedr client must run in the thread pool
+    import inspect
+    from fastapi.routing import APIRoute
+
+    def depends_on_client(dependant):
+        return any(d.call is get_seedr_client or depends_on_client(d) for d in dependant.dependencies)
+
+    app = create_app()
+    routes = [route for r in app.routes for route in getattr(getattr(r, "original_router", None), "routes", [r])]
+    client_routes = [r for r in routes if isinstance(r, APIRoute) and depends_on_client(r.dependant)]
+    assert client_routes
+    assert [r.path for r in client_routes if inspect.iscoroutinefunction(r.endpoint)] == []
@@ -0,0 +1,59 @@
+from fastapi.routing import APIRoute
+from fastapi.testclient import TestClient
+from seedrcc.exceptions import SeedrError
+from seedrcc.models import ListContentsResult
+
+from main import create_app
+from utils.dependencies import get_seedr_client, get_user_id
+
+
+class FakeSeedr:
+    def list_contents(self, folder_id="0"):
+        return ListContentsResult.from_dict({
+            "space_used": 1, "space_max": 2,
+            "folders": [{"id": 3, "name": "a", "last_update": "2024-01-01 10:00:00"}],
+            "files": [{"folder_file_id": 7, "name": "x.mkv", "size": 5, "video_progress": 12}],
+            "torrents": []
+        })
+
+    def fetch_file(self, file_id):
+        raise SeedrError("Invalid JSON")
+
+
+def client():
+    app = create_app()
+    app.dependency_overrides[get_seedr_client] = lambda: FakeSeedr()
+    app.dependency_overrides[get_user_id] = lambda: "schemas-user"
+    return app, TestClient(app)
+
+
+def test_every_route_declares_a_response_model():
+    app, _ = client()
+    routes = [r for r in app.router.routes if isinstance(r, APIRoute) and r.include_in_schema]
+    routes += [r for inc in app.router.routes if hasattr(inc, "original_router")
+               for r in inc.original_router.routes if isinstance(r, APIRoute)]
+    assert routes
+    assert [r.path for r in routes if r.response_model is None] == []
+
+
+def test_listing_is_validated_from_seedrcc_objects():
+    _, api = client()
+    data = api.get("/api/v1/files/list").json()
+    assert "_raw" not in data
+    assert data["folders"][0]["id"] == 3
+    assert data["folders"][0]["last_update"] == "2024-01-01T10:00:00"
+    # Numbers Seedr sends for string fields are kept as strings
+    assert data["files"][0]["video_progress"] == "12"
+
+    projected = api.get("/api/v1/files/list", params={"fields": "space_max,files.name"}).json()
+    assert projected == {"space_max": 2, "files": [{"name": "x.mkv"}]}
+
+
+def test_optional_envelope_keys_are_omitted_not_null():
+    _, api = client()
+    response = api.get("/api/v1/files/archive/9/status")
+    assert response.status_code == 202
+    assert set(response.json()) == {"status", "message", "archive_id"}
+
+    schemas = api.get("/openapi.json").json()["components"]["schemas"]
+    assert "FolderContents" in schemas and "AddTorrentResponse" in schemas
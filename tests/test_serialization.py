@@ -0,0 +1,86 @@
+import json
+from datetime import datetime
+
+import pytest
+from fastapi import FastAPI, APIRouter, Response
+from fastapi.testclient import TestClient
+from seedrcc.models import ListContentsResult
+from seedrcc.token import Token
+
+from models.schemas import FolderContents
+from utils.serialization import SerializedRoute, dumps, parse_fields, project
+
+
+def listing():
+    return ListContentsResult.from_dict({
+        "space_used": 1, "space_max": 2,
+        "folders": [{"id": 3, "name": "a", "last_update": "2024-01-01 10:00:00"}],
+        "files": [], "torrents": []
+    })
+
+
+def test_dumps_uses_public_fields_and_iso_datetimes():
+    body = json.loads(dumps({"contents": listing(), "blob": b"\xffok", "when": datetime(2024, 1, 2, 3, 4, 5)}))
+    assert "_raw" not in body["contents"]
+    assert body["contents"]["folders"][0]["last_update"] == "2024-01-01T10:00:00"
+    assert body["blob"] == "�ok"
+    assert body["when"] == "2024-01-02T03:04:05"
+
+
+def test_dumps_honours_to_dict_methods():
+    assert json.loads(dumps(Token(access_token="a"))) == {"access_token": "a"}
+
+
+def test_routes_keep_status_codes_and_headers():
+    router = APIRouter(route_class=SerializedRoute)
+
+    @router.get("/declared", response_model=FolderContents)
+    def declared(response: Response):
+        response.status_code = 202
+        response.headers["X-Extra"] = "1"
+        return listing()
+
+    @router.get("/plain", status_code=201)
+    async def plain() -> dict:
+        return {"ok": True}
+
+    app = FastAPI()
+    app.include_router(router)
+    client = TestClient(app)
+
+    response = client.get("/declared")
+    assert response.status_code == 202
+    assert response.headers["X-Extra"] == "1"
+    assert response.json()["space_used"] == 1 and "_raw" not in response.json()
+
+    response = client.get("/plain")
+    assert response.status_code == 201
+    assert response.json() == {"ok": True}
+
+
+def test_routes_must_declare_a_response_model():
+    router = APIRouter(route_class=SerializedRoute)
+    with pytest.raises(TypeError):
+        @router.get("/undeclared")
+        def undeclared():
+            return {}
+
+
+def test_fields_projection_reads_only_requested_attributes():
+    tree = parse_fields("space_used, folders.id,folders.name,files")
+    assert tree == {"space_used": None, "folders": {"id": None, "name": None}, "files": None}
+    assert parse_fields("folders,folders.id") == {"folders": None}
+    assert parse_fields("") is None
+
+    projected = project(listing(), tree)
+    assert projected == {"space_used": 1, "folders": [{"id": 3, "name": "a"}], "files": []}
+    assert project([{"a": 1, "b": 2}], {"a": None, "missing": None}) == [{"a": 1}]
+
+
+def test_invalid_fields_are_rejected():
+    for spec in ("_raw", "folders..id", "a-b"):
+        try:
+            parse_fields(spec)
+        except ValueError:
+            continue
+        raise AssertionError(spec)
@@ -0,0 +1,102 @@
+import json
+
+import httpx
+from seedrcc.models import ListContentsResult
+
+import utils.seedr_client as seedr_client
+import utils.torrentmeta as torrentmeta_module
+from config import settings
+from utils.shared_state import LeaderLease, SharedState
+from utils.torrentmeta import TorrentMetaClient
+from utils.usage_series import UsageRecorder
+
+
+class ListingSeedr:
+    def __init__(self):
+        self.calls = []
+
+    def list_contents(self, folder_id="0"):
+        self.calls.append(folder_id)
+        return ListContentsResult.from_dict({"space_used": 1, "folders": [{"id": 3, "name": "a"}], "files": []})
+
+    def add_folder(self, name):
+        self.calls.append(name)
+        return {"result": True}
+
+
+def test_tokens_are_shared_and_imported_from_the_legacy_file(tmp_path):
+    legacy = tmp_path / "tokens.json"
+    legacy.write_text(json.dumps({"alice": {"access_token": "a1"}}))
+    db = str(tmp_path / "state.db")
+    worker_a = SharedState(db, str(legacy), owner="a")
+    worker_b = SharedState(db, str(legacy), owner="b")
+
+    assert worker_a.get_token("alice") == {"access_token": "a1"}
+    worker_a.put_token("alice", {"access_token": "a2"})
+    assert worker_b.get_token("alice") == {"access_token": "a2"}
+    worker_b.delete_token("alice")
+    assert worker_a.token_user_ids() == []
+
+
+def test_only_one_worker_holds_a_lease(tmp_path):
+    db = str(tmp_path / "state.db")
+    worker_a, worker_b = SharedState(db, "", owner="a"), SharedState(db, "", owner="b")
+    leader_a, leader_b = LeaderLease("poller", worker_a, ttl=60), LeaderLease("poller", worker_b, ttl=60)
+
+    assert leader_a.is_leader() and leader_a.is_leader()
+    assert not leader_b.is_leader()
+    leader_a.release()
+    assert leader_b.is_leader()
+
+    # An expired lease is taken over
+    assert worker_b.acquire_lease("short", ttl=-1)
+    assert worker_a.acquire_lease("short", ttl=60)
+
+
+def test_listings_are_shared_between_workers_until_a_write(tmp_path, monkeypatch):
+    monkeypatch.setattr(seedr_client, "shared_state", SharedState(str(tmp_path / "state.db"), ""))
+    monkeypatch.setattr(settings, "SEEDR_SHARED_LISTING_TTL", 60.0)
+    upstream_a, upstream_b = ListingSeedr(), ListingSeedr()
+    worker_a = seedr_client.InstrumentedSeedr(upstream_a, "carol")
+    worker_b = seedr_client.InstrumentedSeedr(upstream_b, "carol")
+
+    assert worker_a.list_contents("0").folders[0].name == "a"
+    cached = worker_b.list_contents("0")
+    assert isinstance(cached, ListContentsResult) and cached.folders[0].id == 3
+    assert upstream_b.calls == []
+
+    worker_b.add_folder("new")
+    worker_a.list_contents("0")
+    assert upstream_a.calls == ["0", "0"]
+
+
+def test_metadata_lookups_are_shared(tmp_path, monkeypatch):
+    monkeypatch.setattr(torrentmeta_module, "shared_state", SharedState(str(tmp_path / "state.db"), ""))
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(200, json={"data": {"files": [{"size": 42}]}})
+
+    for _ in range(2):
+        meta = TorrentMetaClient("http://meta.local", transport=httpx.MockTransport(handler), shared_cache=True)
+        assert meta.torrent_size("magnet:?xt=urn:btih:abc") == 42
+    assert len(calls) == 1
+
+
+def test_usage_followers_read_the_leaders_samples(tmp_path):
+    path = str(tmp_path / "usage.jsonl")
+    leader = UsageRecorder(path=path, capacity=5)
+    follower = UsageRecorder(path=path, capacity=5)
+    values = {"space_used": 10, "space_max": 100, "bandwidth_used": 0, "torrents": 1}
+
+    leader.record("dave", values, timestamp=1000.0)
+    leader.record("dave", {**values, "space_used": 20}, timestamp=1001.0)
+    result = follower.query("dave")
+    assert result["samples"] == 2 and result["latest"]["space_used"] == 20
+
+    # After the leader compacts the log the follower reloads it
+    for t in range(12):
+        leader.record("dave", {**values, "space_used": 30 + t}, timestamp=1002.0 + t)
+    assert follower.query("dave")["latest"]["space_used"] == 41
+    assert follower.query("dave")["samples"] == leader.query("dave")["samples"]
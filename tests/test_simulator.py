@@ -0,0 +1,115 @@
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+from seedrcc import Seedr
+
+import utils.seedr_client as seedr_client
+import utils.shared_state as shared_state_module
+from config import settings
+from main import create_app
+from simulator import SimulatorConfig, SimulatorServer
+from utils.resilience import breakers
+from utils.seedr_client import client_manager, configure_endpoints
+from utils.shared_state import SharedState
+from utils.torrentmeta import TorrentMetaClient
+
+MAGNET = "magnet:?xt=urn:btih:" + "c" * 40 + "&dn=Simulated+Release"
+
+
+@pytest.fixture
+def simulate(tmp_path, monkeypatch):
+    """Start a simulator with the given config and point seedrcc at it"""
+    state = SharedState(str(tmp_path / "state.db"), "", owner="test")
+    monkeypatch.setattr(seedr_client, "shared_state", state)
+    monkeypatch.setattr(shared_state_module, "shared_state", state)
+    servers, users = [], []
+
+    def start(**config):
+        server = SimulatorServer(SimulatorConfig(**config)).start()
+        servers.append(server)
+        configure_endpoints(server.url)
+        return server, users
+
+    yield start
+    for user_id in users:
+        client_manager.remove_client(user_id)
+    configure_endpoints(None)
+    breakers.reset()
+    for server in servers:
+        server.stop()
+
+
+def login(users, username="sim@example.com"):
+    client_manager.create_client_from_password(username, "simulator")
+    users.append(username)
+    return username
+
+
+def test_generated_tree_fetch_and_usage(simulate):
+    sim, users = simulate(tree_folders=3, tree_depth=1, tree_fanout=2, tree_files=4)
+    user = login(users)
+    api = TestClient(create_app())
+
+    root = api.get("/api/v1/files/list", params={"user_id": user}).json()
+    assert len(root["folders"]) == 3
+    child = api.get("/api/v1/files/list", params={"user_id": user, "folder_id": root["folders"][0]["id"]}).json()
+    assert len(child["folders"]) == 2 and len(child["files"]) == 4
+
+    file = child["files"][0]
+    fetched = api.get(f"/api/v1/files/fetch/{file['folder_file_id']}", params={"user_id": user}).json()
+    assert fetched["name"] == file["name"] and fetched["url"].startswith(sim.url)
+
+    usage = api.get("/api/v1/account/memory-bandwidth", params={"user_id": user}).json()
+    assert usage["bandwidth_used"] == file["size"]
+    assert usage["space_used"] == root["space_used"] > 0
+
+
+def test_torrent_completes_into_a_folder(simulate):
+    sim, users = simulate(torrent_duration="fixed:0.3", tree_folders=0)
+    user = login(users)
+    client = client_manager.get_client(user)
+
+    added = client.add_torrent(magnet_link=MAGNET)
+    assert added.title == "Simulated Release"
+    torrent = client.list_contents().torrents[0]
+    assert float(torrent.progress) < 100
+    assert client.get_torrent_progress(torrent.progress_url).title == "Simulated Release"
+
+    time.sleep(0.35)
+    listing = client.list_contents()
+    assert listing.torrents == [] and [f.name for f in listing.folders] == ["Simulated Release"]
+
+    # The TorrentMeta stand-in describes the same files
+    expected = TorrentMetaClient(base_url=f"{sim.url}/torrentmeta").torrent_size(MAGNET)
+    assert listing.folders[0].size == expected
+
+
+def test_expired_access_token_is_refreshed(simulate):
+    sim, users = simulate(token_ttl=0.2)
+    user = login(users)
+    time.sleep(0.25)
+
+    assert client_manager.get_client(user).get_settings().account.email == user
+    assert sim.state.calls["token"] == 2
+
+
+def test_device_code_flow(simulate):
+    sim, users = simulate()
+    code = Seedr.get_device_code()
+    client_manager.create_client_from_device_code(code.device_code, "device-user")
+    users.append("device-user")
+
+    devices = client_manager.get_client("device-user").get_devices()
+    assert [d.device_code for d in devices] == [code.device_code]
+
+
+def test_injected_errors_surface_as_upstream_failures(simulate, monkeypatch):
+    monkeypatch.setattr(settings, "SEEDR_MAX_RETRIES", 0)
+    sim, users = simulate()
+    user = login(users)
+    sim.app.state.simulator.config.error_rate = 1.0
+
+    response = TestClient(create_app()).get("/api/v1/files/list", params={"user_id": user})
+    assert response.status_code == 502
+    assert sim.state.injected_errors == 1
@@ -0,0 +1,51 @@
+import time
+from types import SimpleNamespace
+
+from config import settings
+from utils import space_check
+
+
+class SlowQuotaClient:
+    def __init__(self, delay, space_used=40, space_max=100):
+        self.delay = delay
+        self.space_used = space_used
+        self.space_max = space_max
+
+    def get_memory_bandwidth(self):
+        time.sleep(self.delay)
+        return SimpleNamespace(space_used=self.space_used, space_max=self.space_max)
+
+
+def test_stages_run_concurrently(monkeypatch):
+    def slow_size(magnet_link, timeout=None):
+        time.sleep(0.2)
+        return 50
+
+    monkeypatch.setattr(space_check, "get_torrent_size", slow_size)
+    start = time.monotonic()
+    check = space_check.check_space(SlowQuotaClient(0.2), "magnet:?xt=urn:btih:abc", "concurrent")
+    elapsed = time.monotonic() - start
+
+    assert elapsed < 0.35
+    assert check.torrent_size == 50
+    assert check.available_space == 60
+    assert check.sufficient
+
+
+def test_metadata_deadline_falls_back(monkeypatch):
+    def hung_size(magnet_link, timeout=None):
+        time.sleep(0.5)
+        return 10 ** 12
+
+    monkeypatch.setattr(space_check, "get_torrent_size", hung_size)
+    monkeypatch.setattr(settings, "SPACE_CHECK_METADATA_TIMEOUT", 0.05)
+
+    monkeypatch.setattr(settings, "SPACE_CHECK_FALLBACK", "add")
+    check = space_check.check_space(SlowQuotaClient(0), "magnet:?xt=urn:btih:abc", "fallback")
+    assert check.metadata_timed_out
+    assert check.sufficient
+    assert not check.rejected_by_policy
+
+    monkeypatch.setattr(settings, "SPACE_CHECK_FALLBACK", "reject")
+    check = space_check.check_space(SlowQuotaClient(0), "magnet:?xt=urn:btih:abc", "fallback")
+    assert check.rejected_by_policy
@@ -0,0 +1,48 @@
+import json
+import os
+import subprocess
+import sys
+
+from fastapi.testclient import TestClient
+
+import main
+from config import settings
+from utils.startup import DEFAULT_BUDGET_MS, by_package, profile_import, time_import
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_cold_import_is_within_budget():
+    budget = float(os.environ.get("STARTUP_BUDGET_MS", DEFAULT_BUDGET_MS))
+    elapsed = time_import("main", runs=3, cwd=ROOT)
+    assert elapsed <= budget, f"importing main took {elapsed:.0f} ms (budget {budget:.0f} ms); see python -m utils.startup"
+
+
+def test_disabled_routers_and_the_server_are_not_imported():
+    code = (
+        "import json, sys, main; "
+        "print(json.dumps({'modules': sorted(m for m in sys.modules if m.startswith(('routers', 'uvicorn'))), "
+        "'paths': sorted(main.app.openapi()['paths'])}))"
+    )
+    env = {**os.environ, "DISABLED_ROUTERS": "vlc, metadata"}
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, env=env, cwd=ROOT)
+    loaded = json.loads(result.stdout.strip().splitlines()[-1])
+
+    assert "routers.vlc" not in loaded["modules"] and "routers.metadata" not in loaded["modules"]
+    assert not any(module.startswith("uvicorn") for module in loaded["modules"])
+    assert "/api/v1/torrents/list" in loaded["paths"]
+    assert "/api/v1/torrents/metadata" not in loaded["paths"]
+
+
+def test_index_lists_only_enabled_routers(monkeypatch):
+    monkeypatch.setattr(settings, "DISABLED_ROUTERS", "vlc")
+    api = TestClient(main.create_app())
+
+    assert "vlc" not in api.get("/").json()["endpoints"]
+    assert api.get("/api/v1/vlc/config").status_code == 404
+
+
+def test_import_profile_breakdown():
+    records = profile_import("json", cwd=ROOT)
+    assert "json.decoder" in [record.module for record in records]
+    assert next(iter(by_package(records))) in {record.module.split(".")[0] for record in records}
@@ -0,0 +1,86 @@
+from types import SimpleNamespace
+
+from utils.shared_state import SharedState
+from utils.torrent_index import TorrentIndex, infohash_from_magnet, normalize_title
+
+
+def listing(torrents=(), folders=()):
+    return SimpleNamespace(torrents=list(torrents), folders=list(folders), files=[])
+
+
+def test_normalize_title_matches_seedr_rewrites():
+    assert normalize_title("Tom & Jerry: The Movie?") == normalize_title("Tom _ Jerry  The Movie")
+    assert normalize_title("Café [1080p]") == normalize_title("café 1080p")
+
+
+def test_completion_follows_torrent_into_folder():
+    index = TorrentIndex()
+    index.register_add("u", "ABCDEF", torrent_id=5, title="Tom & Jerry: The Movie?")
+
+    torrent = SimpleNamespace(id=5, hash="abcdef", name="Tom & Jerry: The Movie?", progress="42.5")
+    index.observe_listing("u", "0", listing(torrents=[torrent]))
+    entry = index.lookup("u", "abcdef")
+    assert entry["status"] == "downloading"
+    assert entry["progress"] == 42.5
+
+    folder = SimpleNamespace(id=77, name="Tom _ Jerry  The Movie", size=100)
+    index.observe_listing("u", "0", listing(folders=[folder]))
+    entry = index.lookup("u", "ABCDEF")
+    assert entry["status"] == "completed"
+    assert entry["folder_id"] == "77"
+    assert index.lookup_title("u", "tom & jerry the movie")["hash"] == "abcdef"
+
+    index.forget_folder("u", 77)
+    assert index.lookup("u", "abcdef") is None
+
+
+def test_infohash_from_magnet():
+    hex_hash = "c12fe1c06bba254a9dc9f519b335aa7c1367a88a"
+    assert infohash_from_magnet(f"magnet:?xt=urn:btih:{hex_hash.upper()}&dn=x") == hex_hash
+    assert infohash_from_magnet("magnet:?xt=urn:btih:YEX6DQDLXISUVHOJ6UM3GNNKPQJWPKEK") == hex_hash
+    assert infohash_from_magnet("https://example.com/file.torrent") is None
+
+
+def test_claim_detects_duplicates():
+    index = TorrentIndex()
+    assert index.claim("u", "abc") is None
+    assert index.claim("u", "ABC")["status"] == "in_flight"
+
+    index.register_add("u", "abc", torrent_id=1, title="Movie")
+    index.release_claim("u", "abc")
+    assert index.claim("u", "abc")["torrent_id"] == "1"
+
+    index.forget_torrent("u", 1)
+    assert index.claim("u", "abc") is None
+
+
+
+def test_base32_hashes_match_their_hex_form():
+    index = TorrentIndex()
+    index.register_add("u", "C12FE1C06BBA254A9DC9F519B335AA7C1367A88A", torrent_id=3, title="Movie")
+    assert index.lookup("u", "YEX6DQDLXISUVHOJ6UM3GNNKPQJWPKEK")["torrent_id"] == "3"
+    assert index.claim("u", "yex6dqdlxisuvhoj6um3gnnkpqjwpkek")["torrent_id"] == "3"
+
+
+def test_in_flight_claims_are_seen_by_other_workers(tmp_path):
+    path = str(tmp_path / "state.db")
+    worker_a = TorrentIndex(SharedState(path, "", owner="worker-a"))
+    worker_b = TorrentIndex(SharedState(path, "", owner="worker-b"))
+
+    assert worker_a.claim("u", "abc") is None
+    assert worker_b.claim("u", "abc")["status"] == "in_flight"
+    worker_a.release_claim("u", "abc")
+    assert worker_b.claim("u", "abc") is None
+
+def test_subfolder_listings_do_not_demote_or_complete_torrents():
+    index = TorrentIndex()
+    index.register_add("u", "abc", torrent_id=1, title="Some Show")
+    index.observe_listing("u", "0", listing(torrents=[SimpleNamespace(id=1, hash="abc", name="Some Show", progress="10")]))
+
+    # A subfolder listing has no active torrents, and a same-named folder elsewhere is not the download
+    index.observe_listing("u", "42", listing(folders=[SimpleNamespace(id=43, name="Some Show", size=1)]))
+    assert index.lookup("u", "abc")["status"] == "downloading"
+    assert index.find_folder("u", "Some Show") is None
+
+    index.observe_listing("u", "0", listing(folders=[SimpleNamespace(id=44, name="Some Show", size=1)]))
+    assert index.lookup("u", "abc")["folder_id"] == "44"
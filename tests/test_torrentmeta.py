@@ -0,0 +1,102 @@
+import asyncio
+import threading
+import time
+
+import httpx
+
+from config import settings
+from utils import torrentmeta as torrentmeta_module
+from utils.torrentmeta import TorrentMetaClient
+
+
+def flaky_handler(failures):
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        if len(calls) <= failures:
+            return httpx.Response(503)
+        return httpx.Response(200, json={"data": {"files": [{"size": 10}, {"size": 32}]}})
+
+    return handler, calls
+
+
+def test_retries_server_errors_and_reuses_client(monkeypatch):
+    monkeypatch.setattr(settings, "TORRENTMETA_BACKOFF", 0)
+    handler, calls = flaky_handler(failures=2)
+    meta = TorrentMetaClient(base_url="http://meta.local", transport=httpx.MockTransport(handler))
+
+    assert meta.torrent_size("magnet:?xt=urn:btih:abc") == 42
+    assert meta.torrent_size("magnet:?xt=urn:btih:abc") == 42
+    assert len(calls) == 4
+    assert str(calls[0].url) == "http://meta.local"
+
+
+def test_gives_up_after_max_retries(monkeypatch):
+    monkeypatch.setattr(settings, "TORRENTMETA_BACKOFF", 0)
+    monkeypatch.setattr(settings, "TORRENTMETA_MAX_RETRIES", 1)
+    handler, calls = flaky_handler(failures=5)
+    meta = TorrentMetaClient(base_url="http://meta.local", transport=httpx.MockTransport(handler))
+
+    assert meta.torrent_size("magnet:?xt=urn:btih:abc") == 0
+    assert len(calls) == 2
+
+
+
+def test_no_retry_starts_past_the_deadline(monkeypatch):
+    monkeypatch.setattr(settings, "TORRENTMETA_BACKOFF", 1.0)
+    monkeypatch.setattr(settings, "TORRENTMETA_MAX_RETRIES", 3)
+    handler, calls = flaky_handler(failures=5)
+    meta = TorrentMetaClient(base_url="http://meta.local", transport=httpx.MockTransport(handler))
+
+    start = time.monotonic()
+    assert meta.torrent_size("magnet:?xt=urn:btih:abc", deadline=start + 0.5) == 0
+    assert len(calls) == 1
+    assert time.monotonic() - start < 0.5
+
+def test_async_query(monkeypatch):
+    monkeypatch.setattr(settings, "TORRENTMETA_BACKOFF", 0)
+    handler, calls = flaky_handler(failures=1)
+    meta = TorrentMetaClient(base_url="http://meta.local", async_transport=httpx.MockTransport(handler))
+
+    async def run():
+        try:
+            return await meta.aquery("abc")
+        finally:
+            await meta.aclose()
+
+    assert asyncio.run(run())["data"]["files"][1]["size"] == 32
+    assert len(calls) == 2
+
+
+class ThreadRecordingCache:
+    def __init__(self):
+        self.values = {}
+        self.threads = set()
+
+    def cache_get(self, namespace, key):
+        self.threads.add(threading.get_ident())
+        return self.values.get(key)
+
+    def cache_put(self, namespace, key, value, ttl):
+        self.threads.add(threading.get_ident())
+        self.values[key] = value
+
+
+def test_async_query_keeps_the_shared_cache_off_the_event_loop(monkeypatch):
+    cache = ThreadRecordingCache()
+    monkeypatch.setattr(torrentmeta_module, "shared_state", cache)
+    handler, calls = flaky_handler(failures=0)
+    meta = TorrentMetaClient(
+        base_url="http://meta.local", async_transport=httpx.MockTransport(handler), shared_cache=True
+    )
+
+    async def run():
+        try:
+            return [await meta.aquery("abc") for _ in range(2)], threading.get_ident()
+        finally:
+            await meta.aclose()
+
+    results, loop_thread = asyncio.run(run())
+    assert results[0] == results[1] and len(calls) == 1
+    assert cache.threads and loop_thread not in cache.threads
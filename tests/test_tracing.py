@@ -0,0 +1,95 @@
+import contextvars
+import threading
+import time
+
+from fastapi.testclient import TestClient
+
+from config import settings
+from main import create_app
+from utils.dependencies import get_seedr_client, get_user_id
+from utils.profiling import SamplingProfiler, _profiler, profiled_thread
+from utils.seedr_client import InstrumentedSeedr
+from utils.tracing import KIND_CLIENT, KIND_SERVER, collect, parse_traceparent, start_span
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+PARENT_ID = "00f067aa0ba902b7"
+
+
+class FakeSeedr:
+    def list_contents(self, folder_id="0"):
+        return {"folders": [], "files": [], "torrents": []}
+
+
+def test_traceparent_parsing():
+    assert parse_traceparent(f"00-{TRACE_ID}-{PARENT_ID}-01") == (TRACE_ID, PARENT_ID)
+    assert parse_traceparent("00-abc-def-01") == (None, None)
+    assert parse_traceparent(f"00-{'0' * 32}-{PARENT_ID}-01") == (None, None)
+    assert parse_traceparent(None) == (None, None)
+
+
+def test_upstream_calls_become_child_spans():
+    with start_span("outside") as span:
+        assert span is None
+
+    client = InstrumentedSeedr(FakeSeedr(), "alice")
+    with collect() as spans:
+        with start_span("GET /files/list", KIND_SERVER, traceparent=f"00-{TRACE_ID}-{PARENT_ID}-01") as server:
+            client.list_contents("0")
+
+    upstream, request = spans
+    assert request is server and request.parent_id == PARENT_ID
+    assert upstream.name == "seedr.list_contents" and upstream.kind == KIND_CLIENT
+    assert upstream.trace_id == TRACE_ID and upstream.parent_id == request.span_id
+    assert upstream.attributes["enduser.id"] == "alice"
+
+
+def test_profile_request_returns_stacks_and_spans(monkeypatch):
+    monkeypatch.setattr(settings, "PROFILE_TOKEN", "secret")
+    app = create_app()
+    app.dependency_overrides[get_seedr_client] = lambda: InstrumentedSeedr(FakeSeedr())
+    app.dependency_overrides[get_user_id] = lambda: "tracing-user"
+    api = TestClient(app)
+
+    plain = api.get("/api/v1/files/list", params={"profile": "1"}, headers={"X-Profile-Token": "wrong"})
+    assert "folders" in plain.json()
+
+    profile = api.get("/api/v1/files/list", params={"profile": "1"}, headers={"X-Profile-Token": "secret"}).json()
+    assert profile["status"] == 200 and profile["response_bytes"] > 0
+    assert isinstance(profile["folded"], list)
+    names = [span["name"] for span in profile["spans"]]
+    assert "seedr.list_contents" in names and "GET /files/list" in names
+
+
+def _spin(stop):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def _request_work(stop):
+    with profiled_thread():
+        _spin(stop)
+
+
+def test_profiles_only_sample_the_request_threads():
+    profiler = SamplingProfiler(0.001)
+    stop = threading.Event()
+    unrelated = threading.Thread(target=_spin, args=(stop,), name="unrelated")
+    unrelated.start()
+
+    token = _profiler.set(profiler)
+    try:
+        # Threads started from the request's context see its profiler, like thread pool workers do
+        worker = threading.Thread(target=contextvars.copy_context().run, args=(_request_work, stop), name="worker")
+    finally:
+        _profiler.reset(token)
+    worker.start()
+    profiler.start()
+    time.sleep(0.05)
+    profiler.stop()
+    stop.set()
+    worker.join()
+    unrelated.join()
+
+    stacks = profiler.folded()
+    assert stacks and all(stack.startswith("worker;") for stack in stacks)
+    assert not profiler.threads
@@ -0,0 +1,132 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import routers.files as files_router
+import utils.seedr_client as seedr_client
+import utils.shared_state as shared_state_module
+from config import settings
+from main import create_app
+from simulator import SimulatorConfig, SimulatorServer
+from utils.resilience import breakers
+from utils.seedr_client import client_manager, configure_endpoints
+from utils.shared_state import SharedState
+from utils.tree_mirror import TreeMirror
+
+USER = "mirror@example.com"
+
+
+@pytest.fixture
+def mirrored(tmp_path, monkeypatch):
+    """A simulated account of 3 folders with 2 subfolders each (2 files per folder) and an enabled mirror"""
+    state = SharedState(str(tmp_path / "state.db"), "", owner="test")
+    monkeypatch.setattr(seedr_client, "shared_state", state)
+    monkeypatch.setattr(shared_state_module, "shared_state", state)
+    monkeypatch.setattr(settings, "TREE_MIRROR_SYNC_INTERVAL", 60.0)
+    mirror = TreeMirror(str(tmp_path / "mirror.db"))
+    monkeypatch.setattr(seedr_client, "tree_mirror", mirror)
+    monkeypatch.setattr(files_router, "tree_mirror", mirror)
+
+    server = SimulatorServer(SimulatorConfig(tree_folders=3, tree_depth=1, tree_fanout=2, tree_files=2)).start()
+    configure_endpoints(server.url)
+    client_manager.create_client_from_password(USER, "simulator")
+    yield server, mirror, TestClient(create_app())
+    client_manager.remove_client(USER)
+    configure_endpoints(None)
+    breakers.reset()
+    server.stop()
+
+
+def listings(sim) -> int:
+    return sim.state.calls.get("list_contents", 0)
+
+
+def test_sync_relists_only_changed_folders(mirrored):
+    sim, mirror, _ = mirrored
+    client = client_manager.get_client(USER)
+
+    assert mirror.sync(USER, client, full=True)["listed"] == 10
+    stats = mirror.sync(USER, client)
+    assert (stats["listed"], stats["confirmed"]) == (1, 3)
+
+    # A new file two levels down changes the sizes of its folder and the folder above it
+    account = sim.state.account(USER)
+    top = next(iter(account.children(0)[0]))
+    nested = account.children(top["id"])[0][0]
+    account.add_file(nested["id"], "Late Arrival.mkv", 1234)
+    stats = mirror.sync(USER, client)
+    assert (stats["listed"], stats["confirmed"]) == (3, 3)  # the other top folders and the sibling subfolder
+
+    contents, _ = mirror.listing(USER, nested["id"], max_age=60)
+    assert "Late Arrival.mkv" in [f["name"] for f in contents["files"]]
+    assert mirror.status(USER)["dirty_folders"] == 0
+
+
+def test_listings_and_search_are_served_from_the_mirror(mirrored):
+    sim, _, api = mirrored
+    params = {"user_id": USER}
+    assert api.post("/api/v1/files/mirror/sync", params={**params, "full": "true"}).json()["sync"]["listed"] == 10
+
+    before = listings(sim)
+    root = api.get("/api/v1/files/list", params=params)
+    assert len(root.json()["folders"]) == 3 and root.json()["space_used"] > 0
+    assert int(root.headers["age"]) >= 0 and float(root.headers["x-mirror-synced-at"]) > 0
+    folder = api.get("/api/v1/files/list", params={**params, "folder_id": root.json()["folders"][0]["id"]}).json()
+    assert len(folder["folders"]) == 2 and len(folder["files"]) == 2
+
+    everything = api.get("/api/v1/files/list-all", params={**params, "fields": "id,name"})
+    assert (everything.json()["total_folders"], everything.json()["total_files"]) == (9, 18)
+    assert "x-mirror-synced-at" in everything.headers
+    assert listings(sim) == before
+
+    name = folder["files"][0]["name"]
+    found = api.get("/api/v1/files/search", params={**params, "query": name.upper()}).json()["results"]
+    assert [f["name"] for f in found["files"]] == [name]
+    assert "search_files" not in sim.state.calls
+
+    # max_age=0 always asks Seedr
+    live = api.get("/api/v1/files/list-all", params={**params, "max_age": 0})
+    assert live.json()["total_files"] == 18 and "x-mirror-synced-at" not in live.headers
+    assert listings(sim) == before + 10
+
+
+def test_writes_go_through_to_the_mirror(mirrored):
+    sim, mirror, api = mirrored
+    params = {"user_id": USER}
+    client = client_manager.get_client(USER)
+    mirror.sync(USER, client, full=True)
+    root = mirror.listing(USER, 0, max_age=60)[0]
+    doomed, kept = root["folders"][0], root["folders"][1]
+    file = mirror.listing(USER, kept["id"], max_age=60)[0]["files"][0]
+
+    assert api.put(f"/api/v1/files/file/{file['folder_file_id']}/rename", params=params,
+                   json={"new_name": "Renamed.mkv"}).json()["success"]
+    assert api.delete(f"/api/v1/files/folder/{doomed['id']}", params=params).json()["success"]
+
+    before = listings(sim)
+    listed = api.get("/api/v1/files/list", params={**params, "folder_id": kept["id"]}).json()
+    assert "Renamed.mkv" in [f["name"] for f in listed["files"]]
+    root = api.get("/api/v1/files/list", params=params).json()
+    assert doomed["id"] not in [f["id"] for f in root["folders"]]
+    assert root["space_used"] == sim.state.account(USER).space_used
+    assert listings(sim) == before
+
+    # The mirror already matches Seedr, so the next sync only lists the root
+    assert mirror.sync(USER, client)["listed"] == 1
+
+    # A new folder's id is unknown, so the root is listed from Seedr again
+    api.post("/api/v1/files/folder", params=params, json={"name": "Fresh"})
+    root = api.get("/api/v1/files/list", params=params)
+    assert "Fresh" in [f["name"] for f in root.json()["folders"]] and "age" not in root.headers
+
+
+def test_observed_listings_are_written_off_the_request_path(mirrored):
+    sim, mirror, api = mirrored
+    params = {"user_id": USER}
+
+    # The writer is held up, yet the request that fetched the listing does not wait for it
+    with mirror._write_lock:
+        live = api.get("/api/v1/files/list", params={**params, "max_age": 0}).json()
+        assert mirror.listing(USER, 0, max_age=60) is None
+    mirror.flush()
+    contents, _ = mirror.listing(USER, 0, max_age=60)
+    assert sorted(f["id"] for f in contents["folders"]) == sorted(f["id"] for f in live["folders"])
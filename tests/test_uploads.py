@@ -0,0 +1,68 @@
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+
+from config import settings
+from main import create_app
+from utils.dependencies import get_seedr_client
+from utils.resilience import _idempotency_key
+
+
+class UploadClient:
+    def __init__(self):
+        self.uploaded = []
+
+    def add_torrent(self, torrent_file=None, wishlist_id=None, folder_id="-1", magnet_link=None):
+        with open(torrent_file, "rb") as f:
+            self.uploaded.append(f.read())
+        return SimpleNamespace(result=True, user_torrent_id=len(self.uploaded), title=None, torrent_hash=None)
+
+
+@pytest.fixture
+def seedr():
+    return UploadClient()
+
+
+@pytest.fixture
+def api(monkeypatch, seedr):
+    monkeypatch.setattr(settings, "MAX_TORRENT_UPLOAD_SIZE", 1024)
+    app = create_app()
+    app.dependency_overrides[get_seedr_client] = lambda: seedr
+    return TestClient(app)
+
+
+def test_upload_is_passed_to_seedr(api, seedr):
+    response = api.post("/api/v1/torrents/add/file", files={"file": ("a.torrent", b"d4:infoe")})
+    assert response.status_code == 200
+    assert seedr.uploaded == [b"d4:infoe"]
+
+
+def test_oversize_upload_is_rejected(api, seedr):
+    # Rejected by the middleware from Content-Length alone
+    response = api.post("/api/v1/torrents/add/file", files={"file": ("a.torrent", b"x" * 200_000)})
+    assert response.status_code == 413
+    # Within the multipart allowance, rejected while spooling the file
+    response = api.post("/api/v1/torrents/add/file", files={"file": ("a.torrent", b"x" * 2_000)})
+    assert response.status_code == 413
+    assert seedr.uploaded == []
+
+
+def test_multi_file_upload(api, seedr):
+    files = [("files", (f"{n}.torrent", f"torrent-{n}".encode())) for n in range(3)]
+    response = api.post("/api/v1/torrents/add/files", files=files)
+    body = response.json()
+    assert response.status_code == 200
+    assert body["added"] == 3
+    assert sorted(seedr.uploaded) == [b"torrent-0", b"torrent-1", b"torrent-2"]
+
+
+def test_multi_file_adds_keep_the_request_context(api, seedr, monkeypatch):
+    # The Idempotency-Key decides whether an upstream add may be retried
+    keys = []
+    add_torrent = seedr.add_torrent
+    monkeypatch.setattr(seedr, "add_torrent", lambda **kwargs: keys.append(_idempotency_key.get()) or add_torrent(**kwargs))
+    files = [("files", (f"{n}.torrent", f"torrent-{n}".encode())) for n in range(3)]
+    response = api.post("/api/v1/torrents/add/files", files=files, headers={"Idempotency-Key": "batch-1"})
+    assert response.json()["added"] == 3
+    assert keys == ["batch-1"] * 3
@@ -0,0 +1,59 @@
+from types import SimpleNamespace
+
+from utils.account_cache import MEMORY_BANDWIDTH, account_cache
+from utils.usage_series import RingSeries, UsageRecorder, downsample
+
+
+def sample(used, space_max=1000):
+    return {"space_used": used, "space_max": space_max, "bandwidth_used": used * 2, "torrents": 1}
+
+
+def test_ring_buffer_overwrites_oldest_and_downsamples():
+    series = RingSeries(capacity=5)
+    for t in range(8):
+        series.append(float(t), sample(t * 10))
+
+    assert series.size == 5
+    assert series.first_timestamp() == 3.0
+    assert series.range(4.0, 6.0) == (1, 4)
+
+    buckets = downsample(series, 3.0, 7.0, 2)
+    assert [b["count"] for b in buckets] == [2, 3]
+    assert buckets[0]["space_used"] == {"min": 30, "max": 40, "avg": 35.0}
+    assert buckets[1]["bandwidth_used"]["max"] == 140
+
+
+def test_recorder_persists_and_forecasts(tmp_path):
+    path = str(tmp_path / "usage.jsonl")
+    recorder = UsageRecorder(path=path, capacity=3)
+    for t in range(10):
+        recorder.record("u1", sample(100 + t * 10), timestamp=1000.0 + t)
+    # The log is compacted back down once it outgrows the buffers
+    assert recorder._file_lines <= 6
+
+    reloaded = UsageRecorder(path=path, capacity=3)
+    result = reloaded.query("u1")
+    assert result["samples"] == 3
+    assert result["latest"]["space_used"] == 190
+    assert abs(result["seconds_until_full"] - 81.0) < 1e-6
+    assert reloaded.query("nobody")["buckets"] == []
+
+
+def test_samples_read_usage_directly_from_seedr():
+    class Client:
+        space_used = 300
+
+        def get_memory_bandwidth(self):
+            return SimpleNamespace(space_used=self.space_used, space_max=1000, bandwidth_used=5)
+
+        def list_contents(self, folder_id):
+            return SimpleNamespace(torrents=[], folders=[], files=[])
+
+    # A cached value, even a fresh one, is not what gets sampled
+    account_cache.entries[("sample-user", MEMORY_BANDWIDTH)] = (Client().get_memory_bandwidth(), float("inf"))
+    client = Client()
+    client.space_used = 450
+    recorder = UsageRecorder(path="", capacity=3)
+    recorder.sample_user("sample-user", client)
+    assert recorder.query("sample-user")["latest"]["space_used"] == 450
+    account_cache.invalidate("sample-user")
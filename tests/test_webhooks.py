@@ -0,0 +1,152 @@
+import hashlib
+import hmac
+import json
+import socket
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from config import settings
+from main import create_app
+from utils.dependencies import get_seedr_client, get_user_id
+from utils.webhooks import CompletionPoller, WebhookDelivery, check_callback_url, sign_payload
+
+
+def make_delivery(payload):
+    return {"id": "d1", "url": "http://hook.local/done", "payload": payload,
+            "attempts": 0, "created_at": 0.0, "last_error": None}
+
+
+def test_signed_delivery_and_dead_letter(monkeypatch):
+    monkeypatch.setattr(settings, "WEBHOOK_SECRET", "s3cret")
+    monkeypatch.setattr(settings, "WEBHOOK_MAX_ATTEMPTS", 2)
+    monkeypatch.setattr(socket, "getaddrinfo", lambda host, port, **kw: [(socket.AF_INET, 1, 6, "", ("93.184.216.34", port))])
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(500 if len(requests) <= 2 else 204)
+
+    queue = WebhookDelivery(transport=httpx.MockTransport(handler))
+    delivery = make_delivery({"event": "torrent.completed", "user_id": "u1"})
+
+    queue._deliver(delivery)
+    assert queue.status()["metrics"]["pending"] == 1
+    queue._pending.clear()
+    queue._deliver(delivery)
+
+    status = queue.status("u1")
+    assert status["metrics"]["dead_lettered"] == 1
+    assert status["dead_letters"][0]["last_error"] == "HTTP 500"
+    assert queue.status("someone-else")["dead_letters"] == []
+
+    request = requests[0]
+    assert request.url.host == "93.184.216.34" and request.headers["Host"] == "hook.local"
+    timestamp = request.headers["X-Seedr-Timestamp"]
+    expected = hmac.new(b"s3cret", timestamp.encode() + b"." + request.content, hashlib.sha256).hexdigest()
+    assert request.headers["X-Seedr-Signature"] == f"sha256={expected}"
+    assert sign_payload(request.content, timestamp, "s3cret") == f"sha256={expected}"
+
+    monkeypatch.setattr(queue, "start", lambda: None)
+    assert queue.retry_dead_letter("d1", "u1")
+    _, _, retried = queue._pending.pop()
+    queue._deliver(retried)
+    assert queue.status()["metrics"]["delivered"] == 1
+
+
+class FakeSeedr:
+    def __init__(self):
+        self.root = SimpleNamespace(
+            torrents=[SimpleNamespace(id=7, hash="AB" * 20, name="Some Show", progress="42")],
+            folders=[], files=[], space_used=0, space_max=100
+        )
+
+    def list_contents(self, folder_id):
+        if folder_id == "0":
+            return self.root
+        return SimpleNamespace(folders=[], torrents=[], files=[
+            SimpleNamespace(folder_file_id=5, name="ep1.mkv", size=10)
+        ])
+
+    def fetch_file(self, file_id):
+        return SimpleNamespace(url=f"https://dl.local/{file_id}")
+
+
+def test_poller_enqueues_completion_payload(monkeypatch):
+    delivered = []
+    poller = CompletionPoller(SimpleNamespace(enqueue=lambda url, payload: delivered.append((url, payload))))
+    monkeypatch.setattr(poller, "start", lambda: None)
+    seedr = FakeSeedr()
+
+    poller.watch("hook-user", "AB" * 20, "http://hook.local/done", title="Some Show", torrent_id=7)
+    assert poller.poll_user("hook-user", seedr) == 0
+
+    seedr.root.torrents = []
+    seedr.root.folders = [SimpleNamespace(id=99, name="Some Show", size=10)]
+    assert poller.poll_user("hook-user", seedr) == 1
+    assert poller.pending("hook-user") == []
+
+    url, payload = delivered[0]
+    assert url == "http://hook.local/done"
+    assert payload["folder_id"] == "99"
+    assert payload["files"] == [{"file_id": 5, "name": "ep1.mkv", "size": 10, "download_url": "https://dl.local/5"}]
+    json.dumps(payload)
+
+
+def test_title_fallback_ignores_folders_that_existed_before_the_add(monkeypatch):
+    delivered = []
+    poller = CompletionPoller(SimpleNamespace(enqueue=lambda url, payload: delivered.append((url, payload))))
+    monkeypatch.setattr(poller, "start", lambda: None)
+    seedr = FakeSeedr()
+    seedr.root.torrents = []
+    seedr.root.folders = [SimpleNamespace(id=98, name="Old Show", size=10)]
+
+    poller.watch("title-user", None, "http://hook.local/done", title="Old Show")
+    assert poller.poll_user("title-user", seedr) == 0
+    assert poller.poll_user("title-user", seedr) == 0
+    assert delivered == [] and len(poller.pending("title-user")) == 1
+
+
+def test_callback_urls_must_resolve_to_public_addresses(monkeypatch):
+    for url in ("ftp://example.com/x", "http://127.0.0.1/x", "http://10.1.2.3/x", "http://169.254.169.254/latest",
+                "http://[::1]:8080/x", "http://[::ffff:192.168.0.1]/x", "http://0.0.0.0/x"):
+        with pytest.raises(ValueError):
+            check_callback_url(url)
+    check_callback_url("https://93.184.216.34/hook")
+
+    monkeypatch.setattr(socket, "getaddrinfo", lambda host, port, **kw: [(socket.AF_INET, 1, 6, "", ("10.0.0.5", port))])
+    with pytest.raises(ValueError):
+        check_callback_url("https://hooks.example.com/done")
+
+    monkeypatch.setattr(settings, "WEBHOOK_ALLOW_PRIVATE_HOSTS", True)
+    check_callback_url("https://hooks.example.com/done")
+
+
+def test_delivery_rechecks_the_callback_host(monkeypatch):
+    # A host that passed registration but now resolves to loopback is not contacted
+    monkeypatch.setattr(socket, "getaddrinfo", lambda host, port, **kw: [(socket.AF_INET, 1, 6, "", ("127.0.0.1", port))])
+    requests = []
+    queue = WebhookDelivery(transport=httpx.MockTransport(lambda request: requests.append(request) or httpx.Response(204)))
+    delivery = make_delivery({"event": "torrent.completed", "user_id": "u1"})
+
+    assert not queue.attempt(delivery)
+    assert requests == [] and delivery["attempts"] == 1
+    assert "loopback" in delivery["last_error"]
+
+
+def test_added_torrent_that_cannot_be_watched_still_succeeds():
+    class Seedr:
+        def add_torrent(self, **kwargs):
+            return SimpleNamespace(result=True, user_torrent_id=5, title=None, torrent_hash=None)
+
+    app = create_app()
+    app.dependency_overrides[get_seedr_client] = lambda: Seedr()
+    app.dependency_overrides[get_user_id] = lambda: "unwatchable-user"
+    response = TestClient(app).post("/api/v1/torrents/add", json={
+        "magnet_link": "magnet:?tr=udp://tracker.local", "callback_url": "https://93.184.216.34/hook"
+    })
+    assert response.status_code == 200
+    assert response.json()["success"] is True
+    assert response.json()["callback"]["registered"] is False
@@ -1,5 +1,21 @@
-"""Utils package"""
-from .seedr_client import client_manager
-from .validators import validate_required_fields, validate_file_id, validate_folder_id
+"""Utils package
+
+The re-exports below are resolved on first access, so importing one
+submodule (e.g. ``utils.startup``) does not pull in the Seedr client.
+"""
+import importlib
+
+_EXPORTS = {
+    'client_manager': 'seedr_client',
+    'validate_required_fields': 'validators',
+    'validate_file_id': 'validators',
+    'validate_folder_id': 'validators',
+}
 
 __all__ = ['client_manager', 'validate_required_fields', 'validate_file_id', 'validate_folder_id']
+
+
+def __getattr__(name):
+    if name in _EXPORTS:
+        return getattr(importlib.import_module(f'.{_EXPORTS[name]}', __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,132 @@
+"""Per-user account data cache
+
+Settings, memory/bandwidth and devices change rarely compared to how often
+clients read them, so each is cached per user with its own TTL. Within
+ACCOUNT_CACHE_STALE_TTL past expiry an entry is still served immediately
+(stale-while-revalidate) while a background refresh fetches the new value;
+only older or missing entries make the caller wait for Seedr. Mutations
+(name/password changes, torrent adds and deletes) invalidate the affected
+kinds so the next read is fresh.
+"""
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from typing import Any, Callable, Dict, Tuple
+
+from config import settings
+from utils.metrics import CACHE_REQUESTS, registry
+from utils.quota_ledger import quota_ledger
+
+logger = logging.getLogger(__name__)
+
+SETTINGS = "settings"
+MEMORY_BANDWIDTH = "memory_bandwidth"
+DEVICES = "devices"
+
+# Data that changes whenever storage is used or freed
+USAGE_KINDS = (SETTINGS, MEMORY_BANDWIDTH)
+
+
+def _ttl(kind: str) -> float:
+    return {
+        SETTINGS: settings.ACCOUNT_CACHE_SETTINGS_TTL,
+        MEMORY_BANDWIDTH: settings.ACCOUNT_CACHE_MEMORY_TTL,
+        DEVICES: settings.ACCOUNT_CACHE_DEVICES_TTL
+    }[kind]
+
+
+class AccountCache:
+    """TTL cache with stale-while-revalidate for account endpoints"""
+
+    def __init__(self):
+        self.entries: Dict[Tuple[str, str], Tuple[Any, float]] = {}
+        self.lock = Lock()
+        self._refreshing = set()
+        self._generation: Dict[Tuple[str, str], int] = {}
+        self._executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="account-cache")
+        registry.watch_executor("account-cache", self._executor)
+        self.stats = {"hits": 0, "stale_hits": 0, "misses": 0, "refresh_errors": 0}
+
+    def get(self, user_id: str, kind: str, fetch: Callable[[], Any]) -> Any:
+        """Return cached data for ``kind``, calling ``fetch`` when it is missing or too old"""
+        key = (user_id, kind)
+        now = time.monotonic()
+        with self.lock:
+            cached = self.entries.get(key)
+            if cached is not None:
+                value, fetched_at = cached
+                age = now - fetched_at
+                if age < _ttl(kind):
+                    self.stats["hits"] += 1
+                    CACHE_REQUESTS.inc(f"account_{kind}", "hit")
+                    return value
+                if age < _ttl(kind) + settings.ACCOUNT_CACHE_STALE_TTL:
+                    self.stats["stale_hits"] += 1
+                    CACHE_REQUESTS.inc(f"account_{kind}", "stale")
+                    if key not in self._refreshing:
+                        self._refreshing.add(key)
+                        self._executor.submit(self._revalidate, key, fetch, self._generation.get(key, 0))
+                    return value
+            self.stats["misses"] += 1
+            CACHE_REQUESTS.inc(f"account_{kind}", "miss")
+            generation = self._generation.get(key, 0)
+
+        value = fetch()
+        self._store(key, value, generation)
+        return value
+
+    def _store(self, key: Tuple[str, str], value: Any, generation: int):
+        with self.lock:
+            # A fetch that started before an invalidation must not resurrect old data
+            if self._generation.get(key, 0) == generation:
+                self.entries[key] = (value, time.monotonic())
+
+    def _revalidate(self, key: Tuple[str, str], fetch: Callable[[], Any], generation: int):
+        try:
+            self._store(key, fetch(), generation)
+        except Exception as e:
+            with self.lock:
+                self.stats["refresh_errors"] += 1
+            logger.warning(f"Background refresh of {key[1]} for {key[0]} failed: {e}")
+        finally:
+            with self.lock:
+                self._refreshing.discard(key)
+
+    def invalidate(self, user_id: str, *kinds: str):
+        """Drop cached data for a user (all kinds when none are given)"""
+        with self.lock:
+            for kind in kinds or (SETTINGS, MEMORY_BANDWIDTH, DEVICES):
+                key = (user_id, kind)
+                self.entries.pop(key, None)
+                self._generation[key] = self._generation.get(key, 0) + 1
+
+    def invalidate_usage(self, user_id: str):
+        """Drop data that a torrent add or delete makes outdated"""
+        self.invalidate(user_id, *USAGE_KINDS)
+
+    # Cached reads
+
+    def settings(self, user_id: str, client: Any) -> Any:
+        return self.get(user_id, SETTINGS, client.get_settings)
+
+    def devices(self, user_id: str, client: Any) -> Any:
+        return self.get(user_id, DEVICES, client.get_devices)
+
+    def memory_bandwidth(self, user_id: str, client: Any) -> Any:
+        def fetch():
+            # Taken before the call: only reservations bound by then can be in the reading
+            taken_at = time.monotonic()
+            memory_bandwidth = client.get_memory_bandwidth()
+            quota_ledger.record_reading(
+                user_id,
+                getattr(memory_bandwidth, 'space_used', 0),
+                getattr(memory_bandwidth, 'space_max', 0),
+                taken_at=taken_at
+            )
+            return memory_bandwidth
+        return self.get(user_id, MEMORY_BANDWIDTH, fetch)
+
+
+# Global account cache instance
+account_cache = AccountCache()
@@ -0,0 +1,65 @@
+"""Request coalescing (single-flight) for read-only Seedr calls
+
+When several requests make the same read at the same moment (ten dashboard
+tabs refreshing together all call ``list_contents('0')`` for one user), only
+the first one calls Seedr. The others wait for that call and get its result,
+or its exception. The key is (user, method, arguments). Once the call
+finishes, the key is free again, so nothing is cached beyond the life of a
+call; TTL caching such as ``utils.account_cache`` works on top of this.
+
+Callers receive the same result object, so they must treat it as read-only.
+"""
+from concurrent.futures import Future
+from threading import Lock
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from utils.metrics import Counter, registry
+
+COALESCED_CALLS = registry.register(Counter(
+    "seedr_coalesced_calls_total", "Upstream Seedr reads served by an identical call already in flight.", ("method",)
+))
+
+
+def call_key(user_id: Optional[str], method: str, args: tuple, kwargs: Dict[str, Any]) -> Optional[Hashable]:
+    """Key identifying a call, or None when its arguments are unhashable"""
+    key = (user_id, method, args, tuple(sorted(kwargs.items())))
+    try:
+        hash(key)
+    except TypeError:
+        return None
+    return key
+
+
+class SingleFlight:
+    """Runs at most one call per key at a time; concurrent callers share its outcome"""
+
+    def __init__(self):
+        self.calls: Dict[Hashable, Future] = {}
+        self.lock = Lock()
+
+    def do(self, key: Hashable, fn: Callable[[], Any], method: str = "") -> Any:
+        with self.lock:
+            future = self.calls.get(key)
+            leader = future is None
+            if leader:
+                future = self.calls[key] = Future()
+
+        if not leader:
+            COALESCED_CALLS.inc(method)
+            return future.result()
+
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self.lock:
+                del self.calls[key]
+
+
+# Global single-flight group for upstream reads
+single_flight = SingleFlight()
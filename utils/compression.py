@@ -0,0 +1,173 @@
+"""Negotiated response compression
+
+ASGI middleware compressing responses with the best encoding the client
+accepts: zstd or brotli when the ``zstandard``/``brotli`` packages are
+installed, gzip otherwise. ``Accept-Encoding`` q-values are honoured; on a
+tie the server prefers zstd, then br, then gzip.
+
+Complete bodies smaller than ``minimum_size`` are sent as they are.
+Streaming responses (several body messages, e.g. NDJSON) are compressed
+chunk by chunk with a flush after each one, so clients still receive every
+chunk as soon as it is produced.
+
+Responses that already carry a ``Content-Encoding``, have an
+already-compressed media type (images, audio, video, archives), or whose
+path starts with one of ``exclude_paths`` are passed through untouched.
+"""
+import importlib
+import zlib
+from importlib.util import find_spec
+from typing import Iterable, List, Optional, Tuple
+
+# Optional codec packages by encoding, in server preference order. They are
+# imported by the first response that uses them, not at startup.
+_CODECS = {"zstd": "zstandard", "br": "brotli"}
+
+_INCOMPRESSIBLE_PREFIXES = (
+    b"image/", b"audio/", b"video/",
+    b"application/zip", b"application/gzip", b"application/x-gzip",
+    b"application/x-bittorrent", b"application/zstd", b"application/x-7z-compressed",
+    b"application/vnd.rar", b"application/octet-stream"
+)
+
+
+def available_encodings() -> List[str]:
+    """Encodings this process can produce, in server preference order"""
+    encodings = [encoding for encoding, package in _CODECS.items() if find_spec(package) is not None]
+    encodings.append("gzip")
+    return encodings
+
+
+def choose_encoding(accept_encoding: str, available: Iterable[str]) -> Optional[str]:
+    """Pick the encoding with the highest q-value the client accepts (None for identity)"""
+    accepted = {}
+    for part in accept_encoding.split(','):
+        token, _, params = part.strip().partition(';')
+        token = token.strip().lower()
+        if not token:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[token] = q
+
+    best, best_q = None, 0.0
+    for encoding in available:
+        q = accepted.get(encoding, accepted.get('*', 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+class _Compressor:
+    """Incremental compressor with a per-chunk flush"""
+
+    def __init__(self, encoding: str, gzip_level: int, brotli_quality: int, zstd_level: int):
+        if encoding == "gzip":
+            self._obj = zlib.compressobj(gzip_level, zlib.DEFLATED, 31)
+            self._flush = lambda: self._obj.flush(zlib.Z_SYNC_FLUSH)
+            self._finish = self._obj.flush
+        elif encoding == "br":
+            brotli = importlib.import_module(_CODECS["br"])
+            self._obj = brotli.Compressor(quality=brotli_quality)
+            self._flush = self._obj.flush
+            self._finish = self._obj.finish
+        else:
+            zstandard = importlib.import_module(_CODECS["zstd"])
+            self._obj = zstandard.ZstdCompressor(level=zstd_level).compressobj()
+            self._flush = lambda: self._obj.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+            self._finish = self._obj.flush
+        self._compress = self._obj.process if encoding == "br" else self._obj.compress
+
+    def chunk(self, data: bytes) -> bytes:
+        return self._compress(data) + self._flush()
+
+    def finish(self, data: bytes = b"") -> bytes:
+        return (self._compress(data) if data else b"") + self._finish()
+
+
+def _header(headers: List[Tuple[bytes, bytes]], name: bytes) -> Optional[bytes]:
+    for key, value in headers:
+        if key.lower() == name:
+            return value
+    return None
+
+
+class CompressionMiddleware:
+    """Compress responses according to the request's Accept-Encoding"""
+
+    def __init__(self, app, minimum_size: int = 1024, exclude_paths: Iterable[str] = (),
+                 gzip_level: int = 6, brotli_quality: int = 4, zstd_level: int = 3):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.exclude_paths = tuple(p for p in exclude_paths if p)
+        self.levels = (gzip_level, brotli_quality, zstd_level)
+        self.available = available_encodings()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope.get("method") == "HEAD" or scope["path"].startswith(self.exclude_paths):
+            return await self.app(scope, receive, send)
+        accept = _header(scope.get("headers", []), b"accept-encoding")
+        encoding = choose_encoding(accept.decode("latin-1"), self.available) if accept else None
+        if encoding is None:
+            return await self.app(scope, receive, send)
+
+        start_message = None
+        compressor: Optional[_Compressor] = None
+        passthrough = False
+
+        async def compressing_send(message):
+            nonlocal start_message, compressor, passthrough
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                content_type = _header(headers, b"content-type") or b""
+                if (
+                    message["status"] < 200 or message["status"] in (204, 304) or
+                    _header(headers, b"content-encoding") is not None or
+                    content_type.lower().startswith(_INCOMPRESSIBLE_PREFIXES)
+                ):
+                    passthrough = True
+                    await send(message)
+                else:
+                    start_message = message
+                return
+
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if compressor is None:
+                headers = [(k, v) for k, v in start_message.get("headers", []) if k.lower() != b"content-length"]
+                headers.append((b"vary", b"Accept-Encoding"))
+                if not more_body and len(body) < self.minimum_size:
+                    passthrough = True
+                    headers.append((b"content-length", str(len(body)).encode()))
+                    await send({**start_message, "headers": headers})
+                    await send(message)
+                    return
+                compressor = _Compressor(encoding, *self.levels)
+                headers.append((b"content-encoding", encoding.encode()))
+                if not more_body:
+                    # Complete body: one compressed message with a length
+                    data = compressor.finish(body)
+                    headers.append((b"content-length", str(len(data)).encode()))
+                    await send({**start_message, "headers": headers})
+                    await send({"type": "http.response.body", "body": data})
+                    return
+                await send({**start_message, "headers": headers})
+
+            if more_body:
+                data = compressor.chunk(body) if body else b""
+                if data:
+                    await send({"type": "http.response.body", "body": data, "more_body": True})
+            else:
+                await send({"type": "http.response.body", "body": compressor.finish(body)})
+
+        await self.app(scope, receive, compressing_send)
@@ -1,5 +1,9 @@
 from fastapi import HTTPException, Query
+from typing import Optional
+from config import settings
 from utils.seedr_client import client_manager
+from utils.serialization import parse_fields, FieldTree
+from utils.tree_mirror import tree_mirror
 
 # Dependency
 def get_seedr_client(user_id: str = Query('default', description="User identifier")):
@@ -10,3 +14,36 @@ def get_seedr_client(user_id: str = Query('default', description="User identifie
     if not client:
         raise HTTPException(status_code=401, detail="Not authenticated. Please login first.")
     return client
+
+def get_user_id(user_id: str = Query('default', description="User identifier")) -> str:
+    """
+    FastAPI dependency resolving the effective user id (honours DEFAULT_AUTH).
+    """
+    return client_manager.get_effective_user_id(user_id)
+
+def get_fields(
+    fields: Optional[str] = Query(
+        None, description="Comma-separated fields to return; use dots for nested fields (e.g. id,name,files.size)"
+    )
+) -> Optional[FieldTree]:
+    """
+    FastAPI dependency parsing a sparse fieldset (``?fields=``).
+    """
+    try:
+        return parse_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def get_max_age(
+    max_age: Optional[float] = Query(
+        None, ge=0,
+        description="Answer from the local tree mirror when it was confirmed at most this many seconds ago "
+                    "(default: TREE_MIRROR_MAX_AGE; 0 always asks Seedr)"
+    )
+) -> Optional[float]:
+    """
+    FastAPI dependency for the oldest mirrored data a request accepts (None while the mirror is off).
+    """
+    if not tree_mirror.enabled:
+        return None
+    return settings.TREE_MIRROR_MAX_AGE if max_age is None else max_age
@@ -0,0 +1,384 @@
+"""Bulk magnet ingestion queue
+
+Magnets submitted in bulk are stored in a persistent per-user queue, sized
+through the torrent metadata path, and dispatched to Seedr by a background
+worker as space frees up. Every cycle the worker re-reads the root listing
+(which refreshes the quota ledger and reconciles finished torrents), then
+packs the largest set of queued items that fits the free space using
+first-fit-decreasing and adds them through the ledger, so reservations made
+by interactive smart adds are respected.
+
+Items are persisted one record each in the shared state database, tagged
+with the worker that owns them, so several worker processes never
+overwrite each other's queue. Every worker dispatches what was submitted
+to it and keeps a liveness lease while it runs. The worker holding the
+``ingest-queue`` lease adopts the items of workers whose liveness lease
+has lapsed (including everything left over from a previous run), so a
+persisted magnet is never added once per worker.
+"""
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from config import settings
+from utils.account_cache import account_cache
+from utils.metrics import registry
+from utils.quota_ledger import quota_ledger
+from utils.shared_state import LeaderLease, SharedState, shared_state
+from utils.space_check import get_torrent_size
+from utils.torrent_index import torrent_index, infohash_from_magnet
+
+logger = logging.getLogger(__name__)
+
+# Item states
+STATUS_SIZING = "sizing"
+STATUS_QUEUED = "queued"
+STATUS_DISPATCHED = "dispatched"
+STATUS_FAILED = "failed"
+STATUS_TOO_LARGE = "too_large"
+STATUS_DUPLICATE = "duplicate"
+
+PENDING_STATUSES = (STATUS_SIZING, STATUS_QUEUED)
+
+# Dispatch history kept for throughput metrics
+_THROUGHPUT_WINDOW = 3600.0
+
+# Shared state namespace of the persisted items, keyed by "<user_id>|<item id>"
+_NAMESPACE = "ingest-queue"
+
+
+def pack_first_fit_decreasing(items: List[Dict[str, Any]], capacity: int) -> List[Dict[str, Any]]:
+    """
+    Select items to fill ``capacity`` bytes, largest first.
+
+    Items of unknown size (0) are only packed when nothing else fits, one at
+    a time, since they cannot be accounted for.
+    """
+    selected = []
+    remaining = capacity
+    for item in sorted(items, key=lambda i: i.get('size', 0), reverse=True):
+        size = item.get('size', 0)
+        if size > 0 and size <= remaining:
+            selected.append(item)
+            remaining -= size
+    if not selected and remaining > 0:
+        unknown = [i for i in items if not i.get('size')]
+        if unknown:
+            selected.append(min(unknown, key=lambda i: i.get('created_at', 0)))
+    return selected
+
+
+class IngestQueue:
+    """Persistent per-user queue of magnets waiting for storage space"""
+
+    def __init__(self, state: Optional[SharedState] = None):
+        self.shared_state = state or shared_state
+        self.lock = threading.RLock()
+        self.queues: Dict[str, List[Dict[str, Any]]] = {}
+        self.history: Dict[str, deque] = {}
+        self.counters: Dict[str, Dict[str, int]] = {}
+        self._executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="ingest-size")
+        registry.watch_executor("ingest-size", self._executor)
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._leader = LeaderLease("ingest-queue", self.shared_state)
+        self._alive = LeaderLease(self._alive_lease(self.shared_state.owner), self.shared_state)
+
+    # Persistence
+
+    @staticmethod
+    def _alive_lease(owner: str) -> str:
+        return f"ingest-worker:{owner}"
+
+    def _save(self, user_id: str, items: List[Dict[str, Any]]):
+        try:
+            self.shared_state.record_put(_NAMESPACE, {f"{user_id}|{item['id']}": item for item in items})
+        except sqlite3.Error as e:
+            logger.error(f"Error saving ingest queue: {e}")
+
+    def _forget(self, user_id: str, items: List[Dict[str, Any]]):
+        try:
+            self.shared_state.record_delete(_NAMESPACE, [f"{user_id}|{item['id']}" for item in items])
+        except sqlite3.Error as e:
+            logger.error(f"Error saving ingest queue: {e}")
+
+    def _adopt(self) -> int:
+        """Take over persisted items whose owning worker is no longer running"""
+        try:
+            persisted = self.shared_state.records(_NAMESPACE)
+        except sqlite3.Error as e:
+            logger.warning(f"Could not read ingest queue ({e}).")
+            return 0
+        # Items of this worker that are not in memory were persisted by an earlier run
+        alive: Dict[str, bool] = {self.shared_state.owner: False}
+        adopted: Dict[str, List[Dict[str, Any]]] = {}
+        with self.lock:
+            known = {item['id'] for items in self.queues.values() for item in items}
+            for key, item in persisted.items():
+                owner = item.get('owner')
+                if item['id'] in known:
+                    continue
+                if owner is not None and owner not in alive:
+                    alive[owner] = self.shared_state.lease_held(self._alive_lease(owner))
+                if owner is not None and alive[owner]:
+                    continue
+                user_id = key.rsplit('|', 1)[0]
+                item['owner'] = self.shared_state.owner
+                self.queues.setdefault(user_id, []).append(item)
+                adopted.setdefault(user_id, []).append(item)
+            for user_id, items in adopted.items():
+                self._save(user_id, items)
+        for user_id, items in adopted.items():
+            for item in items:
+                if item['status'] == STATUS_SIZING:
+                    self._executor.submit(self._size_item, user_id, item)
+        count = sum(len(items) for items in adopted.values())
+        if count:
+            logger.info(f"Adopted {count} persisted ingest item(s)")
+            self._wake.set()
+        return count
+
+    def _counters(self, user_id: str) -> Dict[str, int]:
+        return self.counters.setdefault(user_id, {
+            "submitted": 0,
+            "dispatched": 0,
+            "dispatched_bytes": 0,
+            "failed": 0,
+            "dispatch_errors": 0
+        })
+
+    # Queue operations
+
+    def submit(self, user_id: str, magnet_links: List[str], folder_id: str = "-1") -> List[Dict[str, Any]]:
+        """Queue magnets for a user and start sizing them"""
+        now = time.time()
+        items = [
+            {
+                "id": uuid.uuid4().hex,
+                "magnet_link": magnet_link,
+                "folder_id": folder_id,
+                "size": 0,
+                "status": STATUS_SIZING,
+                "attempts": 0,
+                "created_at": now,
+                "dispatched_at": None,
+                "torrent_id": None,
+                "error": None,
+                "owner": self.shared_state.owner
+            }
+            for magnet_link in magnet_links
+        ]
+        self._alive.is_leader()
+        with self.lock:
+            self.queues.setdefault(user_id, []).extend(items)
+            self._counters(user_id)["submitted"] += len(items)
+            self._save(user_id, items)
+        for item in items:
+            self._executor.submit(self._size_item, user_id, item)
+        self.start()
+        return [dict(item) for item in items]
+
+    def _size_item(self, user_id: str, item: Dict[str, Any]):
+        size = get_torrent_size(item['magnet_link'], settings.SPACE_CHECK_METADATA_TIMEOUT)
+        with self.lock:
+            if item['status'] != STATUS_SIZING:
+                return
+            item['size'] = size
+            item['status'] = STATUS_QUEUED
+            self._save(user_id, [item])
+        self._wake.set()
+
+    def remove(self, user_id: str, item_id: str) -> bool:
+        """Drop a pending item from the queue"""
+        with self.lock:
+            items = self.queues.get(user_id, [])
+            for item in items:
+                if item['id'] == item_id and item['status'] in PENDING_STATUSES + (STATUS_FAILED, STATUS_TOO_LARGE, STATUS_DUPLICATE):
+                    items.remove(item)
+                    self._forget(user_id, [item])
+                    return True
+        return False
+
+    def clear_finished(self, user_id: str) -> int:
+        """Forget dispatched and failed items"""
+        with self.lock:
+            items = self.queues.get(user_id, [])
+            kept = [i for i in items if i['status'] in PENDING_STATUSES]
+            removed = [i for i in items if i['status'] not in PENDING_STATUSES]
+            self.queues[user_id] = kept
+            self._forget(user_id, removed)
+        return len(removed)
+
+    def state(self, user_id: str) -> Dict[str, Any]:
+        """Queue contents and throughput metrics for a user"""
+        now = time.time()
+        with self.lock:
+            items = [dict(i) for i in self.queues.get(user_id, [])]
+            history = list(self.history.get(user_id, ()))
+            counters = dict(self._counters(user_id))
+
+        recent = [(t, size) for t, size in history if now - t <= _THROUGHPUT_WINDOW]
+        pending = [i for i in items if i['status'] in PENDING_STATUSES]
+        return {
+            "items": items,
+            "metrics": {
+                **counters,
+                "pending": len(pending),
+                "pending_bytes": sum(i['size'] for i in pending),
+                "by_status": {
+                    status: sum(1 for i in items if i['status'] == status)
+                    for status in (
+                        STATUS_SIZING, STATUS_QUEUED, STATUS_DISPATCHED, STATUS_FAILED, STATUS_TOO_LARGE, STATUS_DUPLICATE
+                    )
+                },
+                "dispatched_last_hour": len(recent),
+                "bytes_dispatched_last_hour": sum(size for _, size in recent),
+                "last_dispatch_at": history[-1][0] if history else None
+            },
+            "ledger": quota_ledger.status(user_id)
+        }
+
+    # Dispatching
+
+    def resume(self):
+        """Adopt items left over from a previous run and start the dispatcher"""
+        self._alive.is_leader()
+        if self._leader.is_leader():
+            self._adopt()
+        self.start()
+
+    def start(self):
+        """Start the background dispatcher if it is not running"""
+        with self.lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="ingest-dispatcher", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        self._leader.release()
+        self._alive.release()
+
+    def _run(self):
+        next_dispatch = 0.0
+        while not self._stop.is_set():
+            # Renew the liveness lease, and adopt orphaned items while leading
+            self._alive.is_leader()
+            if self._leader.is_leader():
+                self._adopt()
+            if time.monotonic() >= next_dispatch:
+                with self.lock:
+                    user_ids = [u for u, items in self.queues.items() if any(i['status'] == STATUS_QUEUED for i in items)]
+                for user_id in user_ids:
+                    try:
+                        self.dispatch(user_id)
+                    except Exception as e:
+                        logger.error(f"Ingest dispatch failed for {user_id}: {e}")
+                next_dispatch = time.monotonic() + settings.INGEST_DISPATCH_INTERVAL
+            # Wake often enough to keep the leases alive between dispatch cycles
+            wait = min(next_dispatch - time.monotonic(), settings.LEADER_LEASE_TTL / 3)
+            if self._wake.wait(max(wait, 0.0)):
+                self._wake.clear()
+                next_dispatch = 0.0
+
+    def dispatch(self, user_id: str, client: Any = None) -> int:
+        """Run one dispatch cycle for a user; returns the number of torrents added"""
+        if client is None:
+            from utils.seedr_client import client_manager
+            client = client_manager.get_client(user_id)
+        if client is None:
+            return 0
+
+        # A root listing refreshes the quota and reconciles finished torrents
+        try:
+            contents = client.list_contents('0')
+            quota_ledger.observe_listing(user_id, contents)
+            torrent_index.observe_listing(user_id, '0', contents)
+        except Exception as e:
+            logger.warning(f"Ingest: could not list root for {user_id}: {e}")
+        available, _, space_max, _ = quota_ledger.snapshot(user_id, client)
+
+        with self.lock:
+            queued = [i for i in self.queues.get(user_id, []) if i['status'] == STATUS_QUEUED]
+            too_large = [i for i in queued if space_max and i['size'] > space_max]
+            for item in too_large:
+                item['status'] = STATUS_TOO_LARGE
+                item['error'] = "Torrent is larger than the account storage"
+            queued = [i for i in queued if i['status'] == STATUS_QUEUED]
+            batch = pack_first_fit_decreasing(queued, available) if space_max else queued[:1]
+            self._save(user_id, too_large)
+
+        added = 0
+        for item in batch:
+            if self._dispatch_item(user_id, client, item):
+                added += 1
+        return added
+
+    def _dispatch_item(self, user_id: str, client: Any, item: Dict[str, Any]) -> bool:
+        infohash = infohash_from_magnet(item['magnet_link'])
+        existing = torrent_index.claim(user_id, infohash)
+        if existing is not None:
+            with self.lock:
+                item['status'] = STATUS_DUPLICATE
+                item['torrent_id'] = existing.get('torrent_id')
+                item['error'] = "Torrent is already in the account"
+                self._save(user_id, [item])
+            return False
+        try:
+            return self._add_item(user_id, client, item, infohash)
+        finally:
+            torrent_index.release_claim(user_id, infohash)
+
+    def _add_item(self, user_id: str, client: Any, item: Dict[str, Any], infohash: Optional[str]) -> bool:
+        admitted, reservation, _, _ = quota_ledger.admit(user_id, item['size'])
+        if not admitted:
+            return False
+        reservation_id = reservation.id if reservation else None
+        try:
+            result = client.add_torrent(magnet_link=item['magnet_link'], folder_id=item['folder_id'])
+        except Exception as e:
+            quota_ledger.release(user_id, reservation_id)
+            with self.lock:
+                counters = self._counters(user_id)
+                counters["dispatch_errors"] += 1
+                item['attempts'] += 1
+                item['error'] = str(e)
+                if item['attempts'] >= settings.INGEST_MAX_ATTEMPTS:
+                    item['status'] = STATUS_FAILED
+                    counters["failed"] += 1
+                self._save(user_id, [item])
+            return False
+
+        torrent_id = getattr(result, 'user_torrent_id', None)
+        quota_ledger.bind(user_id, reservation_id, torrent_id, getattr(result, 'torrent_hash', None))
+        torrent_index.register_add(
+            user_id, getattr(result, 'torrent_hash', None) or infohash, torrent_id, getattr(result, 'title', None),
+            item['folder_id']
+        )
+        account_cache.invalidate_usage(user_id)
+        now = time.time()
+        with self.lock:
+            item['status'] = STATUS_DISPATCHED
+            item['dispatched_at'] = now
+            item['torrent_id'] = torrent_id
+            item['error'] = None
+            counters = self._counters(user_id)
+            counters["dispatched"] += 1
+            counters["dispatched_bytes"] += item['size']
+            history = self.history.setdefault(user_id, deque(maxlen=10000))
+            history.append((now, item['size']))
+            self._save(user_id, [item])
+        return True
+
+
+# Global ingest queue instance
+ingest_queue = IngestQueue()
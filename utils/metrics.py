@@ -0,0 +1,265 @@
+"""Prometheus metrics
+
+A small in-process registry rendered in the Prometheus text exposition
+format at ``/metrics``. Recording is a dict lookup and a few additions
+under a per-metric lock, so the metrics can stay on in production.
+
+Request latency is recorded by ``MetricsMiddleware`` per method, route
+template and status. Upstream Seedr calls (``InstrumentedSeedr``),
+TorrentMeta requests and cache lookups record into their own metrics.
+Thread pool saturation is read when the endpoint is scraped.
+"""
+import threading
+import time
+from bisect import bisect_left
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from utils import startup
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.lock = threading.Lock()
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Monotonic counter; label values are passed positionally"""
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self.values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1):
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def get(self, *labels: str) -> float:
+        return self.values.get(labels, 0)
+
+    def render(self) -> List[str]:
+        with self.lock:
+            items = list(self.values.items())
+        return self.header() + [f"{self.name}{_labels(self.labelnames, k)} {_number(v)}" for k, v in items]
+
+
+class Gauge(_Metric):
+    """Value that goes up and down, or is computed by ``callback`` at scrape time"""
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 callback: Optional[Callable[[], Iterable[Tuple[Tuple[str, ...], float]]]] = None):
+        super().__init__(name, documentation, labelnames)
+        self.values: Dict[Tuple[str, ...], float] = {}
+        self.callback = callback
+
+    def set(self, value: float, *labels: str):
+        with self.lock:
+            self.values[labels] = value
+
+    def inc(self, *labels: str, amount: float = 1):
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def dec(self, *labels: str, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+    def get(self, *labels: str) -> float:
+        return self.values.get(labels, 0)
+
+    def render(self) -> List[str]:
+        with self.lock:
+            items = list(self.values.items())
+        if self.callback is not None:
+            items.extend(self.callback())
+        return self.header() + [f"{self.name}{_labels(self.labelnames, k)} {_number(v)}" for k, v in items]
+
+
+class Histogram(_Metric):
+    """Cumulative-bucket histogram; label values are passed positionally after the value"""
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [count per bucket..., count above the last bucket, sum]
+        self.values: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, *labels: str):
+        index = bisect_left(self.buckets, value)
+        with self.lock:
+            row = self.values.get(labels)
+            if row is None:
+                row = self.values[labels] = [0] * (len(self.buckets) + 2)
+            row[index] += 1
+            row[-1] += value
+
+    def count(self, *labels: str) -> int:
+        row = self.values.get(labels)
+        return int(sum(row[:-1])) if row else 0
+
+    def render(self) -> List[str]:
+        with self.lock:
+            items = [(k, list(v)) for k, v in self.values.items()]
+        lines = self.header()
+        for labels, row in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), row[:-1]):
+                cumulative += count
+                le = f'le="{_number(bound)}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {_number(cumulative)}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(row[-1])}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {_number(cumulative)}")
+        return lines
+
+
+class Registry:
+    """Ordered collection of metrics rendered together"""
+
+    def __init__(self):
+        self.metrics: List[_Metric] = []
+        self.executors: Dict[str, ThreadPoolExecutor] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        self.metrics.append(metric)
+        return metric
+
+    def watch_executor(self, name: str, executor: ThreadPoolExecutor):
+        """Report an executor's saturation under ``pool=name``"""
+        self.executors[name] = executor
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+def _executor_samples(field: str) -> List[Tuple[Tuple[str, ...], float]]:
+    samples = []
+    for name, executor in list(registry.executors.items()):
+        threads = len(getattr(executor, '_threads', ()))
+        idle = getattr(getattr(executor, '_idle_semaphore', None), '_value', 0)
+        values = {
+            "max": getattr(executor, '_max_workers', 0),
+            "busy": max(threads - idle, 0),
+            "queued": executor._work_queue.qsize() if hasattr(executor, '_work_queue') else 0
+        }
+        samples.append(((name,), values[field]))
+    return samples
+
+
+def _anyio_samples(field: str) -> List[Tuple[Tuple[str, ...], float]]:
+    """FastAPI's thread pool for sync endpoints (only readable from the event loop thread)"""
+    try:
+        from anyio.to_thread import current_default_thread_limiter
+        limiter = current_default_thread_limiter()
+    except Exception:
+        return []
+    values = {"max": limiter.total_tokens, "busy": limiter.borrowed_tokens, "queued": limiter.statistics().tasks_waiting}
+    return [(("endpoints",), values[field])]
+
+
+REQUEST_LATENCY = registry.register(Histogram(
+    "seedr_api_request_duration_seconds", "Time to handle a request.", ("method", "route", "status")
+))
+REQUESTS_IN_FLIGHT = registry.register(Gauge(
+    "seedr_api_requests_in_flight", "Requests currently being handled.", ("method",)
+))
+UPSTREAM_LATENCY = registry.register(Histogram(
+    "seedr_upstream_call_duration_seconds", "Duration of seedrcc client calls.", ("method", "outcome")
+))
+TORRENTMETA_LATENCY = registry.register(Histogram(
+    "seedr_torrentmeta_request_duration_seconds", "Duration of TorrentMeta HTTP attempts.", ("mode", "outcome")
+))
+TOKEN_REFRESHES = registry.register(Counter(
+    "seedr_token_refreshes_total", "Seedr access token refreshes."
+))
+CACHE_REQUESTS = registry.register(Counter(
+    "seedr_cache_requests_total", "Cache lookups by result (hit, stale or miss).", ("cache", "result")
+))
+STARTUP_SECONDS = registry.register(Gauge(
+    "seedr_api_startup_seconds", "Seconds from process start to each startup phase (app built, ready).", ("phase",),
+    callback=lambda: [((phase,), seconds) for phase, seconds in startup.phases.items()]
+))
+THREADPOOL_MAX = registry.register(Gauge(
+    "seedr_threadpool_max_workers", "Worker limit of a thread pool.", ("pool",),
+    callback=lambda: _anyio_samples("max") + _executor_samples("max")
+))
+THREADPOOL_BUSY = registry.register(Gauge(
+    "seedr_threadpool_busy_workers", "Workers currently running a task.", ("pool",),
+    callback=lambda: _anyio_samples("busy") + _executor_samples("busy")
+))
+THREADPOOL_QUEUED = registry.register(Gauge(
+    "seedr_threadpool_queued_tasks", "Tasks waiting for a free worker.", ("pool",),
+    callback=lambda: _anyio_samples("queued") + _executor_samples("queued")
+))
+
+
+class MetricsMiddleware:
+    """Record latency per method, route template and status, and requests in flight"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        method = scope["method"]
+        status = 500
+        start = time.perf_counter()
+
+        async def recording_send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        REQUESTS_IN_FLIGHT.inc(method)
+        try:
+            await self.app(scope, receive, recording_send)
+        finally:
+            REQUESTS_IN_FLIGHT.dec(method)
+            # The template keeps label cardinality bounded; unmatched paths share one label
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            REQUEST_LATENCY.observe(time.perf_counter() - start, method, route, str(status))
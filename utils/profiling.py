@@ -0,0 +1,181 @@
+"""Per-request sampling profiler
+
+Adding ``?profile=1`` to any request, together with an ``X-Profile-Token``
+header matching PROFILE_TOKEN, profiles that one request: a background
+thread samples the stacks of the threads running the request's work every
+PROFILE_INTERVAL seconds while the request runs. The response is replaced by a JSON summary
+with the stacks in folded format (``frame;frame;frame count``, one line per
+distinct stack, ready for flamegraph.pl or speedscope) and the request's
+trace spans.
+
+The profiler is kept in a context variable for the request. The event
+loop thread is sampled for the whole request, and each thread pool worker
+is sampled only while it runs the request's endpoint (``profiled_thread``,
+entered by ``SerializedRoute``). Stacks of other requests handled by pool
+workers and of background threads are therefore left out. Async code of
+concurrent requests shares the event loop thread, so it can still show up
+in samples. Threads parked in a wait (the event loop in ``select``) are
+skipped. Profiling is off when PROFILE_TOKEN is empty.
+"""
+import contextvars
+import hmac
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+from urllib.parse import parse_qs
+
+import orjson
+
+from config import settings
+from utils.tracing import collect
+
+# Leaf frames of threads that are blocked waiting rather than working
+_IDLE_LEAVES = {
+    ("threading.py", "wait"), ("threading.py", "_wait_for_tstate_lock"),
+    ("queue.py", "get"), ("selectors.py", "select"), ("selectors.py", "poll"),
+    ("thread.py", "_worker")
+}
+
+
+_profiler: contextvars.ContextVar[Optional['SamplingProfiler']] = contextvars.ContextVar('request_profiler', default=None)
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """Collect folded stacks of the tracked threads at a fixed interval"""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.threads: Counter = Counter()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def track(self, thread_id: int):
+        with self._lock:
+            self.threads[thread_id] += 1
+
+    def untrack(self, thread_id: int):
+        with self._lock:
+            self.threads[thread_id] -= 1
+            if self.threads[thread_id] <= 0:
+                del self.threads[thread_id]
+
+    def _sample(self):
+        with self._lock:
+            tracked = list(self.threads)
+        names = {t.ident: t.name for t in threading.enumerate()}
+        frames = sys._current_frames()
+        for thread_id in tracked:
+            frame = frames.get(thread_id)
+            if frame is None:
+                continue
+            code = frame.f_code
+            if (os.path.basename(code.co_filename), code.co_name) in _IDLE_LEAVES:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            stack.append(names.get(thread_id, str(thread_id)))
+            self.stacks[';'.join(reversed(stack))] += 1
+        self.samples += 1
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def folded(self):
+        return [f"{stack} {count}" for stack, count in self.stacks.most_common()]
+
+
+@contextmanager
+def profiled_thread() -> Iterator[None]:
+    """Sample the calling thread while the block runs, if the current request is being profiled"""
+    profiler = _profiler.get()
+    if profiler is None:
+        yield
+        return
+    thread_id = threading.get_ident()
+    profiler.track(thread_id)
+    try:
+        yield
+    finally:
+        profiler.untrack(thread_id)
+
+
+def _profile_requested(scope) -> bool:
+    if not settings.PROFILE_TOKEN or scope["type"] != "http":
+        return False
+    if parse_qs(scope.get("query_string", b"").decode("latin-1")).get("profile", [""])[0] not in ("1", "true"):
+        return False
+    token: Optional[bytes] = None
+    for key, value in scope.get("headers", []):
+        if key == b"x-profile-token":
+            token = value
+            break
+    return token is not None and hmac.compare_digest(token, settings.PROFILE_TOKEN.encode())
+
+
+class ProfilingMiddleware:
+    """Replace the response of an authorised ``?profile=1`` request with its profile"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if not _profile_requested(scope):
+            return await self.app(scope, receive, send)
+
+        response: Dict[str, int] = {"status": 500, "bytes": 0}
+
+        async def capture(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+            elif message["type"] == "http.response.body":
+                response["bytes"] += len(message.get("body", b""))
+
+        profiler = SamplingProfiler(settings.PROFILE_INTERVAL)
+        token = _profiler.set(profiler)
+        start = time.perf_counter()
+        with collect() as spans, profiled_thread():
+            profiler.start()
+            try:
+                await self.app(scope, receive, capture)
+            finally:
+                profiler.stop()
+                _profiler.reset(token)
+        elapsed = time.perf_counter() - start
+
+        body = orjson.dumps({
+            "status": response["status"],
+            "response_bytes": response["bytes"],
+            "elapsed_seconds": round(elapsed, 6),
+            "interval_seconds": settings.PROFILE_INTERVAL,
+            "samples": profiler.samples,
+            "folded": profiler.folded(),
+            "spans": [span.to_otlp() for span in spans]
+        })
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+        })
+        await send({"type": "http.response.body", "body": body})
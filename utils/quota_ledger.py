@@ -0,0 +1,291 @@
+"""Per-user quota ledger
+
+Keeps the last memory/bandwidth reading for each user together with the
+space reserved by adds that are still in flight. Admission decisions are
+taken under a lock against ``space_max - space_used - reserved``, so
+concurrent smart adds cannot all pass against the same free space, and most
+of them never need a ``get_memory_bandwidth`` round-trip.
+
+Seedr counts an added torrent in ``space_used`` straight away, so a
+reservation is released by the first reading taken after its add
+succeeded. Reservations are also released when the torrent leaves the
+active list (completed or failed), when it is deleted, when the add itself
+fails, or after QUOTA_RESERVATION_TTL as a last resort.
+
+Readings older than QUOTA_LEDGER_REFRESH_INTERVAL seconds are refreshed on
+the next snapshot, root listings refresh them for free, and a background
+thread refreshes users that hold reservations every interval, so their
+reservations turn into counted space promptly.
+"""
+import logging
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from threading import Lock
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from config import settings
+from utils.metrics import CACHE_REQUESTS
+from utils.torrent_index import normalize_infohash
+
+logger = logging.getLogger(__name__)
+
+# Freshly added torrents may not show up in listings straight away
+RECONCILE_GRACE_SECONDS = 30.0
+
+
+@dataclass
+class Reservation:
+    """Space held by an add that has not completed yet"""
+    id: str
+    size: int
+    created_at: float
+    torrent_id: Optional[str] = None
+    torrent_hash: Optional[str] = None
+    bound_at: Optional[float] = None
+
+
+@dataclass
+class _UserQuota:
+    space_used: int = 0
+    space_max: int = 0
+    fetched_at: float = 0.0
+    reservations: Dict[str, Reservation] = field(default_factory=dict)
+
+    @property
+    def reserved(self) -> int:
+        return sum(r.size for r in self.reservations.values())
+
+    @property
+    def known(self) -> bool:
+        return self.space_max > 0
+
+
+class QuotaLedger:
+    """Caches quota readings and tracks in-flight reservations per user"""
+
+    def __init__(self):
+        self.users: Dict[str, _UserQuota] = {}
+        self.lock = Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _get(self, user_id: str) -> _UserQuota:
+        quota = self.users.get(user_id)
+        if quota is None:
+            quota = self.users[user_id] = _UserQuota()
+        return quota
+
+    def _expire(self, quota: _UserQuota, now: float):
+        ttl = settings.QUOTA_RESERVATION_TTL
+        for reservation_id in [r.id for r in quota.reservations.values() if now - r.created_at > ttl]:
+            logger.warning(f"Reservation {reservation_id} expired without reconciliation")
+            del quota.reservations[reservation_id]
+
+    def _is_stale(self, quota: _UserQuota, now: float) -> bool:
+        return not quota.known or now - quota.fetched_at > settings.QUOTA_LEDGER_REFRESH_INTERVAL
+
+    def record_reading(self, user_id: str, space_used: int, space_max: int, taken_at: Optional[float] = None):
+        """
+        Store a fresh quota reading.
+
+        ``taken_at`` is the monotonic time the reading was requested at (now
+        when unknown). Reservations whose add had succeeded by then are
+        already part of ``space_used`` and are released.
+        """
+        if not space_max:
+            return
+        now = time.monotonic()
+        taken_at = now if taken_at is None else taken_at
+        with self.lock:
+            quota = self._get(user_id)
+            quota.space_used = space_used
+            quota.space_max = space_max
+            quota.fetched_at = now
+            for reservation in list(quota.reservations.values()):
+                if reservation.bound_at is not None and reservation.bound_at <= taken_at:
+                    del quota.reservations[reservation.id]
+
+    def refresh(self, user_id: str, client: Any) -> bool:
+        """Fetch the current quota from Seedr"""
+        taken_at = time.monotonic()
+        try:
+            memory_bandwidth = client.get_memory_bandwidth()
+        except Exception as e:
+            logger.error(f"Error fetching available space: {str(e)}")
+            return False
+        self.record_reading(
+            user_id,
+            getattr(memory_bandwidth, 'space_used', 0),
+            getattr(memory_bandwidth, 'space_max', 0),
+            taken_at
+        )
+        return True
+
+    def snapshot(self, user_id: str, client: Any) -> Tuple[int, int, int, int]:
+        """
+        Return (available, used, max, reserved), refreshing the reading if stale.
+
+        ``available`` already excludes in-flight reservations. All values are
+        0 when the quota could not be read.
+        """
+        with self.lock:
+            stale = self._is_stale(self._get(user_id), time.monotonic())
+        CACHE_REQUESTS.inc("quota", "miss" if stale else "hit")
+        if stale:
+            self.refresh(user_id, client)
+        with self.lock:
+            quota = self._get(user_id)
+            self._expire(quota, time.monotonic())
+            if not quota.known:
+                return 0, 0, 0, 0
+            reserved = quota.reserved
+            return quota.space_max - quota.space_used - reserved, quota.space_used, quota.space_max, reserved
+
+    def admit(self, user_id: str, size: int) -> Tuple[bool, Optional[Reservation], int, int]:
+        """
+        Atomically decide whether ``size`` bytes fit and reserve them if so.
+
+        Returns (admitted, reservation, available, reserved). Unknown sizes
+        or quotas are admitted without a reservation.
+        """
+        with self.lock:
+            quota = self._get(user_id)
+            now = time.monotonic()
+            self._expire(quota, now)
+            reserved = quota.reserved
+            available = quota.space_max - quota.space_used - reserved if quota.known else 0
+            if size <= 0 or not quota.known:
+                return True, None, available, reserved
+            if size > available:
+                return False, None, available, reserved
+            reservation = Reservation(id=uuid.uuid4().hex, size=size, created_at=now)
+            quota.reservations[reservation.id] = reservation
+            return True, reservation, available, reserved
+
+    def bind(self, user_id: str, reservation_id: Optional[str], torrent_id: Any = None, torrent_hash: Optional[str] = None):
+        """Attach the Seedr torrent to a reservation once the add succeeded"""
+        if not reservation_id:
+            return
+        with self.lock:
+            reservation = self._get(user_id).reservations.get(reservation_id)
+            if reservation:
+                reservation.torrent_id = str(torrent_id) if torrent_id else None
+                reservation.torrent_hash = normalize_infohash(torrent_hash) if torrent_hash else None
+                reservation.bound_at = time.monotonic()
+
+    def release(self, user_id: str, reservation_id: Optional[str]):
+        """Drop a reservation (the add failed or the torrent finished)"""
+        if not reservation_id:
+            return
+        with self.lock:
+            quota = self._get(user_id)
+            if quota.reservations.pop(reservation_id, None):
+                quota.fetched_at = 0.0
+
+    def release_torrent(self, user_id: str, torrent_id: Any = None, torrent_hash: Optional[str] = None):
+        """Drop the reservation bound to a torrent, by id or hash"""
+        torrent_id = str(torrent_id) if torrent_id else None
+        torrent_hash = normalize_infohash(torrent_hash) if torrent_hash else None
+        with self.lock:
+            quota = self._get(user_id)
+            for reservation in list(quota.reservations.values()):
+                if (torrent_id and reservation.torrent_id == torrent_id) or \
+                   (torrent_hash and reservation.torrent_hash == torrent_hash):
+                    del quota.reservations[reservation.id]
+                    quota.fetched_at = 0.0
+
+    def invalidate(self, user_id: str):
+        """Force the next snapshot to re-read the quota (e.g. after a delete)"""
+        with self.lock:
+            self._get(user_id).fetched_at = 0.0
+
+    def observe_listing(self, user_id: str, contents: Any, root: bool = True):
+        """
+        Reconcile against a listing result.
+
+        Root listings carry ``space_used``/``space_max`` and the full list of
+        active torrents: the reading is refreshed for free and reservations
+        whose torrent is no longer active are released. The listing may
+        have been requested up to SEEDR_TIMEOUT ago, so only adds that
+        succeeded before then count as included in it.
+        """
+        if not root:
+            return
+        self.record_reading(
+            user_id, getattr(contents, 'space_used', 0), getattr(contents, 'space_max', 0),
+            time.monotonic() - settings.SEEDR_TIMEOUT
+        )
+        self.reconcile(user_id, getattr(contents, 'torrents', None) or [])
+
+    def reconcile(self, user_id: str, active_torrents: Iterable[Any]):
+        """Release bound reservations whose torrent is no longer active"""
+        active_ids = set()
+        active_hashes = set()
+        for torrent in active_torrents:
+            active_ids.add(str(getattr(torrent, 'id', '')))
+            active_hashes.add(normalize_infohash(getattr(torrent, 'hash', '')))
+        with self.lock:
+            quota = self._get(user_id)
+            now = time.monotonic()
+            for reservation in list(quota.reservations.values()):
+                if reservation.torrent_id is None and reservation.torrent_hash is None:
+                    continue
+                if now - reservation.created_at < RECONCILE_GRACE_SECONDS:
+                    continue
+                if reservation.torrent_id in active_ids or reservation.torrent_hash in active_hashes:
+                    continue
+                del quota.reservations[reservation.id]
+
+    # Background refresh
+
+    def _run(self):
+        from utils.seedr_client import client_manager
+        while not self._stop.wait(settings.QUOTA_LEDGER_REFRESH_INTERVAL):
+            with self.lock:
+                user_ids = [user_id for user_id, quota in self.users.items() if quota.reservations]
+            for user_id in user_ids:
+                client = client_manager.get_client(user_id)
+                if client is not None:
+                    self.refresh(user_id, client)
+
+    def start(self):
+        """Start the background refresh (disabled when QUOTA_LEDGER_REFRESH_INTERVAL is 0)"""
+        if settings.QUOTA_LEDGER_REFRESH_INTERVAL <= 0:
+            return
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="quota-refresh", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def status(self, user_id: str) -> Dict[str, Any]:
+        """Snapshot of the ledger for a user (no upstream calls)"""
+        with self.lock:
+            quota = self._get(user_id)
+            now = time.monotonic()
+            return {
+                "space_used": quota.space_used,
+                "space_max": quota.space_max,
+                "reserved": quota.reserved,
+                "available": quota.space_max - quota.space_used - quota.reserved if quota.known else 0,
+                "reading_age_seconds": round(now - quota.fetched_at, 1) if quota.fetched_at else None,
+                "reservations": [
+                    {
+                        "id": r.id,
+                        "size": r.size,
+                        "torrent_id": r.torrent_id,
+                        "torrent_hash": r.torrent_hash,
+                        "age_seconds": round(now - r.created_at, 1)
+                    }
+                    for r in quota.reservations.values()
+                ]
+            }
+
+
+# Global quota ledger instance
+quota_ledger = QuotaLedger()
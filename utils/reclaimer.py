@@ -0,0 +1,280 @@
+"""Storage reclamation for full accounts
+
+Tracks when top-level folders were last used through this API (file
+fetches, archives, completed downloads) and, when an add needs space,
+picks folders to evict by policy:
+
+- ``lru``: least recently accessed first (never-accessed folders by age)
+- ``age``: oldest ``last_update`` first
+- ``size``: largest first
+
+Pinned folders are never evicted. Plans can be previewed (dry run) before
+anything is deleted. Reclamation is opt-in per request.
+
+Folder metadata, access times and pins are kept as one record per folder
+(or file) in the shared state database, so every worker process sees the
+same usage and no worker overwrites another's. Listings are recorded only
+when they changed (or after ``_LISTING_INTERVAL``), and root listings only
+when a plan is made, so browsing does not write to the database.
+"""
+import logging
+import sqlite3
+import time
+from datetime import datetime
+from threading import RLock
+from typing import Any, Dict, List, Optional, Tuple
+
+from config import settings
+from utils.account_cache import account_cache
+from utils.quota_ledger import quota_ledger
+from utils.shared_state import SharedState, shared_state
+
+logger = logging.getLogger(__name__)
+
+POLICIES = ("lru", "age", "size")
+
+# Minimum seconds between access-time writes to the shared state
+_SAVE_INTERVAL = 10.0
+
+# Seconds an unchanged listing is not recorded again, and how many listings
+# are remembered per process
+_LISTING_INTERVAL = 60.0
+_MAX_LISTINGS = 10000
+
+# Shared state namespaces, keyed by "<user_id>|<folder or file id>"
+_FOLDERS = "reclaim-folders"
+_ACCESS = "reclaim-access"
+_FILES = "reclaim-files"
+_PINS = "reclaim-pins"
+# Folder and file ids seen in the last listing of each folder, used to drop
+# the records of folders and files that have since been deleted
+_CHILDREN = "reclaim-children"
+
+
+def check_policy(policy: Optional[str]) -> str:
+    """Return the normalised policy name (RECLAIM_POLICY when None); ValueError when unknown"""
+    policy = (policy or settings.RECLAIM_POLICY).lower()
+    if policy not in POLICIES:
+        raise ValueError(f"Unknown reclamation policy '{policy}'. Use one of: {', '.join(POLICIES)}")
+    return policy
+
+
+def _timestamp(value: Any) -> float:
+    if isinstance(value, datetime):
+        return value.timestamp()
+    if isinstance(value, (int, float)):
+        return float(value)
+    return 0.0
+
+
+class StorageReclaimer:
+    """Tracks folder usage and evicts folders to make room for new torrents"""
+
+    def __init__(self, state: Optional[SharedState] = None):
+        self.shared_state = state or shared_state
+        self.lock = RLock()
+        self._pending_access: Dict[str, float] = {}
+        self._saved_at = 0.0
+        # "<user_id>|<folder id>" -> (fingerprint, monotonic time) of the last recorded listing
+        self._listings: Dict[str, Tuple[int, float]] = {}
+
+    # Persistence
+
+    def _save(self, force: bool = False):
+        if not self._pending_access:
+            return
+        if not force and time.monotonic() - self._saved_at < _SAVE_INTERVAL:
+            return
+        try:
+            self.shared_state.record_put(_ACCESS, self._pending_access)
+            self._pending_access = {}
+            self._saved_at = time.monotonic()
+        except sqlite3.Error as e:
+            logger.error(f"Error saving reclamation state: {e}")
+
+    def flush(self):
+        """Write pending access times to the shared state"""
+        with self.lock:
+            self._save(force=True)
+
+    def _access_times(self, user_id: str) -> Dict[str, float]:
+        prefix = f"{user_id}|"
+        times = {key[len(prefix):]: value for key, value in self.shared_state.records(_ACCESS, prefix).items()}
+        with self.lock:
+            for key, value in self._pending_access.items():
+                if key.startswith(prefix):
+                    times[key[len(prefix):]] = value
+        return times
+
+    # Usage tracking
+
+    def record_listing(self, user_id: str, folder_id: Any, contents: Any):
+        """Remember folder metadata and file -> folder mapping from a listing"""
+        parent = None if str(folder_id) in ('0', '-1') else str(folder_id)
+        folders = {
+            str(folder.id): {
+                "name": getattr(folder, 'name', ''),
+                "size": getattr(folder, 'size', 0),
+                "last_update": _timestamp(getattr(folder, 'last_update', None)),
+                "parent": parent
+            }
+            for folder in getattr(contents, 'folders', None) or []
+        }
+        files = []
+        if parent is not None:
+            files = [str(file.folder_file_id) for file in getattr(contents, 'files', None) or []]
+        children_key = f"{user_id}|{parent or '0'}"
+        fingerprint = hash((tuple(sorted((key, tuple(value.values())) for key, value in folders.items())), tuple(sorted(files))))
+        now = time.monotonic()
+        with self.lock:
+            recorded = self._listings.get(children_key)
+        if recorded and recorded[0] == fingerprint and now - recorded[1] < _LISTING_INTERVAL:
+            return
+        try:
+            previous = self.shared_state.record_get(_CHILDREN, children_key) or {"folders": [], "files": []}
+            self._forget_folders(user_id, [f for f in previous["folders"] if f not in folders])
+            self.shared_state.record_delete(_FILES, [f"{user_id}|{f}" for f in set(previous["files"]) - set(files)])
+            self.shared_state.record_put(_FOLDERS, {f"{user_id}|{key}": value for key, value in folders.items()})
+            self.shared_state.record_put(_FILES, {f"{user_id}|{file_id}": parent for file_id in files})
+            self.shared_state.record_put(_CHILDREN, {children_key: {"folders": sorted(folders), "files": sorted(files)}})
+        except sqlite3.Error as e:
+            logger.error(f"Error saving reclamation state: {e}")
+            return
+        with self.lock:
+            if len(self._listings) >= _MAX_LISTINGS:
+                self._listings.clear()
+            self._listings[children_key] = (fingerprint, now)
+
+    def _forget_folders(self, user_id: str, folder_ids: List[str]):
+        """Drop the records of deleted folders, their subfolders and their files"""
+        folder_keys, file_keys = [], []
+        pending = list(folder_ids)
+        while pending:
+            key = f"{user_id}|{pending.pop()}"
+            folder_keys.append(key)
+            children = self.shared_state.record_get(_CHILDREN, key)
+            if children:
+                pending.extend(children["folders"])
+                file_keys.extend(f"{user_id}|{f}" for f in children["files"])
+        with self.lock:
+            for key in folder_keys:
+                self._pending_access.pop(key, None)
+                self._listings.pop(key, None)
+        for namespace in (_FOLDERS, _ACCESS, _CHILDREN):
+            self.shared_state.record_delete(namespace, folder_keys)
+        self.shared_state.record_delete(_FILES, file_keys)
+
+    def record_folder_access(self, user_id: str, folder_id: Any):
+        """Mark a folder (and its ancestors) as used now"""
+        now = time.time()
+        current = str(folder_id)
+        seen = set()
+        while current and current not in seen:
+            seen.add(current)
+            with self.lock:
+                self._pending_access[f"{user_id}|{current}"] = now
+            folder = self.shared_state.record_get(_FOLDERS, f"{user_id}|{current}")
+            current = folder.get("parent") if folder else None
+        with self.lock:
+            self._save()
+
+    def record_file_access(self, user_id: str, file_id: Any):
+        """Mark the folder holding a fetched file as used now"""
+        folder_id = self.shared_state.record_get(_FILES, f"{user_id}|{file_id}")
+        if folder_id:
+            self.record_folder_access(user_id, folder_id)
+
+    # Pins
+
+    def pins(self, user_id: str) -> List[str]:
+        prefix = f"{user_id}|"
+        return [key[len(prefix):] for key in self.shared_state.records(_PINS, prefix)]
+
+    def pin(self, user_id: str, folder_id: str):
+        self.shared_state.record_put(_PINS, {f"{user_id}|{folder_id}": True})
+
+    def unpin(self, user_id: str, folder_id: str) -> bool:
+        key = f"{user_id}|{folder_id}"
+        if self.shared_state.record_get(_PINS, key) is None:
+            return False
+        self.shared_state.record_delete(_PINS, [key])
+        return True
+
+    # Planning and eviction
+
+    def plan(self, user_id: str, client: Any, bytes_needed: int, policy: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Choose top-level folders to delete to free ``bytes_needed`` bytes.
+
+        Nothing is deleted; the plan can be shown as a dry-run preview or
+        passed to ``execute``.
+        """
+        policy = check_policy(policy)
+
+        contents = client.list_contents('0')
+        self.record_listing(user_id, '0', contents)
+
+        protected = set(self.pins(user_id)) | {p.strip() for p in settings.RECLAIM_PROTECTED_FOLDERS.split(',') if p.strip()}
+        access = self._access_times(user_id)
+        candidates = []
+        for folder in getattr(contents, 'folders', None) or []:
+            if str(folder.id) in protected or folder.name in protected:
+                continue
+            candidates.append({
+                "folder_id": str(folder.id),
+                "name": folder.name,
+                "size": getattr(folder, 'size', 0),
+                "last_update": _timestamp(getattr(folder, 'last_update', None)),
+                "last_access": access.get(str(folder.id))
+            })
+
+        if policy == "lru":
+            candidates.sort(key=lambda c: c["last_access"] or c["last_update"])
+        elif policy == "age":
+            candidates.sort(key=lambda c: c["last_update"])
+        else:
+            candidates.sort(key=lambda c: c["size"], reverse=True)
+
+        selected = []
+        freed = 0
+        for candidate in candidates:
+            if freed >= bytes_needed:
+                break
+            selected.append(candidate)
+            freed += candidate["size"]
+
+        return {
+            "policy": policy,
+            "bytes_needed": bytes_needed,
+            "bytes_freed": freed,
+            "sufficient": freed >= bytes_needed,
+            "folders": selected,
+            "protected": sorted(protected)
+        }
+
+    def execute(self, user_id: str, client: Any, plan: Dict[str, Any]) -> Dict[str, Any]:
+        """Delete the folders of a plan; returns what was actually removed"""
+        deleted = []
+        errors = []
+        for folder in plan["folders"]:
+            try:
+                client.delete_folder(folder["folder_id"])
+                deleted.append(folder)
+                logger.info(f"Reclaimed folder '{folder['name']}' ({folder['size']} bytes) for {user_id}")
+            except Exception as e:
+                errors.append({"folder_id": folder["folder_id"], "error": str(e)})
+        try:
+            self._forget_folders(user_id, [folder["folder_id"] for folder in deleted])
+        except sqlite3.Error as e:
+            logger.error(f"Error saving reclamation state: {e}")
+        quota_ledger.invalidate(user_id)
+        account_cache.invalidate_usage(user_id)
+        return {
+            "deleted": deleted,
+            "bytes_freed": sum(f["size"] for f in deleted),
+            "errors": errors
+        }
+
+
+# Global storage reclaimer instance
+storage_reclaimer = StorageReclaimer()
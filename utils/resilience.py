@@ -0,0 +1,242 @@
+"""Retries, deadlines and circuit breaking for upstream Seedr calls
+
+Every seedrcc call made through ``InstrumentedSeedr`` runs through
+``resilient_call``:
+
+* Transient failures (network errors and 5xx responses) of read-only
+  methods are retried with full-jitter exponential backoff. Writes are
+  attempted once, unless the incoming request carried an
+  ``Idempotency-Key`` header, in which case the client has said a repeat
+  is safe and writes are retried like reads.
+* The attempts and the sleeps between them share a deadline budget of
+  SEEDR_CALL_DEADLINE seconds. A retry is only started when the backoff
+  sleep plus a full attempt (SEEDR_TIMEOUT) still fits in what is left of
+  the budget, so no retry can end after the deadline.
+* Consecutive transient failures open a circuit breaker, both for the user
+  and for the Seedr host as a whole. While a breaker is open, calls fail
+  immediately with ``CircuitOpenError`` instead of adding load to a
+  struggling upstream. After SEEDR_BREAKER_COOLDOWN seconds, one trial call
+  is let through; its outcome closes or re-opens the breaker.
+
+``upstream_error`` maps the resulting exceptions onto HTTP responses: 503
+with ``Retry-After`` while a breaker is open, 502 for transient failures
+that outlasted the retries, and 500 for everything else as before.
+"""
+import contextvars
+import math
+import random
+import time
+from threading import Lock
+from typing import Any, Callable, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+from fastapi import HTTPException
+from seedrcc.exceptions import NetworkError, SeedrError, ServerError
+
+from config import settings
+from utils.metrics import Counter, registry
+from utils.tracing import current_span
+
+# Every seedrcc endpoint lives on this host (unless SEEDR_BASE_URL points elsewhere)
+SEEDR_HOST = "www.seedr.cc"
+
+# seedrcc methods that only read state and are always safe to repeat
+READ_METHODS = frozenset({
+    "list_contents", "get_settings", "get_memory_bandwidth", "get_devices",
+    "fetch_file", "search_files", "get_torrent_progress", "scan_page"
+})
+
+TRANSIENT_ERRORS = (NetworkError, ServerError)
+
+UPSTREAM_RETRIES = registry.register(Counter(
+    "seedr_upstream_retries_total", "Upstream Seedr call attempts that were retried.", ("method",)
+))
+CIRCUIT_REJECTIONS = registry.register(Counter(
+    "seedr_circuit_rejections_total", "Upstream Seedr calls refused by an open circuit breaker.", ("scope",)
+))
+
+_idempotency_key: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar('idempotency_key', default=None)
+
+
+class CircuitOpenError(SeedrError):
+    """Raised instead of calling Seedr while a circuit breaker is open"""
+
+    def __init__(self, scope: str, retry_after: float):
+        self.scope = scope
+        self.retry_after = retry_after
+        super().__init__(f"Seedr is unavailable ({scope} circuit open); retry in {math.ceil(retry_after)}s")
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker: closed, open for a cooldown, then half-open for one trial call"""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, threshold: int, cooldown: float):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.lock = Lock()
+
+    def retry_after(self) -> float:
+        """Seconds until a call may be attempted (0 when one may be attempted now)"""
+        with self.lock:
+            if self.state == self.CLOSED:
+                return 0.0
+            remaining = self.opened_at + self.cooldown - time.monotonic()
+            if self.state == self.OPEN and remaining <= 0:
+                return 0.0
+            # Half-open with its trial call still running: wait for the trial's outcome
+            return max(remaining, 1.0)
+
+    def allow(self) -> bool:
+        """Whether a call may go ahead; moves an expired open breaker to half-open for one trial"""
+        with self.lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() >= self.opened_at + self.cooldown:
+                self.state = self.HALF_OPEN
+                return True
+            return False
+
+    def record_success(self):
+        with self.lock:
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+    def release(self):
+        """End a trial call that failed for a non-transient reason without judging the upstream"""
+        with self.lock:
+            if self.state == self.HALF_OPEN:
+                self.state = self.OPEN
+
+
+class BreakerRegistry:
+    """Circuit breakers by (scope, name), created on first use"""
+
+    def __init__(self):
+        self.breakers: Dict[Tuple[str, str], CircuitBreaker] = {}
+        self.lock = Lock()
+
+    def get(self, scope: str, name: str) -> CircuitBreaker:
+        key = (scope, name)
+        breaker = self.breakers.get(key)
+        if breaker is None:
+            with self.lock:
+                breaker = self.breakers.get(key)
+                if breaker is None:
+                    breaker = self.breakers[key] = CircuitBreaker(
+                        settings.SEEDR_BREAKER_THRESHOLD, settings.SEEDR_BREAKER_COOLDOWN
+                    )
+        return breaker
+
+    def reset(self):
+        with self.lock:
+            self.breakers.clear()
+
+
+# Global circuit breaker registry
+breakers = BreakerRegistry()
+
+
+def seedr_host() -> str:
+    return urlsplit(settings.SEEDR_BASE_URL).netloc or SEEDR_HOST
+
+
+def backoff(attempt: int) -> float:
+    """Full-jitter exponential backoff before retry number ``attempt + 1``"""
+    return random.uniform(0, min(settings.SEEDR_BACKOFF_MAX, settings.SEEDR_BACKOFF * (2 ** attempt)))
+
+
+def is_retryable(method: str) -> bool:
+    return method in READ_METHODS or _idempotency_key.get() is not None
+
+
+def resilient_call(method: str, fn: Callable, args: tuple, kwargs: Dict[str, Any],
+                   user_id: Optional[str] = None) -> Any:
+    """Call ``fn`` under the retry policy, deadline budget and circuit breakers for ``user_id``"""
+    scoped = [("host", breakers.get("host", seedr_host()))]
+    if user_id:
+        scoped.append(("user", breakers.get("user", user_id)))
+
+    deadline = time.monotonic() + settings.SEEDR_CALL_DEADLINE
+    attempts = settings.SEEDR_MAX_RETRIES + 1 if is_retryable(method) else 1
+    span = current_span()
+
+    for attempt in range(attempts):
+        admitted = []
+        for scope, breaker in scoped:
+            if not breaker.allow():
+                for other in admitted:
+                    other.release()
+                CIRCUIT_REJECTIONS.inc(scope)
+                raise CircuitOpenError(scope, breaker.retry_after())
+            admitted.append(breaker)
+
+        try:
+            result = fn(*args, **kwargs)
+        except TRANSIENT_ERRORS:
+            for breaker in admitted:
+                breaker.record_failure()
+            delay = backoff(attempt)
+            if attempt + 1 >= attempts or time.monotonic() + delay + settings.SEEDR_TIMEOUT > deadline:
+                raise
+            UPSTREAM_RETRIES.inc(method)
+            if span is not None:
+                span.event("retry")
+            time.sleep(delay)
+            continue
+        except BaseException:
+            # Seedr answered (e.g. an API or auth error): the upstream is up, but the call didn't succeed
+            for breaker in admitted:
+                breaker.release()
+            raise
+
+        for breaker in admitted:
+            breaker.record_success()
+        if span is not None and attempt:
+            span.set("seedr.attempts", attempt + 1)
+        return result
+
+
+def upstream_error(e: SeedrError) -> HTTPException:
+    """HTTP error for a failed Seedr call"""
+    if isinstance(e, CircuitOpenError):
+        return HTTPException(
+            status_code=503, detail=str(e), headers={"Retry-After": str(max(1, math.ceil(e.retry_after)))}
+        )
+    if isinstance(e, TRANSIENT_ERRORS):
+        return HTTPException(status_code=502, detail=f"Seedr upstream error: {e}")
+    return HTTPException(status_code=500, detail=str(e))
+
+
+class IdempotencyKeyMiddleware:
+    """Make the request's ``Idempotency-Key`` header visible to the retry policy"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        key = None
+        for name, value in scope.get("headers", []):
+            if name == b"idempotency-key":
+                key = value.decode("latin-1") or None
+                break
+        token = _idempotency_key.set(key)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _idempotency_key.reset(token)
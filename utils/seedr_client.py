@@ -1,9 +1,159 @@
 import json
-import os
+import logging
+import sqlite3
+import time
 from threading import Lock
-from typing import Optional, Dict, Any
-from seedrcc import Seedr
+from typing import Optional, Dict, Any, Callable
+import orjson
+from seedrcc import Seedr, _constants
+from seedrcc.models import ListContentsResult
 from config import settings
+from utils.metrics import CACHE_REQUESTS, TOKEN_REFRESHES, UPSTREAM_LATENCY
+from utils.coalescing import call_key, single_flight
+from utils.resilience import READ_METHODS, resilient_call
+from utils.shared_state import LeaderLease, shared_state
+from utils.serialization import dumps
+from utils.tracing import KIND_CLIENT, record_http_response, record_token_refresh, start_span
+from utils.tree_mirror import tree_mirror
+
+logger = logging.getLogger(__name__)
+
+
+# seedrcc endpoint URLs, as paths below the Seedr origin
+_ENDPOINTS = {
+    "RESOURCE_URL": "/oauth_test/resource.php",
+    "TOKEN_URL": "/oauth_test/token.php",
+    "DEVICE_CODE_URL": "/api/device/code",
+    "DEVICE_AUTHORIZE_URL": "/api/device/authorize",
+}
+_DEFAULT_ORIGIN = "https://www.seedr.cc"
+
+
+def configure_endpoints(base_url: Optional[str] = None):
+    """Point seedrcc at another Seedr origin, e.g. the local simulator; None or "" restores www.seedr.cc
+
+    seedrcc reads these module constants at call time, so this also affects
+    clients that already exist.
+    """
+    origin = (base_url or _DEFAULT_ORIGIN).rstrip('/')
+    for name, path in _ENDPOINTS.items():
+        setattr(_constants, name, origin + path)
+
+
+if settings.SEEDR_BASE_URL:
+    configure_endpoints(settings.SEEDR_BASE_URL)
+
+
+# Reads whose results are shared between worker processes, with the type to rebuild them as
+SHARED_CACHE_METHODS = {"list_contents": ListContentsResult}
+
+
+class InstrumentedSeedr:
+    """
+    Seedr client proxy that instruments every public method call.
+
+    Each call runs under the retry policy and circuit breakers of
+    ``utils.resilience``, and identical concurrent reads share one upstream
+    call (``utils.coalescing``). With SEEDR_SHARED_LISTING_TTL set, folder
+    listings are also kept in the cross-process cache of
+    ``utils.shared_state`` and any write by the user drops them. With the
+    tree mirror enabled, writes are also applied to ``utils.tree_mirror``
+    once Seedr accepts them. Calls are
+    timed into the upstream latency histogram and, while tracing is
+    recording, run inside a client span (see ``utils.tracing``) that the
+    client's httpx response hook and token refresh callback annotate with
+    request counts, bytes received and refreshes.
+    """
+
+    def __init__(self, client: Seedr, user_id: Optional[str] = None):
+        self._client = client
+        self._user_id = user_id
+        self._methods: Dict[str, Callable] = {}
+
+    @property
+    def user_id(self) -> Optional[str]:
+        return self._user_id
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self._client, name)
+        if name.startswith('_') or not callable(attr):
+            return attr
+        method = self._methods.get(name)
+        if method is None:
+            method = self._methods[name] = self._instrumented(name, attr)
+        return method
+
+    def _instrumented(self, name: str, method: Callable) -> Callable:
+        attributes = {"rpc.system": "seedr", "rpc.method": name}
+        if self._user_id:
+            attributes["enduser.id"] = self._user_id
+
+        def call(*args, **kwargs):
+            start = time.perf_counter()
+            outcome = "error"
+            with start_span(f"seedr.{name}", KIND_CLIENT, attributes):
+                try:
+                    result = self._call(name, method, args, kwargs)
+                    outcome = "ok"
+                    return result
+                finally:
+                    UPSTREAM_LATENCY.observe(time.perf_counter() - start, name, outcome)
+        call.__name__ = name
+        return call
+
+    def _call(self, name: str, method: Callable, args: tuple, kwargs: Dict[str, Any]) -> Any:
+        shared_key = None
+        if name in SHARED_CACHE_METHODS and self._user_id and settings.SEEDR_SHARED_LISTING_TTL > 0:
+            shared_key = f"{self._user_id}|{name}|{json.dumps([args, kwargs], sort_keys=True, default=str)}"
+            cached = self._shared_get(shared_key)
+            if cached is not None:
+                CACHE_REQUESTS.inc("shared_listing", "hit")
+                return SHARED_CACHE_METHODS[name].from_dict(orjson.loads(cached))
+            CACHE_REQUESTS.inc("shared_listing", "miss")
+
+        key = None
+        if name in READ_METHODS and settings.SEEDR_COALESCE_READS:
+            key = call_key(self._user_id or id(self._client), name, args, kwargs)
+        if key is None:
+            result = resilient_call(name, method, args, kwargs, self._user_id)
+        else:
+            result = single_flight.do(key, lambda: resilient_call(name, method, args, kwargs, self._user_id), name)
+
+        if shared_key is not None:
+            self._shared_put(shared_key, result)
+        elif name not in READ_METHODS and self._user_id and settings.SEEDR_SHARED_LISTING_TTL > 0:
+            self._shared_invalidate()
+        if name not in READ_METHODS and self._user_id and tree_mirror.enabled:
+            self._mirror_write(name, args, kwargs)
+        return result
+
+    def _shared_get(self, key: str) -> Optional[bytes]:
+        try:
+            return shared_state.cache_get("seedr", key)
+        except sqlite3.Error as e:
+            logger.error(f"Shared cache read failed: {e}")
+            return None
+
+    def _shared_put(self, key: str, result: Any):
+        raw = getattr(result, '_raw', None)
+        if raw is None:
+            return
+        try:
+            shared_state.cache_put("seedr", key, dumps(raw), settings.SEEDR_SHARED_LISTING_TTL)
+        except sqlite3.Error as e:
+            logger.error(f"Shared cache write failed: {e}")
+
+    def _mirror_write(self, name: str, args: tuple, kwargs: Dict[str, Any]):
+        try:
+            tree_mirror.apply_write(self._user_id, name, args, kwargs)
+        except sqlite3.Error as e:
+            logger.error(f"Tree mirror write-through failed: {e}")
+
+    def _shared_invalidate(self):
+        try:
+            shared_state.cache_delete("seedr", f"{self._user_id}|")
+        except sqlite3.Error as e:
+            logger.error(f"Shared cache invalidation failed: {e}")
 
 
 class SeedrClientManager:
@@ -12,9 +162,24 @@ class SeedrClientManager:
     def __init__(self):
         self.clients: Dict[str, Seedr] = {}
         self.lock = Lock()
-        self.token_storage_path = settings.TOKEN_STORAGE_PATH
         self._default_auth_initialized = False
     
+    def _client_options(self) -> Dict[str, Any]:
+        """httpx options shared by every Seedr client"""
+        return {
+            "timeout": settings.SEEDR_TIMEOUT,
+            "proxy": settings.encoded_proxy,
+            "event_hooks": {"response": [record_http_response]}
+        }
+    
+    def _refresh_callback(self, user_id: str) -> Callable[[Any], None]:
+        """on_token_refresh callback persisting the new token for ``user_id``"""
+        def on_token_refresh(token_data):
+            TOKEN_REFRESHES.inc()
+            record_token_refresh()
+            self._save_token(user_id, token_data)
+        return on_token_refresh
+    
     def _token_to_dict(self, token_data: Any) -> Dict[str, Any]:
         """Convert token data to dictionary format"""
         # If it's already a dict, return as-is
@@ -36,54 +201,28 @@ class SeedrClientManager:
             raise ValueError(f"Cannot convert token data of type {type(token_data)} to dict")
     
     def _save_token(self, user_id: str, token_data: Any):
-        """Save token data to storage"""
+        """Save token data to the shared token store"""
         try:
-            # Load existing tokens
-            tokens = {}
-            if os.path.exists(self.token_storage_path):
-                try:
-                    with open(self.token_storage_path, 'r') as f:
-                        tokens = json.load(f)
-                except json.JSONDecodeError as json_err:
-                    print(f"Warning: Corrupted token file detected ({json_err}). Resetting token storage.")
-                    tokens = {}
-            
-            # Update with new token (convert to dict if needed)
-            tokens[user_id] = self._token_to_dict(token_data)
-            
-            # Save back to file
-            with open(self.token_storage_path, 'w') as f:
-                json.dump(tokens, f, indent=2)
+            shared_state.put_token(user_id, self._token_to_dict(token_data))
         except Exception as e:
             print(f"Error saving token: {e}")
     
     def _load_token(self, user_id: str) -> Optional[Dict[str, Any]]:
-        """Load token data from storage"""
+        """Load token data from the shared token store"""
         try:
-            if os.path.exists(self.token_storage_path):
-                try:
-                    with open(self.token_storage_path, 'r') as f:
-                        tokens = json.load(f)
-                        return tokens.get(user_id)
-                except json.JSONDecodeError as json_err:
-                    print(f"Warning: Corrupted token file detected while loading ({json_err}). Cannot load token.")
-                    return None
+            return shared_state.get_token(user_id)
         except Exception as e:
             print(f"Error loading token: {e}")
         return None
     
     def create_client_from_password(self, username: str, password: str) -> Seedr:
         """Create Seedr client using password authentication"""
-        def on_token_refresh(token_data):
-            self._save_token(username, token_data)
-        
-        client = Seedr.from_password(
+        client = InstrumentedSeedr(Seedr.from_password(
             username=username,
             password=password,
-            on_token_refresh=on_token_refresh,
-            timeout=settings.SEEDR_TIMEOUT,
-            proxy=settings.encoded_proxy
-        )
+            on_token_refresh=self._refresh_callback(username),
+            **self._client_options()
+        ), username)
         
         with self.lock:
             self.clients[username] = client
@@ -96,15 +235,11 @@ class SeedrClientManager:
     
     def create_client_from_device_code(self, device_code: str, user_id: str = 'default') -> Seedr:
         """Create Seedr client using device code authentication"""
-        def on_token_refresh(token_data):
-            self._save_token(user_id, token_data)
-        
-        client = Seedr.from_device_code(
+        client = InstrumentedSeedr(Seedr.from_device_code(
             device_code=device_code,
-            on_token_refresh=on_token_refresh,
-            timeout=settings.SEEDR_TIMEOUT,
-            proxy=settings.encoded_proxy
-        )
+            on_token_refresh=self._refresh_callback(user_id),
+            **self._client_options()
+        ), user_id)
         
         with self.lock:
             self.clients[user_id] = client
@@ -117,15 +252,11 @@ class SeedrClientManager:
     
     def create_client_from_refresh_token(self, refresh_token: str, user_id: str = 'default') -> Seedr:
         """Create Seedr client using refresh token"""
-        def on_token_refresh(token_data):
-            self._save_token(user_id, token_data)
-        
-        client = Seedr.from_refresh_token(
+        client = InstrumentedSeedr(Seedr.from_refresh_token(
             refresh_token=refresh_token,
-            on_token_refresh=on_token_refresh,
-            timeout=settings.SEEDR_TIMEOUT,
-            proxy=settings.encoded_proxy
-        )
+            on_token_refresh=self._refresh_callback(user_id),
+            **self._client_options()
+        ), user_id)
         
         with self.lock:
             self.clients[user_id] = client
@@ -138,15 +269,11 @@ class SeedrClientManager:
     
     def create_client_from_token(self, token: Dict[str, Any], user_id: str = 'default') -> Seedr:
         """Create Seedr client from token data"""
-        def on_token_refresh(token_data):
-            self._save_token(user_id, token_data)
-        
-        client = Seedr(
+        client = InstrumentedSeedr(Seedr(
             token=token,
-            on_token_refresh=on_token_refresh,
-            timeout=settings.SEEDR_TIMEOUT,
-            proxy=settings.encoded_proxy
-        )
+            on_token_refresh=self._refresh_callback(user_id),
+            **self._client_options()
+        ), user_id)
         
         with self.lock:
             self.clients[user_id] = client
@@ -173,7 +300,7 @@ class SeedrClientManager:
         
         try:
             print(f"Initializing default authentication for user: {settings.DEFAULT_USERNAME}")
-            self.create_client_from_password(settings.DEFAULT_USERNAME, settings.DEFAULT_PASSWORD)
+            self._login_once(settings.DEFAULT_USERNAME, settings.DEFAULT_PASSWORD)
             # Store as 'default' user_id
             with self.lock:
                 if settings.DEFAULT_USERNAME in self.clients:
@@ -185,6 +312,31 @@ class SeedrClientManager:
             print(f"Failed to initialize default authentication: {e}")
             return False
     
+    def _login_once(self, username: str, password: str) -> Seedr:
+        """
+        Password login shared by all worker processes.
+        
+        The first worker to start logs in; workers starting at the same time
+        wait for it and use the token it stored instead of logging in too.
+        """
+        lease = LeaderLease(f"login:{username}", ttl=settings.SEEDR_TIMEOUT + 5)
+        if lease.is_leader():
+            try:
+                return self.create_client_from_password(username, password)
+            finally:
+                lease.release()
+        
+        deadline = time.monotonic() + settings.SEEDR_TIMEOUT + 5
+        while not lease.is_leader() and time.monotonic() < deadline:
+            time.sleep(0.1)
+        try:
+            token_data = self._load_token(username)
+            if token_data:
+                return self.create_client_from_token(token_data, username)
+            return self.create_client_from_password(username, password)
+        finally:
+            lease.release()
+    
     def get_client(self, user_id: str = 'default') -> Optional[Seedr]:
         """Get existing client or create from stored token"""
         # Auto-initialize if DEFAULT_AUTH is enabled and not yet initialized
@@ -217,17 +369,7 @@ class SeedrClientManager:
         
         # Remove from storage
         try:
-            if os.path.exists(self.token_storage_path):
-                try:
-                    with open(self.token_storage_path, 'r') as f:
-                        tokens = json.load(f)
-                except json.JSONDecodeError as json_err:
-                    print(f"Warning: Corrupted token file detected while removing ({json_err}). Resetting token storage.")
-                    tokens = {}
-                if user_id in tokens:
-                    del tokens[user_id]
-                    with open(self.token_storage_path, 'w') as f:
-                        json.dump(tokens, f, indent=2)
+            shared_state.delete_token(user_id)
         except Exception as e:
             print(f"Error removing token: {e}")
 
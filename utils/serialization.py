@@ -1,16 +1,200 @@
-from datetime import datetime
+"""Response serialization
 
-def to_dict(obj):
-    """
-    Recursively convert an object to a dictionary.
-    Handles dataclasses, objects with __dict__, lists, datetime, and bytes.
-    """
-    if isinstance(obj, list):
-        return [to_dict(item) for item in obj]
-    if isinstance(obj, datetime):
-        return obj.isoformat()
+One serializer for every route. The first time a type is seen a field plan
+is built for it and cached: types with their own ``to_dict`` (e.g. the
+seedrcc ``Token``) use it, dataclasses (all seedrcc models) get an
+``attrgetter`` over their public fields, anything else falls back to its
+instance ``__dict__``. Private attributes are skipped, which drops the
+``_raw`` copy of the upstream payload that seedrcc keeps on every model.
+
+A plan is applied one level deep; nested objects are left in place and
+converted by the same plans while ``dumps`` writes the response, so a
+listing is encoded in a single pass by orjson without an intermediate tree
+of dicts. ``FastJSONResponse`` renders through ``dumps`` and is used for
+projected responses, which do not match their route's response model.
+
+Every other response is validated against its route's response model
+(``models.schemas``) and written straight to JSON bytes by Pydantic's
+serializer, also in one pass. ``SerializedRoute`` makes sure each route
+declares a response model, so none falls back to FastAPI's
+``jsonable_encoder`` followed by a second encoding pass.
+
+``project`` applies a ``?fields=`` projection the same way: only the
+requested attributes are read, so what is not asked for is never
+converted or encoded.
+
+datetimes are written as ISO 8601, bytes are decoded as UTF-8 (invalid
+sequences replaced), sets and tuples become lists.
+"""
+import dataclasses
+import functools
+import inspect
+import re
+from operator import attrgetter
+from typing import Any, Callable, Dict, Optional
+
+import orjson
+from fastapi.datastructures import DefaultPlaceholder
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
+from pydantic import BaseModel
+
+from utils.profiling import profiled_thread
+
+_OPTIONS = orjson.OPT_PASSTHROUGH_DATACLASS | orjson.OPT_NON_STR_KEYS
+
+_plans: Dict[type, Optional[Callable[[Any], Dict[str, Any]]]] = {}
+_names: Dict[type, Optional[frozenset]] = {}
+
+
+def _build_plan(cls: type) -> Optional[Callable[[Any], Dict[str, Any]]]:
+    method = getattr(cls, 'to_dict', None)
+    if callable(method):
+        return method
+    if dataclasses.is_dataclass(cls):
+        names = tuple(f.name for f in dataclasses.fields(cls) if not f.name.startswith('_'))
+        if not names:
+            return lambda obj: {}
+        if len(names) == 1:
+            name = names[0]
+            return lambda obj: {name: getattr(obj, name)}
+        getter = attrgetter(*names)
+        return lambda obj: dict(zip(names, getter(obj)))
+    return None
+
+
+def _plan(cls: type) -> Optional[Callable[[Any], Dict[str, Any]]]:
+    try:
+        return _plans[cls]
+    except KeyError:
+        plan = _plans[cls] = _build_plan(cls)
+        return plan
+
+
+def _fields(obj: Any) -> Any:
+    """Shallow field mapping of an object; nested values are left as they are"""
+    plan = _plan(type(obj))
+    if plan is not None:
+        return plan(obj)
+    return {key: value for key, value in vars(obj).items() if not key.startswith('_')}
+
+
+def _default(obj: Any) -> Any:
+    """orjson fallback for everything it does not encode natively"""
     if isinstance(obj, bytes):
         return obj.decode('utf-8', errors='replace')
-    if hasattr(obj, '__dict__'):
-        return {key: to_dict(value) for key, value in vars(obj).items()}
-    return obj
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode='json')
+    if dataclasses.is_dataclass(obj) or hasattr(obj, '__dict__'):
+        return _fields(obj)
+    return str(obj)
+
+
+FieldTree = Dict[str, Optional['FieldTree']]
+
+_FIELD_NAME = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+
+def parse_fields(spec: Optional[str]) -> Optional[FieldTree]:
+    """
+    Parse a ``fields`` projection such as ``"id,name,files.name,files.size"``.
+
+    Returns a tree of requested names (``None`` leaves mean "the whole
+    value"), or None when no projection was asked for.
+    """
+    if spec is None or not spec.strip():
+        return None
+    tree: FieldTree = {}
+    for path in spec.split(','):
+        path = path.strip()
+        if not path:
+            continue
+        node = tree
+        parts = path.split('.')
+        for i, part in enumerate(parts):
+            if not _FIELD_NAME.match(part) or part.startswith('_'):
+                raise ValueError(f"Invalid field '{path}'")
+            if i == len(parts) - 1:
+                node[part] = None
+            else:
+                child = node.get(part)
+                if child is None:
+                    # "folders" and "folders.id" together: the full value wins
+                    if part in node:
+                        break
+                    child = node[part] = {}
+                node = child
+    return tree
+
+
+def _public_names(cls: type) -> Optional[frozenset]:
+    try:
+        return _names[cls]
+    except KeyError:
+        names = None
+        if dataclasses.is_dataclass(cls) and not callable(getattr(cls, 'to_dict', None)):
+            names = frozenset(f.name for f in dataclasses.fields(cls) if not f.name.startswith('_'))
+        _names[cls] = names
+        return names
+
+
+def project(obj: Any, fields: Optional[FieldTree]) -> Any:
+    """
+    Keep only the requested fields of ``obj`` (lists element-wise).
+
+    Only the requested attributes are read; everything else is never
+    converted or encoded. Unknown names are skipped.
+    """
+    if fields is None or obj is None or isinstance(obj, (str, int, float, bool, bytes)):
+        return obj
+    if isinstance(obj, (list, tuple)):
+        return [project(item, fields) for item in obj]
+    if not isinstance(obj, dict):
+        names = _public_names(type(obj))
+        if names is not None:
+            return {name: project(getattr(obj, name), sub) for name, sub in fields.items() if name in names}
+        obj = _fields(obj)
+    return {name: project(obj[name], sub) for name, sub in fields.items() if name in obj}
+
+
+def dumps(obj: Any) -> bytes:
+    """Encode a response body in one pass"""
+    return orjson.dumps(obj, default=_default, option=_OPTIONS)
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response rendered by ``dumps``"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def _profiled(endpoint: Callable) -> Callable:
+    """Include the pool worker running a sync endpoint in the request's profile"""
+    @functools.wraps(endpoint)
+    def wrapper(*args, **kwargs):
+        with profiled_thread():
+            return endpoint(*args, **kwargs)
+    return wrapper
+
+
+class SerializedRoute(APIRoute):
+    """
+    Route whose results are encoded in one pass by its response model's serializer.
+
+    Sync endpoints are wrapped so that ``?profile=1`` samples the pool
+    worker that runs them.
+    """
+
+    def __init__(self, path: str, endpoint: Callable, **kwargs):
+        response_model = kwargs.get('response_model')
+        if isinstance(response_model, DefaultPlaceholder):
+            response_model = response_model.value
+        declared = response_model is not None or 'return' in getattr(endpoint, '__annotations__', {})
+        if not declared and isinstance(kwargs.get('response_class', DefaultPlaceholder(None)), DefaultPlaceholder):
+            raise TypeError(f"Route {path} ({endpoint.__name__}) must declare a response model")
+        if not inspect.iscoroutinefunction(endpoint):
+            endpoint = _profiled(endpoint)
+        super().__init__(path, endpoint, **kwargs)
@@ -0,0 +1,269 @@
+"""State shared by all worker processes
+
+With ``uvicorn --workers N`` every worker is its own process with its own
+globals. This module keeps the state the workers must agree on in one
+SQLite database (SHARED_STATE_PATH, WAL mode), so no external service is
+needed:
+
+* **Tokens**: Seedr tokens per user. A token saved by one worker (after a
+  login or a refresh) is what every other worker loads. The legacy
+  TOKEN_STORAGE_PATH JSON file is imported once when the table is empty.
+* **Cache**: a byte-value cache with per-entry expiry, shared by all
+  workers. It sits under the per-process caches, for example for folder
+  listings and TorrentMeta lookups.
+* **Records**: durable JSON documents by namespace and key, for state
+  that must survive restarts and that several workers write (the bulk
+  ingestion queue, folder access times and pins). Each worker writes only
+  the rows it changed, so workers never overwrite each other's state.
+* **Leases**: named, expiring leases used for leader election. A
+  background job that should run once per deployment rather than once per
+  worker only runs in the worker that holds its lease (see
+  ``LeaderLease``).
+
+SQLite serialises writers with file locks, and every statement here is a
+short single-row write, so contention stays low even with many workers.
+"""
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Identifies this process as a lease owner
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tokens (
+    user_id TEXT PRIMARY KEY,
+    data TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS cache (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value BLOB NOT NULL,
+    expires_at REAL NOT NULL,
+    PRIMARY KEY (namespace, key)
+);
+CREATE TABLE IF NOT EXISTS records (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (namespace, key)
+);
+CREATE TABLE IF NOT EXISTS leases (
+    name TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+"""
+
+# Expired cache rows are purged on every this many writes
+_PURGE_EVERY = 256
+
+
+class SharedState:
+    """SQLite-backed tokens, cache, records and leases shared across processes"""
+
+    def __init__(self, path: Optional[str] = None, legacy_token_path: Optional[str] = None,
+                 owner: str = WORKER_ID):
+        self.path = path or settings.SHARED_STATE_PATH
+        self.legacy_token_path = legacy_token_path if legacy_token_path is not None else settings.TOKEN_STORAGE_PATH
+        self.owner = owner
+        self._local = threading.local()
+        self._init_lock = threading.Lock()
+        self._initialized = False
+        self._writes = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            with self._init_lock:
+                if not self._initialized:
+                    conn.executescript(_SCHEMA)
+                    self._import_legacy_tokens(conn)
+                    self._initialized = True
+        return conn
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def _import_legacy_tokens(self, conn: sqlite3.Connection):
+        if not self.legacy_token_path or not os.path.exists(self.legacy_token_path):
+            return
+        if conn.execute("SELECT 1 FROM tokens LIMIT 1").fetchone():
+            return
+        try:
+            with open(self.legacy_token_path, 'r') as f:
+                tokens = json.load(f)
+        except (json.JSONDecodeError, OSError) as e:
+            logger.warning(f"Could not import tokens from {self.legacy_token_path}: {e}")
+            return
+        now = time.time()
+        conn.executemany(
+            "INSERT OR IGNORE INTO tokens (user_id, data, updated_at) VALUES (?, ?, ?)",
+            [(user_id, json.dumps(data), now) for user_id, data in tokens.items()]
+        )
+        logger.info(f"Imported {len(tokens)} token(s) from {self.legacy_token_path}")
+
+    # Tokens
+
+    def get_token(self, user_id: str) -> Optional[Dict[str, Any]]:
+        row = self._connect().execute("SELECT data FROM tokens WHERE user_id = ?", (user_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put_token(self, user_id: str, data: Dict[str, Any]):
+        self._connect().execute(
+            "INSERT INTO tokens (user_id, data, updated_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(user_id) DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at",
+            (user_id, json.dumps(data, default=str), time.time())
+        )
+
+    def delete_token(self, user_id: str):
+        self._connect().execute("DELETE FROM tokens WHERE user_id = ?", (user_id,))
+
+    def token_user_ids(self) -> List[str]:
+        return [row[0] for row in self._connect().execute("SELECT user_id FROM tokens ORDER BY user_id")]
+
+    # Cache
+
+    def cache_get(self, namespace: str, key: str) -> Optional[bytes]:
+        row = self._connect().execute(
+            "SELECT value FROM cache WHERE namespace = ? AND key = ? AND expires_at > ?",
+            (namespace, key, time.time())
+        ).fetchone()
+        return row[0] if row else None
+
+    def cache_put(self, namespace: str, key: str, value: bytes, ttl: float):
+        conn = self._connect()
+        now = time.time()
+        conn.execute(
+            "INSERT OR REPLACE INTO cache (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)",
+            (namespace, key, value, now + ttl)
+        )
+        self._writes += 1
+        if self._writes % _PURGE_EVERY == 0:
+            conn.execute("DELETE FROM cache WHERE expires_at <= ?", (now,))
+
+    def cache_delete(self, namespace: str, prefix: str = ''):
+        """Drop a namespace's entries whose key starts with ``prefix``"""
+        self._connect().execute(
+            "DELETE FROM cache WHERE namespace = ? AND substr(key, 1, ?) = ?", (namespace, len(prefix), prefix)
+        )
+
+    # Records
+
+    def record_get(self, namespace: str, key: str) -> Any:
+        row = self._connect().execute(
+            "SELECT value FROM records WHERE namespace = ? AND key = ?", (namespace, key)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def records(self, namespace: str, prefix: str = '') -> Dict[str, Any]:
+        """A namespace's records whose key starts with ``prefix``"""
+        rows = self._connect().execute(
+            "SELECT key, value FROM records WHERE namespace = ? AND substr(key, 1, ?) = ? ORDER BY key",
+            (namespace, len(prefix), prefix)
+        )
+        return {key: json.loads(value) for key, value in rows}
+
+    def record_put(self, namespace: str, values: Dict[str, Any]):
+        """Insert or replace records; rows whose value is unchanged are left alone"""
+        if not values:
+            return
+        now = time.time()
+        with self._transaction() as conn:
+            conn.executemany(
+                "INSERT INTO records (namespace, key, value, updated_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(namespace, key) DO UPDATE SET value = excluded.value, updated_at = excluded.updated_at "
+                "WHERE records.value != excluded.value",
+                [(namespace, key, json.dumps(value, default=str), now) for key, value in values.items()]
+            )
+
+    def record_delete(self, namespace: str, keys: List[str]):
+        if not keys:
+            return
+        with self._transaction() as conn:
+            conn.executemany("DELETE FROM records WHERE namespace = ? AND key = ?", [(namespace, key) for key in keys])
+
+    # Leases
+
+    def acquire_lease(self, name: str, ttl: float) -> bool:
+        """Take or renew lease ``name`` for ``ttl`` seconds; False while another owner holds it"""
+        now = time.time()
+        cursor = self._connect().execute(
+            "INSERT INTO leases (name, owner, expires_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at "
+            "WHERE leases.owner = excluded.owner OR leases.expires_at <= ?",
+            (name, self.owner, now + ttl, now)
+        )
+        return cursor.rowcount == 1
+
+    def lease_held(self, name: str) -> bool:
+        """Whether any owner currently holds lease ``name``"""
+        row = self._connect().execute(
+            "SELECT 1 FROM leases WHERE name = ? AND expires_at > ?", (name, time.time())
+        ).fetchone()
+        return row is not None
+
+    def release_lease(self, name: str):
+        self._connect().execute("DELETE FROM leases WHERE name = ? AND owner = ?", (name, self.owner))
+
+
+class LeaderLease:
+    """Leader election for one background job via a renewed ``SharedState`` lease"""
+
+    def __init__(self, name: str, state: Optional[SharedState] = None, ttl: Optional[float] = None):
+        self.name = name
+        self.state = state
+        self.ttl = ttl
+        self._held_until = 0.0
+
+    def is_leader(self) -> bool:
+        """Whether this process runs the job now; renews the lease once a third of it has passed"""
+        ttl = self.ttl or settings.LEADER_LEASE_TTL
+        now = time.monotonic()
+        if now < self._held_until - 2 * ttl / 3:
+            return True
+        state = self.state or shared_state
+        try:
+            held = state.acquire_lease(self.name, ttl)
+        except sqlite3.Error as e:
+            logger.error(f"Could not renew lease {self.name}: {e}")
+            held = False
+        self._held_until = now + ttl if held else 0.0
+        return held
+
+    def release(self):
+        if self._held_until:
+            self._held_until = 0.0
+            try:
+                (self.state or shared_state).release_lease(self.name)
+            except sqlite3.Error as e:
+                logger.error(f"Could not release lease {self.name}: {e}")
+
+
+# Global shared state instance
+shared_state = SharedState()
@@ -0,0 +1,128 @@
+"""Pre-add space check pipeline
+
+The torrent size (remote metadata) and the account quota (the per-user
+quota ledger, backed by Seedr ``get_memory_bandwidth``) are independent
+lookups, so they are started together and each one is bounded by its own
+deadline. The check costs the slowest stage instead of the sum of both.
+The final admission is taken by the ledger, which reserves the space for
+the add until the torrent is reconciled.
+"""
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from dataclasses import dataclass
+from typing import Optional
+
+from seedrcc import Seedr
+
+from config import settings
+from utils.metrics import registry
+from utils.quota_ledger import quota_ledger
+from utils.torrentmeta import torrentmeta
+
+logger = logging.getLogger(__name__)
+
+# Fallback policies when the metadata stage misses its deadline
+FALLBACK_ADD = "add"
+FALLBACK_REJECT = "reject"
+
+_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="space-check")
+registry.watch_executor("space-check", _executor)
+
+
+@dataclass
+class SpaceCheckResult:
+    """Outcome of a space check"""
+    torrent_size: int = 0
+    available_space: int = 0
+    space_used: int = 0
+    space_max: int = 0
+    reserved: int = 0
+    reservation_id: Optional[str] = None
+    admitted: bool = True
+    metadata_timed_out: bool = False
+    space_timed_out: bool = False
+    elapsed: float = 0.0
+
+    @property
+    def known(self) -> bool:
+        """Both the torrent size and the free space are known"""
+        return self.torrent_size > 0 and self.available_space > 0
+
+    @property
+    def sufficient(self) -> bool:
+        """Whether the torrent fits (unknown sizes are treated optimistically)"""
+        if not self.admitted:
+            return False
+        if not self.known:
+            return True
+        return self.torrent_size <= self.available_space
+
+    @property
+    def space_needed(self) -> int:
+        return max(self.torrent_size - self.available_space, 0)
+
+    @property
+    def rejected_by_policy(self) -> bool:
+        """The metadata stage timed out and the fallback policy forbids adding blind"""
+        return self.metadata_timed_out and settings.SPACE_CHECK_FALLBACK.lower() == FALLBACK_REJECT
+
+
+def get_torrent_size(magnet_link: str, timeout: Optional[float] = None) -> int:
+    """Get torrent size from TorrentMeta API (0 when unknown), retrying only within ``timeout`` seconds overall"""
+    deadline = time.monotonic() + timeout if timeout else None
+    return torrentmeta.torrent_size(magnet_link, timeout, deadline)
+
+
+def _result_before(future, deadline: float):
+    """Wait for a future until an absolute deadline, returning None on timeout"""
+    try:
+        return future.result(timeout=max(deadline - time.monotonic(), 0))
+    except FutureTimeoutError:
+        future.cancel()
+        return None
+
+
+def check_space(client: Seedr, magnet_link: str, user_id: str = 'default') -> SpaceCheckResult:
+    """
+    Run the metadata and quota lookups concurrently, each with its own deadline,
+    then admit the torrent against the user's quota ledger.
+
+    A stage that misses its deadline is reported as timed out and treated as
+    unknown, which lets the add go through unless SPACE_CHECK_FALLBACK says
+    otherwise. When the torrent is admitted with a known size, the space is
+    reserved under ``result.reservation_id``: the caller must ``bind`` it to
+    the added torrent or ``release`` it if the add fails.
+    """
+    start = time.monotonic()
+    metadata_timeout = settings.SPACE_CHECK_METADATA_TIMEOUT
+    space_timeout = settings.SPACE_CHECK_SPACE_TIMEOUT
+
+    size_future = _executor.submit(get_torrent_size, magnet_link, metadata_timeout)
+    space_future = _executor.submit(quota_ledger.snapshot, user_id, client)
+
+    result = SpaceCheckResult()
+
+    torrent_size = _result_before(size_future, start + metadata_timeout)
+    if torrent_size is None:
+        logger.warning(f"Torrent metadata lookup exceeded {metadata_timeout}s deadline")
+        result.metadata_timed_out = True
+    else:
+        result.torrent_size = torrent_size
+
+    space = _result_before(space_future, start + space_timeout)
+    if space is None:
+        logger.warning(f"Space lookup exceeded {space_timeout}s deadline")
+        result.space_timed_out = True
+    else:
+        result.available_space, result.space_used, result.space_max, result.reserved = space
+
+    if not result.rejected_by_policy:
+        admitted, reservation, available, reserved = quota_ledger.admit(user_id, result.torrent_size)
+        result.admitted = admitted
+        result.reservation_id = reservation.id if reservation else None
+        if space is not None:
+            result.available_space, result.reserved = available, reserved
+
+    result.elapsed = time.monotonic() - start
+    return result
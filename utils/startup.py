@@ -0,0 +1,132 @@
+"""Cold start timing
+
+``main`` imports this module before anything else, so ``STARTED_AT`` is
+taken before the application's own imports. ``mark`` records how long the
+process took to reach a phase:
+
+* ``app``: ``main`` is imported and the app object is built
+* ``ready``: startup (the lifespan) has finished, and requests are served
+
+The phases are logged and exported as ``seedr_api_startup_seconds``.
+
+``python -m utils.startup`` imports ``main`` in a fresh interpreter with
+``-X importtime``, then prints the import time by package and the slowest
+modules. With ``--budget-ms``, it exits 1 when the cold import takes longer
+than the budget. tests/test_startup.py makes the same check.
+
+Only the standard library is imported here, and nothing at all for the
+report, so this module adds nothing to the start it measures.
+"""
+import time
+from typing import Dict, List, NamedTuple, Optional
+
+STARTED_AT = time.perf_counter()
+
+# Seconds from STARTED_AT to each phase reached so far
+phases: Dict[str, float] = {}
+
+# Cold import budget used by --budget-ms and the startup test (milliseconds)
+DEFAULT_BUDGET_MS = 1500.0
+
+
+def mark(phase: str) -> float:
+    phases[phase] = time.perf_counter() - STARTED_AT
+    return phases[phase]
+
+
+# Report (python -m utils.startup)
+
+class ImportRecord(NamedTuple):
+    module: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+
+def profile_import(module: str = "main", env: Optional[Dict[str, str]] = None,
+                   cwd: Optional[str] = None) -> List[ImportRecord]:
+    """``-X importtime`` records of importing ``module`` in a fresh interpreter"""
+    import subprocess
+    import sys
+
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, env=env, cwd=cwd
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+    records = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue  # the column header
+        name = fields[2].rstrip()
+        stripped = name.lstrip()
+        records.append(ImportRecord(
+            stripped, int(fields[0]), int(fields[1]), (len(name) - len(stripped) - 1) // 2
+        ))
+    return records
+
+
+def time_import(module: str = "main", runs: int = 3, env: Optional[Dict[str, str]] = None,
+                cwd: Optional[str] = None) -> float:
+    """Best wall-clock milliseconds to import ``module`` over ``runs`` fresh interpreters
+
+    Measured without ``-X importtime``, which slows imports down.
+    """
+    import subprocess
+    import sys
+
+    code = f"import time; t = time.perf_counter(); import {module}; print((time.perf_counter() - t) * 1000)"
+    timings = []
+    for _ in range(runs):
+        result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, env=env, cwd=cwd)
+        if result.returncode != 0:
+            raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+        timings.append(float(result.stdout.strip().splitlines()[-1]))
+    return min(timings)
+
+
+def by_package(records: List[ImportRecord]) -> Dict[str, int]:
+    """Self import time (microseconds) per top-level package, largest first"""
+    totals: Dict[str, int] = {}
+    for record in records:
+        package = record.module.split(".")[0]
+        totals[package] = totals.get(package, 0) + record.self_us
+    return dict(sorted(totals.items(), key=lambda item: item[1], reverse=True))
+
+
+def report(records: List[ImportRecord], wall_ms: float, top: int = 15) -> str:
+    total_us = sum(record.self_us for record in records)
+    lines = [f"Cold import: {wall_ms:.0f} ms wall ({total_us / 1000:.0f} ms under -X importtime)", "", "By package:"]
+    for package, self_us in list(by_package(records).items())[:top]:
+        lines.append(f"  {self_us / 1000:>8.1f} ms  {self_us / total_us:>6.1%}  {package}")
+    lines += ["", "Slowest modules (self time, cumulative):"]
+    for record in sorted(records, key=lambda r: r.self_us, reverse=True)[:top]:
+        lines.append(f"  {record.self_us / 1000:>8.1f} ms  {record.cumulative_us / 1000:>8.1f} ms  {record.module}")
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="python -m utils.startup", description="Cold start import report")
+    parser.add_argument("--module", default="main", help="Module to import (default: main)")
+    parser.add_argument("--top", type=int, default=15, help="Rows per table")
+    parser.add_argument("--runs", type=int, default=3, help="Fresh interpreters to time (the best counts)")
+    parser.add_argument("--budget-ms", type=float, nargs="?", const=DEFAULT_BUDGET_MS,
+                        help=f"Exit 1 above this many milliseconds (default when given: {DEFAULT_BUDGET_MS:.0f})")
+    args = parser.parse_args(argv)
+
+    wall_ms = time_import(args.module, args.runs)
+    print(report(profile_import(args.module), wall_ms, args.top))
+    if args.budget_ms is not None and wall_ms > args.budget_ms:
+        print(f"\nOver budget: {wall_ms:.0f} ms > {args.budget_ms:.0f} ms")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
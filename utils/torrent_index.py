@@ -0,0 +1,316 @@
+"""Per-user torrent index
+
+Maps torrent infohash and normalized title to the Seedr torrent id and,
+once the download finishes, to the folder Seedr created for it. The index
+is fed by every listing we make (``observe_listing``) and by our own adds
+(``register_add``), so completion checks are dictionary lookups instead of
+linear scans over ``contents.torrents`` and ``contents.folders``.
+
+Seedr rewrites characters when it turns a torrent title into a folder name
+(``&`` -> ``_``, ``:`` -> `` ``, ``?`` dropped, ...). Titles and folder names
+are therefore compared through ``normalize_title``, which keeps only letters
+and digits. Folders are indexed by parent and name, and a torrent only
+matches a folder in the folder it was added to.
+
+Only the root listing carries the active torrents, so only a root listing
+can show that a torrent stopped downloading.
+
+The index also backs duplicate-add detection: ``claim`` atomically checks
+an infohash against known torrents, completed folders and adds that are
+still in flight, and reserves it for the caller. In-flight claims are held
+as shared state leases, so an add in progress on one worker process is
+seen by the others.
+
+Infohashes are kept as lowercase hex; base32 infohashes (as found in some
+magnet links) are converted by ``normalize_infohash``.
+"""
+import base64
+import binascii
+import logging
+import re
+import sqlite3
+import time
+import unicodedata
+from threading import Lock
+from typing import Any, Dict, Optional, Set, Tuple
+from urllib.parse import parse_qs, urlparse
+
+from utils.shared_state import SharedState, shared_state
+
+logger = logging.getLogger(__name__)
+
+STATUS_DOWNLOADING = "downloading"
+STATUS_COMPLETED = "completed"
+STATUS_ADDED = "added"
+STATUS_IN_FLIGHT = "in_flight"
+
+# An add whose torrent has not shown up in a listing yet still counts as present
+_RECENT_ADD_SECONDS = 120.0
+
+# Seconds an in-flight claim outlives a worker that died before releasing it
+_CLAIM_TTL = 900.0
+
+_NON_ALNUM = re.compile(r'[\W_]+', re.UNICODE)
+
+
+def normalize_title(title: Optional[str]) -> str:
+    """Reduce a torrent title or folder name to a comparable key"""
+    if not title:
+        return ''
+    title = unicodedata.normalize('NFKC', title).casefold()
+    return _NON_ALNUM.sub(' ', title).strip()
+
+
+def _hex_infohash(value: str) -> Optional[str]:
+    """Lowercase hex form of a 40-char hex or 32-char base32 infohash, None when it is neither"""
+    if len(value) == 40:
+        try:
+            bytes.fromhex(value)
+            return value.lower()
+        except ValueError:
+            return None
+    if len(value) == 32:
+        try:
+            return base64.b32decode(value.upper()).hex()
+        except (binascii.Error, ValueError):
+            return None
+    return None
+
+
+def normalize_infohash(torrent_hash: str) -> str:
+    """Key an infohash is indexed under: lowercase hex, converted from base32 when needed"""
+    torrent_hash = str(torrent_hash).strip()
+    return _hex_infohash(torrent_hash) or torrent_hash.lower()
+
+
+def infohash_from_magnet(magnet_link: Optional[str]) -> Optional[str]:
+    """Extract the BitTorrent v1 infohash (lowercase hex) from a magnet link"""
+    if not magnet_link or not magnet_link.startswith('magnet:'):
+        return None
+    query = parse_qs(urlparse(magnet_link).query)
+    for xt in query.get('xt', []):
+        if xt.lower().startswith('urn:btih:'):
+            return _hex_infohash(xt[len('urn:btih:'):])
+    return None
+
+
+def _parent_key(folder_id: Any) -> str:
+    """Folder a torrent lands in ("-1" and empty mean the root)"""
+    folder_id = str(folder_id or '0')
+    return '0' if folder_id == '-1' else folder_id
+
+
+def _parse_progress(progress: Any) -> float:
+    try:
+        return float(progress)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class _UserIndex:
+    def __init__(self):
+        self.by_hash: Dict[str, Dict[str, Any]] = {}
+        self.by_title: Dict[str, str] = {}
+        # (parent folder id, normalized name) -> folder
+        self.folders: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        # Folders listed at least once, so a folder missing from them and seen later is new
+        self.listed: Set[str] = set()
+        self.in_flight: Set[str] = set()
+
+
+class TorrentIndex:
+    """Infohash/title -> torrent/folder index, kept up to date by listings"""
+
+    def __init__(self, state: Optional[SharedState] = None):
+        self.users: Dict[str, _UserIndex] = {}
+        self.lock = Lock()
+        self.shared_state = state or shared_state
+
+    def _get(self, user_id: str) -> _UserIndex:
+        index = self.users.get(user_id)
+        if index is None:
+            index = self.users[user_id] = _UserIndex()
+        return index
+
+    def _entry(self, index: _UserIndex, torrent_hash: str, title: Optional[str]) -> Dict[str, Any]:
+        entry = index.by_hash.get(torrent_hash)
+        if entry is None:
+            entry = index.by_hash[torrent_hash] = {
+                "hash": torrent_hash,
+                "torrent_id": None,
+                "title": title or '',
+                "status": STATUS_ADDED,
+                "progress": 0.0,
+                "parent": '0',
+                "folder_id": None,
+                "folder_name": None,
+                "updated_at": time.time()
+            }
+        if title:
+            entry["title"] = title
+            index.by_title[normalize_title(title)] = torrent_hash
+        return entry
+
+    def _match_folder(self, index: _UserIndex, entry: Dict[str, Any]):
+        folder = index.folders.get((entry["parent"], normalize_title(entry["title"])))
+        if folder and entry["status"] != STATUS_DOWNLOADING:
+            entry["status"] = STATUS_COMPLETED
+            entry["progress"] = 100.0
+            entry["folder_id"] = folder["folder_id"]
+            entry["folder_name"] = folder["name"]
+            entry["updated_at"] = time.time()
+
+    def register_add(self, user_id: str, torrent_hash: Optional[str], torrent_id: Any = None, title: Optional[str] = None,
+                     folder_id: Any = '0'):
+        """Record a torrent we just added (to ``folder_id``, the root by default)"""
+        if not torrent_hash:
+            return
+        with self.lock:
+            index = self._get(user_id)
+            entry = self._entry(index, normalize_infohash(torrent_hash), title)
+            entry["parent"] = _parent_key(folder_id)
+            if torrent_id:
+                entry["torrent_id"] = str(torrent_id)
+            self._match_folder(index, entry)
+
+    def observe_listing(self, user_id: str, folder_id: str, contents: Any):
+        """Update the index from a ``list_contents`` result"""
+        now = time.time()
+        parent = _parent_key(folder_id)
+        with self.lock:
+            index = self._get(user_id)
+            active = set()
+            for torrent in getattr(contents, 'torrents', None) or []:
+                torrent_hash = str(getattr(torrent, 'hash', '') or '')
+                if not torrent_hash:
+                    continue
+                torrent_hash = normalize_infohash(torrent_hash)
+                active.add(torrent_hash)
+                entry = self._entry(index, torrent_hash, getattr(torrent, 'name', None))
+                entry["torrent_id"] = str(getattr(torrent, 'id', '') or '') or entry["torrent_id"]
+                entry["progress"] = _parse_progress(getattr(torrent, 'progress', 0))
+                entry["status"] = STATUS_DOWNLOADING if entry["progress"] < 100 else STATUS_COMPLETED
+                entry["updated_at"] = now
+
+            seen_before = parent in index.listed
+            current = {}
+            for folder in getattr(contents, 'folders', None) or []:
+                name = getattr(folder, 'name', '')
+                key = (parent, normalize_title(name))
+                known = index.folders.get(key)
+                current[key] = {
+                    "folder_id": str(folder.id),
+                    "name": name,
+                    "parent": parent,
+                    "size": getattr(folder, 'size', 0),
+                    # When the folder first showed up in a listing of its parent; None if it was there all along
+                    "appeared_at": known["appeared_at"] if known and known["folder_id"] == str(folder.id)
+                    else (now if seen_before else None)
+                }
+            for key in [k for k in index.folders if k[0] == parent]:
+                del index.folders[key]
+            index.folders.update(current)
+            index.listed.add(parent)
+
+            # Torrents that left the active list may have turned into folders
+            for torrent_hash, entry in index.by_hash.items():
+                if torrent_hash in active:
+                    continue
+                if parent == '0' and entry["status"] == STATUS_DOWNLOADING:
+                    entry["status"] = STATUS_ADDED
+                if entry["parent"] == parent:
+                    self._match_folder(index, entry)
+
+    def forget_folder(self, user_id: str, folder_id: Any):
+        """Drop a deleted folder from the index"""
+        folder_id = str(folder_id)
+        with self.lock:
+            index = self._get(user_id)
+            for key in [k for k, f in index.folders.items() if f["folder_id"] == folder_id]:
+                del index.folders[key]
+            for torrent_hash in [h for h, e in index.by_hash.items() if e["folder_id"] == folder_id]:
+                entry = index.by_hash.pop(torrent_hash)
+                index.by_title.pop(normalize_title(entry["title"]), None)
+
+    def forget_torrent(self, user_id: str, torrent_id: Any):
+        """Drop a deleted torrent from the index"""
+        torrent_id = str(torrent_id)
+        with self.lock:
+            index = self._get(user_id)
+            for torrent_hash in [h for h, e in index.by_hash.items() if e["torrent_id"] == torrent_id]:
+                entry = index.by_hash.pop(torrent_hash)
+                index.by_title.pop(normalize_title(entry["title"]), None)
+
+    def claim(self, user_id: str, torrent_hash: Optional[str]) -> Optional[Dict[str, Any]]:
+        """
+        Reserve an infohash for an add about to be made.
+
+        Returns None when the caller may go ahead (call ``release_claim``
+        once the add finished), or the existing entry when the torrent is
+        already active, completed, or being added by another request (in
+        this or another worker process).
+        """
+        if not torrent_hash:
+            return None
+        torrent_hash = normalize_infohash(torrent_hash)
+        with self.lock:
+            index = self._get(user_id)
+            if torrent_hash in index.in_flight:
+                return {"hash": torrent_hash, "status": STATUS_IN_FLIGHT}
+            entry = index.by_hash.get(torrent_hash)
+            if entry and (
+                entry["status"] in (STATUS_DOWNLOADING, STATUS_COMPLETED) or
+                time.time() - entry["updated_at"] < _RECENT_ADD_SECONDS
+            ):
+                return dict(entry)
+            index.in_flight.add(torrent_hash)
+        try:
+            claimed = self.shared_state.acquire_lease(self._claim_name(user_id, torrent_hash), _CLAIM_TTL)
+        except sqlite3.Error as e:
+            logger.error(f"Cannot share in-flight claim with other workers: {e}")
+            claimed = True
+        if not claimed:
+            with self.lock:
+                self._get(user_id).in_flight.discard(torrent_hash)
+            return {"hash": torrent_hash, "status": STATUS_IN_FLIGHT}
+        return None
+
+    def release_claim(self, user_id: str, torrent_hash: Optional[str]):
+        """Mark an in-flight add as finished"""
+        if not torrent_hash:
+            return
+        torrent_hash = normalize_infohash(torrent_hash)
+        try:
+            self.shared_state.release_lease(self._claim_name(user_id, torrent_hash))
+        except sqlite3.Error as e:
+            logger.error(f"Error releasing in-flight claim: {e}")
+        with self.lock:
+            self._get(user_id).in_flight.discard(torrent_hash)
+
+    @staticmethod
+    def _claim_name(user_id: str, torrent_hash: str) -> str:
+        return f"torrent-claim:{user_id}|{torrent_hash}"
+
+    def lookup(self, user_id: str, torrent_hash: str) -> Optional[Dict[str, Any]]:
+        """Find a torrent by infohash (hex or base32)"""
+        with self.lock:
+            entry = self._get(user_id).by_hash.get(normalize_infohash(torrent_hash))
+            return dict(entry) if entry else None
+
+    def lookup_title(self, user_id: str, title: str) -> Optional[Dict[str, Any]]:
+        """Find a torrent by title (normalized)"""
+        with self.lock:
+            index = self._get(user_id)
+            torrent_hash = index.by_title.get(normalize_title(title))
+            entry = index.by_hash.get(torrent_hash) if torrent_hash else None
+            return dict(entry) if entry else None
+
+    def find_folder(self, user_id: str, title: str, parent: Any = '0') -> Optional[Dict[str, Any]]:
+        """Find a folder in ``parent`` whose name matches a torrent title"""
+        with self.lock:
+            folder = self._get(user_id).folders.get((_parent_key(parent), normalize_title(title)))
+            return dict(folder) if folder else None
+
+
+# Global torrent index instance
+torrent_index = TorrentIndex()
@@ -0,0 +1,226 @@
+"""TorrentMeta API client
+
+All third-party metadata traffic goes through one shared client per mode
+(a sync ``httpx.Client`` for the thread-pool paths such as the space check
+and the ingest queue, an ``httpx.AsyncClient`` for async routes). Both keep
+connections alive, split connect and read timeouts, and retry transport
+errors and 5xx responses with exponential backoff. The base URL comes from
+TORRENTMETA_URL so a local stand-in server can be used in tests and
+benchmarks.
+
+The global client keeps successful lookups for TORRENTMETA_CACHE_TTL
+seconds in the cache shared by all worker processes (``utils.shared_state``),
+so a magnet sized by one worker is not looked up again by the others.
+"""
+import asyncio
+import json
+import logging
+import sqlite3
+import time
+from threading import Lock
+from typing import Any, Dict, Optional
+
+import httpx
+from starlette.concurrency import run_in_threadpool
+
+from config import settings
+from utils.metrics import CACHE_REQUESTS, TORRENTMETA_LATENCY
+from utils.shared_state import shared_state
+
+logger = logging.getLogger(__name__)
+
+
+class TorrentMetaError(Exception):
+    """Raised when the metadata service cannot answer a query"""
+
+
+def total_size(payload: Dict[str, Any]) -> int:
+    """Sum the file sizes of a TorrentMeta response (0 when unknown)"""
+    metadata = payload.get('data', {}) if isinstance(payload, dict) else {}
+    files = metadata.get('files') if isinstance(metadata, dict) else None
+    if isinstance(files, list):
+        return sum(file.get('size', 0) for file in files)
+    return 0
+
+
+class TorrentMetaClient:
+    """Pooled, retrying client for the TorrentMeta API"""
+
+    def __init__(self, base_url: Optional[str] = None, transport: Any = None, async_transport: Any = None,
+                 shared_cache: bool = False):
+        self.base_url = base_url
+        self.shared_cache = shared_cache
+        self._transport = transport
+        self._async_transport = async_transport
+        self._client: Optional[httpx.Client] = None
+        self._async_client: Optional[httpx.AsyncClient] = None
+        self._lock = Lock()
+
+    @property
+    def url(self) -> str:
+        return self.base_url or settings.TORRENTMETA_URL
+
+    def _timeout(self, read_timeout: Optional[float] = None, deadline: Optional[float] = None) -> httpx.Timeout:
+        read = read_timeout or settings.TORRENTMETA_READ_TIMEOUT
+        connect = settings.TORRENTMETA_CONNECT_TIMEOUT
+        if deadline is not None:
+            remaining = max(deadline - time.monotonic(), 0.001)
+            read, connect = min(read, remaining), min(connect, remaining)
+        return httpx.Timeout(read, connect=connect)
+
+    def _limits(self) -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=settings.TORRENTMETA_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.TORRENTMETA_MAX_CONNECTIONS
+        )
+
+    @property
+    def client(self) -> httpx.Client:
+        with self._lock:
+            if self._client is None:
+                self._client = httpx.Client(
+                    timeout=self._timeout(),
+                    limits=self._limits(),
+                    transport=self._transport,
+                    headers={'Content-Type': 'application/json'}
+                )
+            return self._client
+
+    @property
+    def async_client(self) -> httpx.AsyncClient:
+        if self._async_client is None:
+            self._async_client = httpx.AsyncClient(
+                timeout=self._timeout(),
+                limits=self._limits(),
+                transport=self._async_transport,
+                headers={'Content-Type': 'application/json'}
+            )
+        return self._async_client
+
+    @staticmethod
+    def _backoff(attempt: int) -> float:
+        return settings.TORRENTMETA_BACKOFF * (2 ** attempt)
+
+    def _retry_delay(self, attempt: int, deadline: Optional[float]) -> Optional[float]:
+        """Seconds to wait before the next attempt, or None when no attempt is left before the deadline"""
+        if attempt >= settings.TORRENTMETA_MAX_RETRIES:
+            return None
+        delay = self._backoff(attempt)
+        if deadline is not None and time.monotonic() + delay >= deadline:
+            return None
+        return delay
+
+    @staticmethod
+    def _retryable(response: httpx.Response) -> bool:
+        return response.status_code >= 500
+
+    @property
+    def _caching(self) -> bool:
+        return self.shared_cache and settings.TORRENTMETA_CACHE_TTL > 0
+
+    def _cached(self, query: str) -> Optional[Dict[str, Any]]:
+        if not self._caching:
+            return None
+        try:
+            cached = shared_state.cache_get("torrentmeta", f"{self.url}|{query}")
+        except sqlite3.Error as e:
+            logger.error(f"Shared cache read failed: {e}")
+            return None
+        CACHE_REQUESTS.inc("torrentmeta", "miss" if cached is None else "hit")
+        return json.loads(cached) if cached is not None else None
+
+    def _store(self, query: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        if self._caching:
+            try:
+                shared_state.cache_put(
+                    "torrentmeta", f"{self.url}|{query}", json.dumps(payload).encode(), settings.TORRENTMETA_CACHE_TTL
+                )
+            except sqlite3.Error as e:
+                logger.error(f"Shared cache write failed: {e}")
+        return payload
+
+    def query(self, query: str, read_timeout: Optional[float] = None, deadline: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Look up a magnet/hash; retries transport errors and 5xx responses.
+
+        ``deadline`` (a ``time.monotonic()`` value) bounds the whole lookup:
+        attempts are cut off at it and no retry starts past it.
+        """
+        cached = self._cached(query)
+        if cached is not None:
+            return cached
+        last_error = None
+        for attempt in range(settings.TORRENTMETA_MAX_RETRIES + 1):
+            start = time.perf_counter()
+            try:
+                response = self.client.post(self.url, json={'query': query}, timeout=self._timeout(read_timeout, deadline))
+                TORRENTMETA_LATENCY.observe(time.perf_counter() - start, "sync", str(response.status_code))
+                if not self._retryable(response):
+                    if response.status_code != 200:
+                        raise TorrentMetaError(f"TorrentMeta returned {response.status_code}")
+                    return self._store(query, response.json())
+                last_error = TorrentMetaError(f"TorrentMeta returned {response.status_code}")
+            except httpx.TransportError as e:
+                TORRENTMETA_LATENCY.observe(time.perf_counter() - start, "sync", "error")
+                last_error = TorrentMetaError(str(e))
+            delay = self._retry_delay(attempt, deadline)
+            if delay is None:
+                break
+            time.sleep(delay)
+        raise last_error
+
+    async def aquery(self, query: str, read_timeout: Optional[float] = None,
+                     deadline: Optional[float] = None) -> Dict[str, Any]:
+        """Async variant of ``query``; the blocking shared cache is used from the thread pool"""
+        if self._caching:
+            cached = await run_in_threadpool(self._cached, query)
+            if cached is not None:
+                return cached
+        last_error = None
+        for attempt in range(settings.TORRENTMETA_MAX_RETRIES + 1):
+            start = time.perf_counter()
+            try:
+                response = await self.async_client.post(
+                    self.url, json={'query': query}, timeout=self._timeout(read_timeout, deadline)
+                )
+                TORRENTMETA_LATENCY.observe(time.perf_counter() - start, "async", str(response.status_code))
+                if not self._retryable(response):
+                    if response.status_code != 200:
+                        raise TorrentMetaError(f"TorrentMeta returned {response.status_code}")
+                    payload = response.json()
+                    if self._caching:
+                        await run_in_threadpool(self._store, query, payload)
+                    return payload
+                last_error = TorrentMetaError(f"TorrentMeta returned {response.status_code}")
+            except httpx.TransportError as e:
+                TORRENTMETA_LATENCY.observe(time.perf_counter() - start, "async", "error")
+                last_error = TorrentMetaError(str(e))
+            delay = self._retry_delay(attempt, deadline)
+            if delay is None:
+                break
+            await asyncio.sleep(delay)
+        raise last_error
+
+    def torrent_size(self, query: str, read_timeout: Optional[float] = None, deadline: Optional[float] = None) -> int:
+        """Total size of a torrent in bytes, or 0 if it cannot be determined"""
+        try:
+            return total_size(self.query(query, read_timeout, deadline))
+        except Exception as e:
+            logger.error(f"Error fetching torrent size: {str(e)}")
+            return 0
+
+    def close(self):
+        with self._lock:
+            if self._client is not None:
+                self._client.close()
+                self._client = None
+
+    async def aclose(self):
+        self.close()
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+
+
+# Global TorrentMeta client instance
+torrentmeta = TorrentMetaClient(shared_cache=True)
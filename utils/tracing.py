@@ -0,0 +1,271 @@
+"""Request tracing
+
+Spans follow the OpenTelemetry data model: every incoming request gets a
+server span, continuing the caller's trace when a W3C ``traceparent``
+header is sent, and each upstream Seedr call made while handling it becomes
+a client span underneath. Upstream spans carry the number of HTTP requests
+the call needed (seedrcc retries once after refreshing an expired token),
+the response bytes received and whether the token was refreshed.
+
+The current span lives in a context variable, so it follows the request
+into the thread pool that runs sync endpoints. Finished spans are batched
+and POSTed as OTLP/HTTP JSON to TRACING_OTLP_ENDPOINT. When no endpoint is
+configured and nothing is collecting spans for the current request (see
+``collect``), no spans are created at all.
+"""
+import contextvars
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import httpx
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+KIND_SERVER = 2
+KIND_CLIENT = 3
+
+_current: contextvars.ContextVar[Optional['Span']] = contextvars.ContextVar('current_span', default=None)
+_collector: contextvars.ContextVar[Optional[List['Span']]] = contextvars.ContextVar('span_collector', default=None)
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class Span:
+    """One timed operation within a trace"""
+
+    __slots__ = ('name', 'kind', 'trace_id', 'span_id', 'parent_id', 'start_ns', 'end_ns',
+                 'attributes', 'events', 'error')
+
+    def __init__(self, name: str, kind: int, trace_id: str, parent_id: Optional[str],
+                 attributes: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.kind = kind
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes: Dict[str, Any] = dict(attributes or {})
+        self.events: List[Tuple[str, int]] = []
+        self.error: Optional[str] = None
+
+    def set(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def add(self, key: str, amount: int = 1):
+        self.attributes[key] = self.attributes.get(key, 0) + amount
+
+    def event(self, name: str):
+        self.events.append((name, time.time_ns()))
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def to_otlp(self) -> Dict[str, Any]:
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns or self.start_ns),
+            "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in self.attributes.items()],
+            "events": [{"name": name, "timeUnixNano": str(ts)} for name, ts in self.events],
+            "status": {"code": 2, "message": self.error} if self.error else {"code": 1}
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        return span
+
+
+def parse_traceparent(header: Optional[str]) -> Tuple[Optional[str], Optional[str]]:
+    """(trace_id, parent span_id) from a W3C traceparent header, or (None, None)"""
+    if not header:
+        return None, None
+    parts = header.strip().split('-')
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None, None
+    try:
+        int(parts[1], 16), int(parts[2], 16)
+    except ValueError:
+        return None, None
+    if parts[1] == '0' * 32 or parts[2] == '0' * 16:
+        return None, None
+    return parts[1], parts[2]
+
+
+def current_span() -> Optional[Span]:
+    return _current.get()
+
+
+def _recording() -> bool:
+    return bool(settings.TRACING_OTLP_ENDPOINT) or _collector.get() is not None
+
+
+@contextmanager
+def start_span(name: str, kind: int = KIND_CLIENT, attributes: Optional[Dict[str, Any]] = None,
+               traceparent: Optional[str] = None) -> Iterator[Optional[Span]]:
+    """Time a block as a child of the current span (or of ``traceparent``); yields None when not recording"""
+    if not _recording():
+        yield None
+        return
+    parent = _current.get()
+    if parent is not None:
+        trace_id, parent_id = parent.trace_id, parent.span_id
+    else:
+        trace_id, parent_id = parse_traceparent(traceparent)
+        trace_id = trace_id or os.urandom(16).hex()
+    span = Span(name, kind, trace_id, parent_id, attributes)
+    token = _current.set(span)
+    try:
+        yield span
+    except BaseException as e:
+        span.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current.reset(token)
+        span.end_ns = time.time_ns()
+        _finish(span)
+
+
+def _finish(span: Span):
+    collector = _collector.get()
+    if collector is not None:
+        collector.append(span)
+    if settings.TRACING_OTLP_ENDPOINT:
+        exporter.export(span)
+
+
+@contextmanager
+def collect() -> Iterator[List[Span]]:
+    """Record the spans finished in this context (e.g. for one profiled request)"""
+    spans: List[Span] = []
+    token = _collector.set(spans)
+    try:
+        yield spans
+    finally:
+        _collector.reset(token)
+
+
+def record_http_response(response: httpx.Response):
+    """httpx response hook for Seedr clients: counts requests and bytes on the current upstream span"""
+    span = _current.get()
+    if span is None or span.kind != KIND_CLIENT:
+        return
+    response.read()
+    span.add("http.request_count")
+    span.add("http.response.body.size", len(response.content))
+    span.set("http.response.status_code", response.status_code)
+
+
+def record_token_refresh():
+    """Mark the current upstream call as having refreshed the access token"""
+    span = _current.get()
+    if span is not None:
+        span.set("seedr.token_refreshed", True)
+        span.event("token_refresh")
+
+
+class OTLPExporter:
+    """Batches finished spans and POSTs them as OTLP/HTTP JSON from a background thread"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pending: List[Span] = []
+        self.dropped = 0
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def export(self, span: Span):
+        with self.lock:
+            if len(self.pending) >= settings.TRACING_MAX_QUEUE:
+                self.dropped += 1
+                return
+            self.pending.append(span)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="otlp-exporter", daemon=True)
+                self._thread.start()
+
+    def payload(self, spans: List[Span]) -> Dict[str, Any]:
+        return {
+            "resourceSpans": [{
+                "resource": {"attributes": [
+                    {"key": "service.name", "value": _otlp_value(settings.TRACING_SERVICE_NAME)}
+                ]},
+                "scopeSpans": [{
+                    "scope": {"name": "seedr-api"},
+                    "spans": [span.to_otlp() for span in spans]
+                }]
+            }]
+        }
+
+    def flush(self):
+        with self.lock:
+            spans, self.pending = self.pending, []
+        if not spans or not settings.TRACING_OTLP_ENDPOINT:
+            return
+        try:
+            httpx.post(settings.TRACING_OTLP_ENDPOINT, json=self.payload(spans), timeout=10.0)
+        except httpx.HTTPError as e:
+            logger.warning(f"Could not export {len(spans)} spans: {e}")
+
+    def _run(self):
+        while True:
+            self._wake.wait(settings.TRACING_EXPORT_INTERVAL)
+            self._wake.clear()
+            self.flush()
+
+    def stop(self):
+        self.flush()
+
+
+# Global span exporter instance
+exporter = OTLPExporter()
+
+
+class TracingMiddleware:
+    """Open a server span per request and expose its trace id as ``X-Trace-Id``"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not _recording():
+            return await self.app(scope, receive, send)
+
+        traceparent = None
+        for key, value in scope.get("headers", []):
+            if key == b"traceparent":
+                traceparent = value.decode("latin-1")
+                break
+
+        with start_span(f"{scope['method']} {scope['path']}", KIND_SERVER,
+                        {"http.request.method": scope["method"], "url.path": scope["path"]},
+                        traceparent=traceparent) as span:
+            async def traced_send(message):
+                if message["type"] == "http.response.start":
+                    span.set("http.response.status_code", message["status"])
+                    headers = list(message.get("headers", [])) + [(b"x-trace-id", span.trace_id.encode())]
+                    message = {**message, "headers": headers}
+                await send(message)
+
+            await self.app(scope, receive, traced_send)
+            route = getattr(scope.get("route"), "path", None)
+            if route:
+                span.name = f"{scope['method']} {route}"
+                span.set("http.route", route)
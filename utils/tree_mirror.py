@@ -0,0 +1,597 @@
+"""Local mirror of each user's folder tree
+
+A SQLite database (TREE_MIRROR_PATH) holds the folders, files and torrents
+of every synced account: id, parent, name, size, hash and timestamps. It
+lets listings, recursive listings and searches be answered without a Seedr
+round-trip.
+
+The mirror is kept current three ways:
+
+* **Observed listings**: what ``/files/list`` and ``/files/list-all``
+  fetch from Seedr is written to the mirror. Requests only queue the
+  listing (``observe_later``); a writer thread stores it, keeping the
+  latest listing of each folder, so no request waits on a mirror write.
+* **Write-through**: renames and deletes made through ``InstrumentedSeedr``
+  are applied to the mirror as soon as Seedr confirms them, sizes of the
+  parent folders included.
+  Creates (new folders, added torrents) return no ids, so they mark the
+  folder they land in as changed instead.
+* **Background sync**: every TREE_MIRROR_SYNC_INTERVAL seconds the leader
+  (``LeaderLease``) lists each user's root folder. A child folder is
+  re-listed only when its size or last update differs from the mirror,
+  since Seedr folder sizes include everything below them. Unchanged
+  subtrees are confirmed without being listed, so a sync of an idle account
+  costs one call. Changes that keep the size (such as renames made on
+  seedr.cc) are caught by a full re-list every TREE_MIRROR_FULL_SYNC_INTERVAL
+  seconds.
+
+A folder is fresh as of ``verified_at``, the last time its contents were
+listed or confirmed unchanged. Folders seen in a parent listing but not
+listed since (``listed_at`` NULL) are dirty; the next sync lists them.
+"""
+import logging
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from config import settings
+from utils.metrics import CACHE_REQUESTS
+from utils.shared_state import LeaderLease, shared_state
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS folders (
+    user_id TEXT NOT NULL,
+    id INTEGER NOT NULL,
+    parent INTEGER,
+    name TEXT,
+    fullname TEXT,
+    size INTEGER,
+    last_update TEXT,
+    listed_at REAL,
+    verified_at REAL,
+    PRIMARY KEY (user_id, id)
+);
+CREATE INDEX IF NOT EXISTS folders_parent ON folders (user_id, parent);
+CREATE TABLE IF NOT EXISTS files (
+    user_id TEXT NOT NULL,
+    id INTEGER NOT NULL,
+    folder_id INTEGER NOT NULL,
+    file_id INTEGER,
+    name TEXT,
+    size INTEGER,
+    hash TEXT,
+    last_update TEXT,
+    play_audio INTEGER,
+    play_video INTEGER,
+    PRIMARY KEY (user_id, id)
+);
+CREATE INDEX IF NOT EXISTS files_folder ON files (user_id, folder_id);
+CREATE TABLE IF NOT EXISTS torrents (
+    user_id TEXT NOT NULL,
+    id INTEGER NOT NULL,
+    folder_id INTEGER NOT NULL,
+    name TEXT,
+    size INTEGER,
+    hash TEXT,
+    progress TEXT,
+    last_update TEXT,
+    progress_url TEXT,
+    PRIMARY KEY (user_id, id)
+);
+CREATE TABLE IF NOT EXISTS users (
+    user_id TEXT PRIMARY KEY,
+    space_used INTEGER,
+    space_max INTEGER,
+    synced_at REAL,
+    full_synced_at REAL
+);
+"""
+
+# Ids of a folder and everything below it (parameters: folder id, user id)
+_SUBTREE = """
+WITH RECURSIVE subtree(id) AS (
+    SELECT ? UNION ALL
+    SELECT f.id FROM folders f JOIN subtree ON f.parent = subtree.id WHERE f.user_id = ?
+)
+"""
+
+# Ids of a folder and its ancestors (parameters: folder id, user id)
+_ANCESTORS = """
+WITH RECURSIVE ancestors(id) AS (
+    SELECT ? UNION ALL
+    SELECT f.parent FROM folders f JOIN ancestors ON f.id = ancestors.id
+    WHERE f.user_id = ? AND f.parent IS NOT NULL
+)
+"""
+
+_FOLDER_COLUMNS = ("id", "name", "fullname", "size", "last_update")
+_FILE_COLUMNS = ("folder_file_id", "folder_id", "file_id", "name", "size", "hash", "last_update",
+                 "play_audio", "play_video")
+_TORRENT_COLUMNS = ("id", "name", "size", "hash", "progress", "last_update", "progress_url")
+
+
+def _timestamp(value: Any) -> Optional[str]:
+    if value is None:
+        return None
+    return value.isoformat() if hasattr(value, 'isoformat') else str(value)
+
+
+def _id(value: Any) -> int:
+    """Integer id of a folder, file or torrent (0, the root folder, when missing)
+
+    The root folder is mirrored as 0 whatever id Seedr gives it.
+    """
+    try:
+        return int(value or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+def _like(query: str) -> str:
+    escaped = query.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f"%{escaped}%"
+
+
+class TreeMirror:
+    """SQLite mirror of folder trees with change-detecting background sync"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or settings.TREE_MIRROR_PATH
+        self.lock = threading.Lock()
+        self._local = threading.local()
+        self._init_lock = threading.Lock()
+        self._initialized = False
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._leader = LeaderLease("tree-mirror")
+        # (user id, folder id) -> (folder id as given, contents, listed at), written by the writer thread
+        self._pending: Dict[Tuple[str, int], Tuple[Any, Any, float]] = {}
+        self._pending_ready = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._writer: Optional[threading.Thread] = None
+
+    @property
+    def enabled(self) -> bool:
+        return settings.TREE_MIRROR_SYNC_INTERVAL > 0
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            with self._init_lock:
+                if not self._initialized:
+                    conn.executescript(_SCHEMA)
+                    self._initialized = True
+        return conn
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    # Observed listings
+
+    def observe_listing(self, user_id: str, folder_id: Any, contents: Any, now: Optional[float] = None):
+        """Store a ``list_contents`` result; child folders whose size or last update changed become dirty"""
+        now = now or time.time()
+        fid = _id(folder_id)
+        children = getattr(contents, 'folders', None) or []
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT INTO folders (user_id, id, parent, name, fullname, size, last_update, listed_at, verified_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(user_id, id) DO UPDATE SET name = excluded.name, fullname = excluded.fullname, "
+                "size = excluded.size, last_update = excluded.last_update, "
+                "listed_at = excluded.listed_at, verified_at = excluded.verified_at",
+                (user_id, fid, None if fid == 0 else getattr(contents, 'parent', None),
+                 getattr(contents, 'name', None), getattr(contents, 'fullname', None),
+                 getattr(contents, 'size', None), _timestamp(getattr(contents, 'last_update', None)), now, now)
+            )
+
+            # Child folders that disappeared take their subtree with them
+            present = {int(folder.id) for folder in children}
+            for (gone,) in conn.execute("SELECT id FROM folders WHERE user_id = ? AND parent = ?", (user_id, fid)).fetchall():
+                if gone not in present:
+                    self._delete_subtree(conn, user_id, gone)
+
+            for folder in children:
+                size, last_update = getattr(folder, 'size', None), _timestamp(getattr(folder, 'last_update', None))
+                conn.execute(
+                    "INSERT INTO folders (user_id, id, parent, name, fullname, size, last_update) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT(user_id, id) DO UPDATE SET parent = excluded.parent, name = excluded.name, "
+                    "fullname = excluded.fullname, size = excluded.size, last_update = excluded.last_update, "
+                    "listed_at = CASE WHEN folders.size IS excluded.size AND folders.last_update IS excluded.last_update "
+                    "THEN folders.listed_at END, "
+                    "verified_at = CASE WHEN folders.size IS excluded.size AND folders.last_update IS excluded.last_update "
+                    "THEN folders.verified_at END",
+                    (user_id, int(folder.id), fid, getattr(folder, 'name', None),
+                     getattr(folder, 'fullname', None), size, last_update)
+                )
+
+            conn.execute("DELETE FROM files WHERE user_id = ? AND folder_id = ?", (user_id, fid))
+            conn.executemany(
+                "INSERT OR REPLACE INTO files (user_id, id, folder_id, file_id, name, size, hash, last_update, "
+                "play_audio, play_video) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(user_id, int(f.folder_file_id), fid, getattr(f, 'file_id', None), getattr(f, 'name', None),
+                  getattr(f, 'size', None), getattr(f, 'hash', None), _timestamp(getattr(f, 'last_update', None)),
+                  getattr(f, 'play_audio', None), getattr(f, 'play_video', None))
+                 for f in getattr(contents, 'files', None) or []]
+            )
+
+            conn.execute("DELETE FROM torrents WHERE user_id = ? AND folder_id = ?", (user_id, fid))
+            conn.executemany(
+                "INSERT OR REPLACE INTO torrents (user_id, id, folder_id, name, size, hash, progress, last_update, "
+                "progress_url) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(user_id, int(t.id), fid, getattr(t, 'name', None), getattr(t, 'size', None),
+                  getattr(t, 'hash', None), getattr(t, 'progress', None),
+                  _timestamp(getattr(t, 'last_update', None)), getattr(t, 'progress_url', None))
+                 for t in getattr(contents, 'torrents', None) or []]
+            )
+
+            if fid == 0:
+                conn.execute(
+                    "INSERT INTO users (user_id, space_used, space_max) VALUES (?, ?, ?) "
+                    "ON CONFLICT(user_id) DO UPDATE SET space_used = excluded.space_used, space_max = excluded.space_max",
+                    (user_id, getattr(contents, 'space_used', None), getattr(contents, 'space_max', None))
+                )
+
+    def observe_later(self, user_id: str, folder_id: Any, contents: Any):
+        """Queue a ``list_contents`` result for the writer thread; replaces a queued listing of the same folder"""
+        with self._pending_ready:
+            self._pending[(user_id, _id(folder_id))] = (folder_id, contents, time.time())
+            if self._writer is None or not self._writer.is_alive():
+                self._writer = threading.Thread(target=self._write_pending, name="tree-mirror-writer", daemon=True)
+                self._writer.start()
+            self._pending_ready.notify()
+
+    def flush(self):
+        """Write queued listings now"""
+        with self._write_lock:
+            with self._pending_ready:
+                pending, self._pending = self._pending, {}
+            for (user_id, _), (folder_id, contents, listed_at) in pending.items():
+                try:
+                    self.observe_listing(user_id, folder_id, contents, now=listed_at)
+                except sqlite3.Error as e:
+                    logger.error(f"Tree mirror update failed: {e}")
+
+    def _write_pending(self):
+        while True:
+            with self._pending_ready:
+                if not self._pending:
+                    # Exit when idle; the next observe_later starts a new writer
+                    if not self._pending_ready.wait(timeout=60.0) and not self._pending:
+                        self._writer = None
+                        return
+            self.flush()
+
+    def _delete_subtree(self, conn: sqlite3.Connection, user_id: str, folder_id: int):
+        for table, column in (("files", "folder_id"), ("torrents", "folder_id"), ("folders", "id")):
+            conn.execute(
+                f"{_SUBTREE} DELETE FROM {table} WHERE user_id = ? AND {column} IN (SELECT id FROM subtree)",
+                (folder_id, user_id, user_id)
+            )
+
+    def _shrink(self, conn: sqlite3.Connection, user_id: str, folder_id: int, size: int):
+        """Take ``size`` bytes off a folder, its ancestors and the account's used space"""
+        if not size:
+            return
+        conn.execute(
+            f"{_ANCESTORS} UPDATE folders SET size = MAX(size - ?, 0) "
+            "WHERE user_id = ? AND id IN (SELECT id FROM ancestors)",
+            (folder_id, user_id, size, user_id)
+        )
+        conn.execute("UPDATE users SET space_used = MAX(space_used - ?, 0) WHERE user_id = ?", (size, user_id))
+
+    def _mark_dirty(self, conn: sqlite3.Connection, user_id: str, folder_id: int):
+        conn.execute(
+            "UPDATE folders SET listed_at = NULL, verified_at = NULL WHERE user_id = ? AND id = ?",
+            (user_id, folder_id)
+        )
+
+    # Write-through
+
+    def apply_write(self, user_id: str, method: str, args: tuple, kwargs: Dict[str, Any]):
+        """Apply a write Seedr accepted (a ``Seedr`` method name and its arguments) to the mirror"""
+        def arg(index: int, name: str, default: Any = None) -> Any:
+            return args[index] if len(args) > index else kwargs.get(name, default)
+
+        with self._transaction() as conn:
+            if method == "rename_file":
+                conn.execute(
+                    "UPDATE files SET name = ? WHERE user_id = ? AND id = ?",
+                    (arg(1, "rename_to"), user_id, _id(arg(0, "file_id")))
+                )
+            elif method == "rename_folder":
+                self._rename_folder(conn, user_id, _id(arg(0, "folder_id")), arg(1, "rename_to"))
+            elif method == "delete_file":
+                row = conn.execute(
+                    "SELECT folder_id, size FROM files WHERE user_id = ? AND id = ?",
+                    (user_id, _id(arg(0, "file_id")))
+                ).fetchone()
+                if row:
+                    conn.execute("DELETE FROM files WHERE user_id = ? AND id = ?", (user_id, _id(arg(0, "file_id"))))
+                    self._shrink(conn, user_id, row[0], row[1] or 0)
+            elif method == "delete_folder":
+                fid = _id(arg(0, "folder_id"))
+                row = conn.execute("SELECT parent, size FROM folders WHERE user_id = ? AND id = ?", (user_id, fid)).fetchone()
+                if row and fid:
+                    self._delete_subtree(conn, user_id, fid)
+                    if row[0] is not None:
+                        self._shrink(conn, user_id, row[0], row[1] or 0)
+            elif method == "delete_torrent":
+                conn.execute("DELETE FROM torrents WHERE user_id = ? AND id = ?", (user_id, _id(arg(0, "torrent_id"))))
+            elif method == "add_folder":
+                self._mark_dirty(conn, user_id, 0)
+            elif method == "add_torrent":
+                # Active torrents are listed in the root folder
+                self._mark_dirty(conn, user_id, 0)
+                self._mark_dirty(conn, user_id, _id(arg(3, "folder_id", "0")))
+
+    def _rename_folder(self, conn: sqlite3.Connection, user_id: str, folder_id: int, new_name: str):
+        row = conn.execute("SELECT fullname FROM folders WHERE user_id = ? AND id = ?", (user_id, folder_id)).fetchone()
+        if row is None:
+            return
+        old_fullname = row[0]
+        if old_fullname:
+            head, sep, _ = old_fullname.rpartition('/')
+            new_fullname = f"{head}{sep}{new_name}"
+            conn.execute(
+                f"{_SUBTREE} UPDATE folders SET fullname = ? || substr(fullname, ?) "
+                "WHERE user_id = ? AND id IN (SELECT id FROM subtree) AND id != ?",
+                (folder_id, user_id, new_fullname, len(old_fullname) + 1, user_id, folder_id)
+            )
+        else:
+            new_fullname = None
+        conn.execute(
+            "UPDATE folders SET name = ?, fullname = COALESCE(?, fullname) WHERE user_id = ? AND id = ?",
+            (new_name, new_fullname, user_id, folder_id)
+        )
+
+    # Sync
+
+    def sync(self, user_id: str, client: Any, full: bool = False) -> Dict[str, Any]:
+        """
+        Bring a user's mirror up to date.
+
+        Lists the root folder, then only the folders that changed since the
+        mirror last saw them (every folder when ``full``).
+        """
+        start = time.time()
+        pending, listed, confirmed = [0], 0, 0
+        while pending:
+            folder_id = pending.pop()
+            self.observe_listing(user_id, folder_id, client.list_contents(str(folder_id)))
+            listed += 1
+            rows = self._connect().execute(
+                "SELECT id, listed_at FROM folders WHERE user_id = ? AND parent = ?", (user_id, folder_id)
+            ).fetchall()
+            for child_id, listed_at in rows:
+                if full or listed_at is None:
+                    pending.append(child_id)
+                    continue
+                # Unchanged subtree: confirm what is listed, and list what below it is dirty
+                with self._transaction() as conn:
+                    conn.execute(
+                        f"{_SUBTREE} UPDATE folders SET verified_at = ? "
+                        "WHERE user_id = ? AND id IN (SELECT id FROM subtree) AND listed_at IS NOT NULL",
+                        (child_id, user_id, start, user_id)
+                    )
+                    dirty = conn.execute(
+                        f"{_SUBTREE} SELECT id FROM folders "
+                        "WHERE user_id = ? AND id IN (SELECT id FROM subtree) AND listed_at IS NULL",
+                        (child_id, user_id, user_id)
+                    ).fetchall()
+                confirmed += 1
+                pending.extend(row[0] for row in dirty)
+
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT INTO users (user_id, synced_at, full_synced_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(user_id) DO UPDATE SET synced_at = excluded.synced_at, "
+                "full_synced_at = COALESCE(excluded.full_synced_at, users.full_synced_at)",
+                (user_id, start, start if full else None)
+            )
+        return {"full": full, "listed": listed, "confirmed": confirmed, "elapsed_seconds": time.time() - start}
+
+    def needs_full_sync(self, user_id: str, now: Optional[float] = None) -> bool:
+        row = self._connect().execute("SELECT full_synced_at FROM users WHERE user_id = ?", (user_id,)).fetchone()
+        last = row[0] if row else None
+        return last is None or (now or time.time()) - last >= settings.TREE_MIRROR_FULL_SYNC_INTERVAL
+
+    def _run(self):
+        from utils.seedr_client import client_manager
+        while not self._stop.is_set():
+            if not self._leader.is_leader():
+                self._stop.wait(settings.TREE_MIRROR_SYNC_INTERVAL)
+                continue
+            # Users signed in through other workers are known from their stored tokens
+            for user_id in shared_state.token_user_ids():
+                client_manager.get_client(user_id)
+            with client_manager.lock:
+                clients = list(client_manager.clients.items())
+            # The default user shares its client with the named account; sync it once
+            seen = set()
+            for user_id, client in clients:
+                if id(client) in seen:
+                    continue
+                seen.add(id(client))
+                owner = mirror_user(client, user_id)
+                try:
+                    stats = self.sync(owner, client, full=self.needs_full_sync(owner))
+                    logger.debug(f"Tree mirror sync for {owner}: {stats}")
+                except Exception as e:
+                    logger.error(f"Tree mirror sync failed for {owner}: {e}")
+            self._stop.wait(settings.TREE_MIRROR_SYNC_INTERVAL)
+
+    def start(self):
+        """Start the background sync (disabled when TREE_MIRROR_SYNC_INTERVAL is 0)"""
+        if not self.enabled:
+            return
+        with self.lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="tree-mirror", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._leader.release()
+        self.flush()
+
+    # Queries
+
+    def _freshness(self, conn: sqlite3.Connection, user_id: str) -> Optional[float]:
+        """When the whole tree was last confirmed; None while any folder is dirty or nothing is mirrored"""
+        row = conn.execute(
+            "SELECT COUNT(*), COUNT(verified_at), MIN(verified_at) FROM folders WHERE user_id = ?", (user_id,)
+        ).fetchone()
+        root = conn.execute("SELECT 1 FROM folders WHERE user_id = ? AND id = 0", (user_id,)).fetchone()
+        if not root or row[0] != row[1]:
+            return None
+        return row[2]
+
+    def _files(self, rows: List[tuple]) -> List[Dict[str, Any]]:
+        return [dict(zip(_FILE_COLUMNS, row)) for row in rows]
+
+    def _folders(self, rows: List[tuple]) -> List[Dict[str, Any]]:
+        return [dict(zip(_FOLDER_COLUMNS, row)) for row in rows]
+
+    def listing(self, user_id: str, folder_id: Any, max_age: float) -> Optional[Tuple[Dict[str, Any], float]]:
+        """A folder listing confirmed within ``max_age`` seconds, and when it was confirmed"""
+        fid = _id(folder_id)
+        conn = self._connect()
+        row = conn.execute(
+            "SELECT name, fullname, size, last_update, parent, verified_at FROM folders "
+            "WHERE user_id = ? AND id = ? AND listed_at IS NOT NULL",
+            (user_id, fid)
+        ).fetchone()
+        if row is None or row[5] is None or time.time() - row[5] > max_age:
+            CACHE_REQUESTS.inc("tree_mirror", "miss")
+            return None
+        CACHE_REQUESTS.inc("tree_mirror", "hit")
+        name, fullname, size, last_update, parent, verified_at = row
+        contents = {
+            "id": fid, "name": name, "fullname": fullname, "size": size, "last_update": last_update,
+            "parent": parent,
+            "folders": self._folders(conn.execute(
+                "SELECT id, name, fullname, size, last_update FROM folders WHERE user_id = ? AND parent = ? ORDER BY id",
+                (user_id, fid)
+            ).fetchall()),
+            "files": self._files(conn.execute(
+                "SELECT id, folder_id, file_id, name, size, hash, last_update, play_audio, play_video "
+                "FROM files WHERE user_id = ? AND folder_id = ? ORDER BY id",
+                (user_id, fid)
+            ).fetchall()),
+            "torrents": [dict(zip(_TORRENT_COLUMNS, t)) for t in conn.execute(
+                "SELECT id, name, size, hash, progress, last_update, progress_url "
+                "FROM torrents WHERE user_id = ? AND folder_id = ? ORDER BY id",
+                (user_id, fid)
+            ).fetchall()]
+        }
+        if fid == 0:
+            usage = conn.execute("SELECT space_used, space_max FROM users WHERE user_id = ?", (user_id,)).fetchone()
+            if usage:
+                contents["space_used"], contents["space_max"] = usage
+        return contents, verified_at
+
+    def tree(self, user_id: str, max_age: float) -> Optional[Tuple[List[Dict[str, Any]], List[Dict[str, Any]], float]]:
+        """Every folder and file (breadth first, like a recursive listing) when the whole tree is fresh"""
+        conn = self._connect()
+        verified_at = self._freshness(conn, user_id)
+        if verified_at is None or time.time() - verified_at > max_age:
+            CACHE_REQUESTS.inc("tree_mirror", "miss")
+            return None
+        CACHE_REQUESTS.inc("tree_mirror", "hit")
+        children: Dict[int, List[Dict[str, Any]]] = {}
+        for row in conn.execute(
+            "SELECT parent, id, name, fullname, size, last_update FROM folders "
+            "WHERE user_id = ? AND id != 0 ORDER BY id", (user_id,)
+        ):
+            children.setdefault(row[0], []).append(dict(zip(_FOLDER_COLUMNS, row[1:])))
+        files: Dict[int, List[Dict[str, Any]]] = {}
+        for row in conn.execute(
+            "SELECT id, folder_id, file_id, name, size, hash, last_update, play_audio, play_video "
+            "FROM files WHERE user_id = ? ORDER BY id", (user_id,)
+        ):
+            files.setdefault(row[1], []).append(dict(zip(_FILE_COLUMNS, row)))
+        all_folders, all_files, pending = [], [], [0]
+        while pending:
+            folder_id = pending.pop(0)
+            for folder in children.get(folder_id, []):
+                all_folders.append(folder)
+                pending.append(folder["id"])
+            all_files.extend(files.get(folder_id, []))
+        return all_folders, all_files, verified_at
+
+    def search(self, user_id: str, query: str, max_age: float) -> Optional[Tuple[Dict[str, Any], float]]:
+        """Folders and files whose name contains ``query`` (case-insensitive) when the whole tree is fresh"""
+        conn = self._connect()
+        verified_at = self._freshness(conn, user_id)
+        if verified_at is None or time.time() - verified_at > max_age:
+            CACHE_REQUESTS.inc("tree_mirror", "miss")
+            return None
+        CACHE_REQUESTS.inc("tree_mirror", "hit")
+        pattern = _like(query)
+        results = {
+            "folders": self._folders(conn.execute(
+                "SELECT id, name, fullname, size, last_update FROM folders "
+                "WHERE user_id = ? AND id != 0 AND name LIKE ? ESCAPE '\\' ORDER BY id",
+                (user_id, pattern)
+            ).fetchall()),
+            "files": self._files(conn.execute(
+                "SELECT id, folder_id, file_id, name, size, hash, last_update, play_audio, play_video "
+                "FROM files WHERE user_id = ? AND name LIKE ? ESCAPE '\\' ORDER BY id",
+                (user_id, pattern)
+            ).fetchall()),
+            "torrents": []
+        }
+        return results, verified_at
+
+    def status(self, user_id: str) -> Dict[str, Any]:
+        conn = self._connect()
+        folders, dirty = conn.execute(
+            "SELECT COUNT(*), COUNT(*) - COUNT(listed_at) FROM folders WHERE user_id = ?", (user_id,)
+        ).fetchone()
+        sync = conn.execute("SELECT synced_at, full_synced_at FROM users WHERE user_id = ?", (user_id,)).fetchone()
+        verified_at = self._freshness(conn, user_id)
+        return {
+            "enabled": self.enabled,
+            "folders": folders,
+            "files": conn.execute("SELECT COUNT(*) FROM files WHERE user_id = ?", (user_id,)).fetchone()[0],
+            "torrents": conn.execute("SELECT COUNT(*) FROM torrents WHERE user_id = ?", (user_id,)).fetchone()[0],
+            "dirty_folders": dirty,
+            "synced_at": sync[0] if sync else None,
+            "full_synced_at": sync[1] if sync else None,
+            "verified_at": verified_at,
+            "age_seconds": time.time() - verified_at if verified_at is not None else None
+        }
+
+
+def freshness_headers(verified_at: float) -> Dict[str, str]:
+    """Headers of a response answered from the mirror: its age and when Seedr last confirmed it"""
+    return {"Age": str(max(int(time.time() - verified_at), 0)), "X-Mirror-Synced-At": f"{verified_at:.3f}"}
+
+
+def mirror_user(client: Any, user_id: str) -> str:
+    """The user a client's calls are mirrored under (the named account behind ``default``)"""
+    return getattr(client, 'user_id', None) or user_id
+
+
+# Global tree mirror instance
+tree_mirror = TreeMirror()
@@ -0,0 +1,77 @@
+"""Request body size limits for upload routes
+
+Starlette parses multipart bodies before the endpoint runs, so a size check
+inside the route comes too late to stop a huge upload from being received.
+This ASGI middleware rejects oversize bodies up front: requests whose
+``Content-Length`` exceeds the route limit get a 413 without reading the
+body, and chunked bodies are cut off as soon as they cross the limit.
+"""
+import json
+from typing import Dict
+
+
+class BodyTooLarge(Exception):
+    """Raised inside the receive channel when a body exceeds its limit"""
+
+
+async def _send_413(send, limit: int):
+    body = json.dumps({"detail": f"Request body exceeds the {limit} byte upload limit"}).encode()
+    await send({
+        "type": "http.response.start",
+        "status": 413,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+class UploadLimitMiddleware:
+    """Enforce per-path request body limits (in bytes)"""
+
+    def __init__(self, app, limits: Dict[str, int]):
+        self.app = app
+        self.limits = limits
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope.get("method") not in ("POST", "PUT"):
+            return await self.app(scope, receive, send)
+        limit = self.limits.get(scope["path"].rstrip('/'))
+        if limit is None:
+            return await self.app(scope, receive, send)
+
+        for name, value in scope.get("headers", []):
+            if name == b"content-length":
+                try:
+                    if int(value) > limit:
+                        return await _send_413(send, limit)
+                except ValueError:
+                    pass
+
+        received = 0
+        exceeded = False
+        replaced = False
+
+        async def limited_receive():
+            nonlocal received, exceeded
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    exceeded = True
+                    raise BodyTooLarge()
+            return message
+
+        async def limiting_send(message):
+            # The framework may turn the aborted read into its own error response
+            nonlocal replaced
+            if exceeded:
+                if message["type"] == "http.response.start" and not replaced:
+                    replaced = True
+                    await _send_413(send, limit)
+                return
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, limiting_send)
+        except BodyTooLarge:
+            if not replaced:
+                await _send_413(send, limit)
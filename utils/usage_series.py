@@ -0,0 +1,350 @@
+"""Usage time-series recorder
+
+A background sampler records ``space_used``, ``space_max``,
+``bandwidth_used`` and the number of active torrents for every signed-in
+user every USAGE_SAMPLE_INTERVAL seconds. Samples live in a fixed-size ring
+buffer per user (parallel ``array`` columns, USAGE_SERIES_CAPACITY samples),
+so memory is bounded and the oldest samples are overwritten first.
+
+When USAGE_SERIES_PATH is set every sample is also appended to that file
+(one JSON line per sample) and the buffers are rebuilt from it on start;
+the file is rewritten from the buffers once it holds more than twice what
+they can keep.
+
+With several worker processes only the leader (``LeaderLease``) samples,
+for every user with a stored token. The other workers answer queries by
+reading the samples the leader appended to USAGE_SERIES_PATH, so that path
+should be set when running more than one worker.
+
+Queries binary-search the time range and downsample it into min/max/avg
+buckets, so the cost depends on the range and bucket count, not on how
+long the recorder has been running.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from array import array
+from typing import Any, Dict, List, Optional, Tuple
+
+from config import settings
+from utils.shared_state import LeaderLease, shared_state
+
+logger = logging.getLogger(__name__)
+
+FIELDS = ("space_used", "space_max", "bandwidth_used", "torrents")
+
+
+class RingSeries:
+    """Fixed-capacity time series stored in parallel arrays"""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.timestamps = array('d', bytes(8 * capacity))
+        self.columns = {field: array('q', bytes(8 * capacity)) for field in FIELDS}
+        self.start = 0
+        self.size = 0
+
+    def append(self, timestamp: float, values: Dict[str, int]):
+        if self.size and timestamp < self.timestamps[self._slot(self.size - 1)]:
+            return  # Keep timestamps ordered so range lookups can bisect
+        if self.size < self.capacity:
+            slot = self._slot(self.size)
+            self.size += 1
+        else:
+            slot = self.start
+            self.start = (self.start + 1) % self.capacity
+        self.timestamps[slot] = timestamp
+        for field in FIELDS:
+            self.columns[field][slot] = int(values.get(field) or 0)
+
+    def _slot(self, index: int) -> int:
+        return (self.start + index) % self.capacity
+
+    def _bisect(self, timestamp: float) -> int:
+        """First logical index whose timestamp is >= ``timestamp``"""
+        lo, hi = 0, self.size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.timestamps[self._slot(mid)] < timestamp:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def range(self, start: float, end: float) -> Tuple[int, int]:
+        """Logical index range [first, last) of samples within [start, end]"""
+        return self._bisect(start), self._bisect(end + 1e-9)
+
+    def sample(self, index: int) -> Dict[str, Any]:
+        slot = self._slot(index)
+        sample = {"timestamp": self.timestamps[slot]}
+        for field in FIELDS:
+            sample[field] = self.columns[field][slot]
+        return sample
+
+    def first_timestamp(self) -> Optional[float]:
+        return self.timestamps[self._slot(0)] if self.size else None
+
+    def last_timestamp(self) -> Optional[float]:
+        return self.timestamps[self._slot(self.size - 1)] if self.size else None
+
+
+def downsample(series: RingSeries, start: float, end: float, buckets: int) -> List[Dict[str, Any]]:
+    """Aggregate samples in [start, end] into ``buckets`` equal-width min/max/avg buckets"""
+    first, last = series.range(start, end)
+    if first >= last or buckets < 1:
+        return []
+    width = max((end - start) / buckets, 1e-9)
+    result: List[Dict[str, Any]] = []
+    current = None
+    for index in range(first, last):
+        slot = series._slot(index)
+        timestamp = series.timestamps[slot]
+        bucket = min(int((timestamp - start) / width), buckets - 1)
+        if current is None or current["bucket"] != bucket:
+            if current is not None:
+                result.append(_finish_bucket(current))
+            current = {"bucket": bucket, "start": start + bucket * width, "count": 0,
+                       "stats": {field: [None, None, 0] for field in FIELDS}}
+        current["count"] += 1
+        for field in FIELDS:
+            value = series.columns[field][slot]
+            stats = current["stats"][field]
+            stats[0] = value if stats[0] is None else min(stats[0], value)
+            stats[1] = value if stats[1] is None else max(stats[1], value)
+            stats[2] += value
+    result.append(_finish_bucket(current))
+    return result
+
+
+def _finish_bucket(current: Dict[str, Any]) -> Dict[str, Any]:
+    count = current["count"]
+    bucket = {"start": current["start"], "count": count}
+    for field, (low, high, total) in current["stats"].items():
+        bucket[field] = {"min": low, "max": high, "avg": total / count}
+    return bucket
+
+
+def forecast_full(series: RingSeries, start: float, end: float) -> Optional[float]:
+    """Seconds until ``space_used`` reaches ``space_max`` at the least-squares trend of the range"""
+    first, last = series.range(start, end)
+    n = last - first
+    if n < 2:
+        return None
+    xs, ys = [], []
+    for index in range(first, last):
+        slot = series._slot(index)
+        xs.append(series.timestamps[slot])
+        ys.append(series.columns["space_used"][slot])
+    mean_x, mean_y = sum(xs) / n, sum(ys) / n
+    var_x = sum((x - mean_x) ** 2 for x in xs)
+    if var_x == 0:
+        return None
+    slope = sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / var_x
+    if slope <= 0:
+        return None
+    latest = series.sample(last - 1)
+    remaining = latest["space_max"] - latest["space_used"]
+    return max(remaining, 0) / slope
+
+
+class UsageRecorder:
+    """Per-user usage ring buffers with optional append-only persistence"""
+
+    def __init__(self, path: Optional[str] = None, capacity: Optional[int] = None):
+        self.path = settings.USAGE_SERIES_PATH if path is None else path
+        self.capacity = capacity or settings.USAGE_SERIES_CAPACITY
+        self.series: Dict[str, RingSeries] = {}
+        self.lock = threading.Lock()
+        self._file_lines = 0
+        self._file_offset = 0
+        self._file_id: Optional[Tuple[int, int]] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._leader = LeaderLease("usage-sampler")
+        self._load()
+
+    def _get(self, user_id: str) -> RingSeries:
+        series = self.series.get(user_id)
+        if series is None:
+            series = self.series[user_id] = RingSeries(self.capacity)
+        return series
+
+    # Persistence
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            self._read_new_lines()
+        except OSError as e:
+            logger.warning(f"Could not read usage series ({e}). Starting fresh.")
+            return
+        self._compact_if_needed()
+
+    def _read_new_lines(self):
+        """Apply the lines appended to the file since the last read (all of it if it was replaced)"""
+        stat = os.stat(self.path)
+        file_id = (stat.st_dev, stat.st_ino)
+        if file_id != self._file_id or stat.st_size < self._file_offset:
+            self.series = {}
+            self._file_lines = 0
+            self._file_offset = 0
+            self._file_id = file_id
+        if stat.st_size == self._file_offset:
+            return
+        with open(self.path, 'rb') as f:
+            f.seek(self._file_offset)
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break  # Still being written; read it next time
+                self._file_offset += len(line)
+                self._file_lines += 1
+                try:
+                    record = json.loads(line)
+                    self._get(record["u"]).append(record["t"], record)
+                except (json.JSONDecodeError, KeyError, TypeError):
+                    continue  # A torn line from a crash
+
+    def _follow(self):
+        """Pick up samples appended by the worker that leads sampling"""
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            self._read_new_lines()
+        except OSError as e:
+            logger.warning(f"Could not read usage series: {e}")
+
+    def _append_to_file(self, user_id: str, timestamp: float, values: Dict[str, int]):
+        if not self.path:
+            return
+        record = {"u": user_id, "t": timestamp, **{field: values.get(field, 0) for field in FIELDS}}
+        try:
+            with open(self.path, 'ab') as f:
+                f.write((json.dumps(record, separators=(',', ':')) + '\n').encode())
+                self._file_offset = f.tell()
+            if self._file_id is None:
+                stat = os.stat(self.path)
+                self._file_id = (stat.st_dev, stat.st_ino)
+            self._file_lines += 1
+        except OSError as e:
+            logger.error(f"Error appending usage sample: {e}")
+        self._compact_if_needed()
+
+    def _compact_if_needed(self):
+        retained = sum(s.size for s in self.series.values())
+        if self._file_lines <= 2 * max(retained, self.capacity):
+            return
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, 'w') as f:
+                for user_id, series in self.series.items():
+                    for index in range(series.size):
+                        sample = series.sample(index)
+                        record = {"u": user_id, "t": sample.pop("timestamp"), **sample}
+                        f.write(json.dumps(record, separators=(',', ':')) + '\n')
+            os.replace(tmp_path, self.path)
+            stat = os.stat(self.path)
+            self._file_lines = retained
+            self._file_offset = stat.st_size
+            self._file_id = (stat.st_dev, stat.st_ino)
+        except OSError as e:
+            logger.error(f"Error compacting usage series: {e}")
+
+    # Recording
+
+    def record(self, user_id: str, values: Dict[str, int], timestamp: Optional[float] = None):
+        timestamp = timestamp or time.time()
+        with self.lock:
+            self._get(user_id).append(timestamp, values)
+            self._append_to_file(user_id, timestamp, values)
+
+    def sample_user(self, user_id: str, client: Any):
+        """Read usage for one user from Seedr and record it"""
+        from utils.quota_ledger import quota_ledger
+        from utils.torrent_index import torrent_index
+
+        # Read directly: the account cache may serve a stale value, which would make the series lag
+        taken_at = time.monotonic()
+        memory_bandwidth = client.get_memory_bandwidth()
+        quota_ledger.record_reading(
+            user_id,
+            getattr(memory_bandwidth, 'space_used', 0),
+            getattr(memory_bandwidth, 'space_max', 0),
+            taken_at=taken_at
+        )
+        contents = client.list_contents('0')
+        quota_ledger.observe_listing(user_id, contents)
+        torrent_index.observe_listing(user_id, '0', contents)
+        self.record(user_id, {
+            "space_used": getattr(memory_bandwidth, 'space_used', 0),
+            "space_max": getattr(memory_bandwidth, 'space_max', 0),
+            "bandwidth_used": getattr(memory_bandwidth, 'bandwidth_used', 0),
+            "torrents": len(getattr(contents, 'torrents', None) or [])
+        })
+
+    def _run(self):
+        from utils.seedr_client import client_manager
+        while not self._stop.is_set():
+            if not self._leader.is_leader():
+                self._stop.wait(settings.USAGE_SAMPLE_INTERVAL)
+                continue
+            # Users signed in through other workers are known from their stored tokens
+            for user_id in shared_state.token_user_ids():
+                client_manager.get_client(user_id)
+            with client_manager.lock:
+                clients = list(client_manager.clients.items())
+            # The default user shares its client with the named account; sample it once
+            clients.sort(key=lambda item: item[0] != 'default')
+            seen = set()
+            for user_id, client in clients:
+                if id(client) in seen:
+                    continue
+                seen.add(id(client))
+                try:
+                    self.sample_user(user_id, client)
+                except Exception as e:
+                    logger.error(f"Usage sampling failed for {user_id}: {e}")
+            self._stop.wait(settings.USAGE_SAMPLE_INTERVAL)
+
+    def start(self):
+        """Start the background sampler (disabled when USAGE_SAMPLE_INTERVAL is 0)"""
+        if settings.USAGE_SAMPLE_INTERVAL <= 0:
+            return
+        with self.lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="usage-sampler", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._leader.release()
+
+    # Queries
+
+    def query(self, user_id: str, start: Optional[float] = None, end: Optional[float] = None,
+              buckets: int = 60) -> Dict[str, Any]:
+        with self.lock:
+            self._follow()
+            series = self.series.get(user_id)
+            if series is None or series.size == 0:
+                return {"start": start, "end": end, "samples": 0, "buckets": [], "seconds_until_full": None}
+            end = end if end is not None else series.last_timestamp()
+            start = start if start is not None else series.first_timestamp()
+            first, last = series.range(start, end)
+            return {
+                "start": start,
+                "end": end,
+                "samples": last - first,
+                "latest": series.sample(series.size - 1),
+                "buckets": downsample(series, start, end, buckets),
+                "seconds_until_full": forecast_full(series, start, end)
+            }
+
+
+# Global usage recorder instance
+usage_recorder = UsageRecorder()
@@ -0,0 +1,389 @@
+"""Completion webhooks
+
+Adds made with a ``callback_url`` register a watch with the shared
+completion poller. The poller lists each watched folder once per cycle for
+all of a user's pending torrents (feeding the torrent index and quota
+ledger on the way), and when a torrent has turned into a folder it builds
+the completion payload (folder id, files, download URLs) and hands it to
+the delivery queue. Torrents added without a known infohash are matched by
+title to a folder that appeared after the watch was registered.
+
+Callback URLs must be http(s) and, unless WEBHOOK_ALLOW_PRIVATE_HOSTS is
+set, resolve only to public addresses, so the API cannot be used to reach
+loopback, link-local (cloud metadata) or private network services. The
+check runs when the watch is registered and again on every delivery
+attempt, and the POST connects to the address that was checked (with the
+original Host header and TLS server name), so a host that re-resolves to
+an internal address later (DNS rebinding) is refused.
+
+The delivery queue POSTs payloads signed with HMAC-SHA256 over
+``"<timestamp>.<body>"`` (``X-Seedr-Signature: sha256=<hex>`` and
+``X-Seedr-Timestamp`` headers, when WEBHOOK_SECRET is set), retries
+failures with exponential backoff, and moves deliveries that exhaust
+WEBHOOK_MAX_ATTEMPTS to a dead-letter list that can be inspected and
+retried.
+"""
+import hashlib
+import hmac
+import heapq
+import ipaddress
+import json
+import logging
+import socket
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit, urlunsplit
+
+import httpx
+
+from config import settings
+from utils.quota_ledger import quota_ledger
+from utils.torrent_index import normalize_infohash, torrent_index, STATUS_COMPLETED
+
+logger = logging.getLogger(__name__)
+
+EVENT_COMPLETED = "torrent.completed"
+
+_DEAD_LETTER_LIMIT = 1000
+
+
+def sign_payload(body: bytes, timestamp: str, secret: str) -> str:
+    """HMAC-SHA256 signature of a webhook body"""
+    message = timestamp.encode() + b"." + body
+    return "sha256=" + hmac.new(secret.encode(), message, hashlib.sha256).hexdigest()
+
+
+def collect_files(client: Any, folder_id: Any) -> List[Dict[str, Any]]:
+    """List a folder's files with their download URLs"""
+    files = []
+    contents = client.list_contents(str(folder_id))
+    for file in getattr(contents, 'files', None) or []:
+        entry = {'file_id': file.folder_file_id, 'name': file.name, 'size': file.size}
+        try:
+            entry['download_url'] = client.fetch_file(str(file.folder_file_id)).url
+        except Exception as e:
+            entry['error'] = f'Could not get download link: {str(e)}'
+        files.append(entry)
+    return files
+
+
+def check_callback_url(url: str) -> Optional[str]:
+    """
+    Raise ValueError unless ``url`` is an http(s) URL whose host resolves only to public addresses.
+
+    Returns the checked address to connect to, or None when
+    WEBHOOK_ALLOW_PRIVATE_HOSTS skips the check.
+    """
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        raise ValueError("callback_url must be an http(s) URL")
+    if settings.WEBHOOK_ALLOW_PRIVATE_HOSTS:
+        return None
+    try:
+        port = parts.port or (443 if parts.scheme == "https" else 80)
+        addresses = [info[4][0] for info in socket.getaddrinfo(parts.hostname, port, proto=socket.IPPROTO_TCP)]
+    except (OSError, UnicodeError, ValueError):
+        raise ValueError("callback_url host cannot be resolved")
+    if not addresses:
+        raise ValueError("callback_url host cannot be resolved")
+    for address in addresses:
+        ip = ipaddress.ip_address(address.split('%', 1)[0])
+        if isinstance(ip, ipaddress.IPv6Address) and ip.ipv4_mapped:
+            ip = ip.ipv4_mapped
+        if not ip.is_global or ip.is_multicast:
+            raise ValueError("callback_url must not point to a loopback, link-local, private or reserved address")
+    return addresses[0].split('%', 1)[0]
+
+
+def _pinned_request(url: str, address: Optional[str]) -> Tuple[str, Dict[str, str], Dict[str, Any]]:
+    """URL, extra headers and request extensions that send ``url`` to the checked ``address``"""
+    if address is None:
+        return url, {}, {}
+    parts = urlsplit(url)
+    host = f"[{address}]" if ':' in address else address
+    netloc = f"{host}:{parts.port}" if parts.port else host
+    headers = {"Host": parts.netloc.rsplit('@', 1)[-1]}
+    extensions = {"sni_hostname": parts.hostname} if parts.scheme == "https" else {}
+    return urlunsplit(parts._replace(netloc=netloc)), headers, extensions
+
+
+class WebhookDelivery:
+    """Retrying delivery queue with a dead-letter list"""
+
+    def __init__(self, transport: Any = None):
+        self._transport = transport
+        self._client: Optional[httpx.Client] = None
+        self.lock = threading.Lock()
+        self._wake = threading.Condition(self.lock)
+        self._pending: List = []  # heap of (due_at, seq, delivery)
+        self._seq = 0
+        self.dead_letters: deque = deque(maxlen=_DEAD_LETTER_LIMIT)
+        self.metrics = {
+            "enqueued": 0,
+            "delivered": 0,
+            "attempts": 0,
+            "failed_attempts": 0,
+            "dead_lettered": 0,
+            "total_latency_seconds": 0.0
+        }
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = False
+
+    @property
+    def client(self) -> httpx.Client:
+        if self._client is None:
+            self._client = httpx.Client(timeout=settings.WEBHOOK_TIMEOUT, transport=self._transport)
+        return self._client
+
+    def enqueue(self, url: str, payload: Dict[str, Any]) -> str:
+        delivery = {
+            "id": uuid.uuid4().hex,
+            "url": url,
+            "payload": payload,
+            "attempts": 0,
+            "created_at": time.time(),
+            "last_error": None
+        }
+        with self.lock:
+            self.metrics["enqueued"] += 1
+            self._push(delivery, time.monotonic())
+        self.start()
+        return delivery["id"]
+
+    def _push(self, delivery: Dict[str, Any], due_at: float):
+        self._seq += 1
+        heapq.heappush(self._pending, (due_at, self._seq, delivery))
+        self._wake.notify()
+
+    def _backoff(self, attempts: int) -> float:
+        return min(settings.WEBHOOK_BACKOFF_BASE * (2 ** (attempts - 1)), settings.WEBHOOK_BACKOFF_MAX)
+
+    def attempt(self, delivery: Dict[str, Any]) -> bool:
+        """Make one delivery attempt; returns True on a 2xx answer"""
+        body = json.dumps(delivery["payload"], default=str).encode()
+        timestamp = str(int(time.time()))
+        headers = {
+            "Content-Type": "application/json",
+            "X-Seedr-Event": delivery["payload"].get("event", ""),
+            "X-Seedr-Delivery": delivery["id"],
+            "X-Seedr-Timestamp": timestamp
+        }
+        if settings.WEBHOOK_SECRET:
+            headers["X-Seedr-Signature"] = sign_payload(body, timestamp, settings.WEBHOOK_SECRET)
+        delivery["attempts"] += 1
+        try:
+            # Re-checked on every attempt: the host may resolve differently than at registration
+            url, host_headers, extensions = _pinned_request(delivery["url"], check_callback_url(delivery["url"]))
+        except ValueError as e:
+            delivery["last_error"] = str(e)
+            return False
+        try:
+            response = self.client.post(url, content=body, headers={**headers, **host_headers}, extensions=extensions)
+            if response.is_success:
+                return True
+            delivery["last_error"] = f"HTTP {response.status_code}"
+        except httpx.HTTPError as e:
+            delivery["last_error"] = str(e)
+        return False
+
+    def _deliver(self, delivery: Dict[str, Any]):
+        ok = self.attempt(delivery)
+        with self.lock:
+            self.metrics["attempts"] += 1
+            if ok:
+                self.metrics["delivered"] += 1
+                self.metrics["total_latency_seconds"] += time.time() - delivery["created_at"]
+                return
+            self.metrics["failed_attempts"] += 1
+            if delivery["attempts"] >= settings.WEBHOOK_MAX_ATTEMPTS:
+                self.metrics["dead_lettered"] += 1
+                delivery["dead_lettered_at"] = time.time()
+                self.dead_letters.append(delivery)
+                logger.warning(f"Webhook {delivery['id']} to {delivery['url']} dead-lettered: {delivery['last_error']}")
+            else:
+                self._push(delivery, time.monotonic() + self._backoff(delivery["attempts"]))
+
+    def _run(self):
+        while True:
+            with self.lock:
+                while not self._stopped and (not self._pending or self._pending[0][0] > time.monotonic()):
+                    timeout = self._pending[0][0] - time.monotonic() if self._pending else None
+                    self._wake.wait(timeout)
+                if self._stopped:
+                    return
+                _, _, delivery = heapq.heappop(self._pending)
+            self._deliver(delivery)
+
+    def start(self):
+        with self.lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stopped = False
+            self._thread = threading.Thread(target=self._run, name="webhook-delivery", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        with self.lock:
+            self._stopped = True
+            self._wake.notify_all()
+
+    @staticmethod
+    def _owned(delivery: Dict[str, Any], user_id: Optional[str]) -> bool:
+        return user_id is None or delivery["payload"].get("user_id") == user_id
+
+    def retry_dead_letter(self, delivery_id: str, user_id: Optional[str] = None) -> bool:
+        """Move a dead-lettered delivery back to the queue"""
+        with self.lock:
+            for delivery in self.dead_letters:
+                if delivery["id"] == delivery_id and self._owned(delivery, user_id):
+                    self.dead_letters.remove(delivery)
+                    delivery["attempts"] = 0
+                    self._push(delivery, time.monotonic())
+                    break
+            else:
+                return False
+        self.start()
+        return True
+
+    def clear_dead_letters(self, user_id: Optional[str] = None) -> int:
+        with self.lock:
+            kept = [d for d in self.dead_letters if not self._owned(d, user_id)]
+            count = len(self.dead_letters) - len(kept)
+            self.dead_letters.clear()
+            self.dead_letters.extend(kept)
+            return count
+
+    def status(self, user_id: Optional[str] = None) -> Dict[str, Any]:
+        with self.lock:
+            metrics = dict(self.metrics)
+            delivered = metrics.pop("total_latency_seconds")
+            metrics["pending"] = len(self._pending)
+            metrics["avg_delivery_latency_seconds"] = (
+                round(delivered / metrics["delivered"], 3) if metrics["delivered"] else None
+            )
+            return {
+                "metrics": metrics,
+                "dead_letters": [
+                    {k: v for k, v in d.items() if k != "payload"} | {"event": d["payload"].get("event")}
+                    for d in self.dead_letters if self._owned(d, user_id)
+                ]
+            }
+
+
+class CompletionPoller:
+    """Shared poller that turns torrent completions into webhook deliveries"""
+
+    def __init__(self, delivery: WebhookDelivery):
+        self.delivery = delivery
+        self.lock = threading.Lock()
+        self.watches: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def watch(self, user_id: str, torrent_hash: Optional[str], callback_url: str,
+              title: Optional[str] = None, torrent_id: Any = None, folder_id: str = "-1"):
+        """Deliver a completion webhook for this torrent to ``callback_url``"""
+        torrent_hash = normalize_infohash(torrent_hash) if torrent_hash else None
+        key = (torrent_hash or title or '').lower()
+        if not key:
+            raise ValueError("Cannot watch a torrent without an infohash or title")
+        with self.lock:
+            self.watches.setdefault(user_id, {})[key] = {
+                "torrent_hash": torrent_hash,
+                "title": title,
+                "torrent_id": str(torrent_id) if torrent_id else None,
+                "folder_id": '0' if folder_id in (None, '-1') else str(folder_id),
+                "callback_url": callback_url,
+                "created_at": time.time()
+            }
+        self.start()
+
+    def pending(self, user_id: str) -> List[Dict[str, Any]]:
+        with self.lock:
+            return [dict(w) for w in self.watches.get(user_id, {}).values()]
+
+    def poll_user(self, user_id: str, client: Any) -> int:
+        """One polling cycle for a user; returns the number of completions found"""
+        with self.lock:
+            watches = dict(self.watches.get(user_id, {}))
+        if not watches:
+            return 0
+
+        for folder_id in {w["folder_id"] for w in watches.values()}:
+            contents = client.list_contents(folder_id)
+            torrent_index.observe_listing(user_id, folder_id, contents)
+            quota_ledger.observe_listing(user_id, contents, root=folder_id == '0')
+
+        completed = 0
+        now = time.time()
+        for key, watch in watches.items():
+            entry = torrent_index.lookup(user_id, watch["torrent_hash"]) if watch["torrent_hash"] else None
+            folder = None
+            if entry and entry["status"] == STATUS_COMPLETED and entry["folder_id"]:
+                folder = {"folder_id": entry["folder_id"], "name": entry["folder_name"]}
+            elif entry is None and watch["title"]:
+                # Only a folder that appeared after the add, not an older one with the same name
+                folder = torrent_index.find_folder(user_id, watch["title"], watch["folder_id"])
+                if folder is not None and (folder["appeared_at"] is None or folder["appeared_at"] < watch["created_at"]):
+                    folder = None
+
+            if folder is None:
+                if now - watch["created_at"] > settings.WEBHOOK_WATCH_TTL:
+                    logger.warning(f"Webhook watch for {key} expired before completion")
+                    self._forget(user_id, key)
+                continue
+
+            payload = {
+                "event": EVENT_COMPLETED,
+                "user_id": user_id,
+                "torrent_hash": watch["torrent_hash"],
+                "torrent_id": watch["torrent_id"],
+                "title": watch["title"] or (entry or {}).get("title"),
+                "folder_id": folder["folder_id"],
+                "folder_name": folder["name"],
+                "files": collect_files(client, folder["folder_id"]),
+                "completed_at": now
+            }
+            quota_ledger.release_torrent(user_id, watch["torrent_id"], watch["torrent_hash"])
+            self.delivery.enqueue(watch["callback_url"], payload)
+            self._forget(user_id, key)
+            completed += 1
+        return completed
+
+    def _forget(self, user_id: str, key: str):
+        with self.lock:
+            self.watches.get(user_id, {}).pop(key, None)
+
+    def _run(self):
+        from utils.seedr_client import client_manager
+        while not self._stop.is_set():
+            with self.lock:
+                user_ids = [u for u, w in self.watches.items() if w]
+            for user_id in user_ids:
+                client = client_manager.get_client(user_id)
+                if client is None:
+                    continue
+                try:
+                    self.poll_user(user_id, client)
+                except Exception as e:
+                    logger.error(f"Completion polling failed for {user_id}: {e}")
+            self._stop.wait(settings.WEBHOOK_POLL_INTERVAL)
+
+    def start(self):
+        with self.lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="completion-poller", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+
+# Global webhook instances
+webhook_delivery = WebhookDelivery()
+completion_poller = CompletionPoller(webhook_delivery)